@@ -0,0 +1,422 @@
+"""
+Benchmarks das etapas do cálculo da DGM, do pipeline completo e do histórico.
+
+Gera exposições sintéticas (todos os alvos/filtros, os dois locais das tabelas Ki, espessuras
+de 1 a 20 cm, idades dentro e fora da faixa 30-88 da glandularidade), mede cada função
+calcular_*, o pipeline individual (mesma sequência da interface), o cálculo em lote e a
+gravação/exportação do histórico, e grava os tempos em JSON.
+
+Uso:
+    python benchmarks/bench_dgm.py -o resultados.json
+    python benchmarks/bench_dgm.py -o novo.json --comparar resultados.json --tolerancia 0.2
+    python benchmarks/bench_dgm.py -o rapido.json --tamanhos 1 1000 --etapas calcular_csr lote
+
+Com --comparar, etapas que ficaram mais lentas que a linha de base além da tolerância são
+listadas e o script termina com código 1. Com --normalizar, as razões são divididas pela
+razão entre os tempos de um laço de calibração das duas execuções (útil em máquinas
+compartilhadas ou diferentes da que gerou a linha de base).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from dgm import lote as modulo_lote  # noqa: E402
+from dgm.autodiff import (  # noqa: E402
+    _desvios_padrao,
+    _dgm_e_jacobiano,
+    _parametros,
+    incerteza_dgm_autodiff,
+    incertezas_padrao,
+    jacobiano_dgm,
+    propagar_incerteza,
+)
+from dgm.cache import limpar_cache  # noqa: E402
+from dgm.exportacao import exportar_historico  # noqa: E402
+from dgm.historico import HistoricoDGM  # noqa: E402
+from dgm.lote import calcular_dgm_lote, varrer_lote  # noqa: E402
+from dgm.tabelas import (  # noqa: E402
+    COEFS_CSR,
+    CSR_FATOR_G,
+    COEFS_FATOR_G,
+    INCERTEZAS_FATOR_G,
+    CSR_FATOR_C,
+    COEFS_FATOR_C,
+    indices_csr_mais_proximo,
+)
+from dgm.nucleo import (  # noqa: E402
+    alvo_filtro_options,
+    tabelas_ki_por_local,
+    INCERTEZA_KV_PERCENTUAL,
+    INCERTEZA_MAS_PERCENTUAL,
+    INCERTEZA_ESPESSURA_PERCENTUAL,
+    calcular_csr,
+    calcular_fator_g,
+    calcular_glandularidade,
+    calcular_fator_c,
+    calcular_ki,
+    calcular_dgm,
+)
+
+VERSAO_FORMATO = 1
+TAMANHOS_PADRAO = [1, 1_000, 100_000, 1_000_000]
+TOLERANCIA_PADRAO = 0.20
+# Tempo mínimo de medição: tamanhos pequenos são repetidos até atingi-lo (vale o melhor tempo)
+TEMPO_MINIMO = 0.2
+REPETICOES_MAXIMAS = 1_000
+
+
+# --- Exposições sintéticas ---
+
+def gerar_exposicoes(n, semente=0):
+    """DataFrame com n exposições sintéticas nas colunas de entrada do lote e do histórico."""
+    rng = np.random.default_rng(semente)
+    kv_inteiros = rng.integers(24, 33, n).astype(float)
+    kv_fracionarios = np.round(rng.uniform(24, 33, n), 1)
+    return pd.DataFrame({
+        "Data/Hora": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "ID Paciente": rng.integers(1, max(n // 3, 2), n).astype(str),
+        "Iniciais Paciente": "XX",
+        "Local do Mamógrafo": rng.choice(list(tabelas_ki_por_local), n),
+        "Idade": rng.integers(20, 96, n),  # inclui idades fora de 30-88
+        "Espessura (cm)": np.round(rng.uniform(1, 20, n), 1),
+        "Alvo/Filtro": rng.choice(list(alvo_filtro_options), n),
+        "Kv": np.where(rng.random(n) < 0.7, kv_inteiros, kv_fracionarios),
+        "mAs": np.round(rng.uniform(5, 300, n), 1),
+        "Glandularidade (%)": np.where(rng.random(n) < 0.3, np.round(rng.uniform(0, 100, n), 1), np.nan),
+    })
+
+
+def pipeline_individual(local, idade, espessura, alvo_filtro, kv, mas, glandularidade_informada):
+    """Mesma sequência de chamadas da aba de cálculo individual; retorna (DGM, incerteza) ou None."""
+    d_kv_abs = kv * INCERTEZA_KV_PERCENTUAL
+    d_mas_abs = mas * INCERTEZA_MAS_PERCENTUAL
+    d_espessura_abs = espessura * INCERTEZA_ESPESSURA_PERCENTUAL
+    if glandularidade_informada == glandularidade_informada:  # não é NaN
+        glandularidade = glandularidade_informada
+    else:
+        glandularidade = calcular_glandularidade(idade, espessura)
+    s = alvo_filtro_options.get(alvo_filtro)
+    csr, _ = calcular_csr(kv, alvo_filtro, d_kv_abs)
+    if isinstance(csr, str) or isinstance(glandularidade, str) or s is None:
+        return None
+    fator_g, incerteza_fator_g = calcular_fator_g(csr, espessura, d_espessura_abs)
+    fator_c, incerteza_fator_c = calcular_fator_c(csr, espessura, glandularidade, d_espessura_abs)
+    ki, incerteza_ki = calcular_ki(kv, alvo_filtro, mas, espessura, d_mas_abs, d_espessura_abs, local)
+    if any(isinstance(v, str) for v in (fator_g, fator_c, ki)):
+        return None
+    return calcular_dgm(ki, s, fator_g, fator_c, incerteza_ki, 0.0, incerteza_fator_g, incerteza_fator_c)
+
+
+# --- Etapas medidas ---
+# Cada etapa recebe as exposições (e o resultado do lote, para alimentar as funções
+# intermediárias com entradas realistas) e devolve uma função sem argumentos a ser medida.
+
+def _colunas(dados, *nomes):
+    return [dados[nome].tolist() for nome in nomes]
+
+
+def etapa_csr(dados, lote):
+    kvs, alvos = _colunas(dados, "Kv", "Alvo/Filtro")
+    return lambda: [calcular_csr(kv, af, kv * INCERTEZA_KV_PERCENTUAL) for kv, af in zip(kvs, alvos)]
+
+
+def etapa_fator_g(dados, lote):
+    csrs, espessuras = _colunas(lote, "CSR", "Espessura (cm)")
+    return lambda: [calcular_fator_g(csr, e, e * INCERTEZA_ESPESSURA_PERCENTUAL) for csr, e in zip(csrs, espessuras)]
+
+
+def etapa_glandularidade(dados, lote):
+    idades, espessuras = _colunas(dados, "Idade", "Espessura (cm)")
+    return lambda: [calcular_glandularidade(idade, e) for idade, e in zip(idades, espessuras)]
+
+
+def etapa_fator_c(dados, lote):
+    csrs, espessuras, glandularidades = _colunas(lote, "CSR", "Espessura (cm)", "Glandularidade (%)")
+    return lambda: [calcular_fator_c(csr, e, g, e * INCERTEZA_ESPESSURA_PERCENTUAL)
+                    for csr, e, g in zip(csrs, espessuras, glandularidades)]
+
+
+def etapa_ki(dados, lote):
+    kvs, alvos, mas, espessuras, locais = _colunas(dados, "Kv", "Alvo/Filtro", "mAs", "Espessura (cm)", "Local do Mamógrafo")
+    return lambda: [calcular_ki(kv, af, m, e, m * INCERTEZA_MAS_PERCENTUAL, e * INCERTEZA_ESPESSURA_PERCENTUAL, local)
+                    for kv, af, m, e, local in zip(kvs, alvos, mas, espessuras, locais)]
+
+
+def etapa_dgm(dados, lote):
+    colunas = _colunas(lote.fillna(1.0), "Ki", "Valor s", "Fator g", "Fator C", "Incerteza Ki", "Incerteza Fator g", "Incerteza Fator C")
+    return lambda: [calcular_dgm(ki, s, g, c, dki, 0.0, dg, dc) for ki, s, g, c, dki, dg, dc in zip(*colunas)]
+
+
+def etapa_pipeline_individual(dados, lote):
+    colunas = _colunas(dados, "Local do Mamógrafo", "Idade", "Espessura (cm)", "Alvo/Filtro", "Kv", "mAs", "Glandularidade (%)")
+    return lambda: [pipeline_individual(*linha) for linha in zip(*colunas)]
+
+
+def etapa_lote(dados, lote):
+    return lambda: calcular_dgm_lote(dados)
+
+
+def etapa_lote_varredura_mas(dados, lote):
+    # 10 valores de mAs: o lote é calculado uma vez e só Ki e DGM são refeitos nos demais
+    return lambda: varrer_lote(dados, coluna="mAs", valores=np.arange(10.0, 110.0, 10.0))
+
+
+def etapa_lote_autodiff(dados, lote):
+    # Comparar com "lote": a diferença é o custo da jacobiana e da propagação
+    return lambda: incerteza_dgm_autodiff(dados)
+
+
+# Derivadas manuais do lote x diferenciação automática, nas linhas calculadas com sucesso.
+# "lote_derivadas" mede só as derivadas parciais e as somas de incerteza das etapas do lote
+# (dgm.lote._incerteza_*), com as consultas às tabelas feitas fora da medição;
+# "autodiff_nucleo" é o equivalente na diferenciação automática (duais, desvios e propagação,
+# parâmetros extraídos fora da medição) e "autodiff_jacobiano" inclui a extração das colunas
+# do resultado (jacobiano_dgm + propagar_incerteza, desvios fora da medição).
+
+def etapa_lote_derivadas(dados, lote):
+    valores = modulo_lote._calcular_dgm_lote(dados.loc[lote.index[lote["Erro"] == ""]])[1]
+    calibracao, e, kv, mas = valores["calibracao"], valores["espessura"], valores["kv"], valores["mas"]
+    csr_a = COEFS_CSR[valores["idx_alvo"], 0]
+    idx_g = indices_csr_mais_proximo(valores["csr"], CSR_FATOR_G)
+    _, a1, a2, a3 = COEFS_FATOR_G[idx_g].T
+    incertezas_g = INCERTEZAS_FATOR_G[idx_g].T
+    coefs_c = COEFS_FATOR_C[indices_csr_mais_proximo(valores["csr"], CSR_FATOR_C), valores["grupo"] - 1].T
+    x_val, incerteza_interpolacao = calibracao.interpolar_x_ki(valores["idx_local"], valores["idx_alvo"], kv)
+    conversion_factor, reference_thickness = calibracao.fatores[valores["idx_local"]].T
+    divisor = (reference_thickness - e)**2
+    dgm = [valores[nome] for nome in ("ki", "incerteza_ki", "valor_s", "fator_g", "incerteza_fator_g", "fator_c",
+                                      "incerteza_fator_c")]
+
+    def medir():
+        modulo_lote._incerteza_csr(csr_a, kv)
+        modulo_lote._incerteza_fator_g(e, a1, a2, a3, *incertezas_g)
+        modulo_lote._incerteza_fator_c(e, *coefs_c)
+        modulo_lote._incerteza_ki(x_val, incerteza_interpolacao, mas, e, conversion_factor, reference_thickness, divisor)
+        modulo_lote._incerteza_dgm(*dgm)
+    return medir
+
+
+def etapa_autodiff_nucleo(dados, lote):
+    parametros = _parametros(lote[lote["Erro"] == ""])
+
+    def medir():
+        _, jacobiano = _dgm_e_jacobiano(parametros)
+        propagar_incerteza(jacobiano, _desvios_padrao(parametros))
+    return medir
+
+
+def etapa_autodiff_jacobiano(dados, lote):
+    validas = lote[lote["Erro"] == ""]
+    desvios = incertezas_padrao(validas)
+    return lambda: propagar_incerteza(jacobiano_dgm(validas)[1], desvios)
+
+
+def _historico_temporario():
+    pasta = tempfile.mkdtemp(prefix="bench_dgm_")
+    return HistoricoDGM(os.path.join(pasta, "historico.sqlite3")), pasta
+
+
+def etapa_historico_adicionar(dados, lote):
+    linhas = lote[lote["Erro"] == ""].assign(**{c: dados[c] for c in ("Data/Hora", "ID Paciente", "Iniciais Paciente")})
+    historico, pasta = _historico_temporario()  # criado fora da medição; cada repetição acrescenta ao mesmo banco
+    medir = lambda: historico.adicionar_varias(linhas)
+    medir.finalizar = lambda: (historico.fechar(), _remover_pasta(pasta))
+    return medir
+
+
+def _etapa_historico_exportar(formato):
+    def etapa(dados, lote):
+        linhas = lote[lote["Erro"] == ""].assign(**{c: dados[c] for c in ("Data/Hora", "ID Paciente", "Iniciais Paciente")})
+        historico, pasta = _historico_temporario()
+        historico.adicionar_varias(linhas)
+
+        def medir():
+            with tempfile.TemporaryFile() as destino:
+                exportar_historico(historico, formato, destino)
+        medir.finalizar = lambda: (historico.fechar(), _remover_pasta(pasta))
+        return medir
+    return etapa
+
+
+def _remover_pasta(pasta):
+    for nome in os.listdir(pasta):
+        os.remove(os.path.join(pasta, nome))
+    os.rmdir(pasta)
+
+
+ETAPAS = {
+    "calcular_csr": etapa_csr,
+    "calcular_fator_g": etapa_fator_g,
+    "calcular_glandularidade": etapa_glandularidade,
+    "calcular_fator_c": etapa_fator_c,
+    "calcular_ki": etapa_ki,
+    "calcular_dgm": etapa_dgm,
+    "pipeline_individual": etapa_pipeline_individual,
+    "lote": etapa_lote,
+    "lote_varredura_mas": etapa_lote_varredura_mas,
+    "lote_autodiff": etapa_lote_autodiff,
+    "lote_derivadas": etapa_lote_derivadas,
+    "autodiff_nucleo": etapa_autodiff_nucleo,
+    "autodiff_jacobiano": etapa_autodiff_jacobiano,
+    "historico_adicionar": etapa_historico_adicionar,
+    "historico_exportar": _etapa_historico_exportar("csv"),
+    "historico_exportar_parquet": _etapa_historico_exportar("parquet"),
+    "historico_exportar_feather": _etapa_historico_exportar("feather"),
+    "historico_exportar_xlsx": _etapa_historico_exportar("xlsx"),
+}
+
+
+# --- Medição ---
+
+def medir(funcao, tempo_minimo=TEMPO_MINIMO):
+    """Executa `funcao` até somar tempo_minimo segundos; retorna (melhor tempo, repetições)."""
+    melhor = float("inf")
+    total = 0.0
+    repeticoes = 0
+    while total < tempo_minimo and repeticoes < REPETICOES_MAXIMAS:
+        limpar_cache()  # cada repetição parte dos caches vazios
+        inicio = time.perf_counter()
+        funcao()
+        duracao = time.perf_counter() - inicio
+        melhor = min(melhor, duracao)
+        total += duracao
+        repeticoes += 1
+    return melhor, repeticoes
+
+
+def calibrar():
+    """Tempo de um laço Python fixo, para comparar execuções em máquinas (ou cargas) diferentes."""
+    def laco():
+        total = 0.0
+        for i in range(200_000):
+            total += (i % 7) * 0.5
+        return total
+    return medir(laco)[0]
+
+
+def executar(tamanhos, etapas, semente=0, saida_progresso=sys.stderr):
+    resultados = []
+    for n in tamanhos:
+        dados = gerar_exposicoes(n, semente)
+        lote = calcular_dgm_lote(dados)
+        for nome in etapas:
+            funcao = ETAPAS[nome](dados, lote)
+            try:
+                segundos, repeticoes = medir(funcao)
+            finally:
+                if hasattr(funcao, "finalizar"):
+                    funcao.finalizar()
+            resultados.append({
+                "etapa": nome,
+                "linhas": n,
+                "segundos": segundos,
+                "repeticoes": repeticoes,
+                "linhas_por_segundo": n / segundos if segundos > 0 else None,
+            })
+            print(f"{nome:<28} {n:>9} linhas  {segundos * 1e3:12.3f} ms  ({repeticoes} repetições)", file=saida_progresso)
+    return resultados
+
+
+def ambiente():
+    return {
+        "segundos_calibracao": calibrar(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+    }
+
+
+# --- Comparação com a linha de base ---
+
+def comparar(resultados, linha_de_base, tolerancia=TOLERANCIA_PADRAO, fator_maquina=1.0):
+    """
+    Compara os tempos com os de uma execução anterior (mesma etapa e número de linhas).
+    Args:
+        fator_maquina (float): Divide a razão novo/base (ex.: razão entre as calibrações das
+            duas execuções), para descontar diferenças de velocidade da máquina.
+    Returns:
+        list of dict: etapa, linhas, segundos_base, segundos, razao e regressao (bool).
+    """
+    base = {(r["etapa"], r["linhas"]): r["segundos"] for r in linha_de_base["resultados"]}
+    comparacao = []
+    for r in resultados:
+        segundos_base = base.get((r["etapa"], r["linhas"]))
+        if not segundos_base:
+            continue
+        razao = r["segundos"] / segundos_base / fator_maquina
+        comparacao.append({
+            "etapa": r["etapa"],
+            "linhas": r["linhas"],
+            "segundos_base": segundos_base,
+            "segundos": r["segundos"],
+            "razao": razao,
+            "regressao": razao > 1 + tolerancia,
+        })
+    return comparacao
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks da calculadora de DGM.")
+    parser.add_argument("-o", "--saida", required=True, help="Arquivo JSON de resultados.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO,
+                        help=f"Números de linhas (padrão: {' '.join(map(str, TAMANHOS_PADRAO))}).")
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=list(ETAPAS), help="Etapas a medir.")
+    parser.add_argument("--semente", type=int, default=0, help="Semente das exposições sintéticas.")
+    parser.add_argument("--comparar", metavar="BASE_JSON", help="Resultados anteriores para detectar regressões.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help=f"Lentidão relativa aceita antes de acusar regressão (padrão: {TOLERANCIA_PADRAO}).")
+    parser.add_argument("--normalizar", action="store_true",
+                        help="Desconta a diferença de velocidade da máquina medida pela calibração.")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    linha_de_base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            linha_de_base = json.load(arquivo)
+
+    relatorio = {
+        "versao_formato": VERSAO_FORMATO,
+        "ambiente": ambiente(),
+        "semente": args.semente,
+        "resultados": executar(args.tamanhos, args.etapas, args.semente),
+    }
+    codigo_saida = 0
+    if linha_de_base is not None:
+        fator_maquina = 1.0
+        calibracao_base = linha_de_base.get("ambiente", {}).get("segundos_calibracao")
+        if args.normalizar and calibracao_base:
+            fator_maquina = relatorio["ambiente"]["segundos_calibracao"] / calibracao_base
+            print(f"Fator de velocidade da máquina: {fator_maquina:.2f}x", file=sys.stderr)
+        relatorio["comparacao"] = comparar(relatorio["resultados"], linha_de_base, args.tolerancia, fator_maquina)
+        regressoes = [c for c in relatorio["comparacao"] if c["regressao"]]
+        for c in regressoes:
+            print(f"REGRESSÃO {c['etapa']} ({c['linhas']} linhas): {c['segundos_base'] * 1e3:.3f} ms -> "
+                  f"{c['segundos'] * 1e3:.3f} ms ({c['razao']:.2f}x)", file=sys.stderr)
+        print(f"{len(relatorio['comparacao'])} medições comparadas, {len(regressoes)} regressões "
+              f"(tolerância {args.tolerancia:.0%}).", file=sys.stderr)
+        codigo_saida = 1 if regressoes else 0
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    return codigo_saida
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
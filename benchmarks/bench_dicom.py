@@ -0,0 +1,91 @@
+"""
+Vazão da leitura de cabeçalhos DICOM (dgm.dicom).
+
+Gera uma pasta de arquivos DICOM sintéticos (imagens com pixels, parte em VR implícito, e
+relatórios de dose com vários eventos), mede ler_pasta_dicom e calcular_dgm_dicom e informa
+arquivos/minuto. Os pixels nunca são lidos: o tamanho das imagens não deve mudar a vazão.
+
+Uso:
+    python benchmarks/bench_dicom.py --arquivos 3000
+    python benchmarks/bench_dicom.py --arquivos 20000 --bytes-pixels 8000000 --pasta /tmp/dicom
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from dgm.dicom import (  # noqa: E402
+    calcular_dgm_dicom,
+    gravar_imagem_sintetica,
+    gravar_sr_sintetico,
+    ler_pasta_dicom,
+)
+
+ALVOS_FILTROS = ["Mo/Mo", "Mo/Rh", "W/Rh", "W/Ag"]
+
+
+def gerar_pasta(pasta, arquivos, bytes_pixels, fracao_sr=0.1):
+    """Grava `arquivos` DICOM sintéticos em `pasta`; retorna o número de exposições gravadas."""
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    exposicoes = 0
+    a_cada_sr = max(int(1 / fracao_sr), 1) if fracao_sr > 0 else 0
+    for i in range(arquivos):
+        subpasta = pasta / f"estudo{i // 100:04d}"
+        subpasta.mkdir(exist_ok=True)
+        kv, mas, espessura = 25 + i % 6, 40.0 + i % 120, 2.0 + (i % 60) / 10
+        alvo_filtro = ALVOS_FILTROS[i % len(ALVOS_FILTROS)]
+        if a_cada_sr and i % a_cada_sr == 0:
+            eventos = [dict(kv=kv, mas=mas + k, espessura=espessura, alvo_filtro=alvo_filtro) for k in range(4)]
+            gravar_sr_sintetico(subpasta / f"sr{i:06d}.dcm", eventos, idade=40 + i % 30, implicito=i % 2 == 1)
+            exposicoes += len(eventos)
+        else:
+            gravar_imagem_sintetica(subpasta / f"img{i:06d}.dcm", kv=kv, mas=mas, espessura=espessura,
+                                    alvo_filtro=alvo_filtro, idade=40 + i % 30, bytes_pixels=bytes_pixels,
+                                    implicito=i % 3 == 0)
+            exposicoes += 1
+    return exposicoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vazão da leitura de cabeçalhos DICOM.")
+    parser.add_argument("--arquivos", type=int, default=3000, help="Arquivos sintéticos (padrão: 3000).")
+    parser.add_argument("--bytes-pixels", type=int, default=2_000_000,
+                        help="Tamanho dos pixels de cada imagem (padrão: 2000000).")
+    parser.add_argument("--pasta", help="Pasta dos arquivos (padrão: pasta temporária, apagada ao final).")
+    parser.add_argument("--local", default="IRD", help="Local do mamógrafo (padrão: IRD).")
+    args = parser.parse_args(argv)
+
+    pasta = Path(args.pasta) if args.pasta else Path(tempfile.mkdtemp(prefix="dicom_"))
+    try:
+        inicio = time.perf_counter()
+        exposicoes = gerar_pasta(pasta, args.arquivos, args.bytes_pixels)
+        print(f"{args.arquivos} arquivos ({exposicoes} exposições) gerados em {time.perf_counter() - inicio:.1f} s")
+
+        erros = []
+        inicio = time.perf_counter()
+        dados = ler_pasta_dicom(pasta, args.local, erros)
+        leitura = time.perf_counter() - inicio
+        if len(dados) != exposicoes or erros:
+            print(f"Erro: {len(dados)} exposições lidas de {exposicoes}; {len(erros)} arquivos com erro.",
+                  file=sys.stderr)
+            return 1
+
+        inicio = time.perf_counter()
+        calcular_dgm_dicom(pasta, args.local)
+        total = time.perf_counter() - inicio
+        print(f"{'etapa':>16} {'segundos':>9} {'arquivos/min':>13}")
+        print(f"{'leitura':>16} {leitura:9.3f} {args.arquivos / leitura * 60:13,.0f}")
+        print(f"{'leitura + DGM':>16} {total:9.3f} {args.arquivos / total * 60:13,.0f}")
+    finally:
+        if not args.pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Teste de carga do consumidor contínuo (dgm.fluxo) em taxas sustentadas.
+
+Para cada taxa, inicia um ConsumidorFluxo (socket TCP em localhost e histórico SQLite
+temporário), envia eventos sintéticos com o gerador de dgm.fluxo durante --duracao segundos e
+espera a fila esvaziar. Informa a taxa obtida pelo gerador (cai quando a contrapressão o
+segura), a latência de ponta a ponta p50/p95/p99, a fração dentro do SLO, a profundidade
+máxima da fila, os descartes e o tamanho médio dos micro-lotes.
+
+Uso:
+    python benchmarks/bench_fluxo.py --taxas 500 2000 8000 --duracao 10
+    python benchmarks/bench_fluxo.py --taxas 20000 --politica descartar --fila-max 2000 -o fluxo.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from dgm.fluxo import (  # noqa: E402
+    ESPERA_MS_PADRAO,
+    FILA_MAXIMA_PADRAO,
+    LOTE_MAXIMO_PADRAO,
+    POLITICAS,
+    SLO_MS_PADRAO,
+    ConsumidorFluxo,
+    gerar_para_socket,
+)
+from dgm.historico import HistoricoDGM  # noqa: E402
+
+
+async def medir_taxa(taxa, duracao, pasta, args):
+    historico = HistoricoDGM(os.path.join(pasta, f"fluxo_{taxa:g}.sqlite3"))
+    consumidor = ConsumidorFluxo(historico, args.fila_max, args.lote_max, args.espera_ms, args.slo_ms,
+                                 args.politica).iniciar()
+    porta = await consumidor.ouvir_socket(porta=0)
+    gerador = await gerar_para_socket(taxa, duracao, porta=porta)
+    # Espera o consumidor ler o que ficou nos buffers do socket e esvaziar a fila
+    while consumidor.recebidos < gerador["enviados"]:
+        await asyncio.sleep(0.01)
+    await consumidor.encerrar()
+    metricas = consumidor.metricas()
+    metricas["gerador"] = gerador
+    metricas["linhas_no_historico"] = historico.contar()
+    historico.fechar()
+    return metricas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do consumidor contínuo de exposições.")
+    parser.add_argument("--taxas", type=float, nargs="+", default=[500, 2000, 8000],
+                        help="Taxas sustentadas a testar, em eventos/s (padrão: 500 2000 8000).")
+    parser.add_argument("--duracao", type=float, default=10, help="Segundos de carga por taxa (padrão: 10).")
+    parser.add_argument("--fila-max", type=int, default=FILA_MAXIMA_PADRAO)
+    parser.add_argument("--lote-max", type=int, default=LOTE_MAXIMO_PADRAO)
+    parser.add_argument("--espera-ms", type=float, default=ESPERA_MS_PADRAO)
+    parser.add_argument("--slo-ms", type=float, default=SLO_MS_PADRAO)
+    parser.add_argument("--politica", choices=POLITICAS, default="bloquear")
+    parser.add_argument("-o", "--saida", help="Arquivo JSON com as métricas de cada taxa.")
+    args = parser.parse_args(argv)
+
+    pasta = tempfile.mkdtemp(prefix="fluxo_")
+    resultados = {}
+    try:
+        print(f"{'taxa':>8} {'obtida':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'no SLO':>7} "
+              f"{'fila máx':>9} {'descart.':>9} {'lote méd':>9}")
+        for taxa in args.taxas:
+            m = asyncio.run(medir_taxa(taxa, args.duracao, pasta, args))
+            resultados[f"{taxa:g}"] = m
+            latencia = m["latencia_ms"]
+            print(f"{taxa:8g} {m['gerador']['taxa_obtida']:8.0f} {latencia['p50'] or 0:8.1f} {latencia['p95'] or 0:8.1f} "
+                  f"{latencia['p99'] or 0:8.1f} {latencia['dentro_slo'] or 0:7.1%} {m['fila']['maxima_observada']:9d} "
+                  f"{m['eventos']['descartados']:9d} {m['lotes']['tamanho_medio'] or 0:9.1f}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
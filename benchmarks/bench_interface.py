@@ -0,0 +1,117 @@
+"""
+Latência das reexecuções da interface Streamlit com um histórico grande.
+
+Cria um histórico temporário com N cálculos sintéticos da sessão medida (a interface só
+mostra os cálculos gravados com o dono da sessão), abre dgm_calculator.py com o
+AppTest do Streamlit e mede a execução do script após cada interação (mudar o mAs,
+trocar a página do histórico, ordenar por outra coluna). Informa a mediana e o p95 em ms.
+
+O AppTest sempre executa o script inteiro; no navegador, editar campos do formulário não
+reexecuta nada e as interações do histórico reexecutam só o fragmento do histórico, então
+os tempos medidos aqui são um limite superior dessas interações.
+
+Uso:
+    python benchmarks/bench_interface.py --linhas-historico 10000
+    python benchmarks/bench_interface.py --linhas-historico 100000 --repeticoes 30 -o interface.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+from bench_dgm import gerar_exposicoes  # noqa: E402
+from dgm.historico import COLUNAS_HISTORICO, HistoricoDGM  # noqa: E402
+from dgm.lote import calcular_dgm_lote  # noqa: E402
+
+
+# Dono das linhas sintéticas e da sessão aberta pelo AppTest
+DONO_BENCHMARK = "benchmark"
+
+
+def criar_historico(caminho, linhas, semente=0, dono=DONO_BENCHMARK):
+    dados = gerar_exposicoes(linhas, semente)
+    lote = calcular_dgm_lote(dados)
+    lote = lote.assign(**{c: dados[c] for c in ("Data/Hora", "ID Paciente", "Iniciais Paciente")})
+    historico = HistoricoDGM(caminho)
+    historico.adicionar_varias(lote[COLUNAS_HISTORICO], dono)
+    total = historico.contar(dono=dono)
+    historico.fechar()
+    return total
+
+
+def _percentil(valores, q):
+    ordenados = sorted(valores)
+    return ordenados[min(int(q * len(ordenados)), len(ordenados) - 1)]
+
+
+def medir_interacoes(repeticoes, timeout=60):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(RAIZ / "dgm_calculator.py"), default_timeout=timeout)
+    app.session_state["dono_historico"] = DONO_BENCHMARK
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"Erro ao abrir a interface: {app.exception}")
+
+    def executar(interacao):
+        tempos = []
+        for i in range(repeticoes):
+            interacao(i)
+            inicio = time.perf_counter()
+            app.run()
+            tempos.append(time.perf_counter() - inicio)
+            if app.exception:
+                raise RuntimeError(f"Erro na interface: {app.exception}")
+        return tempos
+
+    interacoes = {
+        "mudar_mas": lambda i: _widget(app, "mAs:").set_value(50.0 + i % 10),
+        "pagina_historico": lambda i: app.number_input(key="pagina_historico").set_value(1 + i % 5),
+        "ordenar_historico": lambda i: app.selectbox(key="ordem_historico").set_value(COLUNAS_HISTORICO[i % 5]),
+    }
+    resultados = {}
+    for nome, interacao in interacoes.items():
+        tempos = executar(interacao)
+        resultados[nome] = {
+            "mediana_ms": statistics.median(tempos) * 1e3,
+            "p95_ms": _percentil(tempos, 0.95) * 1e3,
+            "repeticoes": repeticoes,
+        }
+    return resultados
+
+
+def _widget(app, rotulo):
+    return next(w for w in app.number_input if w.label == rotulo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latência das reexecuções da interface com um histórico grande.")
+    parser.add_argument("--linhas-historico", type=int, default=10_000, help="Cálculos no histórico (padrão: 10000).")
+    parser.add_argument("--repeticoes", type=int, default=20, help="Execuções por interação (padrão: 20).")
+    parser.add_argument("-o", "--saida", help="Grava os tempos em JSON.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench_interface_") as pasta:
+        caminho = os.path.join(pasta, "historico.sqlite3")
+        total = criar_historico(caminho, args.linhas_historico)
+        os.environ["DGM_HISTORICO"] = caminho
+        resultados = medir_interacoes(args.repeticoes)
+
+    print(f"Histórico com {total} cálculos")
+    for nome, tempos in resultados.items():
+        print(f"{nome:<20} mediana {tempos['mediana_ms']:8.1f} ms   p95 {tempos['p95_ms']:8.1f} ms")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"linhas_historico": total, "interacoes": resultados}, arquivo, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
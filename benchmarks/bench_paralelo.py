@@ -0,0 +1,76 @@
+"""
+Escalabilidade do cálculo em lote com vários processos (dgm.paralelo).
+
+Mede calcular_dgm_lote (um processo) e calcular_dgm_lote_paralelo com 1, 2, 4, ... processos
+até o número de núcleos disponíveis, confere que os resultados são idênticos e informa o
+ganho e a eficiência (ganho / processos) de cada configuração.
+
+Uso:
+    python benchmarks/bench_paralelo.py --linhas 1000000
+    python benchmarks/bench_paralelo.py --linhas 5000000 --processos 1 2 4 8 -o paralelo.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_dgm import gerar_exposicoes  # noqa: E402
+from dgm.lote import calcular_dgm_lote  # noqa: E402
+from dgm.paralelo import calcular_dgm_lote_paralelo  # noqa: E402
+
+
+def nucleos_disponiveis():
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+
+def medir(funcao, repeticoes):
+    """Melhor tempo de `repeticoes` execuções e o último resultado."""
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Escalabilidade do cálculo da DGM em lote com vários processos.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="Exposições sintéticas (padrão: 1000000).")
+    parser.add_argument("--processos", type=int, nargs="+",
+                        help="Números de processos a medir (padrão: potências de 2 até os núcleos disponíveis).")
+    parser.add_argument("--contexto", choices=["fork", "spawn", "forkserver"], help="Método de início dos processos.")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por configuração; vale a melhor (padrão: 3).")
+    parser.add_argument("-o", "--saida", help="Grava os tempos em JSON.")
+    args = parser.parse_args(argv)
+
+    nucleos = nucleos_disponiveis()
+    processos = args.processos or sorted({2**k for k in range(nucleos.bit_length()) if 2**k <= nucleos} | {nucleos})
+    dados = gerar_exposicoes(args.linhas, semente=0)
+
+    serial, referencia = medir(lambda: calcular_dgm_lote(dados), args.repeticoes)
+    print(f"{args.linhas} linhas, {nucleos} núcleos disponíveis")
+    print(f"{'processos':>9} {'segundos':>9} {'linhas/s':>12} {'ganho':>6} {'eficiência':>10}")
+    print(f"{'serial':>9} {serial:9.3f} {args.linhas / serial:12,.0f} {1.0:6.2f} {1.0:10.2f}")
+    medicoes = [{"processos": 0, "segundos": serial, "ganho": 1.0}]
+    for n in processos:
+        segundos, resultado = medir(
+            lambda: calcular_dgm_lote_paralelo(dados, processos=n, contexto=args.contexto), args.repeticoes)
+        if not resultado.equals(referencia):
+            print(f"Erro: resultado com {n} processos difere do cálculo serial.", file=sys.stderr)
+            return 1
+        ganho = serial / segundos
+        print(f"{n:9d} {segundos:9.3f} {args.linhas / segundos:12,.0f} {ganho:6.2f} {ganho / n:10.2f}")
+        medicoes.append({"processos": n, "segundos": segundos, "ganho": ganho})
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"linhas": args.linhas, "nucleos": nucleos, "medicoes": medicoes}, arquivo, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Teste de carga do serviço HTTP (dgm.servidor) em localhost.
+
+Inicia o servidor em um processo separado (ou usa um já em execução com --endereco), abre
+N clientes concorrentes com conexões persistentes e envia exposições sintéticas a POST /dgm,
+uma por requisição. Informa, do lado do cliente, a latência p50/p99 e a vazão; do lado do
+servidor, o tamanho médio dos micro-lotes (GET /metricas). Ao final mede POST /dgm/lote com
+um lote grande.
+
+Por padrão compara o servidor sem micro-lotes (--lote-max 1) com o padrão, para mostrar o
+ganho de reunir requisições concorrentes.
+
+Uso:
+    python benchmarks/bench_servidor.py --clientes 64 --requisicoes 20000
+    python benchmarks/bench_servidor.py --lote-max 256 --espera-max-ms 1 -o servidor.json
+    python benchmarks/bench_servidor.py --endereco 127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+from bench_dgm import gerar_exposicoes  # noqa: E402
+from dgm.servidor import ESPERA_MAXIMA_MS_PADRAO, LOTE_MAXIMO_PADRAO  # noqa: E402
+
+
+class ClienteHTTP:
+    """Cliente HTTP/1.1 mínimo (uma conexão persistente) para JSON."""
+
+    def __init__(self, host, porta):
+        self.host, self.porta = host, porta
+        self.leitor = self.escritor = None
+
+    async def conectar(self):
+        self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta)
+        return self
+
+    async def requisitar(self, metodo, caminho, dados=None):
+        corpo = b"" if dados is None else json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.escritor.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+                            f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n".encode("latin-1") + corpo)
+        await self.escritor.drain()
+        status = int((await self.leitor.readline()).split()[1])
+        tamanho = 0
+        while (linha := await self.leitor.readline()) not in (b"\r\n", b""):
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            if nome.strip().lower() == "content-length":
+                tamanho = int(valor)
+        return status, json.loads(await self.leitor.readexactly(tamanho))
+
+    async def fechar(self):
+        self.escritor.close()
+        await self.escritor.wait_closed()
+
+
+def _percentil(valores, q):
+    ordenados = sorted(valores)
+    return ordenados[min(int(q * len(ordenados)), len(ordenados) - 1)]
+
+
+def exposicoes_json(linhas, semente=0):
+    dados = gerar_exposicoes(linhas, semente)
+    return [{"local": r[0], "idade": r[1], "espessura": r[2], "alvo_filtro": r[3], "kv": r[4], "mas": r[5]}
+            for r in dados[["Local do Mamógrafo", "Idade", "Espessura (cm)", "Alvo/Filtro", "Kv", "mAs"]].itertuples(index=False)]
+
+
+async def carga(host, porta, exposicoes, clientes, linhas_lote):
+    """Envia as exposições a POST /dgm com `clientes` conexões concorrentes."""
+    latencias = []
+    proxima = iter(exposicoes)
+
+    async def cliente():
+        conexao = await ClienteHTTP(host, porta).conectar()
+        try:
+            for exposicao in proxima:  # o iterador é compartilhado: cada exposição vai a um cliente
+                inicio = time.perf_counter()
+                status, _ = await conexao.requisitar("POST", "/dgm", exposicao)
+                latencias.append(time.perf_counter() - inicio)
+                if status not in (200, 422):
+                    raise RuntimeError(f"Resposta inesperada do servidor: {status}")
+        finally:
+            await conexao.fechar()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(clientes)))
+    duracao = time.perf_counter() - inicio
+
+    conexao = await ClienteHTTP(host, porta).conectar()
+    _, metricas = await conexao.requisitar("GET", "/metricas")
+    inicio_lote = time.perf_counter()
+    status, resposta = await conexao.requisitar("POST", "/dgm/lote", {"exposicoes": exposicoes[:linhas_lote]})
+    duracao_lote = time.perf_counter() - inicio_lote
+    await conexao.fechar()
+    if status != 200 or len(resposta["resultados"]) != min(linhas_lote, len(exposicoes)):
+        raise RuntimeError(f"Falha em /dgm/lote: {status}")
+    return {
+        "requisicoes": len(latencias),
+        "segundos": duracao,
+        "vazao_requisicoes_s": len(latencias) / duracao,
+        "p50_ms": statistics.median(latencias) * 1e3,
+        "p99_ms": _percentil(latencias, 0.99) * 1e3,
+        "micro_lotes": metricas["micro_lotes"],
+        "servidor": metricas["rotas"]["/dgm"],
+        "lote_linhas": min(linhas_lote, len(exposicoes)),
+        "lote_segundos": duracao_lote,
+    }
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(porta, lote_maximo, espera_maxima_ms, timeout=30):
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "dgm.servidor", "--porta", str(porta), "--lote-max", str(lote_maximo),
+         "--espera-max-ms", str(espera_maxima_ms)],
+        cwd=RAIZ, env={**os.environ, "PYTHONPATH": str(RAIZ)}, stderr=subprocess.DEVNULL,
+    )
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection(("127.0.0.1", porta), timeout=0.2).close()
+            return processo
+        except OSError:
+            if processo.poll() is not None:
+                break
+            time.sleep(0.1)
+    processo.kill()
+    raise RuntimeError("O servidor não iniciou.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço HTTP da DGM em localhost.")
+    parser.add_argument("--clientes", type=int, default=64, help="Conexões concorrentes (padrão: 64).")
+    parser.add_argument("--requisicoes", type=int, default=20_000, help="Requisições a POST /dgm (padrão: 20000).")
+    parser.add_argument("--linhas-lote", type=int, default=100_000, help="Exposições do POST /dgm/lote (padrão: 100000).")
+    parser.add_argument("--lote-max", type=int, default=LOTE_MAXIMO_PADRAO, help="Micro-lote máximo do servidor.")
+    parser.add_argument("--espera-max-ms", type=float, default=ESPERA_MAXIMA_MS_PADRAO, help="Espera máxima do micro-lote.")
+    parser.add_argument("--endereco", help="HOST:PORTA de um servidor já em execução (mede só ele).")
+    parser.add_argument("-o", "--saida", help="Grava os resultados em JSON.")
+    args = parser.parse_args(argv)
+
+    exposicoes = exposicoes_json(max(args.requisicoes, args.linhas_lote))
+    carga_avulsa = exposicoes[:args.requisicoes]
+    resultados = {}
+    if args.endereco:
+        host, porta = args.endereco.rsplit(":", 1)
+        resultados["servidor"] = asyncio.run(carga(host, int(porta), carga_avulsa, args.clientes, args.linhas_lote))
+    else:
+        for nome, lote_maximo in (("sem micro-lotes", 1), ("micro-lotes", args.lote_max)):
+            porta = porta_livre()
+            processo = iniciar_servidor(porta, lote_maximo, args.espera_max_ms)
+            try:
+                resultados[nome] = asyncio.run(carga("127.0.0.1", porta, carga_avulsa, args.clientes, args.linhas_lote))
+            finally:
+                processo.terminate()
+                processo.wait()
+
+    print(f"{args.requisicoes} requisições a POST /dgm, {args.clientes} clientes")
+    print(f"{'configuração':<16} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'lote médio':>10} {'/dgm/lote':>16}")
+    for nome, r in resultados.items():
+        tamanho_medio = r["micro_lotes"]["tamanho_medio"] or 0
+        print(f"{nome:<16} {r['vazao_requisicoes_s']:9,.0f} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {tamanho_medio:10.1f} "
+              f"{r['lote_linhas'] / r['lote_segundos']:10,.0f} lin/s")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"clientes": args.clientes, "requisicoes": args.requisicoes, "resultados": resultados},
+                      arquivo, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
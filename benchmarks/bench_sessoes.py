@@ -0,0 +1,308 @@
+"""
+Teste de carga da interface Streamlit com várias sessões ao mesmo tempo (AppTest).
+
+Para cada combinação de --sessoes e --linhas-historico, cria um histórico temporário e abre
+N sessões de dgm_calculator.py, um AppTest por sessão, todas no mesmo processo, como em uma
+instância compartilhada por várias clínicas: o arquivo do histórico (st.cache_resource) é comum
+a todas, mas cada sessão tem seu dono (dgm.historico) e começa com --linhas-historico cálculos
+próprios, então só lê, exporta e limpa os seus. Cada sessão, em sua própria thread, repete
+--rodadas vezes:
+    1. preenche a barra lateral (paciente, local, idade, espessura, alvo/filtro, kV, mAs) e
+       clica em "Calcular DGM";
+    2. clica em "Baixar Resultados como CSV" e gera o arquivo, como o servidor faz no clique;
+e, ao final, clica em "Limpar Histórico" (que apaga só os cálculos da sessão: as demais
+continuam medindo com o histórico completo).
+
+O AppTest usa estado global do Streamlit e não executa dois scripts ao mesmo tempo no mesmo
+processo, então as execuções passam por uma trava: a latência de cada ação inclui a espera pela
+vez, como em um servidor cujo processo está ocupado com outras sessões (no servidor real o GIL
+também serializa quase toda a execução do script). --pausa-ms é o tempo de "leitura" de cada
+usuário entre duas ações; 0 mantém o servidor sempre ocupado.
+
+Informa, por ação, p50/p95/p99 da latência (espera + execução) e a mediana da execução; a
+memória de cada sessão (st.session_state, medido objeto a objeto) e a memória residente do
+processo (RSS) antes e depois de abrir as sessões e ao final.
+
+Uso:
+    python benchmarks/bench_sessoes.py --sessoes 1 4 16 --linhas-historico 1000 100000
+    python benchmarks/bench_sessoes.py --sessoes 8 --rodadas 10 --pausa-ms 200 -o sessoes.json
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+from bench_interface import _percentil, criar_historico  # noqa: E402
+from dgm.calibracao import calibracao_ativa  # noqa: E402
+
+ROTULO_DOWNLOAD = "📥 Baixar Resultados como CSV"
+_TIPOS_IGNORADOS = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+                    types.GeneratorType, type, threading.Thread)
+
+
+def tamanho_profundo(objeto, vistos=None):
+    """Bytes aproximados de um objeto e do que ele referencia (DataFrames e arrays pelo conteúdo)."""
+    vistos = set() if vistos is None else vistos
+    if id(objeto) in vistos or isinstance(objeto, _TIPOS_IGNORADOS):
+        return 0
+    vistos.add(id(objeto))
+    if isinstance(objeto, (pd.DataFrame, pd.Series, pd.Index)):
+        uso = objeto.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(uso, pd.Series) else uso)
+    if isinstance(objeto, np.memmap):
+        return 0  # conteúdo em arquivo, fora da memória da sessão
+    if isinstance(objeto, np.ndarray):
+        return objeto.nbytes
+    tamanho = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        tamanho += sum(tamanho_profundo(k, vistos) + tamanho_profundo(v, vistos) for k, v in objeto.items())
+    elif isinstance(objeto, (list, tuple, set, frozenset, deque)):
+        tamanho += sum(tamanho_profundo(item, vistos) for item in objeto)
+    elif hasattr(objeto, "__dict__"):
+        tamanho += tamanho_profundo(vars(objeto), vistos)
+    elif hasattr(objeto, "__slots__"):
+        tamanho += sum(tamanho_profundo(getattr(objeto, nome), vistos)
+                       for nome in objeto.__slots__ if hasattr(objeto, nome))
+    return tamanho
+
+
+def memoria_residente():
+    """Memória residente (RSS) do processo em bytes; no máximo até agora se /proc não existir."""
+    try:
+        with open("/proc/self/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def registrar_downloads():
+    """
+    Guarda o gerenciador de arquivos de cada download adiado (data=callable) criado pelo
+    Streamlit, para gerar o arquivo depois do clique como o servidor faz (execute_deferred).
+    """
+    from streamlit.runtime.media_file_manager import MediaFileManager
+
+    gerenciadores = {}
+    original = MediaFileManager.add_deferred
+
+    def add_deferred(self, *args, **kwargs):
+        file_id = original(self, *args, **kwargs)
+        gerenciadores[file_id] = self
+        return file_id
+
+    MediaFileManager.add_deferred = add_deferred
+    try:
+        yield gerenciadores
+    finally:
+        MediaFileManager.add_deferred = original
+
+
+def _widget(lista, rotulo):
+    return next(w for w in lista if w.label == rotulo)
+
+
+def dono_sessao(numero):
+    """Dono dos cálculos da sessão `numero` no histórico."""
+    return f"sessao-{numero:03d}"
+
+
+class SessaoSimulada:
+    """Uma sessão do navegador: um AppTest e a sequência de ações do docstring do módulo."""
+
+    def __init__(self, numero, trava, medicoes, gerenciadores, pausa, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.numero = numero
+        self.trava = trava
+        self.medicoes = medicoes
+        self.gerenciadores = gerenciadores
+        self.pausa = pausa
+        self.app = AppTest.from_file(str(RAIZ / "dgm_calculator.py"), default_timeout=timeout)
+        self.app.session_state["dono_historico"] = dono_sessao(numero)
+        self.combinacoes = list(calibracao_ativa().faixas_kv.items())
+        self.erro = None
+
+    def _executar(self, acao, interacao):
+        pedido = time.perf_counter()
+        with self.trava:
+            inicio = time.perf_counter()
+            interacao()
+            fim = time.perf_counter()
+        self.medicoes[acao].append((fim - pedido, fim - inicio))
+        if self.app.exception:
+            raise RuntimeError(f"Sessão {self.numero}, {acao}: {self.app.exception[0].value}")
+
+    def abrir(self):
+        self._executar("abrir", self.app.run)
+
+    def calcular(self, rodada):
+        (local, alvo_filtro), (kv_min, kv_max) = self.combinacoes[(self.numero + rodada) % len(self.combinacoes)]
+        # kV inteiro dentro da faixa da tabela Ki (os limites podem ser fracionários)
+        primeiro, ultimo = math.ceil(kv_min), math.floor(kv_max)
+        kv = float(primeiro + rodada % (ultimo - primeiro + 1)) if ultimo >= primeiro else kv_min
+
+        def interacao():
+            barra = self.app.sidebar
+            _widget(barra.text_input, "ID do Paciente:").set_value(f"S{self.numero:03d}-{rodada}")
+            _widget(barra.text_input, "Iniciais da Paciente:").set_value("AB")
+            _widget(barra.selectbox, "Local do Mamógrafo:").set_value(local)
+            _widget(barra.number_input, "Idade:").set_value(35 + (self.numero + rodada) % 40)
+            _widget(barra.number_input, "Espessura da Mama (cm):").set_value(round(3.0 + rodada % 5, 1))
+            _widget(barra.selectbox, "Alvo/Filtro:").set_value(alvo_filtro)
+            _widget(barra.number_input, "Kv:").set_value(kv)
+            _widget(barra.number_input, "mAs:").set_value(40.0 + rodada % 50)
+            _widget(self.app.button, "Calcular DGM").click()
+            self.app.run()
+
+        self._executar("calcular_dgm", interacao)
+
+    def baixar_csv(self):
+        def interacao():
+            botoes = [b for b in self.app.download_button if b.label == ROTULO_DOWNLOAD]
+            if not botoes:  # histórico vazio: o painel não mostra o botão
+                return
+            botoes[0].click()
+            self.app.run()
+            botao = next(b for b in self.app.download_button if b.label == ROTULO_DOWNLOAD)
+            file_id = botao.proto.deferred_file_id
+            self.gerenciadores.pop(file_id).execute_deferred(file_id)
+
+        self._executar("baixar_csv", interacao)
+
+    def limpar_historico(self):
+        def interacao():
+            botoes = [b for b in self.app.button if b.label == "Limpar Histórico"]
+            if botoes:
+                botoes[0].click()
+                self.app.run()
+
+        self._executar("limpar_historico", interacao)
+
+    def executar(self, rodadas):
+        try:
+            for rodada in range(rodadas):
+                self.calcular(rodada)
+                time.sleep(self.pausa)
+                self.baixar_csv()
+                time.sleep(self.pausa)
+            self.limpar_historico()
+        except Exception as e:  # registrado e mostrado ao final; não derruba as demais sessões
+            self.erro = e
+
+
+def executar_cenario(sessoes, linhas_historico, rodadas, pausa_ms, timeout, pasta):
+    import streamlit as st
+
+    caminho = os.path.join(pasta, f"historico_{sessoes}_{linhas_historico}.sqlite3")
+    # Os mesmos cálculos de partida para cada sessão, cada uma com seu dono
+    total = sum(criar_historico(caminho, linhas_historico, dono=dono_sessao(i)) for i in range(sessoes)) if linhas_historico else 0
+    os.environ["DGM_HISTORICO"] = caminho
+    st.cache_resource.clear()  # o histórico do cenário anterior está em cache
+
+    trava = threading.Lock()
+    medicoes = defaultdict(list)
+    rss_inicial = memoria_residente()
+    with registrar_downloads() as gerenciadores:
+        simuladas = [SessaoSimulada(i, trava, medicoes, gerenciadores, pausa_ms / 1e3, timeout) for i in range(sessoes)]
+        for sessao in simuladas:
+            sessao.abrir()
+        rss_abertas = memoria_residente()
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=sessao.executar, args=(rodadas,)) for sessao in simuladas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+    erros = [f"{sessao.erro}" for sessao in simuladas if sessao.erro is not None]
+    memoria_sessoes = [tamanho_profundo(dict(sessao.app.session_state.items())) for sessao in simuladas]
+
+    acoes = {}
+    for acao, tempos in medicoes.items():
+        latencias = [latencia for latencia, _ in tempos]
+        acoes[acao] = {
+            "execucoes": len(tempos),
+            "p50_ms": statistics.median(latencias) * 1e3,
+            "p95_ms": _percentil(latencias, 0.95) * 1e3,
+            "p99_ms": _percentil(latencias, 0.99) * 1e3,
+            "execucao_p50_ms": statistics.median(execucao for _, execucao in tempos) * 1e3,
+        }
+    return {
+        "sessoes": sessoes,
+        "linhas_historico": total // sessoes,
+        "linhas_historico_total": total,
+        "rodadas": rodadas,
+        "segundos": duracao,
+        "reexecucoes_s": sum(len(t) for a, t in medicoes.items() if a != "abrir") / duracao if duracao else None,
+        "acoes": acoes,
+        "memoria": {
+            "sessao_media_kb": statistics.mean(memoria_sessoes) / 1024,
+            "sessao_maxima_kb": max(memoria_sessoes) / 1024,
+            "rss_inicial_mb": rss_inicial / 2**20,
+            "rss_sessoes_abertas_mb": rss_abertas / 2**20,
+            "rss_final_mb": memoria_residente() / 2**20,
+            "rss_por_sessao_aberta_mb": (rss_abertas - rss_inicial) / sessoes / 2**20,
+        },
+        "erros": erros,
+    }
+
+
+def imprimir_cenario(resultado):
+    memoria = resultado["memoria"]
+    print(f"\n{resultado['sessoes']} sessões, histórico com {resultado['linhas_historico']} cálculos por sessão: "
+          f"{resultado['reexecucoes_s']:.1f} reexecuções/s")
+    print(f"{'ação':<18} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'execução p50':>13}")
+    for acao, tempos in resultado["acoes"].items():
+        print(f"{acao:<18} {tempos['execucoes']:5d} {tempos['p50_ms']:9.1f} {tempos['p95_ms']:9.1f} "
+              f"{tempos['p99_ms']:9.1f} {tempos['execucao_p50_ms']:13.1f}")
+    print(f"st.session_state por sessão: média {memoria['sessao_media_kb']:.1f} KB, máxima {memoria['sessao_maxima_kb']:.1f} KB; "
+          f"RSS {memoria['rss_inicial_mb']:.0f} → {memoria['rss_sessoes_abertas_mb']:.0f} → {memoria['rss_final_mb']:.0f} MB "
+          f"({memoria['rss_por_sessao_aberta_mb']:.2f} MB por sessão aberta)")
+    for erro in resultado["erros"]:
+        print(f"Erro: {erro}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da interface com várias sessões simultâneas.")
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[1, 4, 8], help="Sessões simultâneas (padrão: 1 4 8).")
+    parser.add_argument("--linhas-historico", type=int, nargs="+", default=[1000, 50_000],
+                        help="Cálculos de cada sessão no histórico no início de cada cenário (padrão: 1000 50000).")
+    parser.add_argument("--rodadas", type=int, default=5, help="Cálculos + downloads por sessão (padrão: 5).")
+    parser.add_argument("--pausa-ms", type=float, default=0.0, help="Pausa de cada usuário entre ações (padrão: 0).")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Tempo máximo de uma reexecução, em s (padrão: 120).")
+    parser.add_argument("-o", "--saida", help="Grava os resultados em JSON.")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="bench_sessoes_") as pasta:
+        for linhas in args.linhas_historico:
+            for sessoes in args.sessoes:
+                resultado = executar_cenario(sessoes, linhas, args.rodadas, args.pausa_ms, args.timeout, pasta)
+                imprimir_cenario(resultado)
+                resultados.append(resultado)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+    return 1 if any(r["erros"] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Cálculo da Dose Glandular Média (DGM) em mamografia, sem dependência do Streamlit.
+
+Uso típico em scripts e rotinas em lote:
+
+    from dgm import calcular_dgm_lote
+    resultados = calcular_dgm_lote(df_exposicoes)
+"""
+from dgm.tabelas import (
+    alvo_filtro_options,
+    csr_coeffs,
+    tabela_ki_ird,
+    tabela_ki_ufrj,
+    tabelas_ki_por_local,
+    formulas_fator_c,
+    FATOR_G_CONSTANTS_UNCERTAINTIES,
+    INCERTEZA_KV_PERCENTUAL,
+    INCERTEZA_MAS_PERCENTUAL,
+    INCERTEZA_ESPESSURA_PERCENTUAL,
+    INCERTEZA_X_KI_PERCENTUAL,
+    INCERTEZA_COEFS_FATOR_C_PERCENTUAL,
+    TABELA_FATOR_C,
+    FAIXAS_KV_KI,
+    TabelasKi,
+    interpolar_x_ki,
+    verificar_consistencia_fator_c,
+)
+from dgm.nucleo import (
+    propagate_uncertainty,
+    get_coeffs_from_lambda_for_fator_c,
+    calcular_valor_s,
+    calcular_csr,
+    calcular_fator_g,
+    calcular_glandularidade,
+    calcular_fator_c,
+    calcular_ki,
+    calcular_dgm,
+)
+from dgm.cache import (
+    configurar_cache,
+    estatisticas_cache,
+    limpar_cache,
+    max_entradas_cache,
+)
+from dgm.lote import (
+    COLUNAS_ENTRADA_LOTE,
+    COLUNAS_RESULTADO_LOTE,
+    calcular_dgm_lote,
+    varrer_lote,
+)
+from dgm.grafo import (
+    GRAFO_INDIVIDUAL,
+    CalculoIncremental,
+    Etapa,
+    GrafoEtapas,
+)
+from dgm.resultados import (
+    DTYPE_RESULTADO,
+    MENSAGENS_ERRO,
+    CodigoErro,
+    RegistroDGM,
+    codigos_erro,
+    registros_para_tabela,
+    tabela_para_registros,
+)
+from dgm.paralelo import calcular_dgm_lote_paralelo
+from dgm.historico import (
+    COLUNAS_HISTORICO,
+    HistoricoDGM,
+)
+from dgm.colunar import ArmazemColunar
+from dgm.exportacao import (
+    FORMATOS_EXPORTACAO,
+    exportar_historico,
+    exportar_historico_em_cache,
+)
+from dgm.drl import (
+    COLUNAS_TABELA_DRL,
+    AgregadorDRL,
+    mesclar_agregadores,
+)
+from dgm.montecarlo import (
+    COLUNAS_MONTE_CARLO,
+    simular_dgm,
+    simular_dgm_lote,
+)
+from dgm.autodiff import (
+    COLUNAS_AUTODIFF,
+    VARIAVEIS,
+    incerteza_dgm,
+    incerteza_dgm_autodiff,
+    incertezas_padrao,
+    jacobiano_dgm,
+    propagar_incerteza,
+)
+from dgm.calibracao import (
+    COLUNA_CALIBRACAO,
+    Calibracao,
+    ErroCalibracao,
+    RegistroCalibracoes,
+    calibracao_ativa,
+    calibracao_embutida,
+    ler_arquivo_calibracao,
+    recarregar_calibracoes,
+)
+from dgm.dicom import (
+    COLUNAS_DICOM,
+    ErroDicom,
+    calcular_dgm_dicom,
+    ler_blocos_dicom,
+    ler_exposicoes_dicom,
+    ler_pasta_dicom,
+)
+from dgm.metricas import (
+    ativar_metricas,
+    estatisticas_metricas,
+    exportar_metricas_json,
+    exportar_metricas_prometheus,
+    limpar_metricas,
+)
@@ -0,0 +1,163 @@
+"""
+Leitura e gravação em blocos de arquivos de exposições e resultados (CSV ou XLSX).
+
+Usado pela linha de comando e pelo envio de arquivos na interface; aceita tanto
+caminhos quanto objetos de arquivo (ex.: o UploadedFile do Streamlit).
+"""
+import io
+import os
+
+import pandas as pd
+
+TAMANHO_BLOCO_PADRAO = 50_000
+EXTENSOES_SUPORTADAS = ('.csv', '.xlsx')
+
+
+def _extensao(arquivo):
+    nome = arquivo if isinstance(arquivo, (str, os.PathLike)) else getattr(arquivo, 'name', '')
+    extensao = os.path.splitext(str(nome))[1].lower()
+    if extensao not in EXTENSOES_SUPORTADAS:
+        raise ValueError(f"Formato de arquivo não suportado: {nome} (use {', '.join(EXTENSOES_SUPORTADAS)}).")
+    return extensao
+
+
+def _rebobinar(arquivo):
+    if hasattr(arquivo, 'seek'):
+        arquivo.seek(0)
+
+
+def ler_cabecalho(arquivo, planilha=None):
+    """Retorna os nomes das colunas do arquivo sem ler as linhas de dados."""
+    _rebobinar(arquivo)
+    try:
+        if _extensao(arquivo) == '.csv':
+            return list(pd.read_csv(arquivo, nrows=0).columns)
+
+        import openpyxl
+
+        livro = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            folha = livro[planilha] if planilha else livro.active
+            cabecalho = next(folha.iter_rows(max_row=1, values_only=True), ())
+            return [coluna for coluna in cabecalho if coluna is not None]
+        finally:
+            livro.close()
+    finally:
+        _rebobinar(arquivo)
+
+
+def contar_linhas(arquivo, planilha=None):
+    """
+    Número de linhas de dados (sem o cabeçalho), usado para a barra de progresso.
+    Para XLSX usa a dimensão gravada na planilha, que pode ser aproximada.
+    """
+    _rebobinar(arquivo)
+    try:
+        if _extensao(arquivo) == '.csv':
+            if isinstance(arquivo, (str, os.PathLike)):
+                with open(arquivo, 'rb') as f:
+                    conteudo = f.read()
+            else:
+                conteudo = arquivo.read()
+            if isinstance(conteudo, str):
+                conteudo = conteudo.encode('utf-8')
+            linhas = conteudo.count(b'\n') + (0 if conteudo.endswith(b'\n') else 1)
+            return max(linhas - 1, 0)
+
+        import openpyxl
+
+        livro = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            folha = livro[planilha] if planilha else livro.active
+            return max((folha.max_row or 1) - 1, 0)
+        finally:
+            livro.close()
+    finally:
+        _rebobinar(arquivo)
+
+
+def ler_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO_PADRAO, planilha=None):
+    """
+    Lê um arquivo de exposições em blocos.
+    Args:
+        arquivo (str ou arquivo): CSV ou XLSX com as colunas de COLUNAS_ENTRADA_LOTE.
+        tamanho_bloco (int): Número máximo de linhas por bloco.
+        planilha (str, opcional): Nome da planilha (XLSX); por padrão usa a planilha ativa.
+    Yields:
+        pd.DataFrame: Cada bloco de linhas, na ordem do arquivo.
+    """
+    _rebobinar(arquivo)
+    if _extensao(arquivo) == '.csv':
+        yield from pd.read_csv(arquivo, chunksize=tamanho_bloco)
+        return
+
+    import openpyxl
+
+    # read_only percorre o XML da planilha linha a linha, sem carregar tudo na memória
+    livro = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        folha = livro[planilha] if planilha else livro.active
+        linhas = folha.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        bloco = []
+        inicio = 0
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) == tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=cabecalho, index=pd.RangeIndex(inicio, inicio + len(bloco)))
+                inicio += len(bloco)
+                bloco = []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=cabecalho, index=pd.RangeIndex(inicio, inicio + len(bloco)))
+    finally:
+        livro.close()
+
+
+class EscritorCSV:
+    """Acrescenta blocos de resultados a um arquivo CSV (caminho ou arquivo binário)."""
+
+    def __init__(self, destino):
+        self.proprio = isinstance(destino, (str, os.PathLike))
+        binario = open(destino, 'wb') if self.proprio else destino
+        self.arquivo = io.TextIOWrapper(binario, encoding='utf-8', newline='', write_through=True)
+        self.cabecalho_gravado = False
+
+    def escrever(self, bloco):
+        bloco.to_csv(self.arquivo, header=not self.cabecalho_gravado, index=False)
+        self.cabecalho_gravado = True
+
+    def fechar(self):
+        if self.proprio:
+            self.arquivo.close()
+        else:
+            self.arquivo.detach()
+
+
+class EscritorXLSX:
+    """Acrescenta blocos de resultados a uma planilha XLSX no modo write-only do openpyxl."""
+
+    def __init__(self, destino):
+        import openpyxl
+
+        self.destino = destino
+        self.livro = openpyxl.Workbook(write_only=True)
+        self.folha = self.livro.create_sheet("Resultados DGM")
+        self.cabecalho_gravado = False
+
+    def escrever(self, bloco):
+        if not self.cabecalho_gravado:
+            self.folha.append([str(coluna) for coluna in bloco.columns])
+            self.cabecalho_gravado = True
+        for linha in bloco.astype(object).itertuples(index=False, name=None):
+            self.folha.append([None if pd.isna(valor) else valor for valor in linha])
+
+    def fechar(self):
+        self.livro.save(self.destino)
+
+
+def abrir_escritor(destino, formato=None):
+    """Escritor em blocos para `destino`; `formato` ('.csv'/'.xlsx') é obrigatório para arquivos sem nome."""
+    formato = formato or _extensao(destino)
+    return EscritorCSV(destino) if formato == '.csv' else EscritorXLSX(destino)
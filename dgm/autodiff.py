@@ -0,0 +1,357 @@
+"""
+Diferenciação automática (modo direto) da DGM, vetorizada com NumPy.
+
+Dual guarda o valor de uma grandeza para todas as exposições e as derivadas em relação às
+variáveis de entrada num único array (variáveis, exposições). Só as variáveis das quais a
+grandeza depende são guardadas, então o fator g carrega 5 derivadas, o Ki 4 e a DGM as 12 de
+VARIAVEIS. A cadeia CSR -> g/C/Ki -> DGM inteira é avaliada uma vez, em blocos de
+TAMANHO_BLOCO exposições, e dá a jacobiana completa.
+
+O modelo é o do Monte Carlo (dgm.montecarlo), sem os arredondamentos intermediários:
+    - variáveis: kV, mAs, espessura, um desvio aditivo de x da tabela Ki (valor nominal 0),
+      os coeficientes a0..a3 do fator g e a, b, c, d do fator C;
+    - a mesma espessura entra no fator g, no fator C e no Ki, então as correlações entre as
+      etapas aparecem na jacobiana, o que a propagação etapa por etapa de dgm.nucleo não vê;
+    - o kV entra em x pela spline da tabela Ki; CSR e glandularidade só escolhem faixas e
+      grupos (derivada nula), e s é exato.
+Os desvios-padrão padrão das variáveis são os de dgm.tabelas (incertezas_padrao). Uma matriz
+de correlação ou de covariância entre as variáveis pode ser informada.
+
+Sem correlações informadas, a incerteza é a aproximação de primeira ordem da distribuição do
+Monte Carlo. Ela difere da coluna "Incerteza DGM (mGy)" do lote, que propaga cada etapa
+separadamente e aplica o fator 0.10 de dgm.nucleo.calcular_dgm.
+"""
+import numpy as np
+import pandas as pd
+
+from dgm.tabelas import (
+    INCERTEZA_KV_PERCENTUAL,
+    INCERTEZA_MAS_PERCENTUAL,
+    INCERTEZA_ESPESSURA_PERCENTUAL,
+    INCERTEZA_X_KI_PERCENTUAL,
+    INCERTEZA_COEFS_FATOR_C_PERCENTUAL,
+    NOMES_ALVO_FILTRO,
+    CSR_FATOR_G,
+    COEFS_FATOR_G,
+    INCERTEZAS_FATOR_G,
+    CSR_FATOR_C,
+    COEFS_FATOR_C,
+    indices_csr_mais_proximo,
+)
+from dgm.calibracao import calibracao_ativa
+from dgm.lote import _calcular_dgm_lote, _indices_em
+
+# Exposições por bloco na avaliação dos duais (as derivadas de um bloco cabem no cache)
+TAMANHO_BLOCO = 8192
+
+# Variáveis da jacobiana, na ordem das colunas
+VARIAVEIS = ("kv", "mas", "espessura", "x_ki", "g_a0", "g_a1", "g_a2", "g_a3", "c_a", "c_b", "c_c", "c_d")
+COLUNAS_AUTODIFF = ["DGM AD (mGy)", "Incerteza DGM AD (mGy)"]
+
+
+def _escrever(destino, derivadas, fator):
+    """destino[...] = fator * derivadas sem array intermediário (fator None = 1)."""
+    if fator is None:
+        destino[...] = derivadas
+    else:
+        np.multiply(derivadas, fator, out=destino)
+
+
+class Dual:
+    """
+    Valor (array (n,)) e derivadas (array (k, n)) de uma grandeza: uma linha por variável de que
+    ela depende, na ordem de `indices` (posições em VARIAVEIS).
+    """
+
+    __slots__ = ("valor", "indices", "derivadas")
+    # Faz array + Dual chamar Dual.__radd__ em vez de o NumPy operar elemento a elemento
+    __array_ufunc__ = None
+
+    def __init__(self, valor, indices=(), derivadas=None):
+        self.valor = valor
+        self.indices = indices
+        self.derivadas = np.zeros((0, np.size(valor))) if derivadas is None else derivadas
+
+    @classmethod
+    def variavel(cls, nome, valor):
+        valor = np.asarray(valor, dtype=float)
+        return cls(valor, (VARIAVEIS.index(nome),), np.ones((1, valor.size)))
+
+    def _combinar(self, outro, valor, fator_proprio=None, fator_outro=None):
+        """Dual com derivadas fator_proprio * d(self) + fator_outro * d(outro) (fator None = 1)."""
+        comuns = set(self.indices) & set(outro.indices)
+        novos = tuple(i for i in outro.indices if i not in comuns)
+        derivadas = np.empty((len(self.indices) + len(novos), np.size(valor)))
+        _escrever(derivadas[:len(self.indices)], self.derivadas, fator_proprio)
+        if not comuns:
+            _escrever(derivadas[len(self.indices):], outro.derivadas, fator_outro)
+            return Dual(valor, self.indices + novos, derivadas)
+        indices = self.indices + novos
+        posicao = {indice: k for k, indice in enumerate(indices)}
+        for indice, linha in zip(outro.indices, outro.derivadas):
+            if indice in comuns:
+                derivadas[posicao[indice]] += linha if fator_outro is None else fator_outro * linha
+            else:
+                _escrever(derivadas[posicao[indice]], linha, fator_outro)
+        return Dual(valor, indices, derivadas)
+
+    def _escalar(self, valor, fator):
+        return Dual(valor, self.indices, fator * self.derivadas)
+
+    def __add__(self, outro):
+        if isinstance(outro, Dual):
+            return self._combinar(outro, self.valor + outro.valor)
+        return Dual(self.valor + outro, self.indices, self.derivadas)
+
+    __radd__ = __add__
+
+    def __sub__(self, outro):
+        if isinstance(outro, Dual):
+            return self._combinar(outro, self.valor - outro.valor, None, -1.0)
+        return Dual(self.valor - outro, self.indices, self.derivadas)
+
+    def __rsub__(self, outro):
+        return self._escalar(outro - self.valor, -1.0)
+
+    def __neg__(self):
+        return self._escalar(-self.valor, -1.0)
+
+    def __mul__(self, outro):
+        if isinstance(outro, Dual):
+            return self._combinar(outro, self.valor * outro.valor, outro.valor, self.valor)
+        return self._escalar(self.valor * outro, outro)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, outro):
+        if isinstance(outro, Dual):
+            valor = self.valor / outro.valor
+            return self._combinar(outro, valor, 1.0 / outro.valor, -valor / outro.valor)
+        return self._escalar(self.valor / outro, 1.0 / outro)
+
+    def __rtruediv__(self, outro):
+        valor = outro / self.valor
+        return self._escalar(valor, -valor / self.valor)
+
+    def __pow__(self, expoente):
+        return self._escalar(self.valor**expoente, expoente * self.valor**(expoente - 1))
+
+    def maximo(self, limite):
+        """max(self, limite), com derivada nula onde o limite prevalece (como np.maximum)."""
+        ativo = self.valor >= limite
+        return Dual(np.where(ativo, self.valor, limite), self.indices, np.where(ativo, self.derivadas, 0.0))
+
+    def gradiente(self, variaveis=VARIAVEIS):
+        """Jacobiana (n, len(variaveis)); zero nas variáveis das quais a grandeza não depende."""
+        jacobiano = np.zeros((np.size(self.valor), len(variaveis)))
+        posicao = {VARIAVEIS[indice]: k for k, indice in enumerate(self.indices)}
+        for coluna, nome in enumerate(variaveis):
+            if nome in posicao:
+                jacobiano[:, coluna] = self.derivadas[posicao[nome]]
+        return jacobiano
+
+
+def _indices_coluna(coluna, nomes):
+    """Posição de cada valor da coluna em `nomes` (-1 quando ausente), consultando cada valor distinto uma vez."""
+    codigos, unicos = pd.factorize(coluna)
+    return _indices_em(list(unicos), nomes, codigos)
+
+
+def _parametros(resultado, calibracao=None):
+    """
+    Valores nominais e tabelas de cada linha calculada com sucesso de calcular_dgm_lote, com a
+    calibração usada no cálculo (padrão: a ativa).
+    """
+    calibracao = calibracao or calibracao_ativa()
+    return _parametros_arrays(
+        calibracao,
+        idx_local=_indices_coluna(resultado["Local do Mamógrafo"], calibracao.nomes_locais),
+        idx_alvo=_indices_coluna(resultado["Alvo/Filtro"], NOMES_ALVO_FILTRO),
+        kv=resultado["Kv"].to_numpy(dtype=float),
+        mas=resultado["mAs"].to_numpy(dtype=float),
+        espessura=resultado["Espessura (cm)"].to_numpy(dtype=float),
+        s=resultado["Valor s"].to_numpy(dtype=float),
+        csr=resultado["CSR"].to_numpy(dtype=float),
+        grupo=resultado["Grupo Glandularidade"].to_numpy(dtype=float).astype(np.intp),
+    )
+
+
+def _parametros_do_grafo(valores, linhas, calibracao):
+    """Como _parametros, a partir dos valores do grafo do lote (dgm.lote.GRAFO_LOTE) nas `linhas` válidas."""
+    return _parametros_arrays(calibracao, **{nome: valores[chave][linhas] for nome, chave in (
+        ("idx_local", "idx_local"), ("idx_alvo", "idx_alvo"), ("kv", "kv"), ("mas", "mas"),
+        ("espessura", "espessura"), ("s", "valor_s"), ("csr", "csr"), ("grupo", "grupo"))})
+
+
+def _parametros_arrays(calibracao, idx_local, idx_alvo, kv, mas, espessura, s, csr, grupo):
+    # No kV mais alto da tabela, o trecho à esquerda: o trecho constante daria dDGM/dkV = 0
+    kv, _, no, spline, reta = calibracao.trechos_spline_ki(idx_local, idx_alvo, kv, ultimo_no_a_esquerda=True)
+    idx_g = indices_csr_mais_proximo(csr, CSR_FATOR_G)
+    return {
+        "kv": kv,
+        "mas": mas,
+        "espessura": espessura,
+        "s": s,
+        "no_ki": no,
+        "spline_ki": spline,
+        "reta_ki": reta,
+        "coefs_g": COEFS_FATOR_G[idx_g].T,
+        "incertezas_g": INCERTEZAS_FATOR_G[idx_g].T,
+        "coefs_c": COEFS_FATOR_C[indices_csr_mais_proximo(csr, CSR_FATOR_C), grupo - 1].T,
+        "conversion_factor": calibracao.fatores[idx_local, 0],
+        "reference_thickness": calibracao.fatores[idx_local, 1],
+    }
+
+
+def _dgm_dual(p):
+    """Cadeia g/C/Ki -> DGM em números duais."""
+    kv = Dual.variavel("kv", p["kv"])
+    mas = Dual.variavel("mas", p["mas"])
+    e = Dual.variavel("espessura", p["espessura"])
+    a0, a1, a2, a3 = (Dual.variavel(f"g_a{k}", coef) for k, coef in enumerate(p["coefs_g"]))
+    ca, cb, cc, cd = (Dual.variavel(f"c_{nome}", coef) for nome, coef in zip("abcd", p["coefs_c"]))
+
+    e2, e3 = e**2, e**3
+    fator_g = (a0 + (a1 * e) + (a2 * e2) + (a3 * e3)).maximo(0)
+    fator_c = (ca * e3) + (cb * e2) + (cc * e) + cd
+
+    # x da tabela Ki: spline em kV mais o desvio da tabela (variável x_ki, nominal 0)
+    c0, c1, c2, c3 = p["spline_ki"]
+    t = kv - p["no_ki"]
+    x_val = c0 + t * (c1 + t * (c2 + t * c3)) + Dual.variavel("x_ki", np.zeros_like(p["kv"]))
+    ki = ((x_val * mas) * p["conversion_factor"]) / (p["reference_thickness"] - e)**2
+
+    return ki * p["s"] * fator_g * fator_c
+
+
+def _dgm_e_jacobiano(p):
+    """DGM (n,) e jacobiana (n, len(VARIAVEIS)), avaliando os duais em blocos de TAMANHO_BLOCO exposições."""
+    n = len(p["kv"])
+    dgm = np.empty(n)
+    jacobiano = np.empty((len(VARIAVEIS), n))
+    for inicio in range(0, n, TAMANHO_BLOCO):
+        fatia = slice(inicio, inicio + TAMANHO_BLOCO)
+        dual = _dgm_dual({nome: valores[..., fatia] for nome, valores in p.items()})
+        dgm[fatia] = dual.valor
+        jacobiano[:, fatia] = dual.gradiente().T
+    return dgm, jacobiano.T
+
+
+def _desvios_padrao(p):
+    c0, c1, c2, c3 = p["spline_ki"]
+    l0, l1 = p["reta_ki"]
+    t = p["kv"] - p["no_ki"]
+    x_val = c0 + t * (c1 + t * (c2 + t * c3))
+    d_x = np.sqrt((x_val * INCERTEZA_X_KI_PERCENTUAL)**2 + (np.abs(x_val - (l0 + l1 * t)) / np.sqrt(3))**2)
+    # Montada por variável (k, n) e transposta, como a jacobiana de _dgm_e_jacobiano
+    return np.array([
+        p["kv"] * INCERTEZA_KV_PERCENTUAL,
+        p["mas"] * INCERTEZA_MAS_PERCENTUAL,
+        p["espessura"] * INCERTEZA_ESPESSURA_PERCENTUAL,
+        d_x,
+        *p["incertezas_g"],
+        *(np.abs(coef) * INCERTEZA_COEFS_FATOR_C_PERCENTUAL for coef in p["coefs_c"]),
+    ]).T
+
+
+def incertezas_padrao(resultado, calibracao=None):
+    """Desvios-padrão (n, len(VARIAVEIS)) das variáveis, com as incertezas de dgm.tabelas."""
+    return _desvios_padrao(_parametros(resultado, calibracao))
+
+
+def jacobiano_dgm(resultado, calibracao=None):
+    """
+    DGM e jacobiana em relação a VARIAVEIS, para linhas calculadas com sucesso por calcular_dgm_lote
+    (com a mesma `calibracao`; padrão: a ativa).
+    Returns:
+        tuple: (DGM sem arredondamentos (n,), jacobiana (n, len(VARIAVEIS)))
+    """
+    return _dgm_e_jacobiano(_parametros(resultado, calibracao))
+
+
+def propagar_incerteza(jacobiano, desvios, correlacao=None, covariancia=None):
+    """
+    Incerteza padrão sqrt(J Σ Jᵀ) de cada linha.
+    Args:
+        jacobiano (array (n, k)): Derivadas (jacobiano_dgm).
+        desvios (array (n, k)): Desvios-padrão das variáveis (incertezas_padrao).
+        correlacao (array (k, k), opcional): Correlações entre as variáveis; Σ = D R D.
+        covariancia (array (k, k) ou (n, k, k), opcional): Covariância absoluta; substitui
+            desvios e correlacao.
+    """
+    if covariancia is not None:
+        covariancia = np.asarray(covariancia, dtype=float)
+        if covariancia.ndim == 2:
+            return np.sqrt(np.einsum("ni,ij,nj->n", jacobiano, covariancia, jacobiano))
+        return np.sqrt(np.einsum("ni,nij,nj->n", jacobiano, covariancia, jacobiano))
+    ponderado = jacobiano * desvios
+    if correlacao is None:
+        return np.sqrt(np.einsum("ni,ni->n", ponderado, ponderado))
+    return np.sqrt(np.einsum("ni,ij,nj->n", ponderado, np.asarray(correlacao, dtype=float), ponderado))
+
+
+def _validar_matriz(matriz, nome):
+    if matriz is None:
+        return
+    forma = np.shape(matriz)[-2:]
+    if forma != (len(VARIAVEIS), len(VARIAVEIS)):
+        raise ValueError(f"A matriz de {nome} deve ser {len(VARIAVEIS)}x{len(VARIAVEIS)}, na ordem de VARIAVEIS.")
+
+
+def incerteza_dgm_autodiff(dados=None, *, correlacao=None, covariancia=None, incluir_jacobiano=False, calibracao=None,
+                           **entradas):
+    """
+    Calcula a DGM de um lote (como calcular_dgm_lote) e acrescenta a incerteza por diferenciação automática.
+    Args:
+        dados, **entradas: Como em calcular_dgm_lote.
+        correlacao, covariancia: Como em propagar_incerteza (ordem de VARIAVEIS).
+        incluir_jacobiano (bool): Acrescenta também as colunas "dDGM/d<variável>".
+        calibracao (dgm.calibracao.Calibracao, opcional): Calibração a usar (padrão: a ativa).
+    Returns:
+        pd.DataFrame: Resultado de calcular_dgm_lote com as colunas de COLUNAS_AUTODIFF
+            (NaN nas linhas com erro).
+    """
+    _validar_matriz(correlacao, "correlação")
+    _validar_matriz(covariancia, "covariância")
+    calibracao = calibracao or calibracao_ativa()
+    resultado, valores = _calcular_dgm_lote(dados, calibracao=calibracao, **entradas)
+    validas = np.flatnonzero(valores["codigo_erro"] == 0)
+    p = _parametros_do_grafo(valores, validas, calibracao)
+    dgm, jacobiano = _dgm_e_jacobiano(p)
+    if covariancia is not None and np.ndim(covariancia) == 3:
+        covariancia = np.asarray(covariancia)[validas]
+    incerteza = propagar_incerteza(jacobiano, _desvios_padrao(p), correlacao, covariancia)
+
+    colunas = {COLUNAS_AUTODIFF[0]: dgm, COLUNAS_AUTODIFF[1]: incerteza}
+    if incluir_jacobiano:
+        colunas.update((f"dDGM/d{nome}", jacobiano[:, k]) for k, nome in enumerate(VARIAVEIS))
+    for coluna, valores in colunas.items():
+        completo = np.full(len(resultado), np.nan)
+        completo[validas] = valores
+        resultado[coluna] = completo
+    return resultado
+
+
+def incerteza_dgm(kv, alvo_filtro, mas, espessura, local, idade=None, glandularidade=None, *, correlacao=None,
+                  covariancia=None, calibracao=None):
+    """
+    Incerteza da DGM de uma exposição por diferenciação automática (calibracao: como em
+    incerteza_dgm_autodiff).
+    Returns:
+        dict: dgm, incerteza (mGy) e jacobiano {variável: derivada}.
+    Raises:
+        ValueError: Com a mensagem da etapa que falhou, se a exposição não puder ser calculada.
+    """
+    resultado = incerteza_dgm_autodiff(
+        idade=[np.nan if idade is None else idade], espessura=[espessura], alvo_filtro=[alvo_filtro], kv=[kv],
+        mas=[mas], local=[local], glandularidade=[np.nan if glandularidade is None else glandularidade],
+        correlacao=correlacao, covariancia=None if covariancia is None else np.asarray(covariancia)[None],
+        incluir_jacobiano=True, calibracao=calibracao,
+    ).iloc[0]
+    if resultado["Erro"]:
+        raise ValueError(resultado["Erro"])
+    return {
+        "dgm": float(resultado[COLUNAS_AUTODIFF[0]]),
+        "incerteza": float(resultado[COLUNAS_AUTODIFF[1]]),
+        "jacobiano": {nome: float(resultado[f"dDGM/d{nome}"]) for nome in VARIAVEIS},
+    }
@@ -0,0 +1,124 @@
+"""
+Memoização das etapas intermediárias do cálculo individual (CSR, fatores g e C e consulta
+da tabela Ki), com limite de entradas, descarte LRU e contadores de acertos.
+
+As exposições se repetem muito na prática (poucos alvos/filtros, kV inteiros, espessuras
+em passos de 1 mm), então cada etapa é indexada pelas entradas que de fato determinam o
+resultado: por exemplo, o fator g depende da faixa de CSR, e não do CSR exato.
+
+O limite padrão pode ser definido pela variável de ambiente DGM_CACHE_MAX_ENTRADAS
+(0 desativa a memoização).
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+MAX_ENTRADAS_PADRAO = int(os.environ.get("DGM_CACHE_MAX_ENTRADAS", 4096))
+
+_AUSENTE = object()
+
+
+class CacheLRU:
+    """Dicionário com limite de entradas e descarte da entrada usada há mais tempo."""
+
+    def __init__(self, nome, max_entradas=MAX_ENTRADAS_PADRAO):
+        self.nome = nome
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def obter(self, chave, funcao, *args):
+        """Retorna o valor em cache para `chave` ou calcula funcao(*args) e guarda o resultado."""
+        if self.max_entradas <= 0:
+            return funcao(*args)
+        try:
+            with self._trava:
+                valor = self._dados.get(chave, _AUSENTE)
+                if valor is not _AUSENTE:
+                    self._dados.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                self.falhas += 1
+        except TypeError:  # chave não hashable (entrada inválida): calcula sem guardar
+            return funcao(*args)
+
+        valor = funcao(*args)
+        with self._trava:
+            self._dados[chave] = valor
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+                self.descartes += 1
+        return valor
+
+    def configurar(self, max_entradas):
+        with self._trava:
+            self.max_entradas = max_entradas
+            while len(self._dados) > max(max_entradas, 0):
+                self._dados.popitem(last=False)
+                self.descartes += 1
+
+    def limpar(self, zerar_contadores=True):
+        with self._trava:
+            self._dados.clear()
+            if zerar_contadores:
+                self.acertos = self.falhas = self.descartes = 0
+
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            entradas = len(self._dados)
+            # Estimativa grosseira: tamanho de uma entrada de exemplo vezes o número de entradas
+            memoria = 0
+            if entradas:
+                chave, valor = next(iter(self._dados.items()))
+                memoria = entradas * (_tamanho(chave) + _tamanho(valor) + 100)  # ~100 bytes por nó do OrderedDict
+            return {
+                "etapa": self.nome,
+                "entradas": entradas,
+                "max_entradas": self.max_entradas,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "descartes": self.descartes,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+                "memoria_estimada_bytes": memoria,
+            }
+
+
+def _tamanho(objeto):
+    if isinstance(objeto, tuple):
+        return sys.getsizeof(objeto) + sum(sys.getsizeof(item) for item in objeto)
+    return sys.getsizeof(objeto)
+
+
+# Um cache por etapa, para que cada uma possa ser dimensionada e acompanhada separadamente
+CACHE_CSR = CacheLRU("CSR")
+CACHE_FATOR_G = CacheLRU("Fator g")
+CACHE_FATOR_C = CacheLRU("Fator C")
+CACHE_TABELA_KI = CacheLRU("Tabela Ki")
+CACHES = (CACHE_CSR, CACHE_FATOR_G, CACHE_FATOR_C, CACHE_TABELA_KI)
+
+
+def configurar_cache(max_entradas):
+    """Define o número máximo de entradas de cada etapa (0 desativa a memoização)."""
+    for cache in CACHES:
+        cache.configurar(max_entradas)
+
+
+def max_entradas_cache():
+    """Limite atual de entradas por etapa (o mesmo em todas, ver configurar_cache)."""
+    return CACHES[0].max_entradas
+
+
+def limpar_cache():
+    for cache in CACHES:
+        cache.limpar()
+
+
+def estatisticas_cache():
+    """Lista com as estatísticas (acertos, falhas, descartes, entradas...) de cada etapa."""
+    return [cache.estatisticas() for cache in CACHES]
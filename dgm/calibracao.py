@@ -0,0 +1,271 @@
+"""
+Registro das calibrações por local do mamógrafo, lidas de arquivos versionados.
+
+Cada arquivo (.json ou .toml) da pasta de calibrações descreve um mamógrafo:
+
+    {
+        "local": "IRD",
+        "versao": "2024.1",
+        "descricao": "texto livre (opcional)",
+        "fator_conversao": 2500,
+        "espessura_referencia": 63,
+        "tabela_ki": {"Mo/Mo": {"26": 0.1357, "27": 0.1530}, "Mo/Rh": {"29": 0.1540, "31": 0.1830}}
+    }
+
+Todos os arquivos da pasta são compilados juntos, uma vez, em uma Calibracao (arrays de
+TabelasKi, ver dgm.tabelas): o cálculo consulta os arrays pelo índice do local, sem
+nenhum desvio por local. Acrescentar um mamógrafo é acrescentar um arquivo.
+
+Recarga a quente: calibracao_ativa() confere, no máximo a cada INTERVALO_VERIFICACAO
+segundos, se algum arquivo da pasta foi criado, alterado ou removido e, se foi, recompila a
+pasta e troca a calibração ativa de uma vez. Uma pasta com algum arquivo inválido não é
+aplicada: a calibração anterior continua ativa e o problema fica em RegistroCalibracoes.erro.
+Um cálculo pega a calibração ativa uma vez e a usa do começo ao fim, e cada resultado leva o
+carimbo "local@versão" da calibração que o produziu (coluna "Calibração" do lote).
+
+A pasta padrão é calibracoes/, ao lado do pacote, ou a indicada pela variável de ambiente
+DGM_CALIBRACOES; sem arquivos nela, vale a calibração embutida em dgm.tabelas.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from dgm.tabelas import (
+    FATORES_KI_POR_LOCAL,
+    NOMES_ALVO_FILTRO,
+    TabelasKi,
+    tabelas_ki_por_local,
+)
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: só arquivos .json
+    tomllib = None
+
+PASTA_PADRAO = os.environ.get("DGM_CALIBRACOES", str(Path(__file__).resolve().parents[1] / "calibracoes"))
+INTERVALO_VERIFICACAO = float(os.environ.get("DGM_CALIBRACOES_INTERVALO", 2.0))
+EXTENSOES_CALIBRACAO = (".json", ".toml")
+VERSAO_EMBUTIDA = "embutida"
+COLUNA_CALIBRACAO = "Calibração"
+
+
+class ErroCalibracao(ValueError):
+    """Arquivo de calibração ausente, ilegível ou com valores inválidos."""
+
+
+def _positivo(valor, campo, origem):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not valor > 0:
+        raise ErroCalibracao(f"{origem}: {campo!r} deve ser um número positivo (recebido {valor!r}).")
+    return float(valor)
+
+
+def validar_calibracao(dados, origem="calibração"):
+    """
+    Confere e normaliza o conteúdo de um arquivo de calibração.
+    Returns:
+        dict: local, versao, descricao, fator_conversao, espessura_referencia e tabela_ki
+            no formato de dgm.tabelas ({(alvo/filtro, kV): x}).
+    Raises:
+        ErroCalibracao: Campo ausente ou inválido.
+    """
+    if not isinstance(dados, dict):
+        raise ErroCalibracao(f"{origem}: o conteúdo deve ser um objeto com os campos da calibração.")
+    faltando = [campo for campo in ("local", "versao", "fator_conversao", "espessura_referencia", "tabela_ki")
+                if campo not in dados]
+    if faltando:
+        raise ErroCalibracao(f"{origem}: campos ausentes: {faltando}")
+    local, versao = dados["local"], dados["versao"]
+    if not isinstance(local, str) or not local.strip():
+        raise ErroCalibracao(f"{origem}: 'local' deve ser um texto não vazio.")
+    if not isinstance(versao, (str, int, float)) or isinstance(versao, bool) or not str(versao).strip():
+        raise ErroCalibracao(f"{origem}: 'versao' deve ser um texto ou número não vazio.")
+    tabela = dados["tabela_ki"]
+    if not isinstance(tabela, dict) or not tabela:
+        raise ErroCalibracao(f"{origem}: 'tabela_ki' deve ter ao menos um alvo/filtro.")
+    tabela_ki = {}
+    for alvo_filtro, pontos in tabela.items():
+        if alvo_filtro not in NOMES_ALVO_FILTRO:
+            raise ErroCalibracao(f"{origem}: alvo/filtro desconhecido {alvo_filtro!r}. Opções: {NOMES_ALVO_FILTRO}")
+        if not isinstance(pontos, dict) or not pontos:
+            raise ErroCalibracao(f"{origem}: 'tabela_ki.{alvo_filtro}' deve ter ao menos um kV.")
+        for kv, x in pontos.items():
+            try:
+                kv_valor = float(kv)
+            except (TypeError, ValueError):
+                raise ErroCalibracao(f"{origem}: kV inválido {kv!r} em {alvo_filtro}.") from None
+            if not kv_valor > 0:
+                raise ErroCalibracao(f"{origem}: kV inválido {kv!r} em {alvo_filtro}.")
+            chave = (alvo_filtro, int(kv_valor) if kv_valor.is_integer() else kv_valor)
+            if chave in tabela_ki:
+                raise ErroCalibracao(f"{origem}: kV {kv!r} repetido em {alvo_filtro}.")
+            tabela_ki[chave] = _positivo(x, f"tabela_ki.{alvo_filtro}.{kv}", origem)
+    return {
+        "local": local.strip(),
+        "versao": str(versao).strip(),
+        "descricao": str(dados.get("descricao", "")),
+        "fator_conversao": _positivo(dados["fator_conversao"], "fator_conversao", origem),
+        "espessura_referencia": _positivo(dados["espessura_referencia"], "espessura_referencia", origem),
+        "tabela_ki": tabela_ki,
+    }
+
+
+def ler_arquivo_calibracao(caminho):
+    """Lê e valida um arquivo de calibração .json ou .toml (ver validar_calibracao)."""
+    caminho = Path(caminho)
+    extensao = caminho.suffix.lower()
+    try:
+        if extensao == ".json":
+            with open(caminho, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+        elif extensao == ".toml":
+            if tomllib is None:
+                raise ErroCalibracao(f"{caminho.name}: arquivos .toml exigem Python 3.11 ou mais recente.")
+            with open(caminho, "rb") as arquivo:
+                dados = tomllib.load(arquivo)
+        else:
+            raise ErroCalibracao(f"{caminho.name}: extensão não suportada (use {', '.join(EXTENSOES_CALIBRACAO)}).")
+    except (OSError, ValueError) as erro:  # JSONDecodeError e TOMLDecodeError são ValueError
+        if isinstance(erro, ErroCalibracao):
+            raise
+        raise ErroCalibracao(f"{caminho.name}: não foi possível ler o arquivo ({erro}).") from erro
+    return validar_calibracao(dados, caminho.name)
+
+
+class Calibracao(TabelasKi):
+    """
+    Calibrações de vários locais compiladas juntas (arrays de TabelasKi), com a versão e o
+    arquivo de cada local. Não é alterada depois de criada; a recarga cria outra.
+    """
+
+    def __init__(self, calibracoes, arquivos=None):
+        """
+        Args:
+            calibracoes (list[dict]): Calibrações no formato de validar_calibracao, uma por local.
+            arquivos (list, opcional): Arquivo de origem de cada calibração.
+        """
+        locais = [c["local"] for c in calibracoes]
+        repetidos = sorted({local for local in locais if locais.count(local) > 1})
+        if repetidos:
+            raise ErroCalibracao(f"Locais com mais de uma calibração: {repetidos}")
+        super().__init__({c["local"]: c["tabela_ki"] for c in calibracoes},
+                         {c["local"]: (c["fator_conversao"], c["espessura_referencia"]) for c in calibracoes})
+        self.versoes = {c["local"]: c["versao"] for c in calibracoes}
+        self.descricoes = {c["local"]: c["descricao"] for c in calibracoes}
+        self.arquivos = dict(zip(locais, [str(a) for a in arquivos])) if arquivos else {}
+        # Carimbo de cada local ("IRD@2024.1"), alinhado a nomes_locais
+        self.carimbos = [f"{local}@{self.versoes[local]}" for local in self.nomes_locais]
+        self.carimbo_por_local = dict(zip(self.nomes_locais, self.carimbos))
+        self.versao = ", ".join(self.carimbos)
+
+    def __repr__(self):
+        return f"Calibracao({self.versao!r})"
+
+
+def calibracao_embutida():
+    """Calibração com as tabelas de dgm.tabelas (versão "embutida")."""
+    return Calibracao([
+        {"local": local, "versao": VERSAO_EMBUTIDA, "descricao": "Tabelas de dgm.tabelas",
+         "fator_conversao": FATORES_KI_POR_LOCAL[local][0], "espessura_referencia": FATORES_KI_POR_LOCAL[local][1],
+         "tabela_ki": tabela}
+        for local, tabela in tabelas_ki_por_local.items()
+    ])
+
+
+def arquivos_calibracao(pasta):
+    """Arquivos de calibração da pasta, em ordem alfabética (ignora ocultos)."""
+    pasta = Path(pasta)
+    if not pasta.is_dir():
+        return []
+    return sorted(caminho for caminho in pasta.iterdir()
+                  if caminho.suffix.lower() in EXTENSOES_CALIBRACAO and not caminho.name.startswith(".")
+                  and caminho.is_file())
+
+
+def carregar_pasta_calibracao(pasta):
+    """
+    Compila todos os arquivos de calibração da pasta em uma Calibracao (a embutida se não houver nenhum).
+    Raises:
+        ErroCalibracao: Algum arquivo inválido ou dois arquivos para o mesmo local.
+    """
+    arquivos = arquivos_calibracao(pasta)
+    if not arquivos:
+        return calibracao_embutida()
+    return Calibracao([ler_arquivo_calibracao(caminho) for caminho in arquivos], arquivos)
+
+
+def _estado_pasta(pasta):
+    """Nome, data de modificação e tamanho dos arquivos da pasta: muda quando algum arquivo muda."""
+    estado = []
+    for caminho in arquivos_calibracao(pasta):
+        try:
+            info = caminho.stat()
+        except OSError:  # removido entre a listagem e o stat
+            continue
+        estado.append((caminho.name, info.st_mtime_ns, info.st_size))
+    return tuple(estado)
+
+
+class RegistroCalibracoes:
+    """
+    Calibração ativa de uma pasta, recarregada quando os arquivos mudam (seguro para várias threads).
+    """
+
+    def __init__(self, pasta=None, intervalo=None):
+        # DGM_CALIBRACOES é relida aqui para valer também quando definida depois da importação
+        self.pasta = Path(pasta or os.environ.get("DGM_CALIBRACOES", PASTA_PADRAO))
+        self.intervalo = INTERVALO_VERIFICACAO if intervalo is None else intervalo
+        self._trava = threading.Lock()
+        self._ativa = None
+        self._estado = None
+        self._verificado_em = float("-inf")
+        self.erro = None      # motivo da última recarga recusada (None se a última deu certo)
+        self.recargas = 0     # calibrações aplicadas desde a criação
+
+    def ativa(self):
+        """Calibração em uso; confere os arquivos se o intervalo de verificação já passou."""
+        ativa = self._ativa
+        if ativa is not None and time.monotonic() - self._verificado_em < self.intervalo:
+            return ativa
+        with self._trava:
+            if self._ativa is None or time.monotonic() - self._verificado_em >= self.intervalo:
+                self._verificar()
+            return self._ativa
+
+    def recarregar(self):
+        """Relê a pasta agora, mesmo sem mudanças. Returns: a calibração ativa depois da recarga."""
+        with self._trava:
+            self._estado = None
+            self._verificar()
+            return self._ativa
+
+    def _verificar(self):
+        self._verificado_em = time.monotonic()
+        estado = _estado_pasta(self.pasta)
+        if estado == self._estado and self._ativa is not None:
+            return
+        self._estado = estado
+        try:
+            calibracao = carregar_pasta_calibracao(self.pasta)
+        except ErroCalibracao as erro:
+            self.erro = str(erro)
+            if self._ativa is None:  # sem calibração anterior: não há o que manter
+                raise
+            return
+        self.erro = None
+        self._ativa = calibracao
+        self.recargas += 1
+
+
+REGISTRO = RegistroCalibracoes()
+
+
+def calibracao_ativa():
+    """Calibração em uso pelo processo (ver RegistroCalibracoes.ativa)."""
+    return REGISTRO.ativa()
+
+
+def recarregar_calibracoes():
+    """Relê a pasta de calibrações imediatamente; devolve a calibração ativa."""
+    return REGISTRO.recarregar()
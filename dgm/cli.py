@@ -0,0 +1,171 @@
+"""
+Linha de comando para calcular a DGM de arquivos de exposições (CSV ou XLSX) ou de uma
+pasta de arquivos DICOM (imagens ou relatórios de dose; ver dgm.dicom).
+
+O arquivo é lido em blocos de tamanho fixo e cada bloco é calculado e gravado
+antes de ler o próximo, de modo que o uso de memória não depende do tamanho da entrada.
+
+Exemplo:
+    python -m dgm exposicoes.xlsx -o resultados.csv --bloco 50000
+    python -m dgm exposicoes.csv -o resultados.csv --monte-carlo 10000 --semente 1
+    python -m dgm exposicoes.csv -o resultados.csv --bloco 1000000 --processos 4
+    python -m dgm exposicoes.csv -o resultados.csv --drl drl.csv
+    python -m dgm pasta_dicom/ -o resultados.csv --local IRD
+    python -m dgm auditoria_2019_2024.csv --colunar execucoes/auditoria --bloco 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from dgm.arquivos import TAMANHO_BLOCO_PADRAO, abrir_escritor, ler_blocos
+from dgm.colunar import ArmazemColunar
+from dgm.dicom import ler_blocos_dicom
+from dgm.drl import AgregadorDRL
+from dgm.lote import calcular_dgm_lote, colunas_faltando
+from dgm.metricas import ativar_metricas, exportar_metricas_json, exportar_metricas_prometheus
+from dgm.montecarlo import simular_dgm_lote
+from dgm.paralelo import calcular_dgm_lote_paralelo
+
+
+def calcular_bloco(bloco, amostras_monte_carlo=0, semente=None, processos=1):
+    """
+    Calcula um bloco mantendo as colunas extras da entrada (ID Paciente, Data/Hora etc.).
+    Com amostras_monte_carlo > 0, acrescenta a incerteza por Monte Carlo (dgm.montecarlo);
+    senão, com processos > 1, divide o bloco entre processos (dgm.paralelo).
+    """
+    faltando = colunas_faltando(bloco.columns)
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes no arquivo: {faltando}")
+    if amostras_monte_carlo > 0:
+        resultado = simular_dgm_lote(bloco, amostras=amostras_monte_carlo, semente=semente)
+    elif processos > 1:
+        resultado = calcular_dgm_lote_paralelo(bloco, processos=processos)
+    else:
+        resultado = calcular_dgm_lote(bloco)
+    saida = bloco.copy()
+    for coluna in resultado.columns:
+        saida[coluna] = resultado[coluna]
+    return saida
+
+
+def e_entrada_dicom(entrada):
+    """Pastas e arquivos .dcm são lidos como DICOM; os demais como CSV/XLSX."""
+    return os.path.isdir(entrada) or str(entrada).lower().endswith(".dcm")
+
+
+def processar_arquivo(entrada, saida, tamanho_bloco=TAMANHO_BLOCO_PADRAO, planilha=None,
+                      amostras_monte_carlo=0, semente=None, processos=1, agregador_drl=None,
+                      local=None, erros_dicom=None, armazem=None):
+    """
+    Calcula a DGM de todas as linhas de `entrada` e grava o resultado em `saida` (se informada).
+    Com agregador_drl (dgm.drl.AgregadorDRL), cada bloco também atualiza as estatísticas de DRL;
+    com armazem (dgm.colunar.ArmazemColunar), cada bloco é acrescentado ao armazém colunar.
+    Entradas DICOM (e_entrada_dicom) usam `local` como local do mamógrafo e acrescentam a
+    `erros_dicom` os arquivos que não puderam ser lidos (ver dgm.dicom.ler_blocos_dicom).
+    Returns:
+        tuple: (linhas processadas, linhas com erro)
+    """
+    escritor = abrir_escritor(saida) if saida is not None else None
+    rng = np.random.default_rng(semente)  # um único gerador para todos os blocos
+    linhas = 0
+    linhas_com_erro = 0
+    try:
+        if e_entrada_dicom(entrada):
+            blocos = ler_blocos_dicom(entrada, tamanho_bloco, local, erros_dicom)
+        else:
+            blocos = ler_blocos(entrada, tamanho_bloco, planilha)
+        for bloco in blocos:
+            resultado = calcular_bloco(bloco, amostras_monte_carlo, rng, processos)
+            if escritor is not None:
+                escritor.escrever(resultado)
+            if armazem is not None:
+                armazem.acrescentar(resultado)
+            if agregador_drl is not None:
+                agregador_drl.adicionar(resultado)
+            linhas += len(resultado)
+            linhas_com_erro += int((resultado["Erro"] != "").sum())
+    finally:
+        if escritor is not None:
+            escritor.fechar()
+    return linhas, linhas_com_erro
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m dgm",
+        description="Calcula a DGM de um arquivo de exposições (CSV ou XLSX) ou de uma pasta DICOM em blocos.",
+    )
+    parser.add_argument("entrada", help="Arquivo de exposições (.csv ou .xlsx), arquivo .dcm ou pasta de arquivos DICOM.")
+    parser.add_argument("-o", "--saida", help="Arquivo de resultados (.csv ou .xlsx).")
+    parser.add_argument("--colunar", metavar="PASTA",
+                        help="Grava os resultados em um armazém colunar mapeado em memória (dgm.colunar) na PASTA, "
+                             "que pode ser reaberto e percorrido em blocos sem carregar tudo.")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO_PADRAO,
+                        help=f"Linhas por bloco (padrão: {TAMANHO_BLOCO_PADRAO}).")
+    parser.add_argument("--planilha", help="Planilha a ler quando a entrada for XLSX (padrão: a ativa).")
+    parser.add_argument("--monte-carlo", type=int, default=0, metavar="AMOSTRAS",
+                        help="Acrescenta a incerteza da DGM por Monte Carlo com AMOSTRAS por exposição.")
+    parser.add_argument("--semente", type=int, help="Semente do Monte Carlo (resultados reproduzíveis).")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="Processos para o cálculo de cada bloco (padrão: 1). Blocos com menos de "
+                             "50000 linhas são calculados em um único processo.")
+    parser.add_argument("--local", help="Local do mamógrafo (tabela Ki) das exposições lidas de DICOM.")
+    parser.add_argument("--drl", metavar="ARQUIVO",
+                        help="Grava em CSV a tabela de DRL (mediana, P75, média) por local, alvo/filtro e faixa de espessura.")
+    parser.add_argument("--metricas", metavar="ARQUIVO",
+                        help="Grava as métricas por etapa ao final: formato Prometheus se terminar em .prom, senão JSON.")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    if args.saida is None and args.colunar is None:
+        print("Erro: informe -o/--saida e/ou --colunar.", file=sys.stderr)
+        return 2
+    if args.bloco <= 0:
+        print("Erro: --bloco deve ser maior que zero.", file=sys.stderr)
+        return 2
+    if args.monte_carlo < 0 or args.monte_carlo == 1:
+        print("Erro: --monte-carlo deve ser 0 (desativado) ou pelo menos 2.", file=sys.stderr)
+        return 2
+    if args.processos <= 0:
+        print("Erro: --processos deve ser maior que zero.", file=sys.stderr)
+        return 2
+
+    if args.metricas:
+        ativar_metricas()
+    agregador_drl = AgregadorDRL() if args.drl else None
+    erros_dicom = []
+    inicio = time.perf_counter()
+    try:
+        armazem = None
+        if args.colunar:
+            armazem = ArmazemColunar(args.colunar, metadados={"entrada": os.path.abspath(args.entrada)})
+            if len(armazem):
+                print(f"Erro: {args.colunar} já tem uma execução ({len(armazem)} linhas).", file=sys.stderr)
+                return 2
+        linhas, linhas_com_erro = processar_arquivo(args.entrada, args.saida, args.bloco, args.planilha,
+                                                     args.monte_carlo, args.semente, args.processos, agregador_drl,
+                                                     args.local, erros_dicom, armazem)
+        if agregador_drl is not None:
+            agregador_drl.tabela().to_csv(args.drl, index=False)
+    except (ValueError, KeyError, OSError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    duracao = time.perf_counter() - inicio
+
+    if args.metricas:
+        with open(args.metricas, "w", encoding="utf-8") as arquivo:
+            arquivo.write(exportar_metricas_prometheus() if args.metricas.endswith(".prom") else exportar_metricas_json())
+
+    if erros_dicom:
+        print(f"{len(erros_dicom)} arquivo(s) ignorado(s) (não DICOM ou cabeçalho ilegível), ex.: "
+              f"{erros_dicom[0][0]}: {erros_dicom[0][1]}", file=sys.stderr)
+    taxa = linhas / duracao if duracao > 0 else float('inf')
+    print(f"{linhas} linhas processadas em {duracao:.2f} s ({taxa:,.0f} linhas/s); "
+          f"{linhas_com_erro} com erro. Resultados em {' e '.join(filter(None, [args.saida, args.colunar]))}.",
+          file=sys.stderr)
+    return 0
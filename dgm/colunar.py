@@ -0,0 +1,397 @@
+"""
+Armazém de resultados em arquivos colunares mapeados em memória, para execuções maiores que a
+memória (ex.: auditorias de vários anos).
+
+Uma execução é uma pasta com um arquivo por coluna:
+    cNNN.f64             coluna numérica: float64 contíguos (NaN = vazio)
+    cNNN.i32, cNNN.cat   coluna de texto: códigos int32 (-1 = vazio) e os textos distintos,
+                         um por linha em JSON, na ordem dos códigos (só cresce)
+    colunas.json         nomes e tipos das colunas e o número de linhas confirmadas
+
+Cada bloco calculado é acrescentado ao fim dos arquivos (acrescentar) e só passa a valer
+quando colunas.json é regravado, com troca atômica (os.replace): uma execução interrompida no
+meio de um bloco reabre com os blocos anteriores, e a próxima gravação descarta a sobra.
+
+Reabrir uma execução (ArmazemColunar(pasta)) lê só colunas.json. As colunas são mapeadas em
+memória quando pedidas: coluna() devolve a visão do arquivo (np.memmap, sem cópia) e
+iterar_blocos, resumo, contar_valores e exportar percorrem a execução em blocos, sem
+carregá-la inteira. Colunas inteiras ou lógicas são guardadas como float64; as de texto
+voltam como pd.Categorical.
+
+O tipo de cada coluna é fixado no primeiro bloco: as de COLUNAS_TEXTO (identificação,
+local, alvo/filtro, erro...) são sempre texto, mesmo que o primeiro bloco só tenha números
+(ex.: IDs 1000, 1001, ... seguidos de "AB10" em outro bloco); as demais são numéricas se o
+primeiro bloco for numérico. Um valor que não pode ser gravado como número em uma coluna
+numérica é um erro (ValueError), nunca um vazio silencioso.
+"""
+import io
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dgm.arquivos import TAMANHO_BLOCO_PADRAO, abrir_escritor
+from dgm.drl import EstatisticasGrupo
+
+ARQUIVO_COLUNAS = "colunas.json"
+VERSAO_FORMATO = 1
+COLUNAS_RESUMO = ["Exposições", "Média", "Mediana", "P75", "Máximo"]
+# Colunas guardadas sempre como texto, qualquer que seja o conteúdo do primeiro bloco
+COLUNAS_TEXTO = ("Data/Hora", "ID Paciente", "Iniciais Paciente", "Local do Mamógrafo", "Alvo/Filtro", "Erro",
+                 "Calibração", "Arquivo", "Estação")
+
+
+def _tipo_coluna(nome, valores):
+    if nome in COLUNAS_TEXTO:
+        return "texto"
+    return "numero" if pd.api.types.is_numeric_dtype(valores.dtype) else "texto"
+
+
+def _texto(valor):
+    """Texto gravado para um valor de coluna de texto (1000.0, lido com vazios na coluna, vira "1000")."""
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _numeros(nome, valores):
+    """
+    Valores de uma coluna numérica como float64 (vazios viram NaN).
+    Raises:
+        ValueError: Algum valor não vazio não é um número.
+    """
+    numeros = pd.to_numeric(valores, errors="coerce")
+    vazios = valores.isna()
+    if not pd.api.types.is_numeric_dtype(valores.dtype):
+        vazios |= valores.map(lambda v: isinstance(v, str) and not v.strip()).astype(bool)
+    invalidos = numeros.isna() & ~vazios
+    if invalidos.any():
+        raise ValueError(f"Coluna numérica {nome!r}: {int(invalidos.sum())} valores não numéricos "
+                         f"(ex.: {valores[invalidos].iloc[0]!r}).")
+    return numeros.to_numpy(dtype=np.float64)
+
+
+def _gravar_json_atomico(caminho, dados):
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=1)
+    os.replace(temporario, caminho)
+
+
+class ArmazemColunar:
+    """Resultados de uma execução em arquivos colunares (ver o docstring do módulo)."""
+
+    def __init__(self, pasta, metadados=None):
+        """
+        Abre a execução gravada na pasta ou começa uma nova se a pasta não tiver colunas.json.
+        Args:
+            pasta (str ou Path): Pasta da execução (criada se não existir).
+            metadados (dict, opcional): Informações livres guardadas com uma execução nova
+                (ex.: arquivo de origem, calibração).
+        """
+        self.pasta = Path(pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self._trava = threading.Lock()
+        self._mapas = {}        # arquivo -> np.memmap das linhas confirmadas
+        self._categorias = {}   # coluna de texto -> lista de textos
+        self._indices = {}      # coluna de texto -> {texto: código}
+        self._sobras_descartadas = False
+        caminho = self.pasta / ARQUIVO_COLUNAS
+        if caminho.exists():
+            with open(caminho, encoding="utf-8") as arquivo:
+                self._meta = json.load(arquivo)
+            if self._meta.get("formato") != VERSAO_FORMATO:
+                raise ValueError(f"{caminho}: versão de formato não suportada ({self._meta.get('formato')!r}).")
+        else:
+            self._meta = {"formato": VERSAO_FORMATO, "linhas": 0, "colunas": [], "metadados": dict(metadados or {})}
+
+    def __len__(self):
+        return self._meta["linhas"]
+
+    def __repr__(self):
+        return f"ArmazemColunar({str(self.pasta)!r}, linhas={len(self)}, colunas={len(self.colunas)})"
+
+    @property
+    def colunas(self):
+        return [coluna["nome"] for coluna in self._meta["colunas"]]
+
+    @property
+    def metadados(self):
+        return self._meta["metadados"]
+
+    def _coluna(self, nome):
+        for coluna in self._meta["colunas"]:
+            if coluna["nome"] == nome:
+                return coluna
+        raise KeyError(f"Coluna inexistente no armazém: {nome!r}")
+
+    # --- Escrita ---
+
+    def acrescentar(self, bloco):
+        """
+        Acrescenta um bloco de resultados (DataFrame). O primeiro bloco define as colunas; nos
+        seguintes, colunas ausentes ficam vazias e colunas novas são um erro.
+        Raises:
+            ValueError: Bloco com colunas que a execução não tem ou com valores não numéricos em
+                uma coluna numérica (o bloco não é gravado).
+        """
+        with self._trava:
+            confirmado = json.loads(json.dumps(self._meta))
+            try:
+                self._acrescentar(bloco)
+            except BaseException:
+                # Volta ao último estado confirmado; a sobra nos arquivos é cortada na próxima gravação
+                self._meta = confirmado
+                self._categorias.clear()
+                self._indices.clear()
+                self._sobras_descartadas = False
+                raise
+            self._mapas.clear()
+
+    def _acrescentar(self, bloco):
+        if not self._meta["colunas"]:
+            self._meta["colunas"] = [
+                {"nome": str(nome), "tipo": _tipo_coluna(str(nome), bloco[nome]), "arquivo": f"c{i:03d}",
+                 "categorias": 0, "bytes_categorias": 0}
+                for i, nome in enumerate(bloco.columns)
+            ]
+        novas = [str(nome) for nome in bloco.columns if str(nome) not in self.colunas]
+        if novas:
+            raise ValueError(f"Colunas que a execução não tem: {novas}")
+        valores = {coluna["nome"]: bloco[coluna["nome"]] if coluna["nome"] in bloco.columns
+                   else pd.Series([None] * len(bloco)) for coluna in self._meta["colunas"]}
+        # Converte as colunas numéricas antes de gravar qualquer arquivo: um valor inválido não deixa sobra
+        numeros = {coluna["nome"]: _numeros(coluna["nome"], valores[coluna["nome"]])
+                   for coluna in self._meta["colunas"] if coluna["tipo"] == "numero"}
+        self._descartar_sobras()
+        for coluna in self._meta["colunas"]:
+            if coluna["tipo"] == "numero":
+                self._acrescentar_bytes(coluna["arquivo"] + ".f64", numeros[coluna["nome"]])
+            else:
+                self._acrescentar_bytes(coluna["arquivo"] + ".i32", self._codificar(coluna, valores[coluna["nome"]]))
+        self._meta["linhas"] += len(bloco)
+        _gravar_json_atomico(self.pasta / ARQUIVO_COLUNAS, self._meta)
+
+    def _acrescentar_bytes(self, nome_arquivo, dados):
+        with open(self.pasta / nome_arquivo, "ab") as arquivo:
+            arquivo.write(np.ascontiguousarray(dados).tobytes())
+
+    def _codificar(self, coluna, valores):
+        """Códigos int32 dos textos do bloco; textos novos vão para o fim de cNNN.cat."""
+        indice = self._indice(coluna)
+        objetos = valores.to_numpy(dtype=object, copy=True)
+        objetos[valores.isna().to_numpy()] = None
+        codigos_bloco, distintos = pd.factorize(objetos)  # vazios recebem -1
+        textos = [_texto(texto) for texto in distintos]
+        novos = list(dict.fromkeys(texto for texto in textos if texto not in indice))
+        if novos:
+            conteudo = "".join(json.dumps(texto, ensure_ascii=False) + "\n" for texto in novos).encode("utf-8")
+            with open(self.pasta / (coluna["arquivo"] + ".cat"), "ab") as arquivo:
+                arquivo.write(conteudo)
+            categorias = self._categorias[coluna["nome"]]
+            for texto in novos:
+                indice[texto] = len(categorias)
+                categorias.append(texto)
+            coluna["categorias"] = len(categorias)
+            coluna["bytes_categorias"] += len(conteudo)
+        # O -1 dos vazios pega o último item de `mapa`, que é o próprio -1
+        mapa = np.array([indice[texto] for texto in textos] + [-1], dtype=np.int32)
+        return mapa[codigos_bloco]
+
+    def _descartar_sobras(self):
+        """Corta dos arquivos o que foi gravado depois do último colunas.json (gravação interrompida)."""
+        if self._sobras_descartadas:
+            return
+        linhas = self._meta["linhas"]
+        for coluna in self._meta["colunas"]:
+            tamanhos = ({coluna["arquivo"] + ".f64": linhas * 8} if coluna["tipo"] == "numero" else
+                        {coluna["arquivo"] + ".i32": linhas * 4, coluna["arquivo"] + ".cat": coluna["bytes_categorias"]})
+            for nome_arquivo, tamanho in tamanhos.items():
+                caminho = self.pasta / nome_arquivo
+                if caminho.exists() and caminho.stat().st_size > tamanho:
+                    os.truncate(caminho, tamanho)
+        self._sobras_descartadas = True
+
+    # --- Leitura ---
+
+    def _mapa(self, nome_arquivo, dtype):
+        mapa = self._mapas.get(nome_arquivo)
+        if mapa is None:
+            linhas = len(self)
+            # np.memmap não aceita arquivos vazios
+            mapa = (np.memmap(self.pasta / nome_arquivo, dtype=dtype, mode="r", shape=(linhas,)) if linhas
+                    else np.empty(0, dtype=dtype))
+            self._mapas[nome_arquivo] = mapa
+        return mapa
+
+    def _carregar_categorias(self, coluna):
+        categorias = self._categorias.get(coluna["nome"])
+        if categorias is None:
+            categorias = []
+            if coluna["bytes_categorias"]:
+                with open(self.pasta / (coluna["arquivo"] + ".cat"), "rb") as arquivo:
+                    conteudo = arquivo.read(coluna["bytes_categorias"])
+                categorias = [json.loads(linha) for linha in conteudo.decode("utf-8").splitlines()]
+            self._categorias[coluna["nome"]] = categorias
+        return categorias
+
+    def _indice(self, coluna):
+        indice = self._indices.get(coluna["nome"])
+        if indice is None:
+            indice = self._indices[coluna["nome"]] = {
+                texto: codigo for codigo, texto in enumerate(self._carregar_categorias(coluna))}
+        return indice
+
+    def categorias(self, nome):
+        """Textos distintos de uma coluna de texto, na ordem dos códigos."""
+        return list(self._carregar_categorias(self._coluna(nome)))
+
+    def codigos(self, nome):
+        """Códigos int32 de uma coluna de texto (visão mapeada em memória, sem cópia)."""
+        coluna = self._coluna(nome)
+        if coluna["tipo"] != "texto":
+            raise ValueError(f"A coluna {nome!r} não é de texto.")
+        return self._mapa(coluna["arquivo"] + ".i32", np.int32)
+
+    def coluna(self, nome):
+        """
+        Uma coluna inteira: numéricas como np.memmap somente leitura (sem cópia); as de texto
+        como pd.Categorical (só os códigos são lidos do arquivo).
+        """
+        coluna = self._coluna(nome)
+        if coluna["tipo"] == "numero":
+            return self._mapa(coluna["arquivo"] + ".f64", np.float64)
+        return self._categorico(coluna, self.codigos(nome))
+
+    def _categorico(self, coluna, codigos):
+        return pd.Categorical.from_codes(np.asarray(codigos), categories=self._carregar_categorias(coluna))
+
+    def ler(self, inicio=0, fim=None, colunas=None):
+        """Linhas [inicio, fim) como DataFrame (índice = posição na execução)."""
+        fim = len(self) if fim is None else min(fim, len(self))
+        inicio = min(max(inicio, 0), fim)
+        dados = {}
+        for nome in colunas or self.colunas:
+            coluna = self._coluna(nome)
+            if coluna["tipo"] == "numero":
+                dados[nome] = np.array(self._mapa(coluna["arquivo"] + ".f64", np.float64)[inicio:fim])
+            else:
+                dados[nome] = self._categorico(coluna, self.codigos(nome)[inicio:fim])
+        return pd.DataFrame(dados, index=pd.RangeIndex(inicio, fim))
+
+    def iterar_blocos(self, tamanho_bloco=TAMANHO_BLOCO_PADRAO, colunas=None):
+        """Percorre a execução em DataFrames de até `tamanho_bloco` linhas."""
+        for inicio in range(0, len(self), tamanho_bloco):
+            yield self.ler(inicio, inicio + tamanho_bloco, colunas)
+
+    # --- Agregação e exportação ---
+
+    def _validas(self, inicio, fim):
+        """Linhas sem erro no intervalo (todas, se a execução não tiver a coluna "Erro")."""
+        if "Erro" not in self.colunas:
+            return np.ones(fim - inicio, dtype=bool)
+        sem_erro = self._indice(self._coluna("Erro")).get("", -2)
+        return np.asarray(self.codigos("Erro")[inicio:fim]) == sem_erro
+
+    def contar_valores(self, nome, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+        """Quantas linhas têm cada texto de uma coluna de texto (pd.Series, da maior para a menor)."""
+        categorias = self.categorias(nome)
+        contagem = np.zeros(len(categorias) + 1, dtype=np.int64)
+        codigos = self.codigos(nome)
+        for inicio in range(0, len(self), tamanho_bloco):
+            # -1 (vazio) vai para a última posição, descartada abaixo
+            contagem += np.bincount(np.asarray(codigos[inicio:inicio + tamanho_bloco]), minlength=len(contagem))[:len(contagem)]
+        serie = pd.Series(contagem[:-1], index=pd.Index(categorias, name=nome), name="Linhas")
+        return serie[serie > 0].sort_values(ascending=False, kind="stable")
+
+    def resumo(self, por, coluna="DGM (mGy)", somente_validas=True, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+        """
+        Contagem, média, mediana, P75 e máximo de `coluna` por combinação das colunas de texto
+        `por`, em blocos e com memória limitada (mediana e P75 pelo esboço KLL de dgm.drl, exatos
+        em grupos de até algumas centenas de linhas).
+        Returns:
+            pd.DataFrame: Índice `por` e as colunas de COLUNAS_RESUMO.
+        """
+        por = [por] if isinstance(por, str) else list(por)
+        grupos = {}
+        valores = self.coluna(coluna)
+        codigos = [self.codigos(nome) for nome in por]
+        for inicio in range(0, len(self), tamanho_bloco):
+            fim = min(inicio + tamanho_bloco, len(self))
+            manter = ~np.isnan(valores[inicio:fim])
+            if somente_validas:
+                manter &= self._validas(inicio, fim)
+            if not manter.any():
+                continue
+            chaves = np.stack([np.asarray(c[inicio:fim])[manter] for c in codigos], axis=1)
+            distintas, grupo_da_linha = np.unique(chaves, axis=0, return_inverse=True)
+            bloco = np.asarray(valores[inicio:fim])[manter]
+            for i, chave in enumerate(map(tuple, distintas)):
+                estatisticas = grupos.get(chave)
+                if estatisticas is None:
+                    estatisticas = grupos[chave] = EstatisticasGrupo(semente=0)
+                estatisticas.adicionar(bloco[grupo_da_linha.ravel() == i])
+        categorias = [self.categorias(nome) for nome in por]
+        rotulos = {chave: tuple(c[k] if k >= 0 else "" for c, k in zip(categorias, chave)) for chave in grupos}
+        linhas, indice = [], []
+        for chave, estatisticas in sorted(grupos.items(), key=lambda item: rotulos[item[0]]):
+            mediana, p75 = estatisticas.sketch.quantis([0.5, 0.75])
+            indice.append(rotulos[chave])
+            linhas.append([estatisticas.n, estatisticas.media, mediana, p75, estatisticas.sketch.maximo])
+        return pd.DataFrame(linhas, columns=COLUNAS_RESUMO,
+                            index=pd.MultiIndex.from_tuples(indice, names=por) if indice else None)
+
+    def exportar(self, destino=None, formato="csv", tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+        """
+        Grava a execução em CSV, XLSX, Parquet ou Feather, bloco a bloco.
+        Args:
+            destino (str ou arquivo binário, opcional): Onde gravar; por padrão um io.BytesIO.
+            formato (str): "csv", "xlsx", "parquet" ou "feather".
+        Returns:
+            O destino (um io.BytesIO rebobinado, se não foi informado).
+        """
+        if destino is None:
+            destino = io.BytesIO()
+        blocos = self.iterar_blocos(tamanho_bloco)
+        if formato in ("csv", "xlsx"):
+            escritor = abrir_escritor(destino, "." + formato)
+            try:
+                for bloco in blocos:
+                    escritor.escrever(bloco)
+            finally:
+                escritor.fechar()
+        elif formato in ("parquet", "feather"):
+            self._exportar_arrow(destino, formato, blocos)
+        else:
+            raise ValueError(f"Formato de exportação inválido: {formato} (use csv, xlsx, parquet ou feather).")
+        if hasattr(destino, "seek"):
+            destino.seek(0)
+        return destino
+
+    def _exportar_arrow(self, destino, formato, blocos):
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+
+        tipos = {"numero": pa.float64(), "texto": pa.string()}
+        esquema = pa.schema([(coluna["nome"], tipos[coluna["tipo"]]) for coluna in self._meta["colunas"]])
+        if formato == "parquet":
+            escritor = pq.ParquetWriter(destino, esquema, compression="zstd")
+        else:
+            escritor = ipc.new_file(destino, esquema, options=ipc.IpcWriteOptions(compression="lz4"))
+        with escritor:
+            for bloco in blocos:
+                textos = {nome: bloco[nome].astype(object) for nome in bloco.columns
+                          if isinstance(bloco[nome].dtype, pd.CategoricalDtype)}
+                escritor.write_batch(pa.RecordBatch.from_pandas(bloco.assign(**textos), schema=esquema,
+                                                                preserve_index=False))
+
+    def remover(self):
+        """Apaga a pasta da execução."""
+        with self._trava:
+            self._mapas.clear()
+            shutil.rmtree(self.pasta, ignore_errors=True)
@@ -0,0 +1,611 @@
+"""
+Leitura dos parâmetros de exposição de arquivos DICOM (imagens de mamografia e relatórios
+estruturados de dose, RDSR) para o cálculo da DGM em lote.
+
+Só o cabeçalho é lido: o arquivo é mapeado na memória (mmap) e os elementos são percorridos
+pelo tamanho declarado, sem copiar os valores que não interessam; a leitura para antes dos
+pixels (7FE0,0010), que nunca são carregados do disco. Não depende de bibliotecas DICOM.
+
+Campos usados (imagens):
+    - kV: KVP (0018,0060);
+    - mAs: Exposure in µAs (0018,1153), Exposure (0018,1152) ou tempo (0018,1150) x corrente
+      (0018,1151);
+    - espessura: Body Part Thickness (0018,11A0), em mm;
+    - alvo/filtro: Anode Target Material (0018,1191) e Filter Material (0018,7050), convertidos
+      para as chaves de alvo_filtro_options (ex.: MOLYBDENUM/RHODIUM -> "Mo/Rh");
+    - idade: Patient's Age (0010,1010) ou, na falta dela, data de nascimento e data do exame;
+    - DGM informada pelo equipamento: Organ Dose (0040,0316), em dGy.
+Nos RDSR, cada evento de irradiação (113706) vira uma exposição, com kVp (113733), exposição
+(113736), espessura de compressão (111633), material do anodo (111632) e do filtro (113757) e
+a dose glandular média do equipamento (111631).
+
+Sintaxes de transferência suportadas: implícita e explícita little endian (inclusive com pixels
+comprimidos). Big endian e deflate são recusados.
+"""
+import mmap
+import os
+import re
+import struct
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dgm.arquivos import TAMANHO_BLOCO_PADRAO
+from dgm.lote import calcular_dgm_lote
+from dgm.tabelas import alvo_filtro_options
+
+# Colunas das exposições lidas (as de entrada do lote, identificação e a dose do equipamento)
+COLUNAS_DICOM = [
+    "Arquivo", "Data/Hora", "ID Paciente", "Iniciais Paciente", "Estação", "Local do Mamógrafo",
+    "Idade", "Espessura (cm)", "Alvo/Filtro", "Kv", "mAs", "DGM Informada (mGy)",
+]
+
+
+class ErroDicom(ValueError):
+    """Arquivo que não é DICOM ou cujo cabeçalho não pode ser lido."""
+
+
+# --- Tags (grupo << 16 | elemento) ---
+ITEM = 0xFFFEE000
+FIM_ITEM = 0xFFFEE00D
+FIM_SEQUENCIA = 0xFFFEE0DD
+SINTAXE_TRANSFERENCIA = 0x00020010
+PIXEL_DATA = 0x7FE00010
+CONTENT_SEQUENCE = 0x0040A730
+CONCEPT_NAME_CODE_SEQUENCE = 0x0040A043
+CONCEPT_CODE_SEQUENCE = 0x0040A168
+MEASURED_VALUE_SEQUENCE = 0x0040A300
+NUMERIC_VALUE = 0x0040A30A
+MEASUREMENT_UNITS_CODE_SEQUENCE = 0x004008EA
+CODE_VALUE = 0x00080100
+CODE_MEANING = 0x00080104
+
+# Elementos do cabeçalho lidos (os demais são pulados pelo tamanho)
+CAMPOS_CABECALHO = {
+    0x00080020: "data_estudo",
+    0x00080022: "data_aquisicao",
+    0x00080030: "hora_estudo",
+    0x00080032: "hora_aquisicao",
+    0x00080060: "modalidade",
+    0x00081010: "estacao",
+    0x00100010: "nome_paciente",
+    0x00100020: "id_paciente",
+    0x00100030: "nascimento",
+    0x00101010: "idade",
+    0x00180060: "kv",
+    0x00181150: "tempo_exposicao",
+    0x00181151: "corrente",
+    0x00181152: "exposicao",
+    0x00181153: "exposicao_uas",
+    0x00181191: "anodo",
+    0x001811A0: "espessura",
+    0x00187050: "filtro",
+    0x00400316: "dose_orgao",
+}
+# Depois desta tag não há nada a ler (os pixels vêm sempre depois)
+ULTIMA_TAG = CONTENT_SEQUENCE
+
+# Códigos (DCM) dos itens de um evento de irradiação do RDSR
+EVENTO_IRRADIACAO = "113706"
+CODIGOS_EVENTO = {
+    "113733": "kv",
+    "113736": "exposicao",
+    "113734": "corrente",
+    "113824": "tempo_exposicao",
+    "111633": "espessura",
+    "111632": "anodo",
+    "113757": "filtro",
+    "111631": "dgm_informada",
+}
+
+VR_LONGOS = {b"OB", b"OD", b"OF", b"OL", b"OV", b"OW", b"SQ", b"SV", b"UC", b"UN", b"UR", b"UT", b"UV"}
+SINTAXE_IMPLICITA = "1.2.840.10008.1.2"
+SINTAXES_NAO_SUPORTADAS = {
+    "1.2.840.10008.1.2.2": "explícita big endian",
+    "1.2.840.10008.1.2.1.99": "deflate",
+}
+
+# Material (DICOM) -> símbolo usado em alvo_filtro_options
+SIMBOLOS_MATERIAIS = {
+    "MOLYBDENUM": "Mo",
+    "RHODIUM": "Rh",
+    "TUNGSTEN": "W",
+    "ALUMINUM": "Al",
+    "ALUMINIUM": "Al",
+    "SILVER": "Ag",
+    "COPPER": "Cu",
+    "TITANIUM": "Ti",
+}
+NOMES_MATERIAIS = {simbolo: nome for nome, simbolo in reversed(SIMBOLOS_MATERIAIS.items())}
+_SIMBOLOS = {simbolo.upper(): simbolo for simbolo in NOMES_MATERIAIS}
+
+
+# --- Percurso dos elementos ---
+
+def _elemento(mm, pos, explicito):
+    """Cabeçalho do elemento em `pos`: (tag, VR, início do valor, tamanho; None = indefinido)."""
+    grupo, numero = struct.unpack_from("<HH", mm, pos)
+    tag = (grupo << 16) | numero
+    if grupo == 0xFFFE or not explicito:  # itens e delimitadores não têm VR
+        tamanho, = struct.unpack_from("<I", mm, pos + 4)
+        vr, inicio = None, pos + 8
+    else:
+        vr = mm[pos + 4:pos + 6]
+        if vr in VR_LONGOS:
+            tamanho, = struct.unpack_from("<I", mm, pos + 8)
+            inicio = pos + 12
+        else:
+            tamanho, = struct.unpack_from("<H", mm, pos + 6)
+            inicio = pos + 8
+    return tag, vr, inicio, None if tamanho == 0xFFFFFFFF else tamanho
+
+
+def _pular_indefinido(mm, pos, explicito):
+    """Posição logo após o delimitador de um valor de tamanho indefinido que começa em `pos`."""
+    while True:
+        tag, vr, inicio, tamanho = _elemento(mm, pos, explicito)
+        if tag in (FIM_ITEM, FIM_SEQUENCIA):
+            return inicio
+        if tamanho is None:
+            pos = _pular_indefinido(mm, inicio, explicito and vr != b"UN")  # UN indefinido é implícito
+        else:
+            pos = inicio + tamanho
+
+
+def _elementos(mm, pos, fim, explicito):
+    """Elementos entre `pos` e `fim` (ou até um delimitador): (tag, VR, início do valor, tamanho)."""
+    while pos < fim:
+        tag, vr, inicio, tamanho = _elemento(mm, pos, explicito)
+        if tag in (FIM_ITEM, FIM_SEQUENCIA):
+            return
+        yield tag, vr, inicio, tamanho
+        pos = _pular_indefinido(mm, inicio, explicito and vr != b"UN") if tamanho is None else inicio + tamanho
+        if pos > len(mm):
+            raise ErroDicom("Cabeçalho DICOM truncado ou corrompido.")
+
+
+def _itens(mm, inicio, tamanho, explicito):
+    """(início, fim) do conteúdo de cada item de uma sequência."""
+    fim = len(mm) if tamanho is None else inicio + tamanho
+    pos = inicio
+    while pos < fim:
+        tag, _, conteudo, tamanho_item = _elemento(mm, pos, explicito)
+        if tag == FIM_SEQUENCIA:
+            return
+        if tag != ITEM:
+            raise ErroDicom("Item de sequência inválido.")
+        if tamanho_item is None:
+            pos = _pular_indefinido(mm, conteudo, explicito)
+            yield conteudo, pos - 8
+        else:
+            pos = conteudo + tamanho_item
+            yield conteudo, pos
+    if tamanho is None:  # tamanho indefinido: o arquivo acabou antes do delimitador da sequência
+        raise ErroDicom("Cabeçalho DICOM truncado ou corrompido.")
+
+
+def _texto(mm, inicio, tamanho):
+    return mm[inicio:inicio + (tamanho or 0)].decode("latin-1").strip("\x00 ")
+
+
+def _numero(texto):
+    """Primeiro valor de um DS/IS (NaN se vazio ou inválido)."""
+    try:
+        return float(texto.split("\\")[0])
+    except (AttributeError, ValueError):
+        return np.nan
+
+
+# --- Relatório estruturado de dose (RDSR) ---
+
+def _codigo(mm, inicio, tamanho, explicito):
+    """(Code Value, Code Meaning) do primeiro item de uma sequência de código."""
+    for a, b in _itens(mm, inicio, tamanho, explicito):
+        valores = {tag: _texto(mm, i, t) for tag, _, i, t in _elementos(mm, a, b, explicito)
+                   if tag in (CODE_VALUE, CODE_MEANING)}
+        return valores.get(CODE_VALUE, ""), valores.get(CODE_MEANING, "")
+    return "", ""
+
+
+def _nos_sr(mm, inicio, tamanho, explicito):
+    """Itens de uma Content Sequence: (conceito, valor numérico, unidade, código do valor, filhos)."""
+    nos = []
+    for a, b in _itens(mm, inicio, tamanho, explicito):
+        conceito, valor, unidade, significado, filhos = "", np.nan, "", "", []
+        for tag, _, i, t in _elementos(mm, a, b, explicito):
+            if tag == CONCEPT_NAME_CODE_SEQUENCE:
+                conceito = _codigo(mm, i, t, explicito)[0]
+            elif tag == CONCEPT_CODE_SEQUENCE:
+                significado = _codigo(mm, i, t, explicito)[1]
+            elif tag == MEASURED_VALUE_SEQUENCE:
+                for c, d in _itens(mm, i, t, explicito):
+                    for tag_valor, _, i_valor, t_valor in _elementos(mm, c, d, explicito):
+                        if tag_valor == NUMERIC_VALUE:
+                            valor = _numero(_texto(mm, i_valor, t_valor))
+                        elif tag_valor == MEASUREMENT_UNITS_CODE_SEQUENCE:
+                            unidade = _codigo(mm, i_valor, t_valor, explicito)[0]
+                    break
+            elif tag == CONTENT_SEQUENCE:
+                filhos = _nos_sr(mm, i, t, explicito)
+        nos.append((conceito, valor, unidade, significado, filhos))
+    return nos
+
+
+def _eventos_sr(nos):
+    """Campos de cada evento de irradiação da árvore do RDSR."""
+    eventos = []
+    for conceito, _, _, _, filhos in nos:
+        if conceito == EVENTO_IRRADIACAO:
+            campos = {"filtro": []}
+            pendentes = list(filhos)
+            while pendentes:
+                codigo, valor, unidade, significado, netos = pendentes.pop(0)
+                nome = CODIGOS_EVENTO.get(codigo)
+                if nome == "filtro":
+                    campos["filtro"].append(significado)
+                elif nome == "anodo":
+                    campos.setdefault("anodo", significado)
+                elif nome is not None and nome not in campos:
+                    campos[nome] = _converter_unidade(nome, valor, unidade)
+                pendentes.extend(netos)
+            eventos.append(campos)
+        else:
+            eventos.extend(_eventos_sr(filhos))
+    return eventos
+
+
+def _converter_unidade(nome, valor, unidade):
+    """Valor na unidade usada pelo cálculo (kV, mAs, cm, mA, ms, mGy)."""
+    fatores = {
+        ("exposicao", "uA.s"): 1e-3, ("exposicao", "mA.s"): 1.0, ("exposicao", "A.s"): 1e3,
+        ("espessura", "mm"): 0.1, ("espessura", "cm"): 1.0,
+        ("tempo_exposicao", "s"): 1e3, ("dgm_informada", "dGy"): 100.0, ("dgm_informada", "Gy"): 1e3,
+    }
+    return valor * fatores.get((nome, unidade), 1.0)
+
+
+# --- Conversões ---
+
+def simbolo_material(texto):
+    """Símbolo do material (ex.: "MOLYBDENUM" ou "Molybdenum or Molybdenum compound" -> "Mo")."""
+    texto = (texto or "").strip().upper()
+    for nome, simbolo in SIMBOLOS_MATERIAIS.items():
+        if nome in texto:
+            return simbolo
+    return _SIMBOLOS.get(texto, "")
+
+
+def alvo_filtro_dicom(anodo, filtros):
+    """
+    Chave de alvo_filtro_options a partir dos materiais do anodo e do(s) filtro(s).
+    Com vários filtros, vale o primeiro que forma uma combinação conhecida; sem nenhuma, o
+    texto "alvo/filtro" é devolvido assim mesmo (e o cálculo acusa alvo/filtro inválido).
+    """
+    alvo = simbolo_material(anodo)
+    simbolos = [simbolo_material(filtro) for filtro in filtros if filtro]
+    for filtro in simbolos:
+        if f"{alvo}/{filtro}" in alvo_filtro_options:
+            return f"{alvo}/{filtro}"
+    if not alvo and not simbolos:
+        return ""
+    return f"{alvo or anodo}/{simbolos[0] if simbolos else ''}"
+
+
+def _idade(idade, nascimento, data):
+    """Idade em anos: Patient's Age (ex.: "045Y", "018M") ou nascimento e data do exame."""
+    correspondencia = re.fullmatch(r"(\d{1,3})\s*([DWMY]?)", idade or "")
+    if correspondencia:
+        numero, unidade = int(correspondencia.group(1)), correspondencia.group(2) or "Y"
+        return numero / {"D": 365.25, "W": 52.1775, "M": 12.0, "Y": 1.0}[unidade]
+    try:
+        inicio, fim = datetime.strptime(nascimento[:8], "%Y%m%d"), datetime.strptime(data[:8], "%Y%m%d")
+    except (TypeError, ValueError):
+        return np.nan
+    return float(fim.year - inicio.year - ((fim.month, fim.day) < (inicio.month, inicio.day)))
+
+
+def _data_hora(data, hora):
+    try:
+        return datetime.strptime(data[:8] + (hora or "").split(".")[0].ljust(6, "0")[:6], "%Y%m%d%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return ""
+
+
+def _iniciais(nome):
+    """Iniciais do Patient's Name ("Sobrenome^Nome^Meio" -> "NMS")."""
+    partes = nome.split("=")[0].split("^")
+    ordenadas = partes[1:3] + partes[:1]
+    return "".join(palavra[0] for parte in ordenadas for palavra in parte.split() if palavra).upper()
+
+
+# --- Leitura ---
+
+def _cabecalho(mm):
+    """Campos de CAMPOS_CABECALHO e eventos do RDSR de um arquivo mapeado."""
+    if mm[128:132] == b"DICM":
+        pos, sintaxe = 132, SINTAXE_IMPLICITA
+        while pos < len(mm):  # meta-informação (grupo 0002): sempre explícita little endian
+            tag, _, inicio, tamanho = _elemento(mm, pos, True)
+            if tag >> 16 != 0x0002:
+                break
+            if tag == SINTAXE_TRANSFERENCIA:
+                sintaxe = _texto(mm, inicio, tamanho)
+            pos = inicio + (tamanho or 0)
+    elif len(mm) >= 8 and mm[0:2] == b"\x08\x00":
+        pos, sintaxe = 0, SINTAXE_IMPLICITA  # sem preâmbulo: conjunto de dados implícito, grupo 0008
+    else:
+        raise ErroDicom("O arquivo não é DICOM.")
+    if sintaxe in SINTAXES_NAO_SUPORTADAS:
+        raise ErroDicom(f"Sintaxe de transferência não suportada ({SINTAXES_NAO_SUPORTADAS[sintaxe]}).")
+    explicito = sintaxe != SINTAXE_IMPLICITA
+
+    campos, eventos = {}, []
+    for tag, _, inicio, tamanho in _elementos(mm, pos, len(mm), explicito):
+        if tag > ULTIMA_TAG or tag >= PIXEL_DATA:
+            break
+        if tag in CAMPOS_CABECALHO:
+            campos[CAMPOS_CABECALHO[tag]] = _texto(mm, inicio, tamanho)
+        elif tag == CONTENT_SEQUENCE:
+            eventos = _eventos_sr(_nos_sr(mm, inicio, tamanho, explicito))
+            break
+    return campos, eventos
+
+
+def ler_exposicoes_dicom(caminho):
+    """
+    Exposições de um arquivo DICOM: uma por imagem, uma por evento de irradiação de um RDSR.
+    Returns:
+        list: Dicionários com as colunas de COLUNAS_DICOM (sem "Local do Mamógrafo"); vazia para
+            arquivos DICOM sem dados de exposição.
+    Raises:
+        ErroDicom: Arquivo que não é DICOM, truncado ou em sintaxe não suportada.
+    """
+    try:
+        with open(caminho, "rb") as arquivo:
+            if os.fstat(arquivo.fileno()).st_size == 0:
+                raise ErroDicom("O arquivo não é DICOM.")
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                campos, eventos = _cabecalho(mm)
+    except struct.error:
+        raise ErroDicom("Cabeçalho DICOM truncado ou corrompido.") from None
+
+    data = campos.get("data_aquisicao") or campos.get("data_estudo", "")
+    hora = campos.get("hora_aquisicao") or campos.get("hora_estudo", "")
+    comum = {
+        "Arquivo": os.fspath(caminho),
+        "Data/Hora": _data_hora(data, hora),
+        "ID Paciente": campos.get("id_paciente", ""),
+        "Iniciais Paciente": _iniciais(campos.get("nome_paciente", "")),
+        "Estação": campos.get("estacao", ""),
+        "Idade": _idade(campos.get("idade"), campos.get("nascimento"), campos.get("data_estudo") or data),
+    }
+    if not eventos:
+        if not any(nome in campos for nome in ("kv", "exposicao", "exposicao_uas", "espessura", "anodo")):
+            return []
+        eventos = [{
+            "kv": _numero(campos.get("kv")),
+            "exposicao": _numero(campos.get("exposicao_uas")) * 1e-3 if "exposicao_uas" in campos
+                         else _numero(campos.get("exposicao")),
+            "corrente": _numero(campos.get("corrente")),
+            "tempo_exposicao": _numero(campos.get("tempo_exposicao")),
+            "espessura": _numero(campos.get("espessura")) * 0.1,
+            "anodo": campos.get("anodo", ""),
+            "filtro": campos.get("filtro", "").split("\\"),
+            "dgm_informada": _numero(campos.get("dose_orgao")) * 100.0,  # Organ Dose em dGy
+        }]
+
+    exposicoes = []
+    for evento in eventos:
+        mas = evento.get("exposicao", np.nan)
+        if np.isnan(mas):
+            mas = evento.get("corrente", np.nan) * evento.get("tempo_exposicao", np.nan) / 1000
+        exposicoes.append({
+            **comum,
+            "Espessura (cm)": evento.get("espessura", np.nan),
+            "Alvo/Filtro": alvo_filtro_dicom(evento.get("anodo", ""), evento.get("filtro", [])),
+            "Kv": evento.get("kv", np.nan),
+            "mAs": mas,
+            "DGM Informada (mGy)": evento.get("dgm_informada", np.nan),
+        })
+    return exposicoes
+
+
+def arquivos_dicom(caminho):
+    """Arquivos de uma pasta (recursivamente, em ordem) ou o próprio arquivo. Ocultos são ignorados."""
+    if not os.path.isdir(caminho):
+        yield caminho
+        return
+    for raiz, pastas, arquivos in os.walk(caminho):
+        pastas[:] = sorted(p for p in pastas if not p.startswith("."))
+        for nome in sorted(arquivos):
+            if not nome.startswith("."):
+                yield os.path.join(raiz, nome)
+
+
+def _local(local, estacao):
+    if isinstance(local, dict):
+        return local.get(estacao, "")
+    return local or ""
+
+
+def ler_blocos_dicom(caminho, tamanho_bloco=TAMANHO_BLOCO_PADRAO, local=None, erros=None):
+    """
+    Exposições de um arquivo ou pasta DICOM em blocos (como dgm.arquivos.ler_blocos).
+    Args:
+        caminho (str): Arquivo ou pasta (lida recursivamente).
+        tamanho_bloco (int): Número máximo de exposições por bloco.
+        local (str ou dict, opcional): Local do mamógrafo de todas as exposições, ou um
+            dicionário {Station Name: local}; o DICOM não informa o local das tabelas Ki.
+        erros (list, opcional): Recebe (arquivo, mensagem) dos arquivos que não puderam ser lidos.
+    Yields:
+        pd.DataFrame: Blocos com as colunas de COLUNAS_DICOM.
+    """
+    linhas, inicio = [], 0
+    for arquivo in arquivos_dicom(caminho):
+        try:
+            exposicoes = ler_exposicoes_dicom(arquivo)
+        except (ErroDicom, OSError, ValueError) as e:
+            if erros is not None:
+                erros.append((arquivo, str(e)))
+            continue
+        for exposicao in exposicoes:
+            exposicao["Local do Mamógrafo"] = _local(local, exposicao["Estação"])
+            linhas.append(exposicao)
+        if len(linhas) >= tamanho_bloco:
+            bloco, linhas = linhas[:tamanho_bloco], linhas[tamanho_bloco:]
+            yield pd.DataFrame(bloco, columns=COLUNAS_DICOM, index=pd.RangeIndex(inicio, inicio + len(bloco)))
+            inicio += len(bloco)
+    if linhas:
+        yield pd.DataFrame(linhas, columns=COLUNAS_DICOM, index=pd.RangeIndex(inicio, inicio + len(linhas)))
+
+
+def ler_pasta_dicom(caminho, local=None, erros=None):
+    """Todas as exposições de um arquivo ou pasta DICOM em um DataFrame (ver ler_blocos_dicom)."""
+    blocos = list(ler_blocos_dicom(caminho, local=local, erros=erros))
+    return pd.concat(blocos) if blocos else pd.DataFrame(columns=COLUNAS_DICOM)
+
+
+def calcular_dgm_dicom(caminho, local=None, erros=None):
+    """
+    Lê as exposições de um arquivo ou pasta DICOM e calcula a DGM de todas em lote.
+    Returns:
+        pd.DataFrame: Colunas de COLUNAS_DICOM seguidas das de calcular_dgm_lote.
+    """
+    exposicoes = ler_pasta_dicom(caminho, local, erros)
+    resultado = calcular_dgm_lote(exposicoes)
+    for coluna in resultado.columns:
+        exposicoes[coluna] = resultado[coluna]
+    return exposicoes
+
+
+# --- Arquivos sintéticos (testes e benchmarks) ---
+
+def _bytes_elemento(tag, vr, valor, explicito):
+    if isinstance(valor, str):
+        valor = valor.encode("latin-1")
+    if len(valor) % 2:
+        valor += b"\x00" if vr in (b"UI", b"OB", b"UN") else b" "
+    grupo, numero = tag >> 16, tag & 0xFFFF
+    if not explicito:
+        return struct.pack("<HHI", grupo, numero, len(valor)) + valor
+    if vr in VR_LONGOS:
+        return struct.pack("<HH2sHI", grupo, numero, vr, 0, len(valor)) + valor
+    return struct.pack("<HH2sH", grupo, numero, vr, len(valor)) + valor
+
+
+def _sequencia(tag, itens, explicito):
+    """Sequência e itens de tamanho indefinido (exercita os delimitadores)."""
+    cabecalho = struct.pack("<HH2sHI", tag >> 16, tag & 0xFFFF, b"SQ", 0, 0xFFFFFFFF) if explicito \
+        else struct.pack("<HHI", tag >> 16, tag & 0xFFFF, 0xFFFFFFFF)
+    corpo = b"".join(struct.pack("<HHI", 0xFFFE, 0xE000, 0xFFFFFFFF) + item + struct.pack("<HHI", 0xFFFE, 0xE00D, 0)
+                     for item in itens)
+    return cabecalho + corpo + struct.pack("<HHI", 0xFFFE, 0xE0DD, 0)
+
+
+def _arquivo_dicom(destino, elementos, implicito, classe_sop):
+    """Grava preâmbulo, meta-informação e os elementos (tag, VR, valor bytes), em ordem de tag."""
+    sintaxe = SINTAXE_IMPLICITA if implicito else "1.2.840.10008.1.2.1"
+    meta = (_bytes_elemento(0x00020001, b"OB", b"\x00\x01", True)
+            + _bytes_elemento(0x00020002, b"UI", classe_sop, True)
+            + _bytes_elemento(0x00020010, b"UI", sintaxe, True))
+    meta = _bytes_elemento(0x00020000, b"UL", struct.pack("<I", len(meta)), True) + meta
+    corpo = b"".join(valor if vr == b"SQ" else _bytes_elemento(tag, vr, valor, not implicito)
+                     for tag, vr, valor in sorted(elementos, key=lambda elemento: elemento[0]))
+    with open(destino, "wb") as arquivo:
+        arquivo.write(b"\x00" * 128 + b"DICM" + meta + corpo)
+
+
+def _identificacao(id_paciente, nome_paciente, idade, data_hora, estacao, modalidade):
+    data_hora = data_hora or datetime(2024, 1, 1, 8, 0, 0)
+    elementos = [
+        (0x00080020, b"DA", data_hora.strftime("%Y%m%d")),
+        (0x00080030, b"TM", data_hora.strftime("%H%M%S")),
+        (0x00080060, b"CS", modalidade),
+        (0x00081010, b"SH", estacao),
+        (0x00100010, b"PN", nome_paciente),
+        (0x00100020, b"LO", id_paciente),
+    ]
+    if idade is not None:
+        elementos.append((0x00101010, b"AS", f"{int(idade):03d}Y"))
+    return elementos
+
+
+def gravar_imagem_sintetica(destino, *, kv, mas, espessura, alvo_filtro="Mo/Mo", idade=None, id_paciente="",
+                            nome_paciente="", data_hora=None, estacao="", dose_orgao=None, bytes_pixels=0,
+                            implicito=False):
+    """
+    Grava uma imagem de mamografia DICOM mínima (para testes e benchmarks).
+    Args:
+        espessura (float): Espessura em cm (gravada em mm).
+        alvo_filtro (str): Chave de alvo_filtro_options (gravada como materiais, ex.: MOLYBDENUM).
+        dose_orgao (float, opcional): Organ Dose em dGy.
+        bytes_pixels (int): Tamanho dos pixels (zeros) após o cabeçalho.
+        implicito (bool): Sintaxe implícita little endian (padrão: explícita).
+    """
+    alvo, _, filtro = alvo_filtro.partition("/")
+    elementos = _identificacao(id_paciente, nome_paciente, idade, data_hora, estacao, "MG") + [
+        (0x00180060, b"DS", f"{kv:g}"),
+        (0x00181153, b"IS", f"{round(mas * 1000)}"),
+        (0x00181191, b"CS", NOMES_MATERIAIS.get(alvo, alvo)),
+        (0x001811A0, b"DS", f"{espessura * 10:g}"),
+        (0x00187050, b"CS", NOMES_MATERIAIS.get(filtro, filtro)),
+        (0x00280010, b"US", struct.pack("<H", 1)),
+        (0x7FE00010, b"OW", b"\x00" * bytes_pixels),
+    ]
+    if dose_orgao is not None:
+        elementos.append((0x00400316, b"DS", f"{dose_orgao:g}"))
+    _arquivo_dicom(destino, elementos, implicito, "1.2.840.10008.5.1.4.1.1.1.2")
+
+
+def _item_sr(codigo, significado, explicito, valor=None, unidade=None, codigo_valor=None, filhos=None):
+    def codigo_item(valor_codigo, texto, esquema="DCM"):
+        return (_bytes_elemento(CODE_VALUE, b"SH", valor_codigo, explicito)
+                + _bytes_elemento(0x00080102, b"SH", esquema, explicito)
+                + _bytes_elemento(CODE_MEANING, b"LO", texto, explicito))
+
+    tipo = "CONTAINER" if filhos is not None else "NUM" if valor is not None else "CODE"
+    item = _bytes_elemento(0x0040A040, b"CS", tipo, explicito)
+    item += _sequencia(CONCEPT_NAME_CODE_SEQUENCE, [codigo_item(codigo, significado)], explicito)
+    if codigo_valor is not None:
+        item += _sequencia(CONCEPT_CODE_SEQUENCE, [codigo_item("", codigo_valor, "SRT")], explicito)
+    if valor is not None:
+        medida = _sequencia(MEASUREMENT_UNITS_CODE_SEQUENCE, [codigo_item(unidade, unidade, "UCUM")], explicito)
+        medida += _bytes_elemento(NUMERIC_VALUE, b"DS", f"{valor:g}", explicito)
+        item += _sequencia(MEASURED_VALUE_SEQUENCE, [medida], explicito)
+    if filhos is not None:
+        item += _sequencia(CONTENT_SEQUENCE, filhos, explicito)
+    return item
+
+
+def gravar_sr_sintetico(destino, eventos, *, idade=None, id_paciente="", nome_paciente="", data_hora=None,
+                        estacao="", implicito=False):
+    """
+    Grava um relatório estruturado de dose (RDSR) mínimo com um evento de irradiação por exposição.
+    Args:
+        eventos (list): Dicionários com kv, mas, espessura (cm), alvo_filtro e, opcionalmente, dgm (mGy).
+    """
+    explicito = not implicito
+    itens_eventos = []
+    for evento in eventos:
+        alvo, _, filtro = evento["alvo_filtro"].partition("/")
+        filhos = [
+            _item_sr("111633", "Compression Thickness", explicito, valor=evento["espessura"] * 10, unidade="mm"),
+            _item_sr("113733", "KVP", explicito, valor=evento["kv"], unidade="kV"),
+            _item_sr("113736", "Exposure", explicito, valor=evento["mas"] * 1000, unidade="uA.s"),
+            _item_sr("111632", "Anode Target Material", explicito,
+                     codigo_valor=f"{NOMES_MATERIAIS.get(alvo, alvo).title()} or {NOMES_MATERIAIS.get(alvo, alvo).title()} compound"),
+            _item_sr("113771", "X-Ray Filters", explicito, filhos=[
+                _item_sr("113757", "X-Ray Filter Material", explicito,
+                         codigo_valor=f"{NOMES_MATERIAIS.get(filtro, filtro).title()} or {NOMES_MATERIAIS.get(filtro, filtro).title()} compound"),
+            ]),
+        ]
+        if evento.get("dgm") is not None:
+            filhos.append(_item_sr("111631", "Average Glandular Dose", explicito, valor=evento["dgm"], unidade="mGy"))
+        itens_eventos.append(_item_sr(EVENTO_IRRADIACAO, "Irradiation Event X-Ray Data", explicito, filhos=filhos))
+    conteudo = _sequencia(CONTENT_SEQUENCE, itens_eventos, explicito)
+    elementos = _identificacao(id_paciente, nome_paciente, idade, data_hora, estacao, "SR") + [
+        (0x0040A040, b"CS", "CONTAINER"),
+        (CONTENT_SEQUENCE, b"SQ", conteudo),
+    ]
+    _arquivo_dicom(destino, elementos, implicito, "1.2.840.10008.5.1.4.1.1.88.67")
@@ -0,0 +1,262 @@
+"""
+Estatísticas para níveis de referência em diagnóstico (DRL), calculadas de forma incremental.
+
+A DGM é agrupada por local do mamógrafo, alvo/filtro e faixa de espessura comprimida. Cada
+grupo guarda:
+    - um esboço de quantis KLL (Karnin, Lang e Liberty, 2016), com memória limitada e erro de
+      posto de cerca de 1% para k = 256, do qual saem mediana e percentil 75;
+    - contagem, média e soma dos quadrados dos desvios (Welford), mínimo e máximo.
+Os dois podem ser mesclados, então lotes calculados em paralelo (ou arquivos processados em
+blocos) são combinados sem reler os dados, e a tabela de DRL é obtida sem ordenar o conjunto
+inteiro.
+
+AgregadorDRL.sincronizar(historico) lê do histórico só as linhas incluídas desde a última
+sincronização (pelo id do SQLite) e recomeça do zero quando o histórico foi limpo desde então
+(contador HistoricoDGM.limpezas, já que o SQLite reaproveita os ids apagados), de modo que a interface mostra a tabela atualizada sem
+percorrer o histórico a cada execução.
+"""
+import math
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Parâmetro de precisão do esboço KLL (capacidade do nível mais alto)
+K_PADRAO = 256
+# Limites das faixas de espessura (cm): [limite_i, limite_i+1)
+LIMITES_ESPESSURA_DRL = (2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0)
+COLUNAS_DRL = ["Local do Mamógrafo", "Alvo/Filtro", "Espessura (cm)", "DGM (mGy)"]
+COLUNAS_TABELA_DRL = ["Local do Mamógrafo", "Alvo/Filtro", "Faixa de espessura", "Exposições", "Média (mGy)",
+                      "Desvio Padrão (mGy)", "Mediana (mGy)", "P75 (mGy)", "Mínimo (mGy)", "Máximo (mGy)"]
+
+
+def rotulos_faixas(limites=LIMITES_ESPESSURA_DRL):
+    """Rótulos das faixas definidas por `limites` ("< 2 cm", "2–3 cm", ..., "≥ 10 cm")."""
+    formatar = lambda v: f"{v:g}"
+    return ([f"< {formatar(limites[0])} cm"]
+            + [f"{formatar(a)}–{formatar(b)} cm" for a, b in zip(limites[:-1], limites[1:])]
+            + [f"≥ {formatar(limites[-1])} cm"])
+
+
+class SketchKLL:
+    """Esboço de quantis KLL: níveis de amostras compactadas, o nível h com peso 2**h."""
+
+    def __init__(self, k=K_PADRAO, semente=None):
+        self.k = k
+        self.niveis = [np.empty(0)]
+        self.n = 0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+        self._rng = np.random.default_rng(semente)
+
+    def _capacidade(self, nivel):
+        return max(2, math.ceil(self.k * (2 / 3) ** (len(self.niveis) - 1 - nivel)))
+
+    def _compactar(self):
+        while sum(len(nivel) for nivel in self.niveis) > sum(self._capacidade(h) for h in range(len(self.niveis))):
+            h = next(h for h in range(len(self.niveis)) if len(self.niveis[h]) >= self._capacidade(h))
+            if h + 1 == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            nivel = np.sort(self.niveis[h])
+            resto = nivel[len(nivel) - len(nivel) % 2:]  # com tamanho ímpar, o maior item fica no nível
+            pares = nivel[:len(nivel) - len(nivel) % 2]
+            # Metade dos itens (posições pares ou ímpares, ao acaso) sobe com o dobro do peso
+            self.niveis[h + 1] = np.concatenate([self.niveis[h + 1], pares[int(self._rng.integers(2))::2]])
+            self.niveis[h] = resto
+
+    def adicionar(self, valores):
+        valores = np.asarray(valores, dtype=float).ravel()
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return
+        self.n += len(valores)
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+        self.niveis[0] = np.concatenate([self.niveis[0], valores])
+        self._compactar()
+
+    def mesclar(self, outro):
+        for h, nivel in enumerate(outro.niveis):
+            if h == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            self.niveis[h] = np.concatenate([self.niveis[h], nivel])
+        self.n += outro.n
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        self._compactar()
+
+    def quantis(self, qs):
+        """Quantis estimados para as probabilidades `qs` (NaN com o esboço vazio)."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=float))
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        itens = np.concatenate(self.niveis)
+        pesos = np.concatenate([np.full(len(nivel), 2.0**h) for h, nivel in enumerate(self.niveis)])
+        ordem = np.argsort(itens, kind="stable")
+        itens, acumulado = itens[ordem], np.cumsum(pesos[ordem])
+        posicoes = np.searchsorted(acumulado, qs * acumulado[-1], side="left")
+        resultado = itens[np.minimum(posicoes, len(itens) - 1)]
+        resultado = np.where(qs <= 0, self.minimo, np.where(qs >= 1, self.maximo, resultado))
+        return np.clip(resultado, self.minimo, self.maximo)
+
+    def tamanho(self):
+        """Número de itens guardados (a memória do esboço)."""
+        return sum(len(nivel) for nivel in self.niveis)
+
+
+class EstatisticasGrupo:
+    """Contagem, média, variância (Welford/Chan), extremos e esboço de quantis de um grupo."""
+
+    def __init__(self, k=K_PADRAO, semente=None):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.sketch = SketchKLL(k, semente)
+
+    def adicionar(self, valores):
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores)]
+        if len(valores):
+            self._combinar(len(valores), float(valores.mean()), float(((valores - valores.mean())**2).sum()))
+            self.sketch.adicionar(valores)
+
+    def _combinar(self, n, media, m2):
+        total = self.n + n
+        delta = media - self.media
+        self.media += delta * n / total
+        self.m2 += m2 + delta**2 * self.n * n / total
+        self.n = total
+
+    def mesclar(self, outro):
+        if outro.n:
+            self._combinar(outro.n, outro.media, outro.m2)
+            self.sketch.mesclar(outro.sketch)
+
+    def desvio_padrao(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else math.nan
+
+
+class AgregadorDRL:
+    """
+    Estatísticas de DGM por (local, alvo/filtro, faixa de espessura), atualizadas por lotes
+    (adicionar), combinadas entre processos (mesclar) ou lidas do histórico (sincronizar).
+    """
+
+    def __init__(self, limites_espessura=LIMITES_ESPESSURA_DRL, k=K_PADRAO, semente=0):
+        self.limites_espessura = tuple(limites_espessura)
+        self.rotulos = rotulos_faixas(self.limites_espessura)
+        self.k = k
+        self.semente = semente
+        self.grupos = {}
+        self.ultimo_id = 0  # último id do histórico já incorporado
+        self.limpezas_historico = None  # HistoricoDGM.limpezas() na última sincronização
+        self._trava = threading.Lock()
+
+    def _grupo(self, chave):
+        grupo = self.grupos.get(chave)
+        if grupo is None:
+            # Semente derivada da chave: o resultado não depende da ordem em que os grupos aparecem
+            semente = None if self.semente is None else [self.semente, zlib.crc32(repr(chave).encode())]
+            grupo = self.grupos[chave] = EstatisticasGrupo(self.k, semente)
+        return grupo
+
+    def adicionar(self, resultados):
+        """
+        Incorpora exposições calculadas (DataFrame com as colunas de COLUNAS_DRL; linhas com
+        erro ou sem DGM são ignoradas).
+        """
+        dados = resultados[COLUNAS_DRL]
+        if "Erro" in resultados.columns:
+            dados = dados[(resultados["Erro"] == "").to_numpy()]
+        dgm = pd.to_numeric(dados["DGM (mGy)"], errors="coerce").to_numpy(dtype=float)
+        espessura = pd.to_numeric(dados["Espessura (cm)"], errors="coerce").to_numpy(dtype=float)
+        validas = ~np.isnan(dgm) & ~np.isnan(espessura)
+        if not validas.any():
+            return
+        faixa = np.searchsorted(self.limites_espessura, espessura[validas], side="right")
+        chaves = pd.DataFrame({
+            "local": dados["Local do Mamógrafo"].to_numpy()[validas].astype(str),
+            "alvo": dados["Alvo/Filtro"].to_numpy()[validas].astype(str),
+            "faixa": faixa,
+        })
+        codigos, unicos = pd.MultiIndex.from_frame(chaves).factorize()
+        dgm = dgm[validas]
+        ordem = np.argsort(codigos, kind="stable")
+        limites = np.flatnonzero(np.diff(codigos[ordem])) + 1
+        with self._trava:
+            for posicoes in np.split(ordem, limites):
+                local, alvo, faixa = unicos[codigos[posicoes[0]]]
+                self._grupo((str(local), str(alvo), int(faixa))).adicionar(dgm[posicoes])
+
+    def __getstate__(self):
+        # A trava não é serializável; o agregador pode ser devolvido por processos (pickle)
+        estado = self.__dict__.copy()
+        del estado["_trava"]
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._trava = threading.Lock()
+
+    def mesclar(self, outro):
+        """Soma ao agregador as estatísticas de outro (ex.: calculado em outro processo)."""
+        if outro.limites_espessura != self.limites_espessura:
+            raise ValueError("Os agregadores usam faixas de espessura diferentes.")
+        with self._trava:
+            for chave, grupo in outro.grupos.items():
+                self._grupo(chave).mesclar(grupo)
+
+    def limpar(self):
+        with self._trava:
+            self.grupos = {}
+            self.ultimo_id = 0
+            self.limpezas_historico = None
+
+    def sincronizar(self, historico, dono=None):
+        """
+        Incorpora as linhas incluídas no histórico desde a última sincronização.
+        Se o histórico foi limpo desde então, recomeça do zero.
+        Args:
+            dono (str, opcional): Considera só as linhas desse dono (ver dgm.historico).
+        Returns:
+            int: Linhas lidas do histórico.
+        """
+        limpezas = historico.limpezas()
+        if limpezas != self.limpezas_historico or historico.ultimo_id(dono=dono) < self.ultimo_id:
+            self.limpar()
+        self.limpezas_historico = limpezas
+        lidas = 0
+        for ultimo_id, bloco in historico.iterar_novos(self.ultimo_id, COLUNAS_DRL, dono=dono):
+            self.adicionar(bloco)
+            self.ultimo_id = ultimo_id
+            lidas += len(bloco)
+        return lidas
+
+    def tabela(self, minimo_exposicoes=1):
+        """
+        Tabela de DRL: uma linha por grupo com pelo menos `minimo_exposicoes` exposições.
+        Returns:
+            pd.DataFrame: Colunas de COLUNAS_TABELA_DRL, ordenadas por local, alvo/filtro e faixa.
+        """
+        with self._trava:
+            itens = sorted(self.grupos.items())
+            linhas = []
+            for (local, alvo, faixa), grupo in itens:
+                if grupo.n < minimo_exposicoes:
+                    continue
+                mediana, p75 = grupo.sketch.quantis([0.5, 0.75])
+                linhas.append([local, alvo, self.rotulos[faixa], grupo.n, grupo.media, grupo.desvio_padrao(),
+                               mediana, p75, grupo.sketch.minimo, grupo.sketch.maximo])
+        return pd.DataFrame(linhas, columns=COLUNAS_TABELA_DRL)
+
+
+def mesclar_agregadores(agregadores):
+    """Combina uma lista de agregadores (ex.: um por processo) em um novo."""
+    agregadores = list(agregadores)
+    if not agregadores:
+        return AgregadorDRL()
+    resultado = AgregadorDRL(agregadores[0].limites_espessura, agregadores[0].k, agregadores[0].semente)
+    for agregador in agregadores:
+        resultado.mesclar(agregador)
+    return resultado
@@ -0,0 +1,167 @@
+"""
+Exportação do histórico em CSV, Parquet, Feather e XLSX, com cache pela versão do histórico.
+
+Todos os formatos percorrem o banco em blocos (HistoricoDGM.iterar_blocos), sem montar um
+DataFrame com o histórico inteiro: Parquet e Feather gravam um grupo de linhas / lote Arrow
+por bloco e o XLSX usa o modo write-only do openpyxl.
+
+O arquivo gerado fica guardado pela chave (versão do histórico, formato, filtros). A versão é
+um contador gravado no próprio banco e incrementado a cada gravação ou limpeza, por qualquer
+instância ou processo (HistoricoDGM.versao), então verificar o cache exige só uma consulta de
+uma linha, sem ler nem comparar o conteúdo; ao mudar a versão, as exportações antigas são
+descartadas.
+
+Parquet e Feather precisam do pyarrow (já instalado com o Streamlit).
+"""
+import io
+import threading
+from collections import OrderedDict
+
+from dgm.historico import COLUNAS_BANCO, COLUNAS_HISTORICO, _TIPOS_COLUNA
+
+# formato -> (extensão, tipo MIME)
+FORMATOS_EXPORTACAO = {
+    "csv": (".csv", "text/csv"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "feather": (".feather", "application/vnd.apache.arrow.file"),
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Exportações guardadas ao mesmo tempo (combinações de formato e filtros da versão atual)
+MAX_EXPORTACOES_EM_CACHE = 4
+
+
+def _esquema_arrow():
+    import pyarrow as pa
+
+    tipos = {"TEXT": pa.string(), "INTEGER": pa.int64()}
+    return pa.schema([(nome, tipos.get(_TIPOS_COLUNA.get(coluna), pa.float64())) for nome, coluna in COLUNAS_BANCO])
+
+
+def _lote_arrow(linhas, esquema):
+    """Converte uma lista de tuplas do banco em um RecordBatch com o esquema do histórico."""
+    import pyarrow as pa
+
+    colunas = list(zip(*linhas))
+    arrays = []
+    for valores, campo in zip(colunas, esquema):
+        try:
+            arrays.append(pa.array(valores, type=campo.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            # Valores de outro tipo gravados na coluna (ex.: "" em uma coluna numérica) viram nulos
+            arrays.append(pa.array([_converter(valor, campo.type) for valor in valores], type=campo.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=esquema)
+
+
+def _converter(valor, tipo):
+    import pyarrow as pa
+
+    if valor is None:
+        return None
+    if pa.types.is_string(tipo):
+        return str(valor)
+    try:
+        return int(valor) if pa.types.is_integer(tipo) else float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _exportar_parquet(historico, destino, filtros):
+    import pyarrow.parquet as pq
+
+    esquema = _esquema_arrow()
+    with pq.ParquetWriter(destino, esquema, compression="zstd") as escritor:
+        for linhas in historico.iterar_blocos(**filtros):
+            escritor.write_batch(_lote_arrow(linhas, esquema))
+
+
+def _exportar_feather(historico, destino, filtros):
+    import pyarrow.ipc as ipc
+
+    # Feather versão 2 é o formato de arquivo IPC do Arrow
+    esquema = _esquema_arrow()
+    with ipc.new_file(destino, esquema, options=ipc.IpcWriteOptions(compression="lz4")) as escritor:
+        for linhas in historico.iterar_blocos(**filtros):
+            escritor.write_batch(_lote_arrow(linhas, esquema))
+
+
+def _exportar_xlsx(historico, destino, filtros):
+    import openpyxl
+
+    livro = openpyxl.Workbook(write_only=True)
+    folha = livro.create_sheet("Histórico DGM")
+    folha.append(COLUNAS_HISTORICO)
+    for linhas in historico.iterar_blocos(**filtros):
+        for linha in linhas:
+            folha.append(linha)
+    livro.save(destino)
+
+
+def exportar_historico(historico, formato="csv", destino=None, **filtros):
+    """
+    Grava o histórico (ou a parte selecionada pelos filtros) no formato pedido.
+    Args:
+        historico (HistoricoDGM): Histórico a exportar.
+        formato (str): Uma das chaves de FORMATOS_EXPORTACAO.
+        destino (arquivo binário, opcional): Onde gravar; por padrão um io.BytesIO.
+        **filtros: Como em HistoricoDGM.pagina (id_paciente, local, data_inicio, data_fim).
+    Returns:
+        O arquivo de destino, rebobinado para o início.
+    """
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação inválido: {formato} (use {', '.join(FORMATOS_EXPORTACAO)}).")
+    if destino is None:
+        destino = io.BytesIO()
+    if formato == "csv":
+        return historico.exportar_csv(destino, **filtros)
+    {"parquet": _exportar_parquet, "feather": _exportar_feather, "xlsx": _exportar_xlsx}[formato](historico, destino, filtros)
+    destino.seek(0)
+    return destino
+
+
+class CacheExportacao:
+    """Exportações já geradas, indexadas pela versão do histórico, formato e filtros."""
+
+    def __init__(self, max_entradas=MAX_EXPORTACOES_EM_CACHE):
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, historico, formato="csv", **filtros):
+        """Conteúdo (bytes) da exportação, gerado só se o histórico mudou desde a última vez."""
+        versao = historico.versao
+        chave = (id(historico), versao, formato, tuple(sorted((nome, valor) for nome, valor in filtros.items() if valor)))
+        with self._trava:
+            conteudo = self._dados.get(chave)
+            if conteudo is not None:
+                self._dados.move_to_end(chave)
+                self.acertos += 1
+                return conteudo
+            self.falhas += 1
+
+        conteudo = exportar_historico(historico, formato, **filtros).getvalue()
+        with self._trava:
+            # Exportações de versões anteriores do mesmo histórico não serão mais pedidas
+            for antiga in [c for c in self._dados if c[0] == chave[0] and c[1] != versao]:
+                del self._dados[antiga]
+            # Se o histórico mudou durante a exportação, o resultado não é guardado
+            if historico.versao == versao and self.max_entradas > 0:
+                self._dados[chave] = conteudo
+                while len(self._dados) > self.max_entradas:
+                    self._dados.popitem(last=False)
+        return conteudo
+
+    def limpar(self):
+        with self._trava:
+            self._dados.clear()
+            self.acertos = self.falhas = 0
+
+
+CACHE_EXPORTACAO = CacheExportacao()
+
+
+def exportar_historico_em_cache(historico, formato="csv", **filtros):
+    """Bytes da exportação do histórico, reaproveitados enquanto a versão do histórico não mudar."""
+    return CACHE_EXPORTACAO.obter(historico, formato, **filtros)
@@ -0,0 +1,527 @@
+"""
+Consumidor contínuo de exposições (asyncio): calcula a DGM à medida que as exposições chegam.
+
+Fontes de eventos (uma exposição por linha, em JSON, com os campos aceitos por dgm.servidor):
+    socket   conexões TCP locais (--porta); várias fontes podem enviar ao mesmo tempo.
+    arquivo  acompanha um arquivo que cresce (--arquivo), como "tail -f"; recomeça do início
+             se o arquivo for truncado ou substituído.
+
+Além dos campos da exposição, cada evento pode ter "id_paciente", "iniciais", "data_hora"
+("AAAA-MM-DD HH:MM:SS"; padrão: a hora do cálculo) e "enviado_em" (time.time() de quem gerou
+o evento), de onde se mede a latência de ponta a ponta; sem ele, a latência conta da chegada.
+
+Os eventos válidos entram em uma fila limitada (fila_maxima). Com a política "bloquear"
+(padrão), a fila cheia para a leitura da fonte: o socket deixa de ser lido e o próprio TCP
+segura quem envia; o arquivo fica à espera. Com "descartar", o evento que não cabe na fila é
+descartado e contado.
+
+Um único laço tira micro-lotes da fila: tudo o que estiver nela, até o limite do lote; com a
+fila vazia, espera espera_ms por mais eventos antes de calcular. Cada lote é calculado por
+calcular_dgm_lote e gravado no histórico (HistoricoDGM.adicionar_varias, só as linhas sem
+erro) em uma thread, sem parar a leitura; o que chega nesse meio tempo forma o lote seguinte,
+que cresce sozinho com a carga. Se o lote falhar inteiro, é refeito evento a evento: só os
+eventos que falham de novo são perdidos (contados em "falhas"). O limite do lote segue o SLO de latência (slo_ms): cai pela
+metade quando um lote leva mais que metade do SLO e volta a dobrar, até lote_maximo, quando um
+lote cheio leva menos de um quarto.
+
+ConsumidorFluxo.metricas() (impressa em JSON a cada --relatorio-s) traz a latência de ponta a
+ponta p50/p95/p99 até a gravação no histórico, a fração dentro do SLO, a profundidade atual e
+máxima da fila, os eventos recebidos, inválidos, descartados, calculados e com erro, e o
+tamanho dos lotes.
+
+O gerador ("gerar") envia exposições sintéticas a uma taxa constante ao socket ou ao arquivo,
+para testes de carga (ver também benchmarks/bench_fluxo.py).
+
+Uso:
+    python -m dgm.fluxo consumir --porta 8766 --historico fluxo.sqlite3
+    python -m dgm.fluxo consumir --arquivo eventos.jsonl --politica descartar
+    python -m dgm.fluxo gerar --porta 8766 --taxa 2000 --duracao 30
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from dgm.calibracao import calibracao_ativa
+from dgm.historico import HistoricoDGM
+from dgm.lote import calcular_dgm_lote
+from dgm.servidor import ErroRequisicao, EstatisticasLatencia, normalizar_exposicao, tabela_exposicoes
+
+# Capacidade da fila, tamanho máximo do micro-lote, espera com a fila vazia (ms) e SLO de latência (ms)
+FILA_MAXIMA_PADRAO = int(os.environ.get("DGM_FLUXO_FILA_MAX", "20000"))
+LOTE_MAXIMO_PADRAO = int(os.environ.get("DGM_FLUXO_LOTE_MAX", "4096"))
+ESPERA_MS_PADRAO = float(os.environ.get("DGM_FLUXO_ESPERA_MS", "5"))
+SLO_MS_PADRAO = float(os.environ.get("DGM_FLUXO_SLO_MS", "250"))
+PORTA_PADRAO = 8766
+POLITICAS = ("bloquear", "descartar")
+# Menor limite a que o ajuste pelo SLO reduz o micro-lote
+LOTE_MINIMO = 16
+# Intervalo entre leituras do arquivo acompanhado quando não há linhas novas (s)
+INTERVALO_ARQUIVO = 0.02
+# Tamanho máximo de uma linha (evento) no socket
+LIMITE_LINHA = 64 * 1024
+
+# Campos de identificação do evento -> coluna do histórico
+CAMPOS_EVENTO = {"id_paciente": "ID Paciente", "iniciais": "Iniciais Paciente", "data_hora": "Data/Hora"}
+
+
+def ler_evento(linha, recebido_em):
+    """
+    Interpreta uma linha JSON de evento.
+    Returns:
+        tuple: (exposição normalizada, identificação {coluna do histórico: texto}, instante de envio)
+    Raises:
+        ErroRequisicao: JSON inválido, campos obrigatórios ausentes ou de tipo inválido.
+    """
+    try:
+        dados = json.loads(linha)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ErroRequisicao(f"JSON inválido: {e}")
+    if not isinstance(dados, dict):
+        raise ErroRequisicao("Cada evento deve ser um objeto JSON.")
+    for campo in CAMPOS_EVENTO:
+        valor = dados.get(campo)
+        if isinstance(valor, (list, dict, bool)):
+            raise ErroRequisicao(f"Campo {campo!r} deve ser texto ou número (recebido {type(valor).__name__}).")
+    identificacao = {coluna: str(dados.pop(campo)) for campo, coluna in CAMPOS_EVENTO.items()
+                     if dados.get(campo) is not None}
+    enviado_em = dados.pop("enviado_em", None)
+    if isinstance(enviado_em, bool) or not isinstance(enviado_em, (int, float)):
+        enviado_em = recebido_em
+    return normalizar_exposicao(dados), identificacao, float(enviado_em)
+
+
+def calcular_e_gravar(historico, eventos):
+    """
+    Calcula um micro-lote de eventos (ver ler_evento) e grava no histórico as linhas sem erro.
+    Returns:
+        np.ndarray: True para cada evento calculado sem erro.
+    """
+    resultado = calcular_dgm_lote(tabela_exposicoes([linha for linha, _, _ in eventos]))
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for coluna in CAMPOS_EVENTO.values():
+        padrao = agora if coluna == "Data/Hora" else ""
+        resultado[coluna] = [identificacao.get(coluna, padrao) for _, identificacao, _ in eventos]
+    validas = (resultado["Erro"] == "").to_numpy()
+    if historico is not None and validas.any():
+        historico.adicionar_varias(resultado[validas])
+    return validas
+
+
+def calcular_e_gravar_isolados(historico, eventos):
+    """
+    Como calcular_e_gravar, mas evento a evento, para quando o lote inteiro falhou.
+    Returns:
+        tuple: (np.ndarray com True para cada evento calculado sem erro,
+                lista com a exceção de cada evento que falhou de novo, ou None).
+    """
+    validas = np.zeros(len(eventos), dtype=bool)
+    erros = [None] * len(eventos)
+    for posicao, evento in enumerate(eventos):
+        try:
+            validas[posicao] = calcular_e_gravar(historico, [evento])[0]
+        except Exception as e:
+            erros[posicao] = e
+    return validas, erros
+
+
+def _arquivo_trocado(caminho, arquivo):
+    """O arquivo acompanhado foi removido, truncado ou substituído por outro?"""
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return True
+    return info.st_ino != os.fstat(arquivo.fileno()).st_ino or info.st_size < arquivo.tell()
+
+
+class ConsumidorFluxo:
+    """Fila limitada + micro-lotes adaptativos + gravação no histórico (ver o docstring do módulo)."""
+
+    def __init__(self, historico=None, fila_maxima=FILA_MAXIMA_PADRAO, lote_maximo=LOTE_MAXIMO_PADRAO,
+                 espera_ms=ESPERA_MS_PADRAO, slo_ms=SLO_MS_PADRAO, politica="bloquear"):
+        """
+        Args:
+            historico (HistoricoDGM, opcional): Onde gravar os resultados (None: só calcula).
+            fila_maxima (int): Eventos que cabem na fila.
+            lote_maximo (int): Eventos por micro-lote.
+            espera_ms (float): Espera por mais eventos quando a fila esvazia.
+            slo_ms (float): Meta de latência de ponta a ponta; guia o tamanho dos lotes.
+            politica (str): "bloquear" (contrapressão na fonte) ou "descartar" (com a fila cheia).
+        """
+        if fila_maxima < 1 or lote_maximo < 1 or espera_ms < 0 or slo_ms <= 0:
+            raise ValueError("fila_maxima e lote_maximo devem ser >= 1, espera_ms >= 0 e slo_ms > 0.")
+        if politica not in POLITICAS:
+            raise ValueError(f"Política desconhecida: {politica!r}. Opções: {POLITICAS}")
+        self.historico = historico
+        self.fila = asyncio.Queue(fila_maxima)
+        self.lote_maximo = lote_maximo
+        self.limite_lote = lote_maximo
+        self.espera = espera_ms / 1e3
+        self.slo = slo_ms / 1e3
+        self.politica = politica
+        # Uma thread: um micro-lote por vez, e as gravações no histórico em ordem
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dgm-fluxo")
+        self.latencias = EstatisticasLatencia()
+        self.recebidos = 0
+        self.invalidos = 0
+        self.descartados = 0
+        self.falhas = 0          # eventos que falharam também sozinhos (ex.: histórico inacessível)
+        self.lotes_refeitos = 0  # lotes que falharam inteiros e foram refeitos evento a evento
+        self.ultimo_erro = None
+        self.fila_maxima_observada = 0
+        self.lotes = 0
+        self.maior_lote = 0
+        self.inicio = time.perf_counter()
+        self._servidores = []
+        self._tarefas = []
+        self._conexoes = set()
+        self._consumidor = None
+
+    # --- Entrada ---
+
+    async def receber(self, linha):
+        """Põe um evento (linha JSON) na fila; com a fila cheia, espera ou descarta conforme a política."""
+        recebido_em = time.time()
+        self.recebidos += 1
+        try:
+            evento = ler_evento(linha, recebido_em)
+        except ErroRequisicao:
+            self.invalidos += 1
+            return False
+        if self.politica == "descartar":
+            try:
+                self.fila.put_nowait(evento)
+            except asyncio.QueueFull:
+                self.descartados += 1
+                return False
+        else:
+            await self.fila.put(evento)
+        self.fila_maxima_observada = max(self.fila_maxima_observada, self.fila.qsize())
+        return True
+
+    async def ouvir_socket(self, host="127.0.0.1", porta=PORTA_PADRAO):
+        """Aceita conexões TCP com eventos; com porta 0, devolve a porta escolhida pelo sistema."""
+        servidor = await asyncio.start_server(self._atender, host, porta, limit=LIMITE_LINHA)
+        self._servidores.append(servidor)
+        return servidor.sockets[0].getsockname()[1]
+
+    async def _atender(self, leitor, escritor):
+        tarefa = asyncio.current_task()
+        self._conexoes.add(tarefa)
+        try:
+            while linha := await leitor.readline():
+                if linha.strip():
+                    await self.receber(linha)
+        except (ConnectionError, ValueError):  # ValueError: linha maior que LIMITE_LINHA
+            pass
+        except asyncio.CancelledError:  # encerrar() com a conexão parada na fila cheia
+            pass
+        finally:
+            self._conexoes.discard(tarefa)
+            escritor.close()
+
+    def acompanhar_arquivo(self, caminho, desde_inicio=False):
+        """Começa a acompanhar um arquivo de eventos (só as linhas novas, salvo desde_inicio)."""
+        self._tarefas.append(asyncio.get_running_loop().create_task(self._acompanhar(Path(caminho), desde_inicio)))
+
+    async def _acompanhar(self, caminho, desde_inicio):
+        while True:
+            while not caminho.exists():
+                desde_inicio = True  # arquivo criado depois: tudo nele é novo
+                await asyncio.sleep(INTERVALO_ARQUIVO)
+            with open(caminho, "rb") as arquivo:
+                if not desde_inicio:
+                    arquivo.seek(0, os.SEEK_END)
+                desde_inicio = True  # um arquivo novo ou truncado é lido desde o começo
+                parcial = b""
+                while True:
+                    linha = arquivo.readline()
+                    if linha:
+                        parcial += linha
+                        if parcial.endswith(b"\n"):  # sem "\n": linha ainda sendo escrita
+                            if parcial.strip():
+                                await self.receber(parcial)
+                            parcial = b""
+                        continue
+                    if _arquivo_trocado(caminho, arquivo):
+                        break
+                    await asyncio.sleep(INTERVALO_ARQUIVO)
+
+    # --- Micro-lotes ---
+
+    def iniciar(self):
+        """Inicia o laço que calcula os micro-lotes (dentro de um laço de eventos em execução)."""
+        if self._consumidor is None:
+            self._consumidor = asyncio.get_running_loop().create_task(self._consumir())
+        return self
+
+    async def _consumir(self):
+        while True:
+            eventos = [await self.fila.get()]
+            if self.fila.empty() and self.espera > 0:
+                await asyncio.sleep(self.espera)
+            while len(eventos) < self.limite_lote and not self.fila.empty():
+                eventos.append(self.fila.get_nowait())
+            try:
+                await self._processar(eventos)
+            finally:
+                for _ in eventos:
+                    self.fila.task_done()
+
+    async def _processar(self, eventos):
+        laco = asyncio.get_running_loop()
+        inicio = time.perf_counter()
+        erros = [None] * len(eventos)
+        try:
+            try:
+                validas = await laco.run_in_executor(self.executor, calcular_e_gravar, self.historico, eventos)
+            except Exception:
+                # O lote inteiro falhou: refaz evento a evento para não perder os eventos bons
+                self.lotes_refeitos += 1
+                validas, erros = await laco.run_in_executor(
+                    self.executor, calcular_e_gravar_isolados, self.historico, eventos)
+        except Exception as e:  # o executor não aceitou o lote: conta e segue com os próximos
+            self.falhas += len(eventos)
+            self.ultimo_erro = f"{type(e).__name__}: {e}"
+            return
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.lotes += 1
+            self.maior_lote = max(self.maior_lote, len(eventos))
+            self._ajustar_limite(len(eventos), duracao)
+        agora = time.time()
+        for (_, _, enviado_em), valida, erro in zip(eventos, validas, erros):
+            if erro is not None:
+                self.falhas += 1
+                self.ultimo_erro = f"{type(erro).__name__}: {erro}"
+            else:
+                self.latencias.registrar(max(agora - enviado_em, 0.0), 1, erro=not valida)
+
+    def _ajustar_limite(self, tamanho, duracao):
+        """Lotes lentos demais para o SLO encolhem o limite; lotes cheios e rápidos o aumentam."""
+        if duracao > self.slo / 2:
+            self.limite_lote = max(min(LOTE_MINIMO, self.lote_maximo), self.limite_lote // 2)
+        elif tamanho >= self.limite_lote and duracao < self.slo / 4:
+            self.limite_lote = min(self.lote_maximo, self.limite_lote * 2)
+
+    async def encerrar(self, esvaziar=True):
+        """Para as fontes e, com esvaziar, calcula o que ainda está na fila antes de parar."""
+        for servidor in self._servidores:
+            servidor.close()
+        fontes = self._tarefas + list(self._conexoes)
+        for tarefa in fontes:
+            tarefa.cancel()
+        await asyncio.gather(*fontes, return_exceptions=True)
+        for servidor in self._servidores:
+            await servidor.wait_closed()
+        if esvaziar and self._consumidor is not None:
+            await self.fila.join()
+        if self._consumidor is not None:
+            self._consumidor.cancel()
+            await asyncio.gather(self._consumidor, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+
+    # --- Métricas ---
+
+    def metricas(self):
+        latencia = self.latencias.resumo()
+        latencias = np.array(self.latencias.latencias)
+        return {
+            "segundos_ativo": time.perf_counter() - self.inicio,
+            "eventos": {
+                "recebidos": self.recebidos,
+                "invalidos": self.invalidos,
+                "descartados": self.descartados,
+                "calculados": latencia["exposicoes"],
+                "com_erro": latencia["erros"],
+                "gravados": latencia["exposicoes"] - latencia["erros"],
+                "falhas": self.falhas,
+            },
+            "latencia_ms": {
+                "p50": latencia["p50_ms"], "p95": latencia["p95_ms"], "p99": latencia["p99_ms"],
+                "slo": self.slo * 1e3,
+                "dentro_slo": float(np.mean(latencias <= self.slo)) if len(latencias) else None,
+            },
+            "vazao_eventos_s": latencia["vazao_requisicoes_s"],
+            "fila": {"profundidade": self.fila.qsize(), "maxima_observada": self.fila_maxima_observada,
+                     "capacidade": self.fila.maxsize, "politica": self.politica},
+            "lotes": {"lotes": self.lotes, "maior_lote": self.maior_lote, "limite_atual": self.limite_lote,
+                      "refeitos": self.lotes_refeitos,
+                      "tamanho_medio": latencia["exposicoes"] / self.lotes if self.lotes else None,
+                      "lote_maximo": self.lote_maximo, "espera_ms": self.espera * 1e3},
+            "ultimo_erro": self.ultimo_erro,
+        }
+
+
+# --- Gerador de eventos para testes de carga ---
+
+def eventos_sinteticos(n, rng, faixas_kv=None):
+    """
+    n linhas JSON (bytes) de exposições sintéticas, com "enviado_em" = agora. Local, alvo/filtro
+    e kV são sorteados dentro das faixas da tabela Ki (faixas_kv de dgm.tabelas.TabelasKi); o kV é
+    inteiro quando a faixa contém algum inteiro.
+    """
+    combinacoes = list(faixas_kv or calibracao_ativa().faixas_kv.items())
+    sorteio = rng.integers(0, len(combinacoes), n)
+    idade = rng.integers(30, 89, n)
+    espessura = np.round(rng.uniform(2, 9, n), 1)
+    mas = np.round(rng.uniform(20, 200, n), 1)
+    paciente = rng.integers(1, 100_000, n)
+    fracao_kv = rng.random(n)
+    agora = time.time()
+    linhas = []
+    for i in range(n):
+        (local, alvo_filtro), (kv_min, kv_max) = combinacoes[sorteio[i]]
+        primeiro, ultimo = math.ceil(kv_min), math.floor(kv_max)
+        kv = primeiro + int(fracao_kv[i] * (ultimo - primeiro + 1)) if ultimo >= primeiro else kv_min
+        linhas.append(json.dumps(
+            {"local": local, "idade": int(idade[i]), "espessura": float(espessura[i]), "alvo_filtro": alvo_filtro,
+             "kv": kv, "mas": float(mas[i]),
+             "id_paciente": str(paciente[i]), "iniciais": "XX", "enviado_em": agora},
+            ensure_ascii=False).encode("utf-8") + b"\n")
+    return linhas
+
+
+async def gerar_eventos(escrever, taxa, duracao, semente=0, passo=0.005):
+    """
+    Chama `await escrever(bytes)` com eventos sintéticos a `taxa` eventos/s durante `duracao` s,
+    em rajadas a cada `passo` s. Se quem recebe não acompanha (contrapressão), a taxa obtida cai.
+    Returns:
+        dict: enviados, segundos e taxa_obtida.
+    """
+    rng = np.random.default_rng(semente)
+    faixas_kv = list(calibracao_ativa().faixas_kv.items())
+    inicio = time.perf_counter()
+    enviados = 0
+    while (decorrido := time.perf_counter() - inicio) < duracao:
+        devidos = int(decorrido * taxa) - enviados
+        if devidos > 0:
+            await escrever(b"".join(eventos_sinteticos(devidos, rng, faixas_kv)))
+            enviados += devidos
+        await asyncio.sleep(passo)
+    segundos = time.perf_counter() - inicio
+    return {"enviados": enviados, "segundos": segundos, "taxa_obtida": enviados / segundos}
+
+
+async def gerar_para_socket(taxa, duracao, host="127.0.0.1", porta=PORTA_PADRAO, semente=0):
+    """Envia eventos sintéticos a um consumidor em host:porta (ver gerar_eventos)."""
+    _, escritor = await asyncio.open_connection(host, porta)
+
+    async def escrever(dados):
+        escritor.write(dados)
+        await escritor.drain()
+
+    try:
+        return await gerar_eventos(escrever, taxa, duracao, semente)
+    finally:
+        escritor.close()
+        await escritor.wait_closed()
+
+
+async def gerar_para_arquivo(taxa, duracao, caminho, semente=0):
+    """Acrescenta eventos sintéticos a um arquivo acompanhado pelo consumidor (ver gerar_eventos)."""
+    with open(caminho, "ab") as arquivo:
+        async def escrever(dados):
+            arquivo.write(dados)
+            arquivo.flush()
+
+        return await gerar_eventos(escrever, taxa, duracao, semente)
+
+
+# --- Linha de comando ---
+
+def _imprimir(dados):
+    print(json.dumps(dados, ensure_ascii=False), file=sys.stderr, flush=True)
+
+
+async def executar_consumidor(args):
+    historico = None if args.sem_historico else HistoricoDGM(args.historico)
+    consumidor = ConsumidorFluxo(historico, args.fila_max, args.lote_max, args.espera_ms, args.slo_ms,
+                                 args.politica).iniciar()
+    origem = []
+    if args.porta is not None:
+        porta = await consumidor.ouvir_socket(args.host, args.porta)
+        origem.append(f"tcp://{args.host}:{porta}")
+    if args.arquivo:
+        consumidor.acompanhar_arquivo(args.arquivo, args.desde_inicio)
+        origem.append(args.arquivo)
+    print(f"Consumindo eventos de {', '.join(origem)} (fila de {args.fila_max}, política {args.politica}, "
+          f"SLO {args.slo_ms:g} ms)", file=sys.stderr, flush=True)
+    try:
+        while True:
+            await asyncio.sleep(args.relatorio_s)
+            _imprimir(consumidor.metricas())
+    finally:
+        await consumidor.encerrar()
+        _imprimir(consumidor.metricas())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dgm.fluxo",
+                                     description="Cálculo contínuo da DGM a partir de um fluxo de exposições.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    consumir = comandos.add_parser("consumir", help="Consome eventos de um socket e/ou arquivo.")
+    consumir.add_argument("--host", default="127.0.0.1", help="Endereço do socket (padrão: 127.0.0.1).")
+    consumir.add_argument("--porta", type=int, help=f"Porta TCP para receber eventos (ex.: {PORTA_PADRAO}).")
+    consumir.add_argument("--arquivo", help="Arquivo de eventos a acompanhar (uma linha JSON por evento).")
+    consumir.add_argument("--desde-inicio", action="store_true", help="Lê também as linhas já existentes no arquivo.")
+    consumir.add_argument("--historico", help="Arquivo SQLite do histórico (padrão: DGM_HISTORICO).")
+    consumir.add_argument("--sem-historico", action="store_true", help="Só calcula, sem gravar no histórico.")
+    consumir.add_argument("--fila-max", type=int, default=FILA_MAXIMA_PADRAO,
+                          help=f"Capacidade da fila (padrão: {FILA_MAXIMA_PADRAO}).")
+    consumir.add_argument("--lote-max", type=int, default=LOTE_MAXIMO_PADRAO,
+                          help=f"Eventos por micro-lote (padrão: {LOTE_MAXIMO_PADRAO}).")
+    consumir.add_argument("--espera-ms", type=float, default=ESPERA_MS_PADRAO,
+                          help=f"Espera por mais eventos com a fila vazia (padrão: {ESPERA_MS_PADRAO:g}).")
+    consumir.add_argument("--slo-ms", type=float, default=SLO_MS_PADRAO,
+                          help=f"Meta de latência de ponta a ponta (padrão: {SLO_MS_PADRAO:g}).")
+    consumir.add_argument("--politica", choices=POLITICAS, default="bloquear",
+                          help="Com a fila cheia: bloquear a fonte (padrão) ou descartar o evento.")
+    consumir.add_argument("--relatorio-s", type=float, default=5.0,
+                          help="Intervalo entre as métricas impressas em stderr (padrão: 5).")
+
+    gerar = comandos.add_parser("gerar", help="Gera eventos sintéticos a uma taxa constante.")
+    gerar.add_argument("--host", default="127.0.0.1", help="Endereço do consumidor (padrão: 127.0.0.1).")
+    gerar.add_argument("--porta", type=int, help="Porta TCP do consumidor.")
+    gerar.add_argument("--arquivo", help="Arquivo onde acrescentar os eventos.")
+    gerar.add_argument("--taxa", type=float, default=1000, help="Eventos por segundo (padrão: 1000).")
+    gerar.add_argument("--duracao", type=float, default=10, help="Duração em segundos (padrão: 10).")
+    gerar.add_argument("--semente", type=int, default=0, help="Semente dos eventos sintéticos.")
+    args = parser.parse_args(argv)
+
+    if args.comando == "gerar" and (args.porta is None) == (args.arquivo is None):
+        print("Erro: informe --porta ou --arquivo (um dos dois).", file=sys.stderr)
+        return 2
+    if args.comando == "consumir" and args.porta is None and not args.arquivo:
+        print("Erro: informe --porta e/ou --arquivo.", file=sys.stderr)
+        return 2
+    try:
+        if args.comando == "consumir":
+            asyncio.run(executar_consumidor(args))
+        elif args.porta is not None:
+            print(json.dumps(asyncio.run(gerar_para_socket(args.taxa, args.duracao, args.host, args.porta,
+                                                           args.semente))))
+        else:
+            print(json.dumps(asyncio.run(gerar_para_arquivo(args.taxa, args.duracao, args.arquivo, args.semente))))
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    except OSError as e:  # porta ocupada, consumidor inacessível, arquivo sem permissão
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
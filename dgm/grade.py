@@ -0,0 +1,333 @@
+"""
+Grade pré-calculada da DGM por unidade de mAs, para respostas instantâneas.
+
+Fixados local, alvo/filtro, kV, espessura e grupo de glandularidade, a DGM é proporcional ao
+mAs: DGM = Ki * s * g * C, com Ki = x * mAs * fator de conversão / (espessura de referência -
+espessura)². A grade guarda DGM/mAs para todos os kV tabelados de cada local e alvo/filtro,
+espessuras de 1 a 20 cm em passos de 0,1 cm e os quatro grupos de glandularidade; uma consulta
+é uma leitura de array vezes o mAs. Combinações fora da grade (kV entre os nós da tabela,
+espessura fora do passo de 0,1 cm) são calculadas pelo caminho exato (dgm.lote).
+
+Diferença para o caminho exato: lá o Ki é arredondado em 0,01 antes de multiplicar pelos
+fatores; aqui não. Por isso |DGM da grade - DGM exata| <= 0,005 * s * g * C + 0,01 mGy
+(o segundo termo vem dos arredondamentos finais dos dois lados). O maior valor desse limite
+na grade fica em GradeDGM.limite_desvio, e GradeDGM.validar() mede o desvio efetivo.
+
+A grade pode ser gravada em um arquivo .npz (obter_grade / variável de ambiente DGM_GRADE),
+que só é reaproveitado se as tabelas não tiverem mudado desde que foi gerado. Cada grade é
+de uma calibração (dgm.calibracao); obter_grade refaz a grade quando a calibração ativa muda.
+
+Uso pela linha de comando:
+    python -m dgm.grade -o grade_dgm.npz
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from dgm.calibracao import calibracao_ativa
+from dgm.lote import calcular_dgm_lote
+from dgm.tabelas import (
+    NOMES_ALVO_FILTRO,
+    VALORES_S,
+    COEFS_CSR,
+    COEFS_FATOR_G,
+    COEFS_FATOR_C,
+    CSR_FATOR_G,
+    CSR_FATOR_C,
+)
+
+VERSAO_GRADE = 1
+ESPESSURA_MIN_GRADE = 1.0
+ESPESSURA_MAX_GRADE = 20.0
+PASSO_ESPESSURA_GRADE = 0.1
+ESPESSURAS_GRADE = np.round(np.arange(10, 201) * PASSO_ESPESSURA_GRADE, 1)
+# Glandularidade usada para representar cada grupo (o cálculo só depende do grupo)
+GLANDULARIDADE_POR_GRUPO = (12.5, 37.5, 62.5, 87.5)
+# Valores de mAs usados por GradeDGM.validar
+MAS_VALIDACAO_PADRAO = (1.0, 10.0, 50.0, 100.0, 250.0, 500.0)
+# Tolerância para considerar um kV ou espessura informado como ponto da grade
+_TOLERANCIA = 1e-9
+
+_CAMINHO_PADRAO = os.environ.get("DGM_GRADE")
+
+
+def grupo_glandularidade(glandularidade):
+    """Grupo (1 a 4) de uma glandularidade em %, com os mesmos limites do cálculo; 0 se inválida."""
+    glandularidade = np.asarray(glandularidade, dtype=float)
+    return np.select([glandularidade <= 25, glandularidade <= 50, glandularidade <= 75, glandularidade > 75],
+                     [1, 2, 3, 4], default=0)
+
+
+def assinatura_tabelas(calibracao=None):
+    """
+    Resumo (SHA-256) das tabelas que determinam a grade (com as da calibração, padrão: a ativa);
+    muda se qualquer coeficiente mudar.
+    """
+    calibracao = calibracao or calibracao_ativa()
+    resumo = hashlib.sha256(f"grade-dgm-v{VERSAO_GRADE}".encode())
+    for nome in NOMES_ALVO_FILTRO + calibracao.nomes_locais:
+        resumo.update(nome.encode())
+    for tabela in (calibracao.kv_nos, calibracao.coefs_spline, calibracao.fatores, VALORES_S, COEFS_CSR, COEFS_FATOR_G, COEFS_FATOR_C,
+                   CSR_FATOR_G, CSR_FATOR_C, ESPESSURAS_GRADE):
+        resumo.update(np.ascontiguousarray(tabela, dtype=float).tobytes())
+    return resumo.hexdigest()
+
+
+def _pontos_da_grade(calibracao):
+    """Índices (local, alvo, nó de kV, espessura, grupo) de todas as células com kV tabelado."""
+    i, j, n = np.nonzero(~np.isnan(calibracao.kv_nos))
+    celulas = np.array(np.meshgrid(np.arange(len(i)), np.arange(len(ESPESSURAS_GRADE)), np.arange(4),
+                                   indexing="ij")).reshape(3, -1)
+    no, e, g = celulas
+    return i[no], j[no], n[no], e, g
+
+
+def calcular_dgm_por_mas(local, alvo_filtro, kv, espessura, idade=None, glandularidade=None, mas=1.0,
+                         calibracao=None):
+    """
+    DGM por unidade de mAs (sem arredondar o Ki), vetorizada.
+    Args:
+        local, alvo_filtro, kv, espessura, idade, glandularidade, calibracao: Como em calcular_dgm_lote.
+    Returns:
+        tuple: (DGM/mAs, s * g * C, resultado de calcular_dgm_lote com mAs = `mas`);
+            NaN nas linhas em que alguma etapa falha (a coluna "Erro" diz qual).
+    """
+    calibracao = calibracao or calibracao_ativa()
+    resultado = calcular_dgm_lote(local=local, alvo_filtro=alvo_filtro, kv=kv, espessura=espessura,
+                                  idade=idade, glandularidade=glandularidade, mas=mas, calibracao=calibracao)
+    idx_local = np.array([calibracao.indice_local.get(v, -1) for v in resultado["Local do Mamógrafo"]], dtype=np.intp)
+    idx_alvo = np.array([NOMES_ALVO_FILTRO.index(v) if v in NOMES_ALVO_FILTRO else -1 for v in resultado["Alvo/Filtro"]],
+                        dtype=np.intp)
+    x_val, _ = calibracao.interpolar_x_ki(idx_local, idx_alvo, resultado["Kv"].to_numpy(dtype=float))
+    fatores_ki = calibracao.fatores[np.maximum(idx_local, 0)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ki_por_mas = x_val * fatores_ki[:, 0] / (fatores_ki[:, 1] - resultado["Espessura (cm)"].to_numpy(dtype=float))**2
+    fatores = (resultado["Valor s"] * resultado["Fator g"] * resultado["Fator C"]).to_numpy(dtype=float, copy=True)
+    fatores[(resultado["Erro"] != "").to_numpy()] = np.nan
+    return ki_por_mas * fatores, fatores, resultado
+
+
+def _entradas_exatas(calibracao, i, j, n, e, g, mas):
+    return dict(
+        local=np.array(calibracao.nomes_locais, dtype=object)[i], alvo_filtro=np.array(NOMES_ALVO_FILTRO, dtype=object)[j],
+        kv=calibracao.kv_nos[i, j, n], espessura=ESPESSURAS_GRADE[e], mas=mas, idade=np.full(len(i), np.nan),
+        glandularidade=np.array(GLANDULARIDADE_POR_GRUPO)[g], calibracao=calibracao,
+    )
+
+
+class GradeDGM:
+    """
+    DGM/mAs em [local, alvo/filtro, nó de kV, espessura, grupo] (NaN onde o cálculo falha ou
+    não há kV tabelado), com consulta escalar e vetorizada. Locais e nós de kV são os da
+    calibração com que a grade foi feita (self.calibracao).
+    """
+
+    def __init__(self, dgm_por_mas, fatores, assinatura, calibracao=None):
+        self.calibracao = calibracao = calibracao or calibracao_ativa()
+        self.dgm_por_mas = dgm_por_mas
+        self.fatores = fatores  # s * g * C de cada célula, para o limite de desvio
+        self.assinatura = assinatura
+        self.limite_desvio = float(np.nanmax(0.005 * fatores)) + 0.01 if np.isfinite(fatores).any() else 0.01
+        self._indice_local = calibracao.indice_local
+        self._indice_alvo = {nome: j for j, nome in enumerate(NOMES_ALVO_FILTRO)}
+        self._indice_kv = {
+            (i, j): {float(kv): n for n, kv in enumerate(calibracao.kv_nos[i, j]) if not np.isnan(kv)}
+            for i in range(len(calibracao.nomes_locais)) for j in range(len(NOMES_ALVO_FILTRO))
+        }
+
+    @classmethod
+    def construir(cls, calibracao=None):
+        """Calcula a grade com o caminho exato (dgm.lote), sem o arredondamento do Ki."""
+        calibracao = calibracao or calibracao_ativa()
+        i, j, n, e, g = _pontos_da_grade(calibracao)
+        por_mas, fatores, _ = calcular_dgm_por_mas(**_entradas_exatas(calibracao, i, j, n, e, g, 1.0))
+        forma = calibracao.kv_nos.shape + (len(ESPESSURAS_GRADE), 4)
+        dgm_por_mas = np.full(forma, np.nan)
+        fatores_grade = np.full(forma, np.nan)
+        dgm_por_mas[i, j, n, e, g] = por_mas
+        fatores_grade[i, j, n, e, g] = fatores
+        return cls(dgm_por_mas, fatores_grade, assinatura_tabelas(calibracao), calibracao)
+
+    def salvar(self, caminho):
+        with open(caminho, "wb") as arquivo:
+            np.savez_compressed(arquivo, dgm_por_mas=self.dgm_por_mas, fatores=self.fatores,
+                                assinatura=np.array(self.assinatura))
+
+    @classmethod
+    def carregar(cls, caminho, calibracao=None):
+        """Lê uma grade gravada por salvar(); ValueError se ela foi gerada com outras tabelas."""
+        calibracao = calibracao or calibracao_ativa()
+        with np.load(caminho) as dados:
+            grade = cls(dados["dgm_por_mas"], dados["fatores"], str(dados["assinatura"]), calibracao)
+        if (grade.assinatura != assinatura_tabelas(calibracao)
+                or grade.dgm_por_mas.shape != calibracao.kv_nos.shape + (len(ESPESSURAS_GRADE), 4)):
+            raise ValueError(f"A grade em {caminho} foi gerada com outras tabelas; gere-a novamente.")
+        return grade
+
+    # --- Consulta ---
+
+    def _celula(self, local, alvo_filtro, kv, espessura, grupo):
+        """Índices da célula na grade, ou None se a combinação estiver fora dela."""
+        i = self._indice_local.get(local)
+        j = self._indice_alvo.get(alvo_filtro)
+        if i is None or j is None or grupo not in (1, 2, 3, 4):
+            return None
+        n = self._indice_kv[i, j].get(round(float(kv), 6))
+        if n is None or abs(self.calibracao.kv_nos[i, j, n] - kv) > _TOLERANCIA:
+            return None
+        e = int(round(espessura / PASSO_ESPESSURA_GRADE)) - 10
+        if not 0 <= e < len(ESPESSURAS_GRADE) or abs(ESPESSURAS_GRADE[e] - espessura) > _TOLERANCIA:
+            return None
+        return i, j, n, e, grupo - 1
+
+    def dgm(self, kv, alvo_filtro, mas, espessura, local, idade=None, glandularidade=None):
+        """
+        DGM (mGy, 2 casas) pela grade; fora dela, pelo caminho exato.
+        Returns:
+            tuple: (DGM, "grade" ou "exato").
+        Raises:
+            ValueError: Com a mensagem da etapa que falhou, se a exposição não puder ser calculada.
+        """
+        if glandularidade is None and idade is not None:
+            from dgm.nucleo import calcular_glandularidade
+
+            glandularidade = calcular_glandularidade(idade, espessura)
+        if isinstance(glandularidade, (int, float)):
+            grupo = 1 if glandularidade <= 25 else 2 if glandularidade <= 50 else 3 if glandularidade <= 75 else 4
+            celula = self._celula(local, alvo_filtro, kv, espessura, grupo if glandularidade == glandularidade else 0)
+            if celula is not None:
+                valor = float(self.dgm_por_mas[celula])
+                if valor == valor:
+                    return round(valor * mas, 2), "grade"
+        return _dgm_exata(kv, alvo_filtro, mas, espessura, local, idade, glandularidade, self.calibracao), "exato"
+
+    def consultar(self, local, alvo_filtro, kv, mas, espessura, glandularidade):
+        """
+        Versão vetorizada da consulta (sem recurso ao caminho exato).
+        Returns:
+            np.ndarray: DGM (mGy, 2 casas) de cada exposição; NaN fora da grade.
+        """
+        local, alvo_filtro = np.asarray(local, dtype=object), np.asarray(alvo_filtro, dtype=object)
+        kv, mas, espessura = (np.asarray(v, dtype=float) for v in (kv, mas, espessura))
+        local, alvo_filtro, kv, mas, espessura, glandularidade = np.broadcast_arrays(
+            local, alvo_filtro, kv, mas, espessura, np.asarray(glandularidade, dtype=float))
+        i = np.array([self._indice_local.get(v, -1) for v in local.ravel()], dtype=np.intp).reshape(local.shape)
+        j = np.array([self._indice_alvo.get(v, -1) for v in alvo_filtro.ravel()], dtype=np.intp).reshape(alvo_filtro.shape)
+        grupo = grupo_glandularidade(glandularidade)
+        valido = (i >= 0) & (j >= 0) & (grupo > 0)
+        ii, jj = np.where(valido, i, 0), np.where(valido, j, 0)
+
+        nos = self.calibracao.kv_nos[ii, jj]  # (..., nós)
+        n = np.argmin(np.abs(np.nan_to_num(nos, nan=np.inf) - kv[..., None]), axis=-1)
+        valido &= np.abs(np.take_along_axis(nos, n[..., None], axis=-1)[..., 0] - kv) <= _TOLERANCIA
+        e = np.rint(espessura / PASSO_ESPESSURA_GRADE).astype(np.intp) - 10
+        dentro = (e >= 0) & (e < len(ESPESSURAS_GRADE))
+        e = np.where(dentro, e, 0)
+        valido &= dentro & (np.abs(ESPESSURAS_GRADE[e] - espessura) <= _TOLERANCIA)
+
+        valores = self.dgm_por_mas[ii, jj, n, e, np.maximum(grupo - 1, 0)] * mas
+        return np.where(valido, np.round(valores, 2), np.nan)
+
+    # --- Validação ---
+
+    def validar(self, valores_mas=MAS_VALIDACAO_PADRAO):
+        """
+        Compara a grade com o caminho exato em todas as células e nos valores de mAs dados.
+        Returns:
+            dict: pontos comparados, maior desvio absoluto (mGy) e relativo, fração de resultados
+                idênticos, limite garantido (limite_desvio) e o maior desvio para cada mAs.
+        """
+        i, j, n, e, g = _pontos_da_grade(self.calibracao)
+        por_mas = np.take(self.dgm_por_mas, np.ravel_multi_index((i, j, n, e, g), self.dgm_por_mas.shape))
+        na_grade = ~np.isnan(por_mas)
+        i, j, n, e, g, por_mas = (v[na_grade] for v in (i, j, n, e, g, por_mas))
+
+        relatorio = {"pontos": 0, "identicos": 0, "max_desvio_mgy": 0.0, "max_desvio_relativo": 0.0,
+                     "limite_garantido_mgy": self.limite_desvio, "por_mas": {}}
+        inicio = time.perf_counter()
+        for mas in valores_mas:
+            exato = calcular_dgm_lote(**_entradas_exatas(self.calibracao, i, j, n, e, g, mas))["DGM (mGy)"].to_numpy(dtype=float)
+            da_grade = np.round(por_mas * mas, 2)
+            desvio = np.abs(da_grade - exato)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                relativo = np.where(exato > 0, desvio / exato, 0.0)
+            relatorio["pontos"] += len(desvio)
+            relatorio["identicos"] += int(np.sum(desvio == 0))
+            relatorio["max_desvio_mgy"] = max(relatorio["max_desvio_mgy"], float(np.nanmax(desvio, initial=0)))
+            relatorio["max_desvio_relativo"] = max(relatorio["max_desvio_relativo"], float(np.nanmax(relativo, initial=0)))
+            relatorio["por_mas"][str(mas)] = float(np.nanmax(desvio, initial=0))
+        relatorio["fracao_identica"] = relatorio["identicos"] / relatorio["pontos"] if relatorio["pontos"] else 1.0
+        relatorio["dentro_do_limite"] = relatorio["max_desvio_mgy"] <= self.limite_desvio + 1e-9
+        relatorio["segundos"] = time.perf_counter() - inicio
+        return relatorio
+
+
+def _dgm_exata(kv, alvo_filtro, mas, espessura, local, idade, glandularidade, calibracao):
+    if isinstance(glandularidade, str):  # erro da glandularidade calculada pela idade
+        glandularidade = None
+    resultado = calcular_dgm_lote(
+        idade=[np.nan if idade is None else idade], espessura=[espessura], alvo_filtro=[alvo_filtro], kv=[kv],
+        mas=[mas], local=[local], glandularidade=[np.nan if glandularidade is None else glandularidade],
+        calibracao=calibracao,
+    ).iloc[0]
+    if resultado["Erro"]:
+        raise ValueError(resultado["Erro"])
+    return float(resultado["DGM (mGy)"])
+
+
+_grade = None
+_trava = threading.Lock()
+
+
+def obter_grade(caminho=_CAMINHO_PADRAO):
+    """
+    Grade compartilhada pelo processo, criada na primeira chamada e refeita quando a calibração
+    ativa muda. Com `caminho` (padrão: variável de ambiente DGM_GRADE), reaproveita o arquivo se
+    ele corresponder às tabelas atuais; senão calcula a grade e grava o arquivo.
+    """
+    global _grade
+    calibracao = calibracao_ativa()
+    with _trava:
+        if _grade is None or _grade.calibracao is not calibracao:
+            grade = None
+            if caminho and os.path.exists(caminho):
+                try:
+                    grade = GradeDGM.carregar(caminho, calibracao)
+                except (ValueError, OSError, KeyError):
+                    grade = None
+            if grade is None:
+                grade = GradeDGM.construir(calibracao)
+                if caminho:
+                    grade.salvar(caminho)
+            _grade = grade
+        return _grade
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dgm.grade",
+                                     description="Gera a grade de DGM por mAs e compara com o cálculo exato.")
+    parser.add_argument("-o", "--saida", help="Arquivo .npz onde gravar a grade.")
+    parser.add_argument("--mas", type=float, nargs="+", default=list(MAS_VALIDACAO_PADRAO),
+                        help="Valores de mAs usados na validação.")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    grade = GradeDGM.construir()
+    duracao = time.perf_counter() - inicio
+    if args.saida:
+        grade.salvar(args.saida)
+    relatorio = grade.validar(args.mas)
+    relatorio["celulas"] = int(np.sum(~np.isnan(grade.dgm_por_mas)))
+    relatorio["segundos_construcao"] = duracao
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    return 0 if relatorio["dentro_do_limite"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Grafo de dependências das etapas do cálculo da DGM e recálculo incremental.
+
+Cada Etapa declara as entradas que lê e as saídas que produz; GrafoEtapas ordena as etapas
+(ordem topológica) e CalculoIncremental guarda as entradas e os valores da execução anterior
+para recalcular só o que mudou:
+    - uma etapa é refeita quando alguma das suas entradas mudou;
+    - se as saídas refeitas forem iguais às anteriores (ex.: outra glandularidade no mesmo
+      grupo), as etapas seguintes não são refeitas.
+As dependências são as do cálculo: o CSR depende só de kV e alvo/filtro, a glandularidade
+só de idade e espessura, o Ki não depende da glandularidade; mudar só o mAs refaz Ki e DGM.
+A calibração (dgm.calibracao) também é uma entrada: depois de uma recarga, só Ki e DGM são refeitos.
+
+GRAFO_INDIVIDUAL usa as funções calcular_* de dgm.nucleo (cálculo individual da interface);
+o grafo vetorizado do lote fica em dgm.lote (GRAFO_LOTE, usado também por varrer_lote).
+"""
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from dgm.nucleo import (
+    INCERTEZA_KV_PERCENTUAL,
+    INCERTEZA_MAS_PERCENTUAL,
+    INCERTEZA_ESPESSURA_PERCENTUAL,
+    calcular_valor_s,
+    calcular_csr,
+    calcular_fator_g,
+    calcular_glandularidade,
+    calcular_fator_c,
+    calcular_ki,
+    calcular_dgm,
+)
+from dgm.tabelas import csr_mais_proximo_fator_c
+
+# funcao recebe os valores de `entradas` (na ordem) e retorna uma tupla na ordem de `saidas`
+Etapa = namedtuple("Etapa", ["nome", "entradas", "saidas", "funcao"])
+
+
+class GrafoEtapas:
+    """Etapas em ordem topológica, com as entradas externas (não produzidas por nenhuma etapa)."""
+
+    def __init__(self, etapas):
+        produtor = {}
+        for etapa in etapas:
+            for saida in etapa.saidas:
+                if saida in produtor:
+                    raise ValueError(f"A saída {saida!r} é produzida por {produtor[saida]!r} e {etapa.nome!r}.")
+                produtor[saida] = etapa.nome
+        # Ordenação topológica estável (mantém a ordem declarada entre etapas independentes)
+        pendentes = list(etapas)
+        prontos = set()
+        self.etapas = []
+        while pendentes:
+            etapa = next((e for e in pendentes if all(nome not in produtor or nome in prontos for nome in e.entradas)), None)
+            if etapa is None:
+                raise ValueError(f"Dependência circular entre as etapas {[e.nome for e in pendentes]}.")
+            pendentes.remove(etapa)
+            prontos.update(etapa.saidas)
+            self.etapas.append(etapa)
+        self.entradas = tuple(dict.fromkeys(nome for e in self.etapas for nome in e.entradas if nome not in produtor))
+        self.saidas = tuple(produtor)
+
+    def dependentes(self, alteradas):
+        """Nomes das etapas afetadas (direta ou indiretamente) pela mudança das entradas `alteradas`."""
+        sujos = set(alteradas)
+        afetadas = []
+        for etapa in self.etapas:
+            if sujos.intersection(etapa.entradas):
+                afetadas.append(etapa.nome)
+                sujos.update(etapa.saidas)
+        return afetadas
+
+    def calcular(self, entradas):
+        """Executa todas as etapas; retorna o dicionário com entradas e saídas."""
+        faltando = [nome for nome in self.entradas if nome not in entradas]
+        if faltando:
+            raise ValueError(f"Entradas ausentes: {faltando}")
+        valores = dict(entradas)
+        for etapa in self.etapas:
+            valores.update(zip(etapa.saidas, etapa.funcao(*(valores[nome] for nome in etapa.entradas))))
+        return valores
+
+
+def _iguais(a, b):
+    """Igualdade de valores de etapa (escalares, textos ou arrays; NaN igual a NaN)."""
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a, b = np.asarray(a), np.asarray(b)
+        if a.shape != b.shape or a.dtype != b.dtype:
+            return False
+        return bool(np.array_equal(a, b, equal_nan=a.dtype.kind in "fc"))
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return type(a) is type(b) and a == b
+
+
+class CalculoIncremental:
+    """Executa um GrafoEtapas reaproveitando os valores da execução anterior."""
+
+    def __init__(self, grafo):
+        self.grafo = grafo
+        self._valores = None
+        self._trava = threading.Lock()
+        self.recalculadas = ()     # etapas refeitas na última execução
+        self.reaproveitadas = ()   # etapas reaproveitadas na última execução
+        self.execucoes = 0
+        self.etapas_recalculadas = 0
+        self.etapas_reaproveitadas = 0
+
+    def calcular(self, **entradas):
+        """
+        Calcula o grafo para `entradas` (todas as entradas externas do grafo).
+        Returns:
+            dict: Entradas e saídas de todas as etapas.
+        """
+        with self._trava:
+            anteriores = self._valores
+            if anteriores is None:
+                valores = self.grafo.calcular(entradas)
+                recalculadas = [etapa.nome for etapa in self.grafo.etapas]
+            else:
+                faltando = [nome for nome in self.grafo.entradas if nome not in entradas]
+                if faltando:
+                    raise ValueError(f"Entradas ausentes: {faltando}")
+                valores = dict(anteriores)
+                alteradas = {nome for nome in self.grafo.entradas if not _iguais(entradas[nome], anteriores[nome])}
+                valores.update(entradas)
+                recalculadas = []
+                for etapa in self.grafo.etapas:
+                    if not alteradas.intersection(etapa.entradas):
+                        continue
+                    recalculadas.append(etapa.nome)
+                    saidas = etapa.funcao(*(valores[nome] for nome in etapa.entradas))
+                    for nome, valor in zip(etapa.saidas, saidas):
+                        if not _iguais(valor, anteriores[nome]):
+                            alteradas.add(nome)
+                        valores[nome] = valor
+            self._valores = valores
+            self.recalculadas = tuple(recalculadas)
+            self.reaproveitadas = tuple(e.nome for e in self.grafo.etapas if e.nome not in recalculadas)
+            self.execucoes += 1
+            self.etapas_recalculadas += len(self.recalculadas)
+            self.etapas_reaproveitadas += len(self.reaproveitadas)
+            return valores
+
+    def limpar(self):
+        with self._trava:
+            self._valores = None
+            self.recalculadas = self.reaproveitadas = ()
+
+
+# --- Cálculo individual (funções de dgm.nucleo) ---
+
+def _numerico(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool) and not math.isnan(valor)
+
+
+def _etapa_glandularidade(idade, espessura, glandularidade_informada):
+    if glandularidade_informada is not None:
+        return (glandularidade_informada,)
+    return (calcular_glandularidade(idade, espessura),)
+
+
+def _etapa_fator_c(csr, espessura, glandularidade):
+    if not (_numerico(csr) and _numerico(glandularidade)):
+        return None, None  # sem CSR ou glandularidade: a interface avisa e não calcula
+    return calcular_fator_c(csr_mais_proximo_fator_c(csr), espessura, glandularidade,
+                            espessura * INCERTEZA_ESPESSURA_PERCENTUAL)
+
+
+def _etapa_dgm(ki, incerteza_ki, s, fator_g, incerteza_fator_g, fator_c, incerteza_fator_c):
+    entradas = (ki, s, fator_g, fator_c, incerteza_ki, incerteza_fator_g, incerteza_fator_c)
+    if not all(_numerico(v) for v in entradas):
+        return None, None  # erro em uma etapa anterior
+    return calcular_dgm(ki, s, fator_g, fator_c, incerteza_ki, 0.0, incerteza_fator_g, incerteza_fator_c)
+
+
+GRAFO_INDIVIDUAL = GrafoEtapas([
+    Etapa("Glandularidade", ("idade", "espessura", "glandularidade_informada"), ("glandularidade",), _etapa_glandularidade),
+    Etapa("Valor s", ("alvo_filtro",), ("valor_s",), lambda alvo_filtro: (calcular_valor_s(alvo_filtro),)),
+    Etapa("CSR", ("kv", "alvo_filtro"), ("csr", "incerteza_csr"),
+          lambda kv, alvo_filtro: calcular_csr(kv, alvo_filtro, kv * INCERTEZA_KV_PERCENTUAL)),
+    Etapa("Fator g", ("csr", "espessura"), ("fator_g", "incerteza_fator_g"),
+          lambda csr, espessura: calcular_fator_g(csr, espessura, espessura * INCERTEZA_ESPESSURA_PERCENTUAL)),
+    Etapa("Fator C", ("csr", "espessura", "glandularidade"), ("fator_c", "incerteza_fator_c"), _etapa_fator_c),
+    Etapa("Ki", ("kv", "alvo_filtro", "mas", "espessura", "local", "calibracao"), ("ki", "incerteza_ki"),
+          lambda kv, alvo_filtro, mas, espessura, local, calibracao: calcular_ki(
+              kv, alvo_filtro, mas, espessura, mas * INCERTEZA_MAS_PERCENTUAL,
+              espessura * INCERTEZA_ESPESSURA_PERCENTUAL, local, calibracao)),
+    Etapa("DGM", ("ki", "incerteza_ki", "valor_s", "fator_g", "incerteza_fator_g", "fator_c", "incerteza_fator_c"),
+          ("dgm", "incerteza_dgm"), _etapa_dgm),
+])
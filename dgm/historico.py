@@ -0,0 +1,288 @@
+"""
+Histórico persistente de cálculos em SQLite (modo WAL).
+
+Cada cálculo é acrescentado com um único INSERT, sem copiar o histórico existente, e as
+leituras são paginadas e filtradas no próprio banco (índices em ID do paciente, data/hora
+e local do mamógrafo). A exportação CSV percorre o banco em blocos.
+
+Cada linha pode ter um dono (coluna "dono", fora das colunas exibidas e exportadas): a
+interface grava com o identificador da sessão do navegador e lê, exporta e limpa só as
+linhas dessa sessão, então instâncias compartilhadas por várias clínicas não misturam os
+pacientes. Sem dono (None), as operações valem para o histórico inteiro (CLI, consumidor
+contínuo, manutenção).
+
+O arquivo padrão é historico_dgm.sqlite3 no diretório atual, ou o indicado pela
+variável de ambiente DGM_HISTORICO.
+"""
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+
+import pandas as pd
+
+CAMINHO_PADRAO = os.environ.get("DGM_HISTORICO", "historico_dgm.sqlite3")
+
+# Colunas do histórico: (nome exibido, coluna no banco)
+COLUNAS_BANCO = [
+    ("Data/Hora", "data_hora"),
+    ("ID Paciente", "id_paciente"),
+    ("Iniciais Paciente", "iniciais_paciente"),
+    ("Local do Mamógrafo", "local_mamografo"),
+    ("Idade", "idade"),
+    ("Espessura (cm)", "espessura_cm"),
+    ("Alvo/Filtro", "alvo_filtro"),
+    ("Kv", "kv"),
+    ("mAs", "mas"),
+    ("Glandularidade (%)", "glandularidade"),
+    ("Grupo Glandularidade", "grupo_glandularidade"),
+    ("Valor s", "valor_s"),
+    ("CSR", "csr"),
+    ("Incerteza CSR", "incerteza_csr"),
+    ("Fator g", "fator_g"),
+    ("Incerteza Fator g", "incerteza_fator_g"),
+    ("Fator C", "fator_c"),
+    ("Incerteza Fator C", "incerteza_fator_c"),
+    ("Ki", "ki"),
+    ("Incerteza Ki", "incerteza_ki"),
+    ("DGM (mGy)", "dgm"),
+    ("Incerteza DGM (mGy)", "incerteza_dgm"),
+    ("Calibração", "calibracao"),
+]
+COLUNAS_HISTORICO = [nome for nome, _ in COLUNAS_BANCO]
+_COLUNA_NO_BANCO = dict(COLUNAS_BANCO)
+_TIPOS_COLUNA = {
+    "data_hora": "TEXT", "id_paciente": "TEXT", "iniciais_paciente": "TEXT", "local_mamografo": "TEXT",
+    "alvo_filtro": "TEXT", "idade": "INTEGER", "grupo_glandularidade": "INTEGER", "calibracao": "TEXT",
+}  # demais colunas: REAL
+
+# Coluna com o dono de cada linha (ver docstring do módulo)
+COLUNA_DONO = "dono"
+
+TAMANHO_BLOCO_EXPORTACAO = 5_000
+
+
+def _criar_tabela(conexao):
+    definicoes = ", ".join(f"{coluna} {_TIPOS_COLUNA.get(coluna, 'REAL')}" for _, coluna in COLUNAS_BANCO)
+    conexao.execute(f"CREATE TABLE IF NOT EXISTS historico (id INTEGER PRIMARY KEY, {definicoes}, {COLUNA_DONO} TEXT)")
+    # Bancos criados antes de uma coluna existir ganham a coluna (vazia nos cálculos antigos)
+    existentes = {linha[1] for linha in conexao.execute("PRAGMA table_info(historico)")}
+    for coluna in [coluna for _, coluna in COLUNAS_BANCO] + [COLUNA_DONO]:
+        if coluna not in existentes:
+            tipo = "TEXT" if coluna == COLUNA_DONO else _TIPOS_COLUNA.get(coluna, "REAL")
+            conexao.execute(f"ALTER TABLE historico ADD COLUMN {coluna} {tipo}")
+    # Contadores gravados no próprio banco, vistos por todos os processos que usam o arquivo.
+    # "limpezas" muda a cada limpar(): os ids do SQLite são reaproveitados depois de um DELETE,
+    # então quem lê só as linhas novas (id > último lido) precisa dele para saber que deve recomeçar.
+    # "alteracoes" muda a cada gravação ou limpeza (HistoricoDGM.versao).
+    conexao.execute("CREATE TABLE IF NOT EXISTS controle (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+    with conexao:
+        conexao.executemany("INSERT OR IGNORE INTO controle (chave, valor) VALUES (?, 0)", [("limpezas",), ("alteracoes",)])
+    conexao.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_historico_dono ON historico (dono);
+        CREATE INDEX IF NOT EXISTS idx_historico_id_paciente ON historico (id_paciente);
+        CREATE INDEX IF NOT EXISTS idx_historico_data_hora ON historico (data_hora);
+        CREATE INDEX IF NOT EXISTS idx_historico_local ON historico (local_mamografo);
+    """)
+
+
+def _valor_sql(valor):
+    """Converte valores do pandas/NumPy para tipos aceitos pelo sqlite3 (NaN vira NULL)."""
+    if valor is None:
+        return None
+    if hasattr(valor, "item"):  # escalares NumPy
+        valor = valor.item()
+    if isinstance(valor, float) and valor != valor:
+        return None
+    return valor
+
+
+class HistoricoDGM:
+    """
+    Histórico de cálculos em um arquivo SQLite, seguro para uso por várias threads
+    (uma conexão por thread; o modo WAL permite ler enquanto outra thread grava).
+    """
+
+    def __init__(self, caminho=None):
+        # DGM_HISTORICO é relida aqui para valer também quando definida depois da importação
+        self.caminho = caminho or os.environ.get("DGM_HISTORICO", CAMINHO_PADRAO)
+        self._local = threading.local()
+        self._trava_escrita = threading.Lock()
+        _criar_tabela(self._conexao())
+
+    def _conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    # --- Escrita ---
+
+    def adicionar(self, linha, dono=None):
+        """Acrescenta um cálculo (dicionário com as chaves de COLUNAS_HISTORICO)."""
+        self.adicionar_varias([linha], dono)
+
+    def adicionar_varias(self, linhas, dono=None):
+        """
+        Acrescenta vários cálculos em uma única transação (DataFrame ou lista de dicionários).
+        Args:
+            dono (str, opcional): Dono das linhas (ver docstring do módulo).
+        """
+        if isinstance(linhas, pd.DataFrame):
+            presentes = [nome for nome in COLUNAS_HISTORICO if nome in linhas.columns]
+            valores = (
+                tuple(_valor_sql(v) for v in registro)
+                for registro in linhas[presentes].itertuples(index=False, name=None)
+            )
+        else:
+            linhas = list(linhas)
+            presentes = [nome for nome in COLUNAS_HISTORICO if any(nome in linha for linha in linhas)]
+            valores = (tuple(_valor_sql(linha.get(nome)) for nome in presentes) for linha in linhas)
+        colunas = [_COLUNA_NO_BANCO[nome] for nome in presentes]
+        if dono is not None:
+            colunas.append(COLUNA_DONO)
+            valores = (registro + (str(dono),) for registro in valores)
+        marcadores = ", ".join("?" for _ in colunas)
+        colunas = ", ".join(colunas)
+        conexao = self._conexao()
+        with self._trava_escrita, conexao:
+            conexao.executemany(f"INSERT INTO historico ({colunas}) VALUES ({marcadores})", valores)
+            conexao.execute("UPDATE controle SET valor = valor + 1 WHERE chave = 'alteracoes'")
+
+    def limpar(self, dono=None):
+        """Apaga as linhas do dono (todas, sem dono)."""
+        where, parametros = self._where(dono=dono)
+        conexao = self._conexao()
+        with self._trava_escrita, conexao:
+            conexao.execute(f"DELETE FROM historico{where}", parametros)
+            conexao.execute("UPDATE controle SET valor = valor + 1 WHERE chave IN ('limpezas', 'alteracoes')")
+
+    # --- Leitura ---
+
+    @staticmethod
+    def _where(id_paciente=None, local=None, data_inicio=None, data_fim=None, dono=None):
+        condicoes, parametros = [], []
+        if dono is not None:
+            condicoes.append(f"{COLUNA_DONO} = ?")
+            parametros.append(str(dono))
+        if id_paciente:
+            condicoes.append("id_paciente = ?")
+            parametros.append(str(id_paciente))
+        if local:
+            condicoes.append("local_mamografo = ?")
+            parametros.append(local)
+        if data_inicio:
+            condicoes.append("data_hora >= ?")
+            parametros.append(str(data_inicio))
+        if data_fim:
+            condicoes.append("data_hora <= ?")
+            parametros.append(str(data_fim))
+        return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+    def contar(self, **filtros):
+        where, parametros = self._where(**filtros)
+        return self._conexao().execute(f"SELECT COUNT(*) FROM historico{where}", parametros).fetchone()[0]
+
+    def pagina(self, numero=1, tamanho=50, ordenar_por="Data/Hora", decrescente=True, **filtros):
+        """
+        Retorna uma página do histórico (numero começa em 1) como DataFrame.
+        Args:
+            ordenar_por (str): Nome exibido de uma das colunas de COLUNAS_HISTORICO.
+            **filtros: id_paciente, local, data_inicio, data_fim (texto "AAAA-MM-DD HH:MM:SS")
+                e dono.
+        """
+        coluna_ordem = _COLUNA_NO_BANCO.get(ordenar_por)
+        if coluna_ordem is None:
+            raise ValueError(f"Coluna de ordenação inválida: {ordenar_por}")
+        direcao = "DESC" if decrescente else "ASC"
+        where, parametros = self._where(**filtros)
+        colunas = ", ".join(coluna for _, coluna in COLUNAS_BANCO)
+        cursor = self._conexao().execute(
+            f"SELECT {colunas} FROM historico{where} ORDER BY {coluna_ordem} {direcao}, id {direcao} LIMIT ? OFFSET ?",
+            parametros + [int(tamanho), (max(int(numero), 1) - 1) * int(tamanho)],
+        )
+        return pd.DataFrame(cursor.fetchall(), columns=COLUNAS_HISTORICO)
+
+    def iterar_blocos(self, tamanho_bloco=TAMANHO_BLOCO_EXPORTACAO, **filtros):
+        """Percorre o histórico (em ordem de inclusão) em listas de tuplas de até `tamanho_bloco` linhas."""
+        where, parametros = self._where(**filtros)
+        colunas = ", ".join(coluna for _, coluna in COLUNAS_BANCO)
+        cursor = self._conexao().execute(f"SELECT {colunas} FROM historico{where} ORDER BY id", parametros)
+        while True:
+            linhas = cursor.fetchmany(tamanho_bloco)
+            if not linhas:
+                break
+            yield linhas
+
+    def limpezas(self):
+        """Quantas vezes o histórico (ou parte dele) foi limpo, por qualquer processo."""
+        return self._conexao().execute("SELECT valor FROM controle WHERE chave = 'limpezas'").fetchone()[0]
+
+    @property
+    def versao(self):
+        """
+        Contador de alterações (gravações e limpezas) guardado no banco: muda também quando
+        outra instância ou outro processo (CLI, consumidor contínuo) altera o arquivo.
+        """
+        return self._conexao().execute("SELECT valor FROM controle WHERE chave = 'alteracoes'").fetchone()[0]
+
+    def ultimo_id(self, dono=None):
+        """Maior id gravado (0 com o histórico vazio); os ids crescem a cada inclusão."""
+        where, parametros = self._where(dono=dono)
+        return self._conexao().execute(f"SELECT COALESCE(MAX(id), 0) FROM historico{where}", parametros).fetchone()[0]
+
+    def iterar_novos(self, apos_id=0, colunas=COLUNAS_HISTORICO, tamanho_bloco=TAMANHO_BLOCO_EXPORTACAO, dono=None):
+        """
+        Percorre, em ordem de inclusão, só os cálculos (do dono, se indicado) com id maior que `apos_id`.
+        Yields:
+            tuple: (id da última linha do bloco, DataFrame com as `colunas` pedidas).
+        """
+        selecao = ", ".join(_COLUNA_NO_BANCO[nome] for nome in colunas)
+        where, parametros = self._where(dono=dono)
+        where = (where + " AND" if where else " WHERE") + " id > ?"
+        cursor = self._conexao().execute(f"SELECT id, {selecao} FROM historico{where} ORDER BY id",
+                                         parametros + [int(apos_id)])
+        while True:
+            linhas = cursor.fetchmany(tamanho_bloco)
+            if not linhas:
+                break
+            yield linhas[-1][0], pd.DataFrame([linha[1:] for linha in linhas], columns=list(colunas))
+
+    def exportar_csv(self, destino=None, **filtros):
+        """
+        Grava o histórico em CSV bloco a bloco, sem montar um DataFrame com tudo.
+        Args:
+            destino (arquivo binário, opcional): Onde gravar; por padrão um arquivo temporário
+                que só passa para o disco acima de alguns MB.
+        Returns:
+            O arquivo de destino, rebobinado para o início.
+        """
+        if destino is None:
+            destino = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+        texto = io.TextIOWrapper(destino, encoding="utf-8", newline="", write_through=True)
+        escritor = csv.writer(texto)
+        escritor.writerow(COLUNAS_HISTORICO)
+        for linhas in self.iterar_blocos(**filtros):
+            escritor.writerows(linhas)
+        texto.detach()
+        destino.seek(0)
+        return destino
+
+    def valores_distintos(self, nome_coluna, dono=None):
+        """Valores distintos de uma coluna (para montar filtros)."""
+        coluna = _COLUNA_NO_BANCO[nome_coluna]
+        where, parametros = self._where(dono=dono)
+        where = (where + " AND" if where else " WHERE") + f" {coluna} IS NOT NULL"
+        cursor = self._conexao().execute(f"SELECT DISTINCT {coluna} FROM historico{where} ORDER BY {coluna}", parametros)
+        return [linha[0] for linha in cursor.fetchall()]
+
+    def fechar(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None:
+            conexao.close()
+            self._local.conexao = None
@@ -0,0 +1,480 @@
+"""
+Cálculo da DGM em lote, vetorizado com NumPy.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from dgm.tabelas import (
+    INCERTEZA_KV_PERCENTUAL,
+    INCERTEZA_MAS_PERCENTUAL,
+    INCERTEZA_ESPESSURA_PERCENTUAL,
+    INCERTEZA_X_KI_PERCENTUAL,
+    INCERTEZA_COEFS_FATOR_C_PERCENTUAL,
+    FAIXAS_GLANDULARIDADE,
+    NOMES_ALVO_FILTRO,
+    VALORES_S,
+    COEFS_CSR,
+    CSR_FATOR_G,
+    COEFS_FATOR_G,
+    INCERTEZAS_FATOR_G,
+    CSR_FATOR_C,
+    COEFS_FATOR_C,
+    indices_csr_mais_proximo,
+)
+from dgm.calibracao import COLUNA_CALIBRACAO, calibracao_ativa
+from dgm.grafo import CalculoIncremental, Etapa, GrafoEtapas
+from dgm.metricas import metricas_ativas, registrar_lote
+from dgm.resultados import MENSAGENS_ERRO, CodigoErro
+
+# Reproduz, sobre arrays NumPy, exatamente a mesma sequência de operações das funções
+# calcular_* de dgm.nucleo (mesma ordem das somas e dos arredondamentos), para que cada linha
+# do lote tenha o mesmo resultado do cálculo individual feito pela interface.
+
+# Colunas de entrada do lote (mesmos nomes usados no histórico)
+COLUNAS_ENTRADA_LOTE = ["Local do Mamógrafo", "Idade", "Espessura (cm)", "Alvo/Filtro", "Kv", "mAs"]
+COLUNA_GLANDULARIDADE = "Glandularidade (%)"
+
+# Colunas calculadas pelo lote, na mesma ordem do histórico
+COLUNAS_RESULTADO_LOTE = [
+    "Glandularidade (%)", "Grupo Glandularidade", "Valor s", "CSR", "Incerteza CSR",
+    "Fator g", "Incerteza Fator g", "Fator C", "Incerteza Fator C", "Ki", "Incerteza Ki", "DGM (mGy)", "Incerteza DGM (mGy)"
+]
+
+def _arredondar(valores, casas):
+    """
+    Arredonda um array exatamente como o round() do Python.
+    np.round multiplica por 10**casas antes de arredondar, o que pode mudar o lado do
+    empate (ex.: 2.675); só esses casos limítrofes são refeitos com round().
+    """
+    valores = np.asarray(valores, dtype=float)
+    arredondado = np.round(valores, casas)
+    escalado = valores * 10.0**casas
+    limitrofes = np.isfinite(escalado) & (np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6)
+    for i in np.flatnonzero(limitrofes):
+        arredondado[i] = round(float(valores[i]), casas)
+    return arredondado
+
+
+def _indices_em(unicos, nomes, codigos):
+    """Posição de cada valor fatorado em `nomes` (-1 quando ausente ou desconhecido)."""
+    posicoes = np.array([nomes.index(v) if v in nomes else -1 for v in unicos] + [-1], dtype=np.intp)
+    return posicoes[codigos]  # código -1 (valor ausente) cai no -1 final
+
+
+def _consultar(tabela, indices):
+    """tabela[indices], com NaN onde o índice é -1."""
+    return np.where(indices >= 0, tabela[indices], np.nan)
+
+
+def _como_array(valores, tamanho):
+    """Converte uma coluna de entrada em array, repetindo valores escalares para todo o lote."""
+    if np.ndim(valores) == 0:
+        return np.full(tamanho, valores, dtype=object if isinstance(valores, str) else float)
+    if isinstance(valores, (list, tuple)):
+        return np.asarray(valores, dtype=object)
+    return valores
+
+
+def _numerico(valores, tamanho):
+    return pd.to_numeric(np.asarray(_como_array(valores, tamanho)).reshape(tamanho), errors='coerce').astype(float)
+
+
+def colunas_faltando(colunas):
+    """Lista as colunas obrigatórias do lote que não estão em `colunas`."""
+    return [nome for nome in COLUNAS_ENTRADA_LOTE if nome not in colunas]
+
+
+def _preparar_entradas(dados, argumentos, calibracao=None):
+    """
+    Junta DataFrame e argumentos avulsos e converte as entradas em arrays (textos viram códigos).
+    Sem `calibracao`, a ativa (dgm.calibracao) é lida aqui, uma vez: todo o lote usa a mesma.
+    """
+    colunas = {} if dados is None else {nome: dados[nome] for nome in dados.columns}
+    for nome, valor in argumentos.items():
+        if valor is not None:
+            colunas[nome] = valor
+    faltando = colunas_faltando(colunas)
+    if faltando:
+        raise ValueError(f"Colunas de entrada ausentes: {faltando}")
+
+    n = max(len(np.atleast_1d(colunas[nome])) for nome in COLUNAS_ENTRADA_LOTE)
+    # Textos são fatorados uma única vez; as etapas seguintes trabalham só com códigos inteiros
+    codigos_local, locais_unicos = pd.factorize(_como_array(colunas["Local do Mamógrafo"], n))
+    codigos_alvo, alvos_unicos = pd.factorize(_como_array(colunas["Alvo/Filtro"], n))
+    return {
+        "codigos_local": codigos_local,
+        "locais_unicos": locais_unicos,
+        "codigos_alvo": codigos_alvo,
+        "alvos_unicos": alvos_unicos,
+        "idade": _numerico(colunas["Idade"], n),
+        "espessura": _numerico(colunas["Espessura (cm)"], n),
+        "kv": _numerico(colunas["Kv"], n),
+        "mas": _numerico(colunas["mAs"], n),
+        "glandularidade": _numerico(colunas.get(COLUNA_GLANDULARIDADE, np.nan), n),
+        "calibracao": calibracao if calibracao is not None else calibracao_ativa(),
+    }
+
+
+# --- Etapas do cálculo (grafo de dependências, ver dgm.grafo) ---
+# Cada etapa devolve também o código do primeiro erro dentro dela; _combinar_erros guarda,
+# por linha, o da primeira etapa que falhou, na mesma ordem das etapas.
+
+def _codigo_onde(mascara, codigo):
+    return np.where(mascara, codigo, 0).astype(np.int8)
+
+
+def _etapa_indices_alvo(codigos_alvo, alvos_unicos):
+    # Índices nas tabelas compiladas (-1 = alvo/filtro desconhecido)
+    return (_indices_em(alvos_unicos, NOMES_ALVO_FILTRO, codigos_alvo),)
+
+
+def _etapa_indices_local(codigos_local, locais_unicos, calibracao):
+    return (_indices_em(locais_unicos, calibracao.nomes_locais, codigos_local),)
+
+
+def _etapa_glandularidade(idade, espessura, glandularidade):
+    n = len(espessura)
+    espessura_mm = espessura * 10
+    g_a, g_b, g_c, g_k = (np.full(n, np.nan) for _ in range(4))
+    for idade_min, idade_max, a, b, c, k in FAIXAS_GLANDULARIDADE:
+        faixa = (idade_min <= idade) & (idade <= idade_max)
+        g_a[faixa], g_b[faixa], g_c[faixa], g_k[faixa] = a, b, c, k
+    glandularidade_calc = np.maximum(0, _arredondar(
+        (g_a * (espessura_mm**3)) + (g_b * (espessura_mm**2)) + (g_c * espessura_mm) + g_k, 2))
+    informada = ~np.isnan(glandularidade)
+    glandularidade_arr = np.where(informada, glandularidade, glandularidade_calc)
+
+    grupo = np.select(
+        [glandularidade_arr <= 25, glandularidade_arr <= 50, glandularidade_arr <= 75, glandularidade_arr > 75],
+        [1, 2, 3, 4], default=0)
+    return glandularidade_arr, grupo, _codigo_onde(np.isnan(glandularidade_arr), CodigoErro.IDADE_FORA_DA_FAIXA)
+
+
+def _etapa_valor_s(idx_alvo):
+    s_arr = _consultar(VALORES_S, idx_alvo)
+    return s_arr, _codigo_onde(np.isnan(s_arr), CodigoErro.ALVO_FILTRO_INVALIDO)
+
+
+# --- Incertezas por derivadas parciais manuais, sem o arredondamento final (as etapas arredondam) ---
+
+def _incerteza_csr(csr_a, kv):
+    d_kv_abs = kv * INCERTEZA_KV_PERCENTUAL
+    return np.sqrt(0 + (csr_a * d_kv_abs)**2)
+
+
+def _incerteza_fator_g(espessura, a1, a2, a3, da0, da1, da2, da3):
+    d_espessura_abs = espessura * INCERTEZA_ESPESSURA_PERCENTUAL
+    e = espessura
+    partial_deriv_espessura = a1 + 2*a2*e + 3*a3*e**2
+    soma = 0 + (partial_deriv_espessura * d_espessura_abs)**2
+    soma = soma + (1 * da0)**2
+    soma = soma + (e * da1)**2
+    soma = soma + (e**2 * da2)**2
+    soma = soma + (e**3 * da3)**2
+    return np.sqrt(soma)
+
+
+def _incerteza_fator_c(espessura, ca, cb, cc, cd):
+    d_espessura_abs = espessura * INCERTEZA_ESPESSURA_PERCENTUAL
+    e = espessura
+    partial_deriv_espessura = (3 * ca * e**2) + (2 * cb * e) + cc
+    soma = 0 + (partial_deriv_espessura * d_espessura_abs)**2
+    soma = soma + (e**3 * (ca * INCERTEZA_COEFS_FATOR_C_PERCENTUAL))**2
+    soma = soma + (e**2 * (cb * INCERTEZA_COEFS_FATOR_C_PERCENTUAL))**2
+    soma = soma + (e * (cc * INCERTEZA_COEFS_FATOR_C_PERCENTUAL))**2
+    soma = soma + (1 * (cd * INCERTEZA_COEFS_FATOR_C_PERCENTUAL))**2
+    return np.sqrt(soma)
+
+
+def _incerteza_ki(x_val, incerteza_interpolacao, mas, espessura, conversion_factor, reference_thickness, divisor):
+    d_mas_abs = mas * INCERTEZA_MAS_PERCENTUAL
+    d_espessura_abs = espessura * INCERTEZA_ESPESSURA_PERCENTUAL
+    with np.errstate(divide='ignore', invalid='ignore'):
+        partial_deriv_x = (mas * conversion_factor) / divisor
+        partial_deriv_mas = (x_val * conversion_factor) / divisor
+        partial_deriv_espessura = (x_val * mas * conversion_factor * 2) / ((reference_thickness - espessura)**3)
+    # Incerteza de x: tabela e, entre os kV tabelados, interpolação
+    d_x_abs = np.sqrt((x_val * INCERTEZA_X_KI_PERCENTUAL)**2 + incerteza_interpolacao**2)
+    soma = 0 + (partial_deriv_x * d_x_abs)**2
+    soma = soma + (partial_deriv_mas * d_mas_abs)**2
+    soma = soma + (partial_deriv_espessura * d_espessura_abs)**2
+    return np.sqrt(soma)
+
+
+def _incerteza_dgm(ki, incerteza_ki, valor_s, fator_g, incerteza_fator_g, fator_c, incerteza_fator_c):
+    incerteza_s = 0.0
+    soma = 0 + ((valor_s * fator_g * fator_c) * incerteza_ki)**2
+    soma = soma + ((ki * fator_g * fator_c) * incerteza_s)**2
+    soma = soma + ((ki * valor_s * fator_c) * incerteza_fator_g)**2
+    soma = soma + ((ki * valor_s * fator_g) * incerteza_fator_c)**2
+    return np.sqrt(soma) * 0.10
+
+
+def _etapa_csr(idx_alvo, kv):
+    csr_a = _consultar(COEFS_CSR[:, 0], idx_alvo)
+    csr_b = _consultar(COEFS_CSR[:, 1], idx_alvo)
+    csr_arr = _arredondar(csr_a * kv + csr_b, 2)
+    incerteza_csr = _arredondar(_incerteza_csr(csr_a, kv), 4)
+    csr_ok = ~np.isnan(csr_arr)
+    incerteza_csr[~csr_ok] = np.nan
+    return csr_arr, incerteza_csr, csr_ok, _codigo_onde(~csr_ok, CodigoErro.CSR_INDISPONIVEL)
+
+
+def _etapa_fator_g(csr, csr_ok, espessura):
+    idx_g = indices_csr_mais_proximo(csr, CSR_FATOR_G)
+    a0, a1, a2, a3 = COEFS_FATOR_G[idx_g].T
+    da0, da1, da2, da3 = INCERTEZAS_FATOR_G[idx_g].T
+    e = espessura
+    fator_g_calculado = (a0 + (a1 * e) + (a2 * (e**2)) + (a3 * (e**3)))
+    fator_g_arr = np.maximum(0, _arredondar(fator_g_calculado, 4))
+    incerteza_fator_g = _arredondar(_incerteza_fator_g(e, a1, a2, a3, da0, da1, da2, da3), 4)
+    fator_g_ok = csr_ok & ~np.isnan(fator_g_arr)
+    fator_g_arr[~fator_g_ok] = np.nan
+    incerteza_fator_g[~fator_g_ok] = np.nan
+    return fator_g_arr, incerteza_fator_g, _codigo_onde(~fator_g_ok, CodigoErro.FATOR_G)
+
+
+def _etapa_fator_c(csr, csr_ok, grupo, espessura):
+    idx_c = indices_csr_mais_proximo(csr, CSR_FATOR_C)
+    ca, cb, cc, cd = COEFS_FATOR_C[idx_c, np.clip(grupo - 1, 0, 3)].T  # grupo 0 (sem glandularidade) é descartado abaixo
+    e = espessura
+    fator_c_arr = _arredondar((ca * e**3) + (cb * e**2) + (cc * e) + cd, 4)
+    incerteza_fator_c = _arredondar(_incerteza_fator_c(e, ca, cb, cc, cd), 4)
+    fator_c_ok = csr_ok & (grupo > 0) & ~np.isnan(fator_c_arr)
+    fator_c_arr[~fator_c_ok] = np.nan
+    incerteza_fator_c[~fator_c_ok] = np.nan
+    return fator_c_arr, incerteza_fator_c, _codigo_onde(~fator_c_ok, CodigoErro.FATOR_C)
+
+
+def _etapa_ki(idx_local, idx_alvo, kv, mas, espessura, calibracao):
+    codigo_erro = np.zeros(len(kv), dtype=np.int8)
+
+    def registrar_erro(mascara, codigo):
+        codigo_erro[mascara & (codigo_erro == 0)] = codigo
+
+    x_val, incerteza_interpolacao = calibracao.interpolar_x_ki(idx_local, idx_alvo, kv)
+    sem_tabela = (idx_local < 0) | (idx_alvo < 0)
+    sem_tabela[~sem_tabela] = np.isnan(calibracao.kv_min[idx_local[~sem_tabela], idx_alvo[~sem_tabela]])
+    registrar_erro(idx_local < 0, CodigoErro.LOCAL_INVALIDO)
+    registrar_erro(sem_tabela, CodigoErro.ALVO_FILTRO_SEM_TABELA_KI)
+    registrar_erro(np.isnan(x_val), CodigoErro.KV_FORA_DA_TABELA)
+
+    conversion_factor = _consultar(calibracao.fatores[:, 0], idx_local)
+    reference_thickness = _consultar(calibracao.fatores[:, 1], idx_local)
+    divisor = (reference_thickness - espessura)**2
+    registrar_erro(divisor == 0, CodigoErro.ESPESSURA_INVALIDA)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ki_arr = _arredondar(((x_val * mas)*conversion_factor) / divisor, 2)
+    incerteza_ki = _arredondar(_incerteza_ki(x_val, incerteza_interpolacao, mas, espessura, conversion_factor,
+                                             reference_thickness, divisor), 4)
+    ki_ok = ~np.isnan(x_val) & (divisor != 0) & ~np.isnan(ki_arr)
+    ki_arr[~ki_ok] = np.nan
+    incerteza_ki[~ki_ok] = np.nan
+    registrar_erro(~ki_ok, CodigoErro.KI)
+    return ki_arr, incerteza_ki, codigo_erro
+
+
+def _etapa_dgm(ki, incerteza_ki, valor_s, fator_g, incerteza_fator_g, fator_c, incerteza_fator_c):
+    dgm = ki * valor_s * fator_g * fator_c
+    incerteza_dgm = _incerteza_dgm(ki, incerteza_ki, valor_s, fator_g, incerteza_fator_g, fator_c, incerteza_fator_c)
+    dgm_arr = _arredondar(dgm, 2)
+    incerteza_dgm = _arredondar(incerteza_dgm, 4)
+    return dgm_arr, incerteza_dgm, _codigo_onde(np.isnan(dgm_arr), CodigoErro.DGM)
+
+
+def _combinar_erros(erro_glandularidade, erro_valor_s, erro_csr, erro_fator_g, erro_fator_c, erro_ki, erro_dgm):
+    # Guarda só a primeira etapa que falhou em cada linha (0 = sem erro)
+    codigo_erro = erro_glandularidade.copy()
+    for erro in (erro_valor_s, erro_csr, erro_fator_g, erro_fator_c, erro_ki, erro_dgm):
+        sem_erro = codigo_erro == 0
+        codigo_erro[sem_erro] = erro[sem_erro]
+    return (codigo_erro,)
+
+
+GRAFO_LOTE = GrafoEtapas([
+    Etapa("Índices alvo/filtro", ("codigos_alvo", "alvos_unicos"), ("idx_alvo",), _etapa_indices_alvo),
+    Etapa("Índices local", ("codigos_local", "locais_unicos", "calibracao"), ("idx_local",), _etapa_indices_local),
+    Etapa("Glandularidade", ("idade", "espessura", "glandularidade"),
+          ("glandularidade_calculada", "grupo", "erro_glandularidade"), _etapa_glandularidade),
+    Etapa("Valor s", ("idx_alvo",), ("valor_s", "erro_valor_s"), _etapa_valor_s),
+    Etapa("CSR", ("idx_alvo", "kv"), ("csr", "incerteza_csr", "csr_ok", "erro_csr"), _etapa_csr),
+    Etapa("Fator g", ("csr", "csr_ok", "espessura"), ("fator_g", "incerteza_fator_g", "erro_fator_g"), _etapa_fator_g),
+    Etapa("Fator C", ("csr", "csr_ok", "grupo", "espessura"), ("fator_c", "incerteza_fator_c", "erro_fator_c"),
+          _etapa_fator_c),
+    Etapa("Ki", ("idx_local", "idx_alvo", "kv", "mas", "espessura", "calibracao"), ("ki", "incerteza_ki", "erro_ki"),
+          _etapa_ki),
+    Etapa("DGM", ("ki", "incerteza_ki", "valor_s", "fator_g", "incerteza_fator_g", "fator_c", "incerteza_fator_c"),
+          ("dgm", "incerteza_dgm", "erro_dgm"), _etapa_dgm),
+    Etapa("Erro", ("erro_glandularidade", "erro_valor_s", "erro_csr", "erro_fator_g", "erro_fator_c", "erro_ki",
+                   "erro_dgm"), ("codigo_erro",), _combinar_erros),
+])
+
+# Coluna do resultado -> valor do grafo
+_SAIDAS_LOTE = {
+    "Glandularidade (%)": "glandularidade_calculada",
+    "Valor s": "valor_s",
+    "CSR": "csr",
+    "Incerteza CSR": "incerteza_csr",
+    "Fator g": "fator_g",
+    "Incerteza Fator g": "incerteza_fator_g",
+    "Fator C": "fator_c",
+    "Incerteza Fator C": "incerteza_fator_c",
+    "Ki": "ki",
+    "Incerteza Ki": "incerteza_ki",
+    "DGM (mGy)": "dgm",
+    "Incerteza DGM (mGy)": "incerteza_dgm",
+}
+
+
+def _resultados_do_grafo(valores):
+    grupo = valores["grupo"]
+    resultados = {coluna: valores[nome] for coluna, nome in _SAIDAS_LOTE.items()}
+    resultados["Grupo Glandularidade"] = np.where(grupo > 0, grupo, np.nan)
+    return {coluna: resultados[coluna] for coluna in COLUNAS_RESULTADO_LOTE}, valores["codigo_erro"], list(MENSAGENS_ERRO)
+
+
+def _calcular(entradas):
+    """
+    Núcleo vetorizado sobre as entradas de _preparar_entradas.
+    Returns:
+        tuple: (arrays das colunas de COLUNAS_RESULTADO_LOTE, código de erro por linha
+            (dgm.resultados.CodigoErro, 0 = sem erro), mensagens de erro indexadas pelo código).
+    """
+    return _resultados_do_grafo(GRAFO_LOTE.calcular(entradas))
+
+
+def _carimbos_calibracao(entradas):
+    """Carimbo "local@versão" da calibração usada em cada linha ("" para locais sem calibração)."""
+    carimbo_por_local = entradas["calibracao"].carimbo_por_local
+    carimbos = list(dict.fromkeys([carimbo_por_local.get(local, "") for local in entradas["locais_unicos"]] + [""]))
+    posicoes = np.array([carimbos.index(carimbo_por_local.get(local, "")) for local in entradas["locais_unicos"]]
+                        + [carimbos.index("")], dtype=np.intp)
+    return pd.Categorical.from_codes(posicoes[entradas["codigos_local"]], categories=pd.Index(carimbos))
+
+
+def _montar_resultado(entradas, resultados, codigo_erro, mensagens_erro, indice=None):
+    resultado = pd.DataFrame({
+        "Local do Mamógrafo": pd.Categorical.from_codes(entradas["codigos_local"], categories=pd.Index(entradas["locais_unicos"])),
+        "Idade": entradas["idade"],
+        "Espessura (cm)": entradas["espessura"],
+        "Alvo/Filtro": pd.Categorical.from_codes(entradas["codigos_alvo"], categories=pd.Index(entradas["alvos_unicos"])),
+        "Kv": entradas["kv"],
+        "mAs": entradas["mas"],
+        **resultados,
+        # Categórica: códigos inteiros (CodigoErro) e a tabela de mensagens, sem uma string por linha
+        "Erro": pd.Categorical.from_codes(codigo_erro, categories=pd.Index(mensagens_erro)),
+        COLUNA_CALIBRACAO: _carimbos_calibracao(entradas),
+    })
+    if indice is not None:
+        resultado.index = indice
+    return resultado
+
+
+def calcular_dgm_lote(dados=None, *, idade=None, espessura=None, alvo_filtro=None, kv=None, mas=None,
+                      local=None, glandularidade=None, calibracao=None):
+    """
+    Calcula a DGM e todos os valores intermediários para um lote de exposições.
+    Args:
+        dados (pd.DataFrame, opcional): Exposições com as colunas de COLUNAS_ENTRADA_LOTE e,
+            opcionalmente, "Glandularidade (%)" (NaN = calcular a partir da idade).
+        idade, espessura, alvo_filtro, kv, mas, local, glandularidade (array-like, opcionais):
+            Alternativa ao DataFrame; cada argumento informado substitui a coluna correspondente.
+        calibracao (dgm.calibracao.Calibracao, opcional): Calibração a usar (padrão: a ativa).
+    Returns:
+        pd.DataFrame: Entradas, colunas de COLUNAS_RESULTADO_LOTE (NaN quando a etapa falha)
+            a coluna "Erro" com a mensagem da primeira etapa que falhou ("" quando não houve erro),
+            categórica sobre dgm.resultados.MENSAGENS_ERRO (códigos = CodigoErro), e a coluna
+            "Calibração" com o carimbo "local@versão" da calibração usada (dgm.calibracao).
+    """
+    return _calcular_dgm_lote(dados, idade=idade, espessura=espessura, alvo_filtro=alvo_filtro, kv=kv, mas=mas,
+                              local=local, glandularidade=glandularidade, calibracao=calibracao)[0]
+
+
+def _calcular_dgm_lote(dados=None, *, idade=None, espessura=None, alvo_filtro=None, kv=None, mas=None, local=None,
+                       glandularidade=None, calibracao=None):
+    """
+    calcular_dgm_lote, devolvendo também os valores do grafo (entradas e saídas de todas as
+    etapas, na ordem das linhas), para quem continua o cálculo sem reextrair as colunas do
+    resultado (dgm.autodiff).
+    Returns:
+        tuple: (resultado, valores de GRAFO_LOTE.calcular)
+    """
+    inicio = time.perf_counter()
+    entradas = _preparar_entradas(dados, {
+        "Local do Mamógrafo": local, "Idade": idade, "Espessura (cm)": espessura,
+        "Alvo/Filtro": alvo_filtro, "Kv": kv, "mAs": mas, COLUNA_GLANDULARIDADE: glandularidade,
+    }, calibracao)
+    valores = GRAFO_LOTE.calcular(entradas)
+    resultados, codigo_erro, mensagens_erro = _resultados_do_grafo(valores)
+    resultado = _montar_resultado(entradas, resultados, codigo_erro, mensagens_erro,
+                                  None if dados is None else dados.index)
+    if metricas_ativas():
+        _registrar_metricas_lote(time.perf_counter() - inicio, codigo_erro, mensagens_erro)
+    return resultado, valores
+
+
+# Coluna de entrada -> entradas do grafo que ela define
+_ENTRADAS_POR_COLUNA = {
+    "Local do Mamógrafo": ("codigos_local", "locais_unicos"),
+    "Idade": ("idade",),
+    "Espessura (cm)": ("espessura",),
+    "Alvo/Filtro": ("codigos_alvo", "alvos_unicos"),
+    "Kv": ("kv",),
+    "mAs": ("mas",),
+    COLUNA_GLANDULARIDADE: ("glandularidade",),
+}
+
+
+def varrer_lote(dados=None, *, coluna, valores, idade=None, espessura=None, alvo_filtro=None, kv=None, mas=None,
+                local=None, glandularidade=None):
+    """
+    Calcula o mesmo lote para cada valor de uma das entradas (análise "e se").
+    O lote é calculado uma vez; para os valores seguintes, só as etapas que dependem da coluna
+    variada são refeitas (ex.: variando o mAs, só Ki e DGM), e as demais são reaproveitadas.
+    Args:
+        dados, idade, ..., glandularidade: Como em calcular_dgm_lote.
+        coluna (str): Coluna variada (COLUNAS_ENTRADA_LOTE ou "Glandularidade (%)").
+        valores (iterável): Valores da coluna; cada um é aplicado a todas as exposições.
+    Returns:
+        pd.DataFrame: Resultados de calcular_dgm_lote empilhados, um bloco por valor, com a
+            coluna "Valor Variado" no início (o índice de `dados` se repete em cada bloco).
+    """
+    if coluna not in _ENTRADAS_POR_COLUNA:
+        raise ValueError(f"Coluna não pode ser variada: {coluna!r}. Opções: {list(_ENTRADAS_POR_COLUNA)}")
+    valores = list(valores)
+    if not valores:
+        raise ValueError("Informe ao menos um valor.")
+    inicio = time.perf_counter()
+    argumentos = {
+        "Local do Mamógrafo": local, "Idade": idade, "Espessura (cm)": espessura,
+        "Alvo/Filtro": alvo_filtro, "Kv": kv, "mAs": mas, COLUNA_GLANDULARIDADE: glandularidade,
+    }
+    argumentos[coluna] = valores[0]
+    entradas = _preparar_entradas(dados, argumentos)
+    n = len(entradas["kv"])
+    indice = None if dados is None else dados.index
+    variadas = _ENTRADAS_POR_COLUNA[coluna]
+
+    calculo = CalculoIncremental(GRAFO_LOTE)
+    blocos, codigos = [], []
+    for valor in valores:
+        if len(variadas) == 2:  # texto: todas as linhas com o mesmo código
+            entradas[variadas[0]], entradas[variadas[1]] = pd.factorize(_como_array(valor, n))
+        else:
+            entradas[variadas[0]] = _numerico(valor, n)
+        resultados, codigo_erro, mensagens_erro = _resultados_do_grafo(calculo.calcular(**entradas))
+        bloco = _montar_resultado(entradas, resultados, codigo_erro, mensagens_erro, indice)
+        bloco.insert(0, "Valor Variado", valor)
+        blocos.append(bloco)
+        codigos.append(codigo_erro)
+    resultado = pd.concat(blocos)
+    if metricas_ativas():
+        _registrar_metricas_lote(time.perf_counter() - inicio, np.concatenate(codigos), mensagens_erro)
+    return resultado
+
+
+def _registrar_metricas_lote(segundos, codigo_erro, mensagens_erro):
+    """Envia às métricas de "Lote" a duração e o número de linhas por mensagem de erro."""
+    registrar_lote(segundos, dict(zip(mensagens_erro, np.bincount(codigo_erro, minlength=len(mensagens_erro)).tolist())))
@@ -0,0 +1,193 @@
+"""
+Instrumentação das etapas do cálculo da DGM: latência (histograma), chamadas e erros por tipo.
+
+As funções calcular_* de dgm.nucleo são decoradas com instrumentar(etapa). Com as métricas
+desativadas (padrão), o decorador só testa uma variável global antes de chamar a função.
+Ative com ativar_metricas(True) ou com a variável de ambiente DGM_METRICAS=1.
+
+As etapas sinalizam falhas devolvendo textos ("Erro CSR", "Kv 28.5 fora do intervalo...");
+o tipo do erro é obtido desses textos por TIPOS_ERRO, sem os valores variáveis.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from dgm.resultados import TRECHOS_ERRO, codigo_erro
+
+_ativo = os.environ.get("DGM_METRICAS", "").lower() in ("1", "true", "sim")
+
+# Limites superiores (segundos) das faixas do histograma de latência
+LIMITES_HISTOGRAMA = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+
+# Trecho da mensagem de erro -> tipo do erro (a primeira correspondência vale; ver dgm.resultados)
+TIPOS_ERRO = [(trecho, codigo.tipo) for trecho, codigo in TRECHOS_ERRO]
+
+
+def tipo_erro(mensagem):
+    return codigo_erro(mensagem).tipo
+
+
+class MetricasEtapa:
+    """Contadores e histograma de latência de uma etapa."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self._trava = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        self.chamadas = 0
+        self.soma_segundos = 0.0
+        self.faixas = [0] * (len(LIMITES_HISTOGRAMA) + 1)  # a última faixa é +Inf
+        self.erros = {}
+
+    def registrar(self, segundos, erro=None, quantidade=1):
+        """Registra `quantidade` chamadas que levaram `segundos` no total (erro = tipo, se falhou)."""
+        faixa = bisect_left(LIMITES_HISTOGRAMA, segundos / quantidade)
+        with self._trava:
+            self.chamadas += quantidade
+            self.soma_segundos += segundos
+            self.faixas[faixa] += quantidade
+            if erro is not None:
+                self.erros[erro] = self.erros.get(erro, 0) + 1
+
+    def registrar_erros(self, erros):
+        """Soma contagens de erros {tipo: quantidade} (usado pelo cálculo em lote)."""
+        with self._trava:
+            for tipo, quantidade in erros.items():
+                self.erros[tipo] = self.erros.get(tipo, 0) + quantidade
+
+    def quantil(self, q):
+        """Estimativa do quantil q da latência: limite superior da faixa que o contém."""
+        with self._trava:
+            faixas, chamadas = list(self.faixas), self.chamadas
+        if not chamadas:
+            return None
+        alvo, acumulado = q * chamadas, 0
+        for limite, contagem in zip(LIMITES_HISTOGRAMA + (float("inf"),), faixas):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float("inf")
+
+    def estatisticas(self):
+        with self._trava:
+            chamadas, soma, erros = self.chamadas, self.soma_segundos, dict(self.erros)
+            faixas = list(self.faixas)
+        return {
+            "etapa": self.nome,
+            "chamadas": chamadas,
+            "erros": sum(erros.values()),
+            "media_ms": soma / chamadas * 1e3 if chamadas else 0.0,
+            "p50_ms": _em_ms(self.quantil(0.5)),
+            "p95_ms": _em_ms(self.quantil(0.95)),
+            "p99_ms": _em_ms(self.quantil(0.99)),
+            "soma_segundos": soma,
+            "histograma": dict(zip([str(l) for l in LIMITES_HISTOGRAMA] + ["+Inf"], faixas)),
+            "erros_por_tipo": erros,
+        }
+
+
+def _em_ms(segundos):
+    return None if segundos is None else segundos * 1e3
+
+
+# Uma entrada por etapa, na ordem do cálculo (em "Lote", cada linha calculada conta como uma chamada)
+ETAPAS = {nome: MetricasEtapa(nome) for nome in
+          ("Glandularidade", "Valor s", "CSR", "Fator g", "Fator C", "Ki", "DGM", "Lote")}
+
+
+def instrumentar(etapa):
+    """Decorador: mede a função e conta como erro o retorno em texto (ou o primeiro item em texto)."""
+    metricas = ETAPAS[etapa]
+
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao(*args, **kwargs)
+            except Exception:
+                metricas.registrar(time.perf_counter() - inicio, "excecao")
+                raise
+            valor = resultado[0] if isinstance(resultado, tuple) else resultado
+            metricas.registrar(time.perf_counter() - inicio, tipo_erro(valor) if isinstance(valor, str) else None)
+            return resultado
+        return envolvida
+    return decorador
+
+
+def registrar_lote(segundos, contagem_por_mensagem):
+    """Registra uma chamada de calcular_dgm_lote: linhas processadas e erros {mensagem: linhas}."""
+    linhas = sum(contagem_por_mensagem.values())
+    if linhas == 0:
+        return
+    metricas = ETAPAS["Lote"]
+    metricas.registrar(segundos, quantidade=linhas)
+    erros = {}
+    for mensagem, quantidade in contagem_por_mensagem.items():
+        if mensagem and quantidade:
+            tipo = tipo_erro(mensagem)
+            erros[tipo] = erros.get(tipo, 0) + quantidade
+    metricas.registrar_erros(erros)
+
+
+def ativar_metricas(ativo=True):
+    global _ativo
+    _ativo = bool(ativo)
+
+
+def metricas_ativas():
+    return _ativo
+
+
+def limpar_metricas():
+    for metricas in ETAPAS.values():
+        with metricas._trava:
+            metricas.limpar()
+
+
+def estatisticas_metricas():
+    """Lista com chamadas, erros, latência média e quantis estimados (ms) de cada etapa."""
+    return [metricas.estatisticas() for metricas in ETAPAS.values()]
+
+
+def exportar_metricas_json():
+    return json.dumps({"ativas": _ativo, "etapas": estatisticas_metricas()}, indent=2, ensure_ascii=False)
+
+
+def _rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def exportar_metricas_prometheus():
+    """Métricas no formato de texto do Prometheus (histograma de latência e contadores de erros)."""
+    linhas = [
+        "# HELP dgm_etapa_duracao_segundos Latência das etapas do cálculo da DGM.",
+        "# TYPE dgm_etapa_duracao_segundos histogram",
+    ]
+    for metricas in ETAPAS.values():
+        with metricas._trava:
+            faixas, soma, chamadas = list(metricas.faixas), metricas.soma_segundos, metricas.chamadas
+        etapa = _rotulo(metricas.nome)
+        acumulado = 0
+        for limite, contagem in zip([repr(l) for l in LIMITES_HISTOGRAMA] + ["+Inf"], faixas):
+            acumulado += contagem
+            linhas.append(f'dgm_etapa_duracao_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+        linhas.append(f'dgm_etapa_duracao_segundos_sum{{etapa="{etapa}"}} {soma!r}')
+        linhas.append(f'dgm_etapa_duracao_segundos_count{{etapa="{etapa}"}} {chamadas}')
+    linhas += [
+        "# HELP dgm_etapa_erros_total Falhas das etapas do cálculo da DGM, por tipo.",
+        "# TYPE dgm_etapa_erros_total counter",
+    ]
+    for metricas in ETAPAS.values():
+        with metricas._trava:
+            erros = dict(metricas.erros)
+        for tipo, quantidade in sorted(erros.items()):
+            linhas.append(f'dgm_etapa_erros_total{{etapa="{_rotulo(metricas.nome)}",tipo="{_rotulo(tipo)}"}} {quantidade}')
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,193 @@
+"""
+Propagação de incertezas da DGM por Monte Carlo (GUM Suplemento 1), vetorizada com NumPy.
+
+A propagação de dgm.nucleo é de primeira ordem e trata cada etapa como independente, embora
+a espessura entre no fator g, no fator C e no Ki ao mesmo tempo. Aqui cada amostra sorteia
+kV, mAs, espessura, o valor x da tabela Ki e os coeficientes dos fatores g e C, e percorre a
+cadeia completa CSR -> g/C/Ki -> DGM; a mesma espessura sorteada é usada em todas as etapas,
+e a faixa de CSR de cada fator é escolhida a partir do CSR da própria amostra.
+
+Hipóteses do modelo (as mesmas incertezas da propagação analítica, como desvios-padrão de
+distribuições normais):
+    - kV, mAs e espessura: INCERTEZA_*_PERCENTUAL do valor nominal;
+    - x da tabela Ki: INCERTEZA_X_KI_PERCENTUAL combinada com a incerteza de interpolação em kV
+      (tabela Ki da calibração ativa, dgm.calibracao); coeficientes do fator C:
+      INCERTEZA_COEFS_FATOR_C_PERCENTUAL; coeficientes do fator g: da0..da3 da faixa;
+    - s, coeficientes do CSR e glandularidade (e portanto o grupo) são tratados como exatos,
+      como no cálculo individual; x é interpolado no kV nominal do equipamento, não no sorteado.
+O fator 0.10 aplicado à incerteza analítica da DGM não é aplicado aqui: o desvio-padrão
+informado é o da distribuição simulada.
+
+As amostras são processadas em blocos (tamanho_bloco valores por vez), e só o vetor de DGM
+de cada exposição fica na memória até o cálculo dos quantis.
+"""
+import numpy as np
+import pandas as pd
+
+from dgm.tabelas import (
+    INCERTEZA_KV_PERCENTUAL,
+    INCERTEZA_MAS_PERCENTUAL,
+    INCERTEZA_ESPESSURA_PERCENTUAL,
+    INCERTEZA_X_KI_PERCENTUAL,
+    INCERTEZA_COEFS_FATOR_C_PERCENTUAL,
+    NOMES_ALVO_FILTRO,
+    COEFS_CSR,
+    CSR_FATOR_G,
+    COEFS_FATOR_G,
+    INCERTEZAS_FATOR_G,
+    CSR_FATOR_C,
+    COEFS_FATOR_C,
+    indices_csr_mais_proximo,
+)
+from dgm.calibracao import calibracao_ativa
+from dgm.lote import calcular_dgm_lote
+
+AMOSTRAS_PADRAO = 1_000_000
+AMOSTRAS_PADRAO_LOTE = 10_000
+COBERTURA_PADRAO = 0.95
+# Valores sorteados por bloco (limita a memória temporária de cada passo)
+TAMANHO_BLOCO_PADRAO = 250_000
+# Máximo de amostras de DGM guardadas ao mesmo tempo (várias exposições do lote juntas)
+MAX_AMOSTRAS_EM_MEMORIA = 4_000_000
+
+COLUNAS_MONTE_CARLO = [
+    "DGM MC Média (mGy)", "DGM MC Desvio Padrão (mGy)", "DGM MC Limite Inferior (mGy)", "DGM MC Limite Superior (mGy)"
+]
+
+
+def _parametros_nominais(resultado, calibracao):
+    """
+    Extrai do resultado de calcular_dgm_lote os valores nominais usados na simulação, com a
+    mesma calibração do cálculo (não a ativa no momento: uma recarga pode ter ocorrido entre os dois).
+    """
+    idx_alvo = np.array([NOMES_ALVO_FILTRO.index(af) for af in resultado["Alvo/Filtro"]], dtype=np.intp)
+    idx_local = np.array([calibracao.indice_local[local] for local in resultado["Local do Mamógrafo"]], dtype=np.intp)
+    kv = resultado["Kv"].to_numpy(dtype=float)
+    x_val, incerteza_interpolacao = calibracao.interpolar_x_ki(idx_local, idx_alvo, kv)
+    return {
+        "kv": kv,
+        "mas": resultado["mAs"].to_numpy(dtype=float),
+        "espessura": resultado["Espessura (cm)"].to_numpy(dtype=float),
+        "grupo": resultado["Grupo Glandularidade"].to_numpy(dtype=float).astype(np.intp),
+        "s": resultado["Valor s"].to_numpy(dtype=float),
+        "csr_a": COEFS_CSR[idx_alvo, 0],
+        "csr_b": COEFS_CSR[idx_alvo, 1],
+        "x": x_val,
+        "d_x": np.sqrt((x_val * INCERTEZA_X_KI_PERCENTUAL)**2 + incerteza_interpolacao**2),
+        "conversion_factor": calibracao.fatores[idx_local, 0],
+        "reference_thickness": calibracao.fatores[idx_local, 1],
+    }
+
+
+def _normal(rng, forma):
+    # Sorteio em float32 (cerca de 2x mais rápido); as contas seguintes são feitas em float64
+    return rng.standard_normal(forma, dtype=np.float32)
+
+
+def _simular_bloco(p, m, rng):
+    """Sorteia m amostras para cada exposição de `p` (arrays de forma (E, 1)) e retorna a DGM (E, m)."""
+    forma = (p["kv"].shape[0], m)
+    kv = p["kv"] * (1 + INCERTEZA_KV_PERCENTUAL * _normal(rng, forma))
+    mas = p["mas"] * (1 + INCERTEZA_MAS_PERCENTUAL * _normal(rng, forma))
+    e = p["espessura"] * (1 + INCERTEZA_ESPESSURA_PERCENTUAL * _normal(rng, forma))
+    x_val = p["x"] + p["d_x"] * _normal(rng, forma)
+
+    # --- CSR ---
+    csr = p["csr_a"] * kv + p["csr_b"]
+
+    # --- Fator g (faixa escolhida pelo CSR da amostra) ---
+    idx_g = indices_csr_mais_proximo(csr, CSR_FATOR_G)
+    a0, a1, a2, a3 = (np.take(COEFS_FATOR_G[:, k], idx_g) + np.take(INCERTEZAS_FATOR_G[:, k], idx_g) * _normal(rng, forma)
+                      for k in range(4))
+    fator_g = np.maximum(0, a0 + (a1 * e) + (a2 * (e**2)) + (a3 * (e**3)))
+
+    # --- Fator C ---
+    idx_c = indices_csr_mais_proximo(csr, CSR_FATOR_C) * 4 + (p["grupo"] - 1)  # índice em COEFS_FATOR_C[:, :, k].ravel()
+    ca, cb, cc, cd = (np.take(COEFS_FATOR_C[:, :, k], idx_c) * (1 + INCERTEZA_COEFS_FATOR_C_PERCENTUAL * _normal(rng, forma))
+                      for k in range(4))
+    fator_c = (ca * e**3) + (cb * e**2) + (cc * e) + cd
+
+    # --- Ki ---
+    ki = ((x_val * mas) * p["conversion_factor"]) / (p["reference_thickness"] - e)**2
+
+    return ki * p["s"] * fator_g * fator_c
+
+
+def _simular(p, amostras, rng, tamanho_bloco):
+    """DGM simulada (E, amostras) para as exposições de `p`, sorteada em blocos de até tamanho_bloco valores."""
+    n = len(p["kv"])
+    p = {nome: valores[:, None] for nome, valores in p.items()}
+    dgm = np.empty((n, amostras))
+    passo = max(1, tamanho_bloco // n)
+    for inicio in range(0, amostras, passo):
+        fim = min(inicio + passo, amostras)
+        dgm[:, inicio:fim] = _simular_bloco(p, fim - inicio, rng)
+    return dgm
+
+
+def simular_dgm_lote(dados=None, *, amostras=AMOSTRAS_PADRAO_LOTE, semente=None, cobertura=COBERTURA_PADRAO,
+                     tamanho_bloco=TAMANHO_BLOCO_PADRAO, calibracao=None, **entradas):
+    """
+    Calcula a DGM de um lote (como calcular_dgm_lote) e acrescenta a incerteza por Monte Carlo.
+    Args:
+        dados, **entradas: Como em calcular_dgm_lote (DataFrame e/ou idade, espessura, alvo_filtro,
+            kv, mas, local, glandularidade).
+        amostras (int): Amostras por exposição.
+        semente (int ou np.random.Generator, opcional): Semente do gerador; com os mesmos argumentos
+            o resultado se repete. Um Generator pode ser reaproveitado entre blocos de um arquivo.
+        cobertura (float): Probabilidade do intervalo de abrangência (probabilisticamente simétrico).
+        tamanho_bloco (int): Valores sorteados por bloco.
+        calibracao (dgm.calibracao.Calibracao, opcional): Calibração a usar (padrão: a ativa).
+    Returns:
+        pd.DataFrame: Resultado de calcular_dgm_lote com as colunas de COLUNAS_MONTE_CARLO
+            (NaN nas linhas com erro).
+    """
+    if amostras < 2:
+        raise ValueError("São necessárias pelo menos 2 amostras.")
+    if not 0 < cobertura < 1:
+        raise ValueError("A cobertura deve estar entre 0 e 1.")
+    calibracao = calibracao or calibracao_ativa()
+    resultado = calcular_dgm_lote(dados, calibracao=calibracao, **entradas)
+    estatisticas = np.full((len(resultado), 4), np.nan)
+    validas = np.flatnonzero((resultado["Erro"] == "").to_numpy())
+    rng = np.random.default_rng(semente)
+    quantis = [(1 - cobertura) / 2, (1 + cobertura) / 2]
+
+    parametros = _parametros_nominais(resultado.iloc[validas], calibracao)
+    por_grupo = max(1, MAX_AMOSTRAS_EM_MEMORIA // amostras)
+    for inicio in range(0, len(validas), por_grupo):
+        fatia = slice(inicio, inicio + por_grupo)
+        dgm = _simular({nome: valores[fatia] for nome, valores in parametros.items()}, amostras, rng, tamanho_bloco)
+        limites = np.quantile(dgm, quantis, axis=1)
+        estatisticas[validas[fatia]] = np.column_stack([dgm.mean(axis=1), dgm.std(axis=1, ddof=1), limites[0], limites[1]])
+
+    for i, coluna in enumerate(COLUNAS_MONTE_CARLO):
+        resultado[coluna] = estatisticas[:, i]
+    return resultado
+
+
+def simular_dgm(kv, alvo_filtro, mas, espessura, local, idade=None, glandularidade=None, *, amostras=AMOSTRAS_PADRAO,
+                semente=None, cobertura=COBERTURA_PADRAO, tamanho_bloco=TAMANHO_BLOCO_PADRAO, calibracao=None):
+    """
+    Incerteza da DGM de uma exposição por Monte Carlo (calibracao: como em simular_dgm_lote).
+    Returns:
+        dict: media, desvio_padrao, limite_inferior, limite_superior (mGy), cobertura e amostras.
+    Raises:
+        ValueError: Com a mensagem da etapa que falhou, se a exposição não puder ser calculada.
+    """
+    resultado = simular_dgm_lote(
+        idade=[np.nan if idade is None else idade], espessura=[espessura], alvo_filtro=[alvo_filtro], kv=[kv],
+        mas=[mas], local=[local], glandularidade=[np.nan if glandularidade is None else glandularidade],
+        amostras=amostras, semente=semente, cobertura=cobertura, tamanho_bloco=tamanho_bloco, calibracao=calibracao,
+    ).iloc[0]
+    if resultado["Erro"]:
+        raise ValueError(resultado["Erro"])
+    media, desvio, inferior, superior = (float(resultado[coluna]) for coluna in COLUNAS_MONTE_CARLO)
+    return {
+        "media": media,
+        "desvio_padrao": desvio,
+        "limite_inferior": inferior,
+        "limite_superior": superior,
+        "cobertura": cobertura,
+        "amostras": amostras,
+    }
@@ -0,0 +1,334 @@
+"""
+Núcleo de cálculo da DGM (sem dependência do Streamlit).
+
+Contém as funções calcular_* usadas pela interface (dgm_calculator.py) e pela linha
+de comando; as tabelas e constantes ficam em dgm.tabelas e são reexportadas aqui.
+"""
+import math # Para sqrt
+
+from dgm.tabelas import (
+    alvo_filtro_options,
+    csr_coeffs,
+    tabela_ki_ird,
+    tabela_ki_ufrj,
+    tabelas_ki_por_local,
+    formulas_fator_c,
+    FATOR_G_CONSTANTS_UNCERTAINTIES,
+    INCERTEZA_KV_PERCENTUAL,
+    INCERTEZA_MAS_PERCENTUAL,
+    INCERTEZA_ESPESSURA_PERCENTUAL,
+    INCERTEZA_X_KI_PERCENTUAL,
+    INCERTEZA_COEFS_FATOR_C_PERCENTUAL,
+    coeficientes_fator_c,
+    coeficientes_fator_g,
+    csr_mais_proximo_fator_c,
+    faixa_csr_fator_g,
+)
+from dgm.calibracao import calibracao_ativa
+from dgm.cache import CACHE_CSR, CACHE_FATOR_G, CACHE_FATOR_C, CACHE_TABELA_KI
+from dgm.metricas import instrumentar
+
+# --- FUNÇÃO GENÉRICA DE PROPAGAÇÃO DE INCERTEZAS (MANUAL) ---
+def propagate_uncertainty(value_func, uncertainty_terms):
+    """
+    Calcula a incerteza propagada usando a fórmula da raiz quadrada da soma dos quadrados (RSS).
+    Args:
+        value_func (callable): Uma função que retorna o valor da medida.
+        uncertainty_terms (list of tuples): Lista de (derivada_parcial, incerteza_da_entrada).
+            A derivada parcial deve ser o valor numérico avaliado.
+    Returns:
+        float: A incerteza propagada.
+    """
+    sum_of_squares = 0
+    for partial_deriv, input_uncertainty in uncertainty_terms:
+        sum_of_squares += (partial_deriv * input_uncertainty)**2
+    
+    return math.sqrt(sum_of_squares)
+
+# --- FIM FUNÇÃO GENÉRICA DE PROPAGAÇÃO DE INCERTEZAS ---
+
+# Função auxiliar para extrair coeficientes do Fator C (consulta a tabela compilada em dgm.tabelas).
+def get_coeffs_from_lambda_for_fator_c(csr_key, group_key):
+    coeffs = coeficientes_fator_c(csr_key, group_key)
+    if coeffs is None:
+        return None
+    return dict(zip(('a', 'b', 'c', 'd'), coeffs))
+
+
+# Valor s do alvo/filtro (tabelado, sem incerteza)
+@instrumentar("Valor s")
+def calcular_valor_s(alvo_filtro):
+    s = alvo_filtro_options.get(alvo_filtro)
+    if s is None:
+        return "Alvo/Filtro inválido."
+    return s
+
+
+# Fórmulas para CSR (função)
+@instrumentar("CSR")
+def calcular_csr(kv_val, alvo_filtro, d_kv_abs):
+    return CACHE_CSR.obter((alvo_filtro, kv_val, d_kv_abs), _calcular_csr, kv_val, alvo_filtro, d_kv_abs)
+
+
+def _calcular_csr(kv_val, alvo_filtro, d_kv_abs):
+    try:
+        const_a = csr_coeffs.get(alvo_filtro)['a']
+        const_b = csr_coeffs.get(alvo_filtro)['b']
+        
+        csr_val = round(const_a * kv_val + const_b, 2)
+
+        # Derivada parcial de CSR em relação a Kv é 'const_a'
+        partial_deriv_kv = const_a
+        
+        incerteza_csr = propagate_uncertainty(
+            lambda: csr_val,
+            [(partial_deriv_kv, d_kv_abs)]
+        )
+
+        return csr_val, round(incerteza_csr, 4)
+    except Exception: # Captura qualquer erro, incluindo se alvo/filtro for inválido
+        return "Erro CSR", 0.0
+
+
+# FUNÇÃO calcular_fator_g
+@instrumentar("Fator g")
+def calcular_fator_g(csr_val, espessura_val, d_espessura_abs):
+    """
+    Calcula o fator g e sua incerteza.
+    """
+    try:
+        # O resultado depende só da faixa de CSR mais próxima, que indexa o cache
+        faixa = faixa_csr_fator_g(csr_val)
+        return CACHE_FATOR_G.obter((faixa, espessura_val, d_espessura_abs),
+                                   _fator_g_da_faixa, faixa, espessura_val, d_espessura_abs)
+    except Exception: # Captura qualquer erro
+        return "Erro Fator g", 0.0
+
+
+def _fator_g_da_faixa(faixa, espessura_val, d_espessura_abs):
+    # Constantes e incertezas da faixa de CSR (tabela compilada)
+    (a0, a1, a2, a3), (da0, da1, da2, da3) = coeficientes_fator_g(faixa)
+
+    # Valor numérico do Fator g
+    fator_g_calculado = (a0 + (a1 * espessura_val) + (a2 * (espessura_val**2)) + (a3 * (espessura_val**3)))
+    fator_g_val = max(0, round(fator_g_calculado, 4))
+
+    # Calcula as derivadas parciais manualmente
+    # f(x, a0, a1, a2, a3) = a0 + a1*x + a2*x^2 + a3*x^3
+    # Derivada em relação a x (espessura_val): a1 + 2*a2*x + 3*a3*x^2
+    partial_deriv_espessura = a1 + 2*a2*espessura_val + 3*a3*espessura_val**2
+    # Derivada em relação a a0: 1
+    partial_deriv_a0 = 1
+    # Derivada em relação a a1: x
+    partial_deriv_a1 = espessura_val
+    # Derivada em relação a a2: x^2
+    partial_deriv_a2 = espessura_val**2
+    # Derivada em relação a a3: x^3
+    partial_deriv_a3 = espessura_val**3
+
+    incerteza_fator_g = propagate_uncertainty(
+        lambda: fator_g_val, # O valor da função
+        [
+            (partial_deriv_espessura, d_espessura_abs),
+            (partial_deriv_a0, da0),
+            (partial_deriv_a1, da1),
+            (partial_deriv_a2, da2),
+            (partial_deriv_a3, da3)
+        ]
+    )
+
+    return fator_g_val, round(incerteza_fator_g, 4)
+
+# FUNÇÃO DE GLANDULARIDADE (incerteza não propagada aqui, assumida como exata)
+@instrumentar("Glandularidade")
+def calcular_glandularidade(idade, espessura_mama_cm):
+    """
+    Calcula a glandularidade usando a fórmula G = at^3 + bt^2 + ct + k.
+    t é a espessura da mama em mm.
+    """
+    espessura_mama_mm = espessura_mama_cm * 10
+
+    # Define as constantes com base na idade
+    if 30 <= idade <= 49:
+        a = -0.000196
+        b = 0.0666
+        c = -7.450000
+        k = 278
+    elif 50 <= idade <= 54:
+        a = -0.000255
+        b = 0.0768
+        c = -7.670000
+        k = 259
+    elif 55 <= idade <= 59:
+        a = -0.000199
+        b = 0.0593
+        c = -6.000000
+        k = 207
+    elif 60 <= idade <= 88:
+        a = -0.000186
+        b = 0.0572
+        c = -5.990000
+        k = 208
+    else:
+        return "Idade fora do intervalo suportado para cálculo de glandularidade (30-88)."
+
+    # Calcula G
+    G = (a * (espessura_mama_mm**3)) + (b * (espessura_mama_mm**2)) + (c * espessura_mama_mm) + k
+    
+    return max(0, round(G, 2))
+
+# Função para calcular o fator C (com incerteza)
+@instrumentar("Fator C")
+def calcular_fator_c(csr, espessura, glandularidade, d_espessura_abs):
+    try:
+        espessura = float(espessura)
+        glandularidade = float(glandularidade)
+
+        grupo_val = 0
+        if glandularidade <= 25:
+            grupo_val = 1
+        elif glandularidade <= 50:
+            grupo_val = 2
+        elif glandularidade <= 75:
+            grupo_val = 3
+        else:
+            grupo_val = 4
+
+        csr_aproximado = csr_mais_proximo_fator_c(csr)
+
+        # O resultado depende só da faixa de CSR e do grupo, que indexam o cache
+        return CACHE_FATOR_C.obter((csr_aproximado, grupo_val, espessura, d_espessura_abs),
+                                   _fator_c_da_faixa, csr_aproximado, grupo_val, espessura, d_espessura_abs)
+
+    except (ValueError, TypeError) as e:
+        return f"Entrada inválida para Fator C: {e}", 0.0
+    except Exception as e:
+        return f"Erro inesperado no cálculo do Fator C: {e}", 0.0
+
+
+def _fator_c_da_faixa(csr_aproximado, grupo_val, espessura, d_espessura_abs):
+    coeffs = coeficientes_fator_c(csr_aproximado, grupo_val)
+    if not coeffs:
+        return "Erro: Coeficientes do Fator C não encontrados.", 0.0
+
+    a, b, c, d = coeffs
+    
+    fator_c_val = (a * espessura**3) + (b * espessura**2) + (c * espessura) + d
+    fator_c_val = round(fator_c_val, 4)
+
+    # Incertezas absolutas dos coeficientes
+    da = a * INCERTEZA_COEFS_FATOR_C_PERCENTUAL
+    db = b * INCERTEZA_COEFS_FATOR_C_PERCENTUAL
+    dc = c * INCERTEZA_COEFS_FATOR_C_PERCENTUAL
+    dd = d * INCERTEZA_COEFS_FATOR_C_PERCENTUAL
+
+    # Derivadas parciais de Fator C = a*e^3 + b*e^2 + c*e + d
+    partial_deriv_espessura = (3 * a * espessura**2) + (2 * b * espessura) + c
+    partial_deriv_a = espessura**3
+    partial_deriv_b = espessura**2
+    partial_deriv_c = espessura
+    partial_deriv_d = 1
+
+    incerteza_fator_c = propagate_uncertainty(
+        lambda: fator_c_val,
+        [
+            (partial_deriv_espessura, d_espessura_abs),
+            (partial_deriv_a, da),
+            (partial_deriv_b, db),
+            (partial_deriv_c, dc),
+            (partial_deriv_d, dd)
+        ]
+    )
+    return fator_c_val, round(incerteza_fator_c, 4)
+
+# Função para calcular o Ki (com incerteza e seleção de tabela)
+@instrumentar("Ki")
+def calcular_ki(kv, alvo_filtro, mas, espessura_mama, d_mas_abs, d_espessura_abs, local_mamografo, calibracao=None):
+    try:
+        # Tabela Ki e fatores do local na calibração (padrão: a ativa, ver dgm.calibracao)
+        if calibracao is None:
+            calibracao = calibracao_ativa()
+        fatores_local = calibracao.fatores_por_local.get(local_mamografo)
+        
+        if fatores_local is None:
+            return "Local do mamógrafo inválido selecionado.", 0.0
+
+        # x interpolado em kV (spline por local e alvo/filtro, ver dgm.tabelas). A própria
+        # calibração entra na chave: depois de uma recarga, as consultas antigas não valem mais.
+        consulta = CACHE_TABELA_KI.obter((calibracao, local_mamografo, alvo_filtro, kv), calibracao.x_ki,
+                                         local_mamografo, alvo_filtro, kv)
+        
+        if consulta is None:
+            faixa_kv = calibracao.faixas_kv.get((local_mamografo, alvo_filtro))
+            if faixa_kv:
+                return f"Kv {kv} fora do intervalo da tabela Ki para {alvo_filtro} no local {local_mamografo} ({faixa_kv[0]:g} a {faixa_kv[1]:g} kV).", 0.0
+            else:
+                return f"Combinação de alvo/filtro ({alvo_filtro}) não encontrada para o local {local_mamografo}.", 0.0
+        x_val, incerteza_interpolacao = consulta
+        
+        # Fatores específicos do Ki do local (fator de conversão e espessura de referência)
+        conversion_factor, reference_thickness = fatores_local
+
+        divisor = (reference_thickness - espessura_mama)**2
+        if divisor == 0:
+            return f"Erro: A espessura da mama é inválida para o cálculo de Ki ({reference_thickness} - espessura deve ser diferente de zero).", 0.0
+
+        ki_val = round(((x_val * mas)*conversion_factor) / divisor, 2)
+
+        # Incerteza de x_val: tabela e, entre os kV tabelados, interpolação
+        d_x_abs = math.sqrt((x_val * INCERTEZA_X_KI_PERCENTUAL)**2 + incerteza_interpolacao**2)
+
+        # Derivadas parciais de Ki = (x * mas * conversion_factor) / (reference_thickness - espessura_mama)**2
+        # dKi/dx = (mas * conversion_factor) / (reference_thickness - espessura_mama)**2
+        partial_deriv_x = (mas * conversion_factor) / divisor
+
+        # dKi/dmas = (x * conversion_factor) / (reference_thickness - espessura_mama)**2
+        partial_deriv_mas = (x_val * conversion_factor) / divisor
+
+        # dKi/despessura = (x * mas * conversion_factor) * (-2 * (reference_thickness - espessura_mama) * -1) / ((reference_thickness - espessura_mama)**2)**2
+        # dKi/despessura = (x * mas * conversion_factor * 2 * (reference_thickness - espessura_mama)) / ((reference_thickness - espessura_mama)**4)
+        # dKi/despessura = (x * mas * conversion_factor * 2) / ((reference_thickness - espessura_mama)**3)
+        partial_deriv_espessura = (x_val * mas * conversion_factor * 2) / ((reference_thickness - espessura_mama)**3)
+
+        incerteza_ki = propagate_uncertainty(
+            lambda: ki_val,
+            [
+                (partial_deriv_x, d_x_abs),
+                (partial_deriv_mas, d_mas_abs),
+                (partial_deriv_espessura, d_espessura_abs)
+            ]
+        )
+        
+        return ki_val, round(incerteza_ki, 4)
+    except Exception as e:
+        return f"Erro no cálculo de Ki: {e}", 0.0
+
+
+# --- FUNÇÃO calcular_dgm (AGORA RETORNA VALOR E INCERTEZA) ---
+@instrumentar("DGM")
+def calcular_dgm(ki_val, s_val, fator_g_val, fator_c_val, incerteza_ki, incerteza_s, incerteza_fator_g, incerteza_fator_c):
+    try:
+        dgm = ki_val * s_val * fator_g_val * fator_c_val
+        
+        # Derivadas parciais de DGM = Ki * s * Fg * Fc
+        partial_deriv_ki = s_val * fator_g_val * fator_c_val
+        partial_deriv_s = ki_val * fator_g_val * fator_c_val
+        partial_deriv_fg = ki_val * s_val * fator_c_val
+        partial_deriv_fc = ki_val * s_val * fator_g_val
+
+        incerteza_dgm = propagate_uncertainty(
+            lambda: dgm, # Valor da DGM
+            [
+                (partial_deriv_ki, incerteza_ki),
+                (partial_deriv_s, incerteza_s),
+                (partial_deriv_fg, incerteza_fator_g),
+                (partial_deriv_fc, incerteza_fator_c)
+            ]
+        )
+        
+        # Multiplica a incerteza da DGM por 10% conforme solicitado
+        incerteza_dgm = incerteza_dgm * 0.10
+
+        return round(dgm, 2), round(incerteza_dgm, 4)
+    except Exception as e: # Captura qualquer erro
+        return f"Erro DGM: {e}", 0.0
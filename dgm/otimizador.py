@@ -0,0 +1,139 @@
+"""
+Otimizador de técnica de exposição: kV, alvo/filtro e mAs para uma DGM desejada.
+
+Para uma espessura (ou várias), local e idade/glandularidade, avalia de uma só vez todos os
+alvos/filtros e kV da tabela Ki do local (dgm.grade.calcular_dgm_por_mas) e calcula o mAs que
+cada combinação precisa:
+    - com dgm_alvo: o mAs que leva a DGM ao valor desejado (arredondado ao passo de mAs);
+      as técnicas são ordenadas do menor para o maior mAs;
+    - com dgm_maxima: o maior mAs que mantém a DGM no máximo nesse teto; as técnicas são
+      ordenadas do maior para o menor mAs (mais margem de sinal abaixo do teto).
+A DGM de cada técnica sugerida é conferida pelo cálculo exato (dgm.lote), com os mesmos
+arredondamentos da interface; no modo teto, o mAs é reduzido até a DGM exata respeitar o teto.
+"""
+import numpy as np
+import pandas as pd
+
+from dgm.calibracao import calibracao_ativa
+from dgm.grade import calcular_dgm_por_mas
+from dgm.lote import calcular_dgm_lote
+from dgm.tabelas import NOMES_ALVO_FILTRO
+
+# Limites e passo do mAs (os mesmos do campo mAs da interface)
+MAS_MIN = 0.1
+MAS_MAX = 1000.0
+PASSO_MAS = 0.1
+
+COLUNAS_TECNICA = ["Espessura (cm)", "Alvo/Filtro", "Kv", "mAs", "DGM (mGy)", "DGM por mAs (mGy)",
+                   "Glandularidade (%)", "Viável", "Posição"]
+
+
+def _varredura(calibracao, espessuras, local, alvos_filtro, idade, glandularidade):
+    """Todas as combinações espessura x alvo/filtro x kV tabelado do local, com a DGM por mAs."""
+    if local not in calibracao.indice_local:
+        raise ValueError(f"Local do mamógrafo inválido: {local}")
+    i = calibracao.indice_local[local]
+    alvos = list(alvos_filtro) if alvos_filtro is not None else NOMES_ALVO_FILTRO
+    tecnicas = [(af, float(kv)) for af in alvos if af in NOMES_ALVO_FILTRO
+                for kv in calibracao.kv_nos[i, NOMES_ALVO_FILTRO.index(af)] if not np.isnan(kv)]
+    if not tecnicas:
+        raise ValueError(f"Nenhum alvo/filtro com tabela Ki no local {local}.")
+    espessuras = np.atleast_1d(np.asarray(espessuras, dtype=float))
+    n_tecnicas = len(tecnicas)
+    espessura = np.repeat(espessuras, n_tecnicas)
+    alvo = np.tile(np.array([af for af, _ in tecnicas], dtype=object), len(espessuras))
+    kv = np.tile(np.array([kv for _, kv in tecnicas]), len(espessuras))
+    por_mas, _, resultado = calcular_dgm_por_mas(
+        local=local, alvo_filtro=alvo, kv=kv, espessura=espessura,
+        idade=np.nan if idade is None else idade, glandularidade=np.nan if glandularidade is None else glandularidade,
+        calibracao=calibracao,
+    )
+    return pd.DataFrame({
+        "Espessura (cm)": espessura,
+        "Alvo/Filtro": alvo,
+        "Kv": kv,
+        "DGM por mAs (mGy)": por_mas,
+        "Glandularidade (%)": resultado["Glandularidade (%)"].to_numpy(),
+        "Erro": resultado["Erro"].to_numpy(),
+    })
+
+
+def _dgm_exata(calibracao, tabela, local, idade, glandularidade):
+    n = len(tabela)
+    return calcular_dgm_lote(
+        local=np.full(n, local, dtype=object), alvo_filtro=tabela["Alvo/Filtro"].to_numpy(),
+        kv=tabela["Kv"].to_numpy(), espessura=tabela["Espessura (cm)"].to_numpy(), mas=tabela["mAs"].to_numpy(),
+        idade=np.nan if idade is None else idade, glandularidade=np.nan if glandularidade is None else glandularidade,
+        calibracao=calibracao,
+    )["DGM (mGy)"].to_numpy(dtype=float)
+
+
+def otimizar_tecnicas(espessura, local, *, dgm_alvo=None, dgm_maxima=None, idade=None, glandularidade=None,
+                      alvos_filtro=None, mas_min=MAS_MIN, mas_max=MAS_MAX, passo_mas=PASSO_MAS):
+    """
+    Técnicas (alvo/filtro, kV, mAs) para uma ou várias espessuras, ordenadas por espessura e posição.
+    Args:
+        espessura (float ou array): Espessura(s) da mama comprimida, em cm.
+        local (str): Local do mamógrafo (define as tabelas Ki e os kV disponíveis).
+        dgm_alvo (float): DGM desejada (mGy). Informe este ou dgm_maxima.
+        dgm_maxima (float): Teto de DGM (mGy).
+        idade, glandularidade: Como no cálculo individual (a glandularidade informada tem prioridade).
+        alvos_filtro (lista, opcional): Restringe os alvos/filtros avaliados.
+        mas_min, mas_max, passo_mas: Faixa e passo do mAs do equipamento.
+    Returns:
+        pd.DataFrame: Colunas de COLUNAS_TECNICA; "Viável" é falso quando o mAs necessário sai da
+            faixa (o mAs é então limitado a ela) e "Posição" numera as técnicas viáveis (vazia nas demais).
+    Raises:
+        ValueError: Parâmetros inválidos ou nenhuma técnica calculável (ex.: idade fora da faixa).
+    """
+    if (dgm_alvo is None) == (dgm_maxima is None):
+        raise ValueError("Informe dgm_alvo ou dgm_maxima (apenas um).")
+    objetivo = dgm_alvo if dgm_alvo is not None else dgm_maxima
+    if not objetivo > 0:
+        raise ValueError("A DGM desejada deve ser maior que zero.")
+    if not 0 < mas_min <= mas_max or not passo_mas > 0:
+        raise ValueError("Faixa de mAs inválida.")
+
+    calibracao = calibracao_ativa()  # a mesma na varredura e na conferência exata
+    tabela = _varredura(calibracao, espessura, local, alvos_filtro, idade, glandularidade)
+    calculaveis = tabela["Erro"] == ""
+    if not calculaveis.any():
+        raise ValueError(tabela["Erro"].iloc[0])
+    tabela = tabela[calculaveis & (tabela["DGM por mAs (mGy)"] > 0)].drop(columns="Erro").reset_index(drop=True)
+
+    necessario = objetivo / tabela["DGM por mAs (mGy)"].to_numpy()
+    if dgm_alvo is not None:
+        mas = np.round(necessario / passo_mas) * passo_mas
+    else:
+        mas = np.floor(necessario / passo_mas + 1e-9) * passo_mas
+    viavel = (mas >= mas_min - 1e-9) & (mas <= mas_max + 1e-9)
+    tabela["mAs"] = np.round(np.clip(mas, mas_min, mas_max), 6)
+    tabela["DGM (mGy)"] = _dgm_exata(calibracao, tabela, local, idade, glandularidade)
+
+    if dgm_maxima is not None:
+        # O Ki arredondado do cálculo exato pode passar do teto por 0,01 mGy: reduz um passo de mAs
+        for _ in range(3):
+            acima = (tabela["DGM (mGy)"] > dgm_maxima).to_numpy()
+            if not acima.any():
+                break
+            tabela.loc[acima, "mAs"] = np.round(tabela.loc[acima, "mAs"] - passo_mas, 6)
+            viavel[acima] &= tabela.loc[acima, "mAs"].to_numpy() >= mas_min - 1e-9
+            tabela.loc[acima, "DGM (mGy)"] = _dgm_exata(calibracao, tabela[acima], local, idade, glandularidade)
+    tabela["Viável"] = viavel
+
+    crescente = dgm_alvo is not None
+    tabela = tabela.sort_values(["Espessura (cm)", "Viável", "mAs", "Kv"], ascending=[True, False, crescente, True],
+                                kind="stable").reset_index(drop=True)
+    posicao = tabela[tabela["Viável"]].groupby("Espessura (cm)").cumcount() + 1
+    tabela["Posição"] = posicao.reindex(tabela.index).astype("Int64")
+    return tabela[COLUNAS_TECNICA]
+
+
+def carta_tecnica(espessuras, local, *, melhores=1, **opcoes):
+    """
+    Carta de técnicas: as `melhores` técnicas viáveis de cada espessura (opções como em otimizar_tecnicas).
+    Returns:
+        pd.DataFrame: Uma linha por espessura e posição.
+    """
+    tecnicas = otimizar_tecnicas(espessuras, local, **opcoes)
+    return tecnicas[(tecnicas["Posição"] <= melhores).fillna(False)].reset_index(drop=True)
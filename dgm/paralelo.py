@@ -0,0 +1,159 @@
+"""
+Cálculo da DGM em lote com vários processos.
+
+As linhas são ordenadas (de forma estável) por local do mamógrafo e divididas em faixas
+contíguas; cada faixa é uma tarefa de um ProcessPoolExecutor. Entradas e resultados ficam
+em blocos de memória compartilhada (multiprocessing.shared_memory): os processos leem as
+entradas e gravam cada linha calculada na sua posição original, sem enviar DataFrames de
+volta. O resultado é idêntico, linha a linha e na mesma ordem, ao de calcular_dgm_lote.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from dgm.lote import (
+    COLUNA_GLANDULARIDADE,
+    COLUNAS_RESULTADO_LOTE,
+    _calcular,
+    _montar_resultado,
+    _preparar_entradas,
+    _registrar_metricas_lote,
+    calcular_dgm_lote,
+)
+from dgm.metricas import metricas_ativas
+
+# Abaixo disso o custo de iniciar os processos supera o ganho
+MIN_LINHAS_PARALELO = 50_000
+LINHAS_POR_TAREFA_PADRAO = 100_000
+
+_COLUNAS_NUMERICAS = ("idade", "espessura", "kv", "mas", "glandularidade")
+
+# Memória compartilhada vista por cada processo (preenchida por _iniciar_processo)
+_memoria = {}
+
+
+class _MemoriaLote:
+    """Blocos de memória compartilhada do lote: entradas, ordem das linhas e resultados."""
+
+    def __init__(self, n):
+        self.n = n
+        self._blocos = {}
+        self.entradas = self._criar("entradas", (len(_COLUNAS_NUMERICAS), n), np.float64)
+        self.codigos = self._criar("codigos", (2, n), np.int64)
+        self.ordem = self._criar("ordem", (n,), np.int64)
+        self.resultados = self._criar("resultados", (len(COLUNAS_RESULTADO_LOTE), n), np.float64)
+        self.erros = self._criar("erros", (n,), np.int8)
+
+    def _criar(self, nome, forma, tipo):
+        tamanho = max(int(np.prod(forma)) * np.dtype(tipo).itemsize, 1)
+        bloco = shared_memory.SharedMemory(create=True, size=tamanho)
+        self._blocos[nome] = (bloco, forma, np.dtype(tipo).str)
+        return np.ndarray(forma, dtype=tipo, buffer=bloco.buf)
+
+    def descricao(self):
+        """Nomes, formas e tipos dos blocos, para os processos os abrirem."""
+        return {nome: (bloco.name, forma, tipo) for nome, (bloco, forma, tipo) in self._blocos.items()}
+
+    def liberar(self):
+        # Os arrays precisam sair de escopo antes de fechar os blocos
+        self.entradas = self.codigos = self.ordem = self.resultados = self.erros = None
+        for bloco, _, _ in self._blocos.values():
+            bloco.close()
+            bloco.unlink()
+        self._blocos = {}
+
+
+def _iniciar_processo(descricao, locais_unicos, alvos_unicos, calibracao):
+    _memoria.clear()
+    for nome, (nome_bloco, forma, tipo) in descricao.items():
+        bloco = shared_memory.SharedMemory(name=nome_bloco)
+        _memoria[nome] = (bloco, np.ndarray(forma, dtype=tipo, buffer=bloco.buf))
+    _memoria["locais_unicos"] = locais_unicos
+    _memoria["alvos_unicos"] = alvos_unicos
+    _memoria["calibracao"] = calibracao  # a mesma do processo principal, mesmo que a pasta mude no meio
+
+
+def _calcular_faixa(inicio, fim):
+    """Calcula as linhas ordem[inicio:fim], grava os resultados nas posições originais e retorna as mensagens de erro."""
+    linhas = _memoria["ordem"][1][inicio:fim]
+    entradas_numericas = _memoria["entradas"][1][:, linhas]
+    codigos = _memoria["codigos"][1][:, linhas]
+    entradas = dict(zip(_COLUNAS_NUMERICAS, entradas_numericas))
+    entradas.update(codigos_local=codigos[0], locais_unicos=_memoria["locais_unicos"],
+                    codigos_alvo=codigos[1], alvos_unicos=_memoria["alvos_unicos"],
+                    calibracao=_memoria["calibracao"])
+    resultados, codigo_erro, mensagens_erro = _calcular(entradas)
+    _memoria["resultados"][1][:, linhas] = np.stack([resultados[coluna] for coluna in COLUNAS_RESULTADO_LOTE])
+    _memoria["erros"][1][linhas] = codigo_erro
+    return mensagens_erro
+
+
+def dividir_tarefas(codigos_local, linhas_por_tarefa):
+    """
+    Ordem estável das linhas por local e faixas [inicio, fim) dessa ordem, cada uma com um
+    único local e no máximo linhas_por_tarefa linhas.
+    """
+    ordem = np.argsort(codigos_local, kind="stable")
+    locais_ordenados = codigos_local[ordem]
+    limites = np.flatnonzero(np.diff(locais_ordenados)) + 1
+    faixas = []
+    for inicio_local, fim_local in zip(np.r_[0, limites], np.r_[limites, len(ordem)]):
+        for inicio in range(int(inicio_local), int(fim_local), linhas_por_tarefa):
+            faixas.append((inicio, min(inicio + linhas_por_tarefa, int(fim_local))))
+    return ordem, faixas
+
+
+def calcular_dgm_lote_paralelo(dados=None, *, processos=None, linhas_por_tarefa=None, contexto=None,
+                               idade=None, espessura=None, alvo_filtro=None, kv=None, mas=None,
+                               local=None, glandularidade=None):
+    """
+    Mesmo resultado de calcular_dgm_lote, calculado em vários processos.
+    Args:
+        processos (int, opcional): Número de processos (padrão: núcleos disponíveis).
+        linhas_por_tarefa (int, opcional): Tamanho máximo de cada faixa; por padrão o menor entre
+            LINHAS_POR_TAREFA_PADRAO e o necessário para ~4 tarefas por processo.
+        contexto (str, opcional): Método de início dos processos ("fork", "spawn", "forkserver").
+    """
+    if processos is None:
+        processos = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    argumentos = {
+        "Local do Mamógrafo": local, "Idade": idade, "Espessura (cm)": espessura,
+        "Alvo/Filtro": alvo_filtro, "Kv": kv, "mAs": mas, COLUNA_GLANDULARIDADE: glandularidade,
+    }
+    entradas = _preparar_entradas(dados, argumentos)
+    n = len(entradas["kv"])
+    if processos <= 1 or n < MIN_LINHAS_PARALELO:
+        return calcular_dgm_lote(dados, idade=idade, espessura=espessura, alvo_filtro=alvo_filtro, kv=kv, mas=mas,
+                                 local=local, glandularidade=glandularidade)
+
+    inicio = time.perf_counter()
+    if linhas_por_tarefa is None:
+        linhas_por_tarefa = min(LINHAS_POR_TAREFA_PADRAO, max(1_000, -(-n // (processos * 4))))
+    memoria = _MemoriaLote(n)
+    try:
+        for i, nome in enumerate(_COLUNAS_NUMERICAS):
+            memoria.entradas[i] = entradas[nome]
+        memoria.codigos[0] = entradas["codigos_local"]
+        memoria.codigos[1] = entradas["codigos_alvo"]
+        ordem, faixas = dividir_tarefas(entradas["codigos_local"], linhas_por_tarefa)
+        memoria.ordem[:] = ordem
+
+        with ProcessPoolExecutor(max_workers=processos, mp_context=get_context(contexto),
+                                 initializer=_iniciar_processo,
+                                 initargs=(memoria.descricao(), list(entradas["locais_unicos"]),
+                                           list(entradas["alvos_unicos"]), entradas["calibracao"])) as executor:
+            tarefas = [executor.submit(_calcular_faixa, a, b) for a, b in faixas]
+            # result() propaga exceções dos processos; a lista de mensagens é a mesma em todas as faixas
+            mensagens_erro = [tarefa.result() for tarefa in tarefas][0]
+        resultados = {coluna: memoria.resultados[i].copy() for i, coluna in enumerate(COLUNAS_RESULTADO_LOTE)}
+        codigo_erro = memoria.erros.copy()
+    finally:
+        memoria.liberar()
+
+    resultado = _montar_resultado(entradas, resultados, codigo_erro, mensagens_erro, None if dados is None else dados.index)
+    if metricas_ativas():
+        _registrar_metricas_lote(time.perf_counter() - inicio, codigo_erro, mensagens_erro)
+    return resultado
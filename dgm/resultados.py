@@ -0,0 +1,272 @@
+"""
+Representação compacta dos resultados: códigos de erro inteiros e registros tipados.
+
+As etapas de dgm.nucleo sinalizam falhas devolvendo textos ("Erro CSR", "Kv 28.5 fora do
+intervalo..."). Aqui cada falha vira um CodigoErro (inteiro pequeno, com a mensagem em
+MENSAGENS_ERRO) e os valores ficam sempre em float, com NaN onde a etapa falhou:
+    - RegistroDGM: um cálculo (classe com __slots__), usado pelo cálculo individual da interface;
+    - DTYPE_RESULTADO: dtype estruturado do NumPy para muitos cálculos (133 bytes por linha),
+      convertido de/para o DataFrame de calcular_dgm_lote por tabela_para_registros e
+      registros_para_tabela.
+No DataFrame do lote, a coluna "Erro" é categórica sobre MENSAGENS_ERRO: os códigos da
+categoria são os próprios CodigoErro (codigos_erro(resultado)).
+"""
+import enum
+import math
+
+import numpy as np
+import pandas as pd
+
+from dgm.calibracao import COLUNA_CALIBRACAO, calibracao_ativa
+from dgm.tabelas import NOMES_ALVO_FILTRO
+
+
+class CodigoErro(enum.IntEnum):
+    """Primeira etapa que falhou em um cálculo (0 = sem erro). Os valores são os códigos do lote."""
+    NENHUM = 0
+    IDADE_FORA_DA_FAIXA = 1
+    ALVO_FILTRO_INVALIDO = 2
+    CSR_INDISPONIVEL = 3
+    FATOR_G = 4
+    FATOR_C = 5
+    LOCAL_INVALIDO = 6
+    ALVO_FILTRO_SEM_TABELA_KI = 7
+    KV_FORA_DA_TABELA = 8
+    ESPESSURA_INVALIDA = 9
+    KI = 10
+    DGM = 11
+    ENTRADA_INVALIDA = 12
+    COEFICIENTES_FATOR_C = 13
+    OUTRO = 14
+
+    @property
+    def mensagem(self):
+        return MENSAGENS_ERRO[self]
+
+    @property
+    def tipo(self):
+        """Nome usado nas métricas (ex.: "kv_fora_da_tabela")."""
+        return self.name.lower()
+
+
+# Mensagem de cada código (índice = CodigoErro); são as mensagens da coluna "Erro" do lote
+MENSAGENS_ERRO = (
+    "",
+    "Idade fora do intervalo suportado para cálculo de glandularidade (30-88).",
+    "Alvo/Filtro inválido.",
+    "Erro CSR",
+    "Erro Fator g",
+    "Fator C não calculado devido a entradas inválidas de CSR ou Glandularidade.",
+    "Local do mamógrafo inválido selecionado.",
+    "Combinação de alvo/filtro não encontrada na tabela Ki do local.",
+    "Kv fora do intervalo da tabela Ki do local.",
+    "Erro: A espessura da mama é inválida para o cálculo de Ki.",
+    "Erro no cálculo de Ki",
+    "Erro DGM",
+    "Entrada inválida para Fator C.",
+    "Erro: Coeficientes do Fator C não encontrados.",
+    "Erro no cálculo.",
+)
+
+# Trecho das mensagens de dgm.nucleo -> código (a primeira correspondência vale)
+TRECHOS_ERRO = [
+    ("Idade fora do intervalo", CodigoErro.IDADE_FORA_DA_FAIXA),
+    ("Alvo/Filtro inválido", CodigoErro.ALVO_FILTRO_INVALIDO),
+    ("Erro CSR", CodigoErro.CSR_INDISPONIVEL),
+    ("Erro Fator g", CodigoErro.FATOR_G),
+    ("Entrada inválida para Fator C", CodigoErro.ENTRADA_INVALIDA),
+    ("Coeficientes do Fator C não encontrados", CodigoErro.COEFICIENTES_FATOR_C),
+    ("Fator C não calculado", CodigoErro.FATOR_C),
+    ("Erro inesperado no cálculo do Fator C", CodigoErro.FATOR_C),
+    ("Local do mamógrafo inválido", CodigoErro.LOCAL_INVALIDO),
+    ("fora do intervalo da tabela Ki", CodigoErro.KV_FORA_DA_TABELA),
+    ("Combinação de alvo/filtro", CodigoErro.ALVO_FILTRO_SEM_TABELA_KI),
+    ("espessura da mama é inválida", CodigoErro.ESPESSURA_INVALIDA),
+    ("Erro no cálculo de Ki", CodigoErro.KI),
+    ("Erro DGM", CodigoErro.DGM),
+]
+
+
+def codigo_erro(valor):
+    """CodigoErro de um retorno das etapas: NENHUM para números, o código da mensagem para textos."""
+    if not isinstance(valor, str):
+        return CodigoErro.NENHUM
+    for trecho, codigo in TRECHOS_ERRO:
+        if trecho in valor:
+            return codigo
+    return CodigoErro.OUTRO
+
+
+# Campos numéricos de um resultado: (atributo, coluna do lote/histórico)
+CAMPOS_RESULTADO = [
+    ("idade", "Idade"),
+    ("espessura", "Espessura (cm)"),
+    ("kv", "Kv"),
+    ("mas", "mAs"),
+    ("glandularidade", "Glandularidade (%)"),
+    ("grupo_glandularidade", "Grupo Glandularidade"),
+    ("valor_s", "Valor s"),
+    ("csr", "CSR"),
+    ("incerteza_csr", "Incerteza CSR"),
+    ("fator_g", "Fator g"),
+    ("incerteza_fator_g", "Incerteza Fator g"),
+    ("fator_c", "Fator C"),
+    ("incerteza_fator_c", "Incerteza Fator C"),
+    ("ki", "Ki"),
+    ("incerteza_ki", "Incerteza Ki"),
+    ("dgm", "DGM (mGy)"),
+    ("incerteza_dgm", "Incerteza DGM (mGy)"),
+]
+
+# Local e alvo/filtro são guardados como índices nos locais da calibração / NOMES_ALVO_FILTRO,
+# e o carimbo "local@versão" como índice em calibracao.carimbos
+SEM_INDICE = 255  # nome fora das tabelas (ou linha sem carimbo)
+DTYPE_RESULTADO = np.dtype(
+    [(campo, "f8") for campo, _ in CAMPOS_RESULTADO if campo != "grupo_glandularidade"]
+    + [("grupo_glandularidade", "u1"), ("local", "u1"), ("alvo_filtro", "u1"), ("codigo_erro", "u1"),
+       ("calibracao", "u1")]
+)
+
+
+class RegistroDGM:
+    """
+    Um cálculo de DGM: identificação, entradas, valores das etapas (float; NaN quando a etapa
+    falhou ou não foi calculada) e o código da primeira falha.
+    """
+
+    __slots__ = ("data_hora", "id_paciente", "iniciais_paciente", "local", "alvo_filtro", "calibracao",
+                 *(campo for campo, _ in CAMPOS_RESULTADO), "codigo_erro", "mensagem_erro")
+
+    def __init__(self, local="", alvo_filtro="", data_hora="", id_paciente="", iniciais_paciente="", calibracao="",
+                 **valores):
+        self.data_hora = data_hora
+        self.id_paciente = id_paciente
+        self.iniciais_paciente = iniciais_paciente
+        self.local = local
+        self.alvo_filtro = alvo_filtro
+        self.calibracao = calibracao  # carimbo "local@versão" da calibração usada
+        for campo, _ in CAMPOS_RESULTADO:
+            setattr(self, campo, math.nan)
+        self.codigo_erro = CodigoErro.NENHUM
+        self.mensagem_erro = ""
+        for campo, valor in valores.items():
+            self.definir(campo, valor)
+
+    def definir(self, campo, valor, incerteza=None):
+        """
+        Guarda o retorno de uma etapa (e, opcionalmente, sua incerteza em "incerteza_<campo>").
+        Um texto de erro guarda NaN e, se for a primeira falha, o código e a mensagem.
+        Returns:
+            bool: True quando o valor é numérico.
+        """
+        if isinstance(valor, str):
+            setattr(self, campo, math.nan)
+            if incerteza is not None:
+                setattr(self, f"incerteza_{campo}", math.nan)
+            if not self.codigo_erro:
+                self.codigo_erro = codigo_erro(valor)
+                self.mensagem_erro = valor
+            return False
+        setattr(self, campo, math.nan if valor is None else float(valor))
+        if incerteza is not None:
+            setattr(self, f"incerteza_{campo}", float(incerteza))
+        return valor is not None
+
+    @property
+    def ok(self):
+        return self.codigo_erro == CodigoErro.NENHUM and not math.isnan(self.dgm)
+
+    def valores(self, *campos):
+        """Valores dos campos, ou None se algum deles não foi calculado."""
+        valores = tuple(getattr(self, campo) for campo in campos)
+        return None if any(math.isnan(v) for v in valores) else valores
+
+    def linha_historico(self):
+        """Dicionário com as colunas do histórico (NaN vira NULL no banco)."""
+        linha = {"Data/Hora": self.data_hora, "ID Paciente": self.id_paciente,
+                 "Iniciais Paciente": self.iniciais_paciente, "Local do Mamógrafo": self.local,
+                 "Alvo/Filtro": self.alvo_filtro, COLUNA_CALIBRACAO: self.calibracao}
+        linha.update((coluna, getattr(self, campo)) for campo, coluna in CAMPOS_RESULTADO)
+        return linha
+
+    def __repr__(self):
+        campos = ", ".join(f"{campo}={getattr(self, campo)!r}" for campo in self.__slots__)
+        return f"RegistroDGM({campos})"
+
+
+def _indices_nomes(valores, nomes):
+    posicoes = {nome: i for i, nome in enumerate(nomes)}
+    codigos, unicos = pd.factorize(np.asarray(valores, dtype=object))
+    tabela = np.array([posicoes.get(v, SEM_INDICE) for v in unicos] + [SEM_INDICE], dtype=np.uint8)
+    return tabela[codigos]
+
+
+def codigos_erro(resultado):
+    """Array de CodigoErro (uint8) da coluna "Erro" de um resultado de calcular_dgm_lote."""
+    erro = resultado["Erro"]
+    if isinstance(erro.dtype, pd.CategoricalDtype) and tuple(erro.cat.categories) == MENSAGENS_ERRO:
+        return erro.cat.codes.to_numpy(dtype=np.uint8)
+    codigos, unicos = pd.factorize(erro.to_numpy(dtype=object))
+    return np.array([codigo_erro(m) if m else CodigoErro.NENHUM for m in unicos], dtype=np.uint8)[codigos]
+
+
+def _indices_carimbos(resultado, calibracao):
+    if COLUNA_CALIBRACAO not in resultado:
+        return np.full(len(resultado), SEM_INDICE, dtype=np.uint8)
+    carimbos = resultado[COLUNA_CALIBRACAO].to_numpy(dtype=object)
+    indices = _indices_nomes(carimbos, calibracao.carimbos)
+    desconhecidos = (indices == SEM_INDICE) & pd.notna(carimbos) & (carimbos != "")
+    if desconhecidos.any():
+        raise ValueError(f"Carimbo de calibração {carimbos[desconhecidos][0]!r} não pertence à calibração "
+                         f"informada ({calibracao.versao}); passe a calibração que produziu o resultado.")
+    return indices
+
+
+def tabela_para_registros(resultado, calibracao=None):
+    """
+    Converte o DataFrame de calcular_dgm_lote em um array com dtype DTYPE_RESULTADO
+    (locais e carimbos como índices nos da `calibracao`, padrão: a ativa).
+    Raises:
+        ValueError: se a coluna "Calibração" tiver carimbos de outra calibração.
+    """
+    calibracao = calibracao or calibracao_ativa()
+    registros = np.empty(len(resultado), dtype=DTYPE_RESULTADO)
+    for campo, coluna in CAMPOS_RESULTADO:
+        valores = resultado[coluna].to_numpy(dtype=float)
+        registros[campo] = np.nan_to_num(valores, nan=0) if campo == "grupo_glandularidade" else valores
+    registros["local"] = _indices_nomes(resultado["Local do Mamógrafo"], calibracao.nomes_locais)
+    registros["alvo_filtro"] = _indices_nomes(resultado["Alvo/Filtro"], NOMES_ALVO_FILTRO)
+    registros["codigo_erro"] = codigos_erro(resultado)
+    registros["calibracao"] = _indices_carimbos(resultado, calibracao)
+    return registros
+
+
+def _categorias(indices, nomes):
+    indices = indices.astype(np.int16)
+    indices[indices == SEM_INDICE] = -1
+    return pd.Categorical.from_codes(indices, categories=pd.Index(nomes))
+
+
+def registros_para_tabela(registros, calibracao=None):
+    """
+    DataFrame com as colunas de calcular_dgm_lote a partir de um array DTYPE_RESULTADO
+    (a mesma calibração usada em tabela_para_registros). Locais e alvos/filtros fora das
+    tabelas voltam como valores ausentes.
+    """
+    calibracao = calibracao or calibracao_ativa()
+    tabela = pd.DataFrame({
+        "Local do Mamógrafo": _categorias(registros["local"], calibracao.nomes_locais),
+        "Alvo/Filtro": _categorias(registros["alvo_filtro"], NOMES_ALVO_FILTRO),
+    })
+    for campo, coluna in CAMPOS_RESULTADO:
+        valores = registros[campo].astype(float)
+        if campo == "grupo_glandularidade":
+            valores[valores == 0] = np.nan
+        tabela[coluna] = valores
+    tabela["Erro"] = pd.Categorical.from_codes(registros["codigo_erro"].astype(np.int16), categories=pd.Index(MENSAGENS_ERRO))
+    # Como no lote: "" para as linhas sem carimbo
+    carimbos = registros["calibracao"].astype(np.int16)
+    carimbos[carimbos == SEM_INDICE] = len(calibracao.carimbos)
+    tabela[COLUNA_CALIBRACAO] = pd.Categorical.from_codes(carimbos, categories=pd.Index(list(calibracao.carimbos) + [""]))
+    colunas = ["Local do Mamógrafo", "Idade", "Espessura (cm)", "Alvo/Filtro", "Kv", "mAs"]
+    return tabela[colunas + [c for _, c in CAMPOS_RESULTADO[4:]] + ["Erro", COLUNA_CALIBRACAO]]
@@ -0,0 +1,436 @@
+"""
+Serviço HTTP local para o cálculo da DGM (asyncio, sem dependências além do NumPy/pandas).
+
+Rotas (JSON):
+    POST /dgm        Uma exposição -> resultado da linha (422 quando o cálculo falha, com "Erro").
+    POST /dgm/lote   Lista de exposições (ou {"exposicoes": [...]}) -> {"resultados": [...]}.
+    GET  /metricas   Latência p50/p99, vazão e tamanho dos micro-lotes.
+    GET  /saude      {"status": "ok", "calibracao": versão da calibração ativa}
+
+As exposições usam os nomes das colunas do lote ("Local do Mamógrafo", "Idade", "Espessura (cm)",
+"Alvo/Filtro", "Kv", "mAs", "Glandularidade (%)" opcional) ou os apelidos de CAMPOS_ENTRADA
+(local, idade, espessura, alvo_filtro, kv, mas, glandularidade). Os resultados têm as colunas
+de calcular_dgm_lote, com null no lugar de NaN.
+
+Requisições avulsas a /dgm que chegam ao mesmo tempo são reunidas em micro-lotes e calculadas
+de uma só vez por calcular_dgm_lote: o lote é disparado quando atinge lote_maximo exposições
+ou quando a primeira espera espera_maxima_ms. Só um micro-lote é calculado por vez (em uma
+thread, sem bloquear o laço de eventos); o que chega durante o cálculo forma o lote seguinte,
+então os lotes crescem sozinhos com a carga. Exposições com campo ausente ou de tipo inválido
+recebem 400 antes de entrar em um micro-lote, e um micro-lote que falha inteiro é refeito
+exposição a exposição, para que só a requisição problemática receba o erro.
+
+Uso:
+    python -m dgm.servidor --porta 8765 --espera-max-ms 2 --lote-max 1024
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+from dgm.calibracao import calibracao_ativa
+from dgm.lote import COLUNA_GLANDULARIDADE, COLUNAS_ENTRADA_LOTE, calcular_dgm_lote, colunas_faltando
+
+# Espera máxima do primeiro pedido de um micro-lote (ms) e tamanho máximo do micro-lote
+ESPERA_MAXIMA_MS_PADRAO = float(os.environ.get("DGM_SERVIDOR_ESPERA_MS", "2"))
+LOTE_MAXIMO_PADRAO = int(os.environ.get("DGM_SERVIDOR_LOTE_MAX", "1024"))
+PORTA_PADRAO = 8765
+# Tamanho máximo do corpo de uma requisição (bytes)
+LIMITE_CORPO = 64 * 1024 * 1024
+# Latências guardadas por rota para os percentis (as mais recentes)
+JANELA_LATENCIAS = 10_000
+
+# Apelidos aceitos nas exposições -> nome da coluna do lote
+CAMPOS_ENTRADA = {
+    "local": "Local do Mamógrafo",
+    "idade": "Idade",
+    "espessura": "Espessura (cm)",
+    "alvo_filtro": "Alvo/Filtro",
+    "kv": "Kv",
+    "mas": "mAs",
+    "glandularidade": COLUNA_GLANDULARIDADE,
+}
+_COLUNAS_EXPOSICAO = COLUNAS_ENTRADA_LOTE + [COLUNA_GLANDULARIDADE]
+# Colunas de texto; as demais aceitam número, texto (convertido no cálculo) ou null
+_COLUNAS_TEXTO = ("Local do Mamógrafo", "Alvo/Filtro")
+
+
+class ErroRequisicao(ValueError):
+    """Requisição inválida; vira uma resposta HTTP com o status indicado."""
+
+    def __init__(self, mensagem, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def normalizar_exposicao(exposicao):
+    """
+    Converte uma exposição em JSON (nomes de coluna ou apelidos) em {coluna do lote: valor}.
+    Raises:
+        ErroRequisicao: Campo obrigatório ausente, de tipo inválido (ex.: lista no lugar do
+            local) ou número não finito (1e999, "inf", NaN); a exposição é recusada antes de
+            entrar em um micro-lote.
+    """
+    if not isinstance(exposicao, dict):
+        raise ErroRequisicao("Cada exposição deve ser um objeto JSON.")
+    linha = {CAMPOS_ENTRADA.get(nome, nome): valor for nome, valor in exposicao.items()}
+    faltando = colunas_faltando(linha)
+    if faltando:
+        raise ErroRequisicao(f"Campos obrigatórios ausentes: {faltando}")
+    linha = {coluna: linha.get(coluna) for coluna in _COLUNAS_EXPOSICAO}
+    for coluna, valor in linha.items():
+        if coluna in _COLUNAS_TEXTO:
+            valido = isinstance(valor, str)
+        else:
+            valido = valor is None or (isinstance(valor, (int, float, str)) and not isinstance(valor, bool))
+        if not valido:
+            esperado = "texto" if coluna in _COLUNAS_TEXTO else "número"
+            raise ErroRequisicao(f"Campo {coluna!r} deve ser {esperado} (recebido {type(valor).__name__}).")
+        if coluna not in _COLUNAS_TEXTO and valor is not None and not _finito(valor):
+            raise ErroRequisicao(f"Campo {coluna!r} deve ser um número finito (recebido {valor!r}).")
+    return linha
+
+
+def _finito(valor):
+    """False para números (ou textos numéricos) infinitos ou NaN; textos não numéricos ficam para o cálculo."""
+    try:
+        return math.isfinite(float(valor))
+    except ValueError:
+        return True
+    except OverflowError:  # inteiro grande demais para float
+        return False
+
+
+def tabela_exposicoes(linhas):
+    """DataFrame de entrada de calcular_dgm_lote a partir de exposições já normalizadas."""
+    tabela = pd.DataFrame.from_records(linhas, columns=_COLUNAS_EXPOSICAO)
+    tabela[COLUNA_GLANDULARIDADE] = pd.to_numeric(tabela[COLUNA_GLANDULARIDADE], errors="coerce")
+    return tabela
+
+
+def registros_resultado(resultado):
+    """Linhas do resultado como dicionários prontos para JSON (textos e números; NaN e infinitos viram None)."""
+    colunas = {}
+    for coluna in resultado.columns:
+        valores = resultado[coluna]
+        if pd.api.types.is_numeric_dtype(valores.dtype):
+            valores = valores.to_numpy(dtype=float)
+            colunas[coluna] = np.where(~np.isfinite(valores), None, valores.astype(object)).tolist()
+        else:
+            colunas[coluna] = [None if isinstance(v, float) and not math.isfinite(v) else v for v in valores.astype(object)]
+    nomes = list(colunas)
+    return [dict(zip(nomes, linha)) for linha in zip(*colunas.values())]
+
+
+def calcular_registros(linhas):
+    """Calcula exposições normalizadas e devolve os resultados como dicionários."""
+    return registros_resultado(calcular_dgm_lote(tabela_exposicoes(linhas)))
+
+
+def calcular_registros_isolados(linhas):
+    """
+    Calcula as exposições uma a uma, para quando o lote inteiro falhou: a exposição que
+    provocou a falha não leva as demais junto.
+    Returns:
+        list: O resultado (dicionário) ou a exceção de cada exposição.
+    """
+    resultados = []
+    for linha in linhas:
+        try:
+            resultados.append(calcular_registros([linha])[0])
+        except Exception as e:
+            resultados.append(e)
+    return resultados
+
+
+class EstatisticasLatencia:
+    """Latências recentes (para p50/p95/p99) e contadores de uma rota."""
+
+    def __init__(self, janela=JANELA_LATENCIAS):
+        self.latencias = deque(maxlen=janela)
+        self.instantes = deque(maxlen=janela)
+        self.requisicoes = 0
+        self.exposicoes = 0
+        self.erros = 0
+
+    def registrar(self, segundos, exposicoes=1, erro=False):
+        self.latencias.append(segundos)
+        self.instantes.append(time.perf_counter())
+        self.requisicoes += 1
+        self.exposicoes += exposicoes
+        self.erros += bool(erro)
+
+    def resumo(self):
+        latencias = np.array(self.latencias)
+        resumo = {"requisicoes": self.requisicoes, "exposicoes": self.exposicoes, "erros": self.erros,
+                  "p50_ms": None, "p95_ms": None, "p99_ms": None, "vazao_requisicoes_s": None}
+        if len(latencias):
+            p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1e3
+            resumo.update(p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99))
+        if len(self.instantes) > 1:
+            # Vazão na janela das requisições mais recentes
+            duracao = self.instantes[-1] - self.instantes[0]
+            if duracao > 0:
+                resumo["vazao_requisicoes_s"] = (len(self.instantes) - 1) / duracao
+        return resumo
+
+
+class MicroLotes:
+    """Reúne exposições avulsas em lotes para calcular_dgm_lote (ver o docstring do módulo)."""
+
+    def __init__(self, espera_maxima_ms=ESPERA_MAXIMA_MS_PADRAO, lote_maximo=LOTE_MAXIMO_PADRAO, executor=None):
+        if espera_maxima_ms < 0 or lote_maximo < 1:
+            raise ValueError("espera_maxima_ms deve ser >= 0 e lote_maximo >= 1.")
+        self.espera_maxima = espera_maxima_ms / 1e3
+        self.lote_maximo = lote_maximo
+        self.executor = executor
+        self._pendentes = []
+        self._temporizador = None
+        self._em_execucao = False
+        self._tarefas = set()  # referências às tarefas em execução (o laço só guarda referências fracas)
+        self.lotes = 0
+        self.exposicoes = 0
+        self.maior_lote = 0
+        self.lotes_refeitos = 0  # lotes que falharam inteiros e foram refeitos exposição a exposição
+
+    async def calcular(self, linha):
+        """Resultado (dicionário) de uma exposição normalizada, calculada no próximo micro-lote."""
+        laco = asyncio.get_running_loop()
+        futuro = laco.create_future()
+        self._pendentes.append((linha, futuro))
+        if len(self._pendentes) >= self.lote_maximo:
+            self._disparar()
+        elif self._temporizador is None and not self._em_execucao:
+            self._temporizador = laco.call_later(self.espera_maxima, self._disparar)
+        return await futuro
+
+    def _disparar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        if self._em_execucao or not self._pendentes:
+            return  # o lote em execução dispara o próximo ao terminar
+        itens, self._pendentes = self._pendentes[:self.lote_maximo], self._pendentes[self.lote_maximo:]
+        self._em_execucao = True
+        tarefa = asyncio.get_running_loop().create_task(self._executar(itens))
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+
+    async def _executar(self, itens):
+        laco = asyncio.get_running_loop()
+        linhas = [linha for linha, _ in itens]
+        try:
+            try:
+                registros = await laco.run_in_executor(self.executor, calcular_registros, linhas)
+            except Exception:
+                # Falha do lote inteiro: refaz exposição a exposição, e só a que falhou recebe o erro
+                self.lotes_refeitos += 1
+                registros = await laco.run_in_executor(self.executor, calcular_registros_isolados, linhas)
+            for (_, futuro), registro in zip(itens, registros):
+                if futuro.done():  # a requisição pode ter sido cancelada (conexão fechada)
+                    continue
+                if isinstance(registro, Exception):
+                    futuro.set_exception(registro)
+                else:
+                    futuro.set_result(registro)
+        except Exception as e:  # o executor não aceitou o cálculo (ex.: servidor encerrando)
+            for _, futuro in itens:
+                if not futuro.done():
+                    futuro.set_exception(e)
+        finally:
+            self.lotes += 1
+            self.exposicoes += len(itens)
+            self.maior_lote = max(self.maior_lote, len(itens))
+            self._em_execucao = False
+            # O que chegou durante o cálculo já esperou: segue direto para o próximo lote
+            if self._pendentes:
+                self._disparar()
+
+    def resumo(self):
+        return {"lotes": self.lotes, "exposicoes": self.exposicoes, "maior_lote": self.maior_lote,
+                "tamanho_medio": self.exposicoes / self.lotes if self.lotes else None,
+                "lotes_refeitos": self.lotes_refeitos}
+
+
+def _json(dados):
+    return json.dumps(dados, ensure_ascii=False, allow_nan=False).encode("utf-8")
+
+
+class ServidorDGM:
+    """Servidor HTTP/1.1 (conexões persistentes) com as rotas do docstring do módulo."""
+
+    def __init__(self, host="127.0.0.1", porta=PORTA_PADRAO, espera_maxima_ms=ESPERA_MAXIMA_MS_PADRAO,
+                 lote_maximo=LOTE_MAXIMO_PADRAO):
+        self.host = host
+        self.porta = porta
+        # Uma thread basta: só um micro-lote por vez, e os lotes de /dgm/lote esperam a vez
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dgm-servidor")
+        self.micro_lotes = MicroLotes(espera_maxima_ms, lote_maximo, self.executor)
+        self.estatisticas = {"/dgm": EstatisticasLatencia(), "/dgm/lote": EstatisticasLatencia()}
+        self.inicio = time.perf_counter()
+        self._servidor = None
+
+    async def iniciar(self):
+        """Abre o socket; com porta 0, a porta escolhida pelo sistema fica em self.porta."""
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self
+
+    async def servir(self):
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def encerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    def metricas(self):
+        return {
+            "segundos_ativo": time.perf_counter() - self.inicio,
+            "rotas": {rota: estatisticas.resumo() for rota, estatisticas in self.estatisticas.items()},
+            "micro_lotes": self.micro_lotes.resumo(),
+            "configuracao": {"espera_maxima_ms": self.micro_lotes.espera_maxima * 1e3,
+                             "lote_maximo": self.micro_lotes.lote_maximo},
+        }
+
+    async def _rota(self, metodo, caminho, corpo):
+        """Devolve (status, objeto JSON) de uma requisição."""
+        rotas = {("GET", "/saude"), ("GET", "/metricas"), ("POST", "/dgm"), ("POST", "/dgm/lote")}
+        if (metodo, caminho) not in rotas:
+            if any(rota == caminho for _, rota in rotas):
+                raise ErroRequisicao(f"Método {metodo} não permitido em {caminho}.", HTTPStatus.METHOD_NOT_ALLOWED)
+            raise ErroRequisicao(f"Rota não encontrada: {caminho}", HTTPStatus.NOT_FOUND)
+        if caminho == "/saude":
+            return HTTPStatus.OK, {"status": "ok", "calibracao": calibracao_ativa().versao}
+        if caminho == "/metricas":
+            return HTTPStatus.OK, self.metricas()
+
+        try:
+            dados = json.loads(corpo or b"null")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ErroRequisicao(f"JSON inválido: {e}")
+        if caminho == "/dgm":
+            registro = await self.micro_lotes.calcular(normalizar_exposicao(dados))
+            return (HTTPStatus.UNPROCESSABLE_ENTITY if registro["Erro"] else HTTPStatus.OK), registro
+
+        exposicoes = dados.get("exposicoes") if isinstance(dados, dict) else dados
+        if not isinstance(exposicoes, list):
+            raise ErroRequisicao('Envie uma lista de exposições ou {"exposicoes": [...]}.')
+        linhas = [normalizar_exposicao(exposicao) for exposicao in exposicoes]
+        registros = await asyncio.get_running_loop().run_in_executor(self.executor, calcular_registros, linhas)
+        return HTTPStatus.OK, {"resultados": registros, "linhas_com_erro": sum(1 for r in registros if r["Erro"])}
+
+    async def _atender(self, leitor, escritor):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(escritor, HTTPStatus.BAD_REQUEST, {"erro": "Linha de requisição inválida."}, False)
+                    break
+                cabecalhos = {}
+                while (linha := await leitor.readline()) not in (b"\r\n", b"\n", b""):
+                    nome, _, valor = linha.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                # HTTP/1.1 mantém a conexão aberta, salvo "Connection: close"; HTTP/1.0, só com "keep-alive"
+                conexao = cabecalhos.get("connection", "").lower()
+                manter = conexao == "keep-alive" if versao == "HTTP/1.0" else conexao != "close"
+                try:
+                    tamanho = int(cabecalhos.get("content-length", 0) or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    await self._responder(escritor, HTTPStatus.BAD_REQUEST, {"erro": "Content-Length inválido."}, False)
+                    break
+                if tamanho > LIMITE_CORPO:
+                    await self._responder(escritor, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"erro": "Corpo grande demais."}, False)
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b""
+
+                caminho = alvo.split("?", 1)[0].rstrip("/") or "/"
+                inicio = time.perf_counter()
+                try:
+                    status, resposta = await self._rota(metodo, caminho, corpo)
+                except ErroRequisicao as e:
+                    status, resposta = e.status, {"erro": str(e)}
+                except Exception as e:  # erro inesperado: não derruba a conexão nem o servidor
+                    status, resposta = HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": f"{type(e).__name__}: {e}"}
+                # Serializa antes de registrar: uma resposta que não vira JSON conta como erro 500
+                try:
+                    corpo_resposta = _json(resposta)
+                except (TypeError, ValueError) as e:
+                    status, resposta = HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": f"Resposta inválida: {e}"}
+                    corpo_resposta = _json(resposta)
+                if caminho in self.estatisticas:
+                    exposicoes = len(resposta["resultados"]) if caminho == "/dgm/lote" and status == HTTPStatus.OK else 1
+                    self.estatisticas[caminho].registrar(time.perf_counter() - inicio, exposicoes,
+                                                         erro=status >= HTTPStatus.BAD_REQUEST)
+                await self._enviar(escritor, status, corpo_resposta, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    @classmethod
+    async def _responder(cls, escritor, status, resposta, manter):
+        await cls._enviar(escritor, status, _json(resposta), manter)
+
+    @staticmethod
+    async def _enviar(escritor, status, corpo, manter):
+        escritor.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(corpo)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode("latin-1") + corpo
+        )
+        await escritor.drain()
+
+
+async def executar_servidor(host="127.0.0.1", porta=PORTA_PADRAO, espera_maxima_ms=ESPERA_MAXIMA_MS_PADRAO,
+                            lote_maximo=LOTE_MAXIMO_PADRAO):
+    servidor = await ServidorDGM(host, porta, espera_maxima_ms, lote_maximo).iniciar()
+    print(f"Servidor DGM em http://{servidor.host}:{servidor.porta} "
+          f"(micro-lotes de até {lote_maximo}, espera máxima {espera_maxima_ms:g} ms)", file=sys.stderr, flush=True)
+    try:
+        await servidor.servir()
+    finally:
+        await servidor.encerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dgm.servidor", description="Serviço HTTP local para o cálculo da DGM.")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço (padrão: 127.0.0.1, só a máquina local).")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO, help=f"Porta (padrão: {PORTA_PADRAO}).")
+    parser.add_argument("--espera-max-ms", type=float, default=ESPERA_MAXIMA_MS_PADRAO,
+                        help=f"Espera máxima para formar um micro-lote, em ms (padrão: {ESPERA_MAXIMA_MS_PADRAO:g}).")
+    parser.add_argument("--lote-max", type=int, default=LOTE_MAXIMO_PADRAO,
+                        help=f"Exposições por micro-lote (padrão: {LOTE_MAXIMO_PADRAO}; 1 desativa os micro-lotes).")
+    args = parser.parse_args(argv)
+    if args.espera_max_ms < 0 or args.lote_max < 1:
+        print("Erro: --espera-max-ms deve ser >= 0 e --lote-max >= 1.", file=sys.stderr)
+        return 2
+    try:
+        asyncio.run(executar_servidor(args.host, args.porta, args.espera_max_ms, args.lote_max))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,489 @@
+"""
+Tabelas de coeficientes e constantes do cálculo da DGM.
+
+Os coeficientes dos fatores g e C são compilados uma única vez, na importação, em
+arrays contíguos indexados por faixa de CSR (e grupo de glandularidade), com busca
+binária da faixa de CSR mais próxima; as tabelas Ki viram splines em kV por local e
+alvo/filtro (TabelasKi). Tanto as funções calcular_* (valores escalares) quanto o cálculo em
+lote consultam os mesmos arrays.
+
+As tabelas Ki e os fatores do Ki daqui são a calibração embutida; a calibração usada nos
+cálculos vem dos arquivos versionados lidos por dgm.calibracao (ver calibracao_ativa).
+"""
+import math
+from bisect import bisect_left
+
+import numpy as np
+
+# Define as opções para o alvo/filtro
+alvo_filtro_options = {
+    'Mo/Mo': 1,
+    'Mo/Rh': 1.017,
+    'Rh/Rh': 1.061,
+    'Rh/Al': 1.044,
+    'W/Rh':  1.042
+}
+
+# --- DICIONÁRIOS GLOBAIS E CONSTANTES DE INCERTEZA ---
+
+# Coeficientes para CSR (para calculo e derivada)
+csr_coeffs = {
+    'Mo/Mo': {'a': 0.01, 'b': 0.08},
+    'Mo/Rh': {'a': 0.0067, 'b': 0.2333},
+    'Rh/Rh': {'a': 0.0167, 'b': -0.0367},
+    'W/Rh':  {'a': 0.0067, 'b': 0.3533}
+}
+
+# Tabela Ki do IRD (restaurada para os valores originais e limitados)
+tabela_ki_ird = {
+    ('Mo/Mo', 26): 0.1357,
+    ('Mo/Mo', 27): 0.1530,
+    ('Mo/Rh', 29): 0.1540,
+    ('Mo/Rh', 31): 0.1830,
+}
+
+# Tabela Ki da UFRJ (dados fornecidos na última mensagem)
+tabela_ki_ufrj = {
+    ('Mo/Mo', 25): 0.119094,
+    ('Mo/Mo', 26): 0.136889,
+    ('Mo/Mo', 27): 0.155258,
+    ('Mo/Mo', 28): 0.175158,
+    ('Mo/Rh', 26): 0.114301,
+    ('Mo/Rh', 27): 0.131012,
+    ('Mo/Rh', 28): 0.148476,
+    ('Mo/Rh', 29): 0.166423,
+    ('Rh/Rh', 28): 0.126825,
+    ('Rh/Rh', 29): 0.142299,
+    ('Rh/Rh', 30): 0.158490,
+    ('Rh/Rh', 31): 0.175164,
+}
+
+# Dicionário para selecionar a tabela Ki com base no local
+tabelas_ki_por_local = {
+    'IRD': tabela_ki_ird,
+    'UFRJ': tabela_ki_ufrj,
+}
+
+# Fórmulas publicadas do Fator C, mantidas como referência. O cálculo usa os coeficientes
+# de TABELA_FATOR_C; verificar_consistencia_fator_c() garante, na importação, que as duas
+# representações descrevem os mesmos polinômios.
+formulas_fator_c = {
+    0.34: {1: lambda e: (0.0004 * e**3) - (0.0105 * e**2) + (0.093 * e) + 0.9449, 2: lambda e: 0.0001 * e**3 - 0.0035 * e**2 + 0.0295 * e + 0.9831, 3: lambda e: -0.0001 * e**3 + 0.0028 * e**2 - 0.0242 * e + 1.0105, 4: lambda e: -0.0005 * e**3 + 0.0103 * e**2 - 0.0773 * e + 1.0343},
+    0.35: {1: lambda e: (0.0004 * e**3) - (0.0105 * e**2) + (0.093 * e) + 0.9449, 2: lambda e: 0.0001 * e**3 - 0.0035 * e**2 + 0.0295 * e + 0.9831, 3: lambda e: -0.0001 * e**3 + 0.0028 * e**2 - 0.0242 * e + 1.0105, 4: lambda e: -0.0005 * e**3 + 0.0103 * e**2 - 0.0773 * e + 1.0343},
+    0.36: {1: lambda e: 0.0004 * e**3 - 0.0103 * e**2 + 0.0915 * e + 0.9443, 2: lambda e: 0.0002 * e**3 - 0.0044 * e**2 + 0.0338 * e + 0.9768, 3: lambda e: -0.0001 * e**3 + 0.0029 * e**2 - 0.0248 * e + 1.0118, 4: lambda e: -0.0004 * e**3 + 0.0093 * e**2 - 0.0726 * e + 1.03},
+    0.37: {1: lambda e: 0.0005 * e**3 - 0.0117 * e**2 + 0.098 * e + 0.9345, 2: lambda e: 0.0002 * e**3 - 0.0041 * e**2 + 0.0325 * e + 0.9783, 3: lambda e: -0.0001 * e**3 + 0.003 * e**2 - 0.0247 * e + 1.0117, 4: lambda e: -0.0004 * e**3 + 0.0091 * e**2 - 0.0718 * e + 1.0304},
+    0.38: {1: lambda e: 0.0005 * e**3 - 0.0117 * e**2 + 0.0978 * e + 0.9342, 2: lambda e: 0.0002 * e**3 - 0.0041 * e**2 + 0.0324 * e + 0.9782, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0252 * e + 1.0126, 4: lambda e: -0.0004 * e**3 + 0.009 * e**2 - 0.0715 * e + 1.0306},
+    0.39: {1: lambda e: 0.0005 * e**3 - 0.0116 * e**2 + 0.0974 * e + 0.934, 2: lambda e: 0.0002 * e**3 - 0.0041 * e**2 + 0.0324 * e + 0.9782, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0251 * e + 1.0126, 4: lambda e: -0.0004 * e**3 + 0.0089 * e**2 - 0.0712 * e + 1.0311},
+    0.40: {1: lambda e: 0.0005 * e**3 - 0.0114 * e**2 + 0.0959 * e + 0.9335, 2: lambda e: 0.0002 * e**3 - 0.0041 * e**2 + 0.0322 * e + 0.9779, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0248 * e + 1.0128, 4: lambda e: -0.0004 * e**3 + 0.0087 * e**2 - 0.0703 * e + 1.0324},
+    0.41: {1: lambda e: 0.0007 * e**3 - 0.0154 * e**2 + 0.1207 * e + 0.8822, 2: lambda e: 0.0002 * e**3 - 0.0036 * e**2 + 0.0299 * e + 0.9801, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0248 * e + 1.0125, 4: lambda e: -0.0004 * e**3 + 0.009 * e**2 - 0.0716 * e + 1.0352},
+    0.42: {1: lambda e: 0.0007 * e**3 - 0.0165 * e**2 + 0.1278 * e + 0.8677, 2: lambda e: 0.0001 * e**3 - 0.0034 * e**2 + 0.0293 * e + 0.9807, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0247 * e + 1.0124, 4: lambda e: -0.0004 * e**3 + 0.0091 * e**2 - 0.0719 * e + 1.0358},
+    0.43: {1: lambda e: 0.0008 * e**3 - 0.0177 * e**2 + 0.1349 * e + 0.853, 2: lambda e: 0.0001 * e**3 - 0.0033 * e**2 + 0.0286 * e + 0.9815, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0247 * e + 1.0124, 4: lambda e: -0.0004 * e**3 + 0.0092 * e**2 - 0.0724 * e + 1.0368},
+    0.44: {1: lambda e: 0.0009 * e**3 - 0.0188 * e**2 + 0.1419 * e + 0.8384, 2: lambda e: 0.0001 * e**3 - 0.0032 * e**2 + 0.0279 * e + 0.9822, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0246 * e + 1.0122, 4: lambda e: -0.0004 * e**3 + 0.0092 * e**2 - 0.0727 * e + 1.0375},
+    0.45: {1: lambda e: 0.0011 * e**3 - 0.0229 * e**2 + 0.1669 * e + 0.787, 2: lambda e: 0.00009 * e**3 - 0.0026 * e**2 + 0.0252 * e + 0.9851, 3: lambda e: -0.0001 * e**3 + 0.0029 * e**2 - 0.0238 * e + 1.0109, 4: lambda e: -0.0004 * e**3 + 0.009 * e**2 - 0.0719 * e + 1.0374},
+    0.46: {1: lambda e: 0.0007 * e**3 - 0.0162 * e**2 + 0.1292 * e + 0.8523, 2: lambda e: 0.00008 * e**3 - 0.0024 * e**2 + 0.0241 * e + 0.9865, 3: lambda e: -0.0001 * e**3 + 0.0029 * e**2 - 0.0241 * e + 1.0127, 4: lambda e: -0.0004 * e**3 + 0.0087 * e**2 - 0.0706 * e + 1.0377},
+    0.47: {1: lambda e: 0.0006 * e**3 - 0.015 * e**2 + 0.1216 * e + 0.8666, 2: lambda e: 0.00008 * e**3 - 0.0024 * e**2 + 0.0238 * e + 0.9869, 3: lambda e: -0.0001 * e**3 + 0.0029 * e**2 - 0.0242 * e + 1.0132, 4: lambda e: -0.0004 * e**3 + 0.0086 * e**2 - 0.07 * e + 1.0375},
+    0.48: {1: lambda e: 0.0008 * e**3 - 0.0177 * e**2 + 0.1349 * e + 0.853, 2: lambda e: 0.0008 * e**3 - 0.0177 * e**2 + 0.1349 * e + 0.853, 3: lambda e: 0.0004 * e**3 - 0.0105 * e**2 + 0.093 * e + 1.077, 4: lambda e: -0.0004 * e**3 + 0.0093 * e**2 - 0.0726 * e + 1.03},
+    0.50: {1: lambda e: (0.0004 * e**3) - (0.0105 * e**2) + (0.093 * e) + 1.077, 2: lambda e: 0.0008 * e**3 - 0.0177 * e**2 + 0.1349 * e**2 + 0.853, 3: lambda e: 0.0004 * e**3 - (0.0105 * e**2) + (0.093 * e) + 1.077, 4: lambda e: -0.0004 * e**3 + 0.0093 * e**2 - 0.0726 * e + 1.03},
+}
+
+# Constantes e Incertezas das constantes do Fator G (da0, da1, da2, da3)
+# Estes valores são fixos para cada faixa de CSR e serão usados no calcular_fator_g
+FATOR_G_CONSTANTS_UNCERTAINTIES = {
+    0.30: {'a0': 0.6862414, 'da0': 0.0215771, 'a1': -0.1903851, 'da1': 0.0122059, 'a2': 0.0211549, 'da2': 0.0020598, 'a3': -0.0008170, 'da3': 0.0001055},
+    0.35: {'a0': 0.7520924, 'da0': 0.0214658, 'a1': -0.2040045, 'da1': 0.0121429, 'a2': 0.0223514, 'da2': 0.0020492, 'a3': -0.0008553, 'da3': 0.0001050},
+    0.40: {'a0': 0.8135159, 'da0': 0.0208152, 'a1': -0.2167391, 'da1': 0.0117749, 'a2': 0.0234949, 'da2': 0.0019871, 'a3': -0.0008925, 'da3': 0.0001018},
+    0.45: {'a0': 0.8587792, 'da0': 0.02030096, 'a1': -0.2213542, 'da1': 0.01148395, 'a2': 0.0235061, 'da2': 0.00193800, 'a3': -0.0008817, 'da3': 0.00009929},
+    0.50: {'a0': 0.8926865, 'da0': 0.0192286, 'a1': -0.2192870, 'da1': 0.0108773, 'a2': 0.0224164, 'da2': 0.0018356, 'a3': -0.0008171, 'da3': 0.0000940},
+    0.55: {'a0': 0.9237367, 'da0': 0.0184259, 'a1': -0.2189931, 'da1': 0.0104233, 'a2': 0.0221241, 'da2': 0.0017590, 'a3': -0.0008050, 'da3': 0.0000901},
+    0.60: {'a0': 0.9131422, 'da0': 0.0097610, 'a1': -0.1996713, 'da1': 0.0055217, 'a2': 0.0190965, 'da2': 0.0009318, 'a3': -0.0006696, 'da3': 0.0000477},
+}
+
+# Incertezas das entradas (em porcentagem do valor)
+INCERTEZA_KV_PERCENTUAL = 0.01  # ±1%
+INCERTEZA_MAS_PERCENTUAL = 0.05 # ±5%
+INCERTEZA_ESPESSURA_PERCENTUAL = 0.05 # ±5% (considerando 1 a 2mm como 2% a 5% de 2 a 11cm)
+INCERTEZA_X_KI_PERCENTUAL = 0.02 # ±2% para os valores de 'x' na tabela Ki
+INCERTEZA_COEFS_FATOR_C_PERCENTUAL = 0.05 # ±5% para os coeficientes das fórmulas do Fator C
+
+# Coeficientes (a, b, c, d) do Fator C = a*e^3 + b*e^2 + c*e + d, por faixa de CSR,
+# para os grupos de glandularidade 1 a 4.
+# Nota (CSR 0.50, grupo 2): a fórmula publicada traz "+ 0.1349 * e**2" (provavelmente
+# "+ 0.1349 * e", como em 0.43 e 0.48); os coeficientes reproduzem a fórmula como está.
+TABELA_FATOR_C = {
+    0.34: (
+        (0.0004, -0.0105, 0.093, 0.9449),
+        (0.0001, -0.0035, 0.0295, 0.9831),
+        (-0.0001, 0.0028, -0.0242, 1.0105),
+        (-0.0005, 0.0103, -0.0773, 1.0343),
+    ),
+    0.35: (
+        (0.0004, -0.0105, 0.093, 0.9449),
+        (0.0001, -0.0035, 0.0295, 0.9831),
+        (-0.0001, 0.0028, -0.0242, 1.0105),
+        (-0.0005, 0.0103, -0.0773, 1.0343),
+    ),
+    0.36: (
+        (0.0004, -0.0103, 0.0915, 0.9443),
+        (0.0002, -0.0044, 0.0338, 0.9768),
+        (-0.0001, 0.0029, -0.0248, 1.0118),
+        (-0.0004, 0.0093, -0.0726, 1.03),
+    ),
+    0.37: (
+        (0.0005, -0.0117, 0.098, 0.9345),
+        (0.0002, -0.0041, 0.0325, 0.9783),
+        (-0.0001, 0.003, -0.0247, 1.0117),
+        (-0.0004, 0.0091, -0.0718, 1.0304),
+    ),
+    0.38: (
+        (0.0005, -0.0117, 0.0978, 0.9342),
+        (0.0002, -0.0041, 0.0324, 0.9782),
+        (-0.0001, 0.0031, -0.0252, 1.0126),
+        (-0.0004, 0.009, -0.0715, 1.0306),
+    ),
+    0.39: (
+        (0.0005, -0.0116, 0.0974, 0.934),
+        (0.0002, -0.0041, 0.0324, 0.9782),
+        (-0.0001, 0.0031, -0.0251, 1.0126),
+        (-0.0004, 0.0089, -0.0712, 1.0311),
+    ),
+    0.40: (
+        (0.0005, -0.0114, 0.0959, 0.9335),
+        (0.0002, -0.0041, 0.0322, 0.9779),
+        (-0.0001, 0.0031, -0.0248, 1.0128),
+        (-0.0004, 0.0087, -0.0703, 1.0324),
+    ),
+    0.41: (
+        (0.0007, -0.0154, 0.1207, 0.8822),
+        (0.0002, -0.0036, 0.0299, 0.9801),
+        (-0.0001, 0.0031, -0.0248, 1.0125),
+        (-0.0004, 0.009, -0.0716, 1.0352),
+    ),
+    0.42: (
+        (0.0007, -0.0165, 0.1278, 0.8677),
+        (0.0001, -0.0034, 0.0293, 0.9807),
+        (-0.0001, 0.0031, -0.0247, 1.0124),
+        (-0.0004, 0.0091, -0.0719, 1.0358),
+    ),
+    0.43: (
+        (0.0008, -0.0177, 0.1349, 0.853),
+        (0.0001, -0.0033, 0.0286, 0.9815),
+        (-0.0001, 0.0031, -0.0247, 1.0124),
+        (-0.0004, 0.0092, -0.0724, 1.0368),
+    ),
+    0.44: (
+        (0.0009, -0.0188, 0.1419, 0.8384),
+        (0.0001, -0.0032, 0.0279, 0.9822),
+        (-0.0001, 0.0031, -0.0246, 1.0122),
+        (-0.0004, 0.0092, -0.0727, 1.0375),
+    ),
+    0.45: (
+        (0.0011, -0.0229, 0.1669, 0.787),
+        (0.00009, -0.0026, 0.0252, 0.9851),
+        (-0.0001, 0.0029, -0.0238, 1.0109),
+        (-0.0004, 0.009, -0.0719, 1.0374),
+    ),
+    0.46: (
+        (0.0007, -0.0162, 0.1292, 0.8523),
+        (0.00008, -0.0024, 0.0241, 0.9865),
+        (-0.0001, 0.0029, -0.0241, 1.0127),
+        (-0.0004, 0.0087, -0.0706, 1.0377),
+    ),
+    0.47: (
+        (0.0006, -0.015, 0.1216, 0.8666),
+        (0.00008, -0.0024, 0.0238, 0.9869),
+        (-0.0001, 0.0029, -0.0242, 1.0132),
+        (-0.0004, 0.0086, -0.07, 1.0375),
+    ),
+    0.48: (
+        (0.0008, -0.0177, 0.1349, 0.853),
+        (0.0008, -0.0177, 0.1349, 0.853),  # igual ao grupo 1; verificar no original se é intencional
+        (0.0004, -0.0105, 0.093, 1.077),
+        (-0.0004, 0.0093, -0.0726, 1.03),
+    ),
+    0.50: (
+        (0.0004, -0.0105, 0.093, 1.077),
+        (0.0008, (-0.0177 + 0.1349), 0.0, 0.853),  # ver nota acima sobre a fórmula publicada
+        (0.0004, -0.0105, 0.093, 1.077),
+        (-0.0004, 0.0093, -0.0726, 1.03),
+    ),
+}
+
+# Faixas de idade da glandularidade: (idade mínima, idade máxima, a, b, c, k)
+FAIXAS_GLANDULARIDADE = [
+    (30, 49, -0.000196, 0.0666, -7.450000, 278),
+    (50, 54, -0.000255, 0.0768, -7.670000, 259),
+    (55, 59, -0.000199, 0.0593, -6.000000, 207),
+    (60, 88, -0.000186, 0.0572, -5.990000, 208),
+]
+
+# Fatores do Ki por local: (fator de conversão, espessura de referência)
+FATORES_KI_POR_LOCAL = {
+    'IRD': (2500, 63),
+    'UFRJ': (1892.25, 64),
+}
+
+# --- FIM DICIONÁRIOS GLOBAIS E CONSTANTES DE INCERTEZA ---
+
+# --- TABELAS COMPILADAS (construídas uma vez na importação) ---
+
+# Fator g: faixas de CSR em ordem crescente, coeficientes [faixa, (a0, a1, a2, a3)]
+# e incertezas [faixa, (da0, da1, da2, da3)]
+CHAVES_CSR_FATOR_G = sorted(FATOR_G_CONSTANTS_UNCERTAINTIES)
+CSR_FATOR_G = np.array(CHAVES_CSR_FATOR_G)
+COEFS_FATOR_G = np.array([[FATOR_G_CONSTANTS_UNCERTAINTIES[k][nome] for nome in ('a0', 'a1', 'a2', 'a3')]
+                          for k in CHAVES_CSR_FATOR_G])
+INCERTEZAS_FATOR_G = np.array([[FATOR_G_CONSTANTS_UNCERTAINTIES[k][nome] for nome in ('da0', 'da1', 'da2', 'da3')]
+                               for k in CHAVES_CSR_FATOR_G])
+
+# Fator C: faixas de CSR em ordem crescente e coeficientes [faixa, grupo - 1, (a, b, c, d)]
+CHAVES_CSR_FATOR_C = sorted(TABELA_FATOR_C)
+CSR_FATOR_C = np.array(CHAVES_CSR_FATOR_C)
+COEFS_FATOR_C = np.array([TABELA_FATOR_C[k] for k in CHAVES_CSR_FATOR_C])
+_INDICE_CSR_FATOR_C = {k: i for i, k in enumerate(CHAVES_CSR_FATOR_C)}
+
+# Alvo/filtro: valores de s e coeficientes (a, b) do CSR alinhados a NOMES_ALVO_FILTRO
+# (NaN quando não há coeficiente de CSR para a combinação, ex.: Rh/Al)
+NOMES_ALVO_FILTRO = list(alvo_filtro_options)
+VALORES_S = np.array([alvo_filtro_options[af] for af in NOMES_ALVO_FILTRO], dtype=float)
+COEFS_CSR = np.array([[csr_coeffs[af]['a'], csr_coeffs[af]['b']] if af in csr_coeffs else [np.nan, np.nan]
+                      for af in NOMES_ALVO_FILTRO])
+
+# Ki: interpolação de x em kV por (local, alvo/filtro), compilada uma vez por calibração
+# (TabelasKi). Spline cúbica natural pelos kV tabelados (linear quando só há dois pontos),
+# guardada como um polinômio por trecho em t = kV - nó: x = c0 + c1*t + c2*t^2 + c3*t^3. O
+# último nó tem um "trecho" constante, para que os kV tabelados devolvam exatamente o valor da
+# tabela. A incerteza de interpolação é estimada pela diferença entre a spline e a interpolação
+# linear do mesmo trecho, tratada como distribuição retangular (|spline - linear| / sqrt(3)).
+
+
+def _spline_natural(nos, valores):
+    """Coeficientes (c0, c1, c2, c3) de cada trecho da spline cúbica natural pelos pontos dados."""
+    n = len(nos)
+    h = np.diff(nos)
+    segundas = np.zeros(n)  # derivadas segundas nos nós (nulas nas pontas: spline natural)
+    if n > 2:
+        sistema = np.zeros((n - 2, n - 2))
+        lado_direito = np.zeros(n - 2)
+        for i in range(1, n - 1):
+            sistema[i - 1, i - 1] = 2 * (h[i - 1] + h[i])
+            if i > 1:
+                sistema[i - 1, i - 2] = h[i - 1]
+            if i < n - 2:
+                sistema[i - 1, i] = h[i]
+            lado_direito[i - 1] = 6 * ((valores[i + 1] - valores[i]) / h[i] - (valores[i] - valores[i - 1]) / h[i - 1])
+        segundas[1:-1] = np.linalg.solve(sistema, lado_direito)
+    c1 = (valores[1:] - valores[:-1]) / h - h * (2 * segundas[:-1] + segundas[1:]) / 6
+    return np.column_stack([valores[:-1], c1, segundas[:-1] / 2, (segundas[1:] - segundas[:-1]) / (6 * h)])
+
+
+class TabelasKi:
+    """
+    Tabelas Ki e fatores do Ki de um conjunto de locais, compilados em arrays indexados por
+    [local, alvo/filtro] (locais na ordem de `tabelas_ki_por_local`, alvos/filtros na de
+    NOMES_ALVO_FILTRO). Não é alterada depois de criada.
+    """
+
+    def __init__(self, tabelas_ki_por_local, fatores_ki_por_local):
+        self.tabelas = tabelas_ki_por_local
+        self.nomes_locais = list(tabelas_ki_por_local)
+        self.indice_local = {local: i for i, local in enumerate(self.nomes_locais)}
+        max_nos = max([sum(1 for af, _ in tabela if af == alvo)
+                       for tabela in tabelas_ki_por_local.values() for alvo in NOMES_ALVO_FILTRO] + [1])
+        # Nós [local, alvo/filtro, nó] (NaN depois do último), coeficientes da spline [..., nó, (c0, c1, c2, c3)]
+        # e da reta do mesmo trecho [..., nó, (x, inclinação)]
+        self.kv_nos = np.full((len(self.nomes_locais), len(NOMES_ALVO_FILTRO), max_nos), np.nan)
+        self.coefs_spline = np.zeros(self.kv_nos.shape + (4,))
+        self.coefs_linear = np.zeros(self.kv_nos.shape + (2,))
+        # Intervalo de kV tabelado por [local, alvo/filtro] (NaN onde não há tabela)
+        self.kv_min = np.full(self.kv_nos.shape[:2], np.nan)
+        self.kv_max = np.full(self.kv_nos.shape[:2], np.nan)
+        for i, local in enumerate(self.nomes_locais):
+            for j, alvo in enumerate(NOMES_ALVO_FILTRO):
+                pontos = sorted((kv, x) for (af, kv), x in tabelas_ki_por_local[local].items() if af == alvo)
+                if not pontos:
+                    continue
+                nos = np.array([kv for kv, _ in pontos], dtype=float)
+                xs = np.array([x for _, x in pontos], dtype=float)
+                n = len(nos)
+                self.kv_nos[i, j, :n] = nos
+                self.kv_min[i, j], self.kv_max[i, j] = nos[0], nos[-1]
+                self.coefs_spline[i, j, n - 1, 0] = self.coefs_linear[i, j, n - 1, 0] = xs[-1]
+                if n > 1:
+                    self.coefs_spline[i, j, :n - 1] = _spline_natural(nos, xs)
+                    self.coefs_linear[i, j, :n - 1] = np.column_stack([xs[:-1], np.diff(xs) / np.diff(nos)])
+        # Número de nós por [local, alvo/filtro]
+        self.n_nos = np.sum(~np.isnan(self.kv_nos), axis=-1)
+        # Intervalo de kV por (local, alvo/filtro), para mensagens de erro sem percorrer as tabelas.
+        # Em float: tabelas de arquivo podem ter nós fracionários (ex.: 25.5 kV)
+        self.faixas_kv = {(local, af): (float(self.kv_min[i, j]), float(self.kv_max[i, j]))
+                          for i, local in enumerate(self.nomes_locais) for j, af in enumerate(NOMES_ALVO_FILTRO)
+                          if not np.isnan(self.kv_min[i, j])}
+        # Fatores do Ki: [local, (fator de conversão, espessura de referência)] e, para o cálculo
+        # escalar, o mesmo por nome do local
+        self.fatores = np.array([fatores_ki_por_local[local] for local in self.nomes_locais], dtype=float).reshape(-1, 2)
+        self.fatores_por_local = {local: tuple(float(v) for v in fatores_ki_por_local[local]) for local in self.nomes_locais}
+
+    def trechos_spline_ki(self, idx_local, idx_alvo, kv, ultimo_no_a_esquerda=False):
+        """
+        Trecho da spline da tabela Ki de cada kV (ver interpolar_x_ki).
+        Args:
+            ultimo_no_a_esquerda (bool): Usa, no último nó, o trecho à esquerda dele em vez do
+                trecho constante (mesmo valor, mas com a derivada do trecho; ver dgm.autodiff).
+        Returns:
+            tuple: (kv, máscara dos kV dentro do intervalo tabelado, nó inicial do trecho,
+                coeficientes (c0, c1, c2, c3) da spline e (x, inclinação) da reta do trecho).
+        """
+        idx_local, idx_alvo, kv = np.broadcast_arrays(np.asarray(idx_local), np.asarray(idx_alvo), np.asarray(kv, dtype=float))
+        conhecido = (idx_local >= 0) & (idx_alvo >= 0)
+        i = np.where(conhecido, idx_local, 0)
+        j = np.where(conhecido, idx_alvo, 0)
+        dentro = conhecido & (kv >= self.kv_min[i, j]) & (kv <= self.kv_max[i, j])
+        # Trecho: último nó <= kV (os nós NaN do fim de cada linha nunca são <= kV)
+        trecho = np.maximum(np.sum(self.kv_nos[i, j] <= kv[..., None], axis=-1) - 1, 0)
+        if ultimo_no_a_esquerda:
+            trecho = np.minimum(trecho, np.maximum(self.n_nos[i, j] - 2, 0))
+        spline = np.moveaxis(self.coefs_spline[i, j, trecho], -1, 0)
+        reta = np.moveaxis(self.coefs_linear[i, j, trecho], -1, 0)
+        return kv, dentro, self.kv_nos[i, j, trecho], spline, reta
+
+    def interpolar_x_ki(self, idx_local, idx_alvo, kv):
+        """
+        Valor x da tabela Ki interpolado em kV, vetorizado.
+        Args:
+            idx_local, idx_alvo (arrays de int): Posições em nomes_locais e NOMES_ALVO_FILTRO (-1 = desconhecido).
+            kv (array): kV de cada exposição.
+        Returns:
+            tuple: (x, incerteza de interpolação), NaN fora do intervalo tabelado ou sem tabela.
+        """
+        kv, dentro, no, (c0, c1, c2, c3), (l0, l1) = self.trechos_spline_ki(idx_local, idx_alvo, kv)
+        t = kv - no
+        x_spline = c0 + t * (c1 + t * (c2 + t * c3))
+        incerteza = np.abs(x_spline - (l0 + l1 * t)) / np.sqrt(3)
+        return np.where(dentro, x_spline, np.nan), np.where(dentro, incerteza, np.nan)
+
+    def x_ki(self, local, alvo_filtro, kv):
+        """
+        Versão escalar de interpolar_x_ki.
+        Returns:
+            tuple: (x, incerteza de interpolação), ou None se o local/alvo não tiver tabela ou o kV
+                estiver fora do intervalo de faixas_kv.
+        """
+        faixa = self.faixas_kv.get((local, alvo_filtro))
+        if faixa is None or not faixa[0] <= kv <= faixa[1]:
+            return None
+        i, j = self.indice_local[local], _INDICE_ALVO_FILTRO[alvo_filtro]
+        nos = self.kv_nos[i, j]
+        trecho = max(int(np.sum(nos <= kv)) - 1, 0)
+        t = kv - float(nos[trecho])
+        c0, c1, c2, c3 = self.coefs_spline[i, j, trecho].tolist()
+        x_spline = c0 + t * (c1 + t * (c2 + t * c3))
+        l0, l1 = self.coefs_linear[i, j, trecho].tolist()
+        return x_spline, abs(x_spline - (l0 + l1 * t)) / math.sqrt(3)
+
+
+_INDICE_ALVO_FILTRO = {af: j for j, af in enumerate(NOMES_ALVO_FILTRO)}
+
+# Calibração embutida (tabelas acima). As calibrações por local carregadas de arquivos ficam
+# em dgm.calibracao; os nomes abaixo descrevem sempre a embutida.
+TABELAS_KI_EMBUTIDAS = TabelasKi(tabelas_ki_por_local, FATORES_KI_POR_LOCAL)
+NOMES_LOCAIS_KI = TABELAS_KI_EMBUTIDAS.nomes_locais
+KV_NOS_KI = TABELAS_KI_EMBUTIDAS.kv_nos
+COEFS_SPLINE_KI = TABELAS_KI_EMBUTIDAS.coefs_spline
+COEFS_LINEAR_KI = TABELAS_KI_EMBUTIDAS.coefs_linear
+KV_MIN_KI = TABELAS_KI_EMBUTIDAS.kv_min
+KV_MAX_KI = TABELAS_KI_EMBUTIDAS.kv_max
+FAIXAS_KV_KI = TABELAS_KI_EMBUTIDAS.faixas_kv
+FATORES_KI = TABELAS_KI_EMBUTIDAS.fatores
+
+# Versões em listas Python para o cálculo escalar (evita converter np.float64 a cada chamada)
+_COEFS_FATOR_G_LISTA = COEFS_FATOR_G.tolist()
+_INCERTEZAS_FATOR_G_LISTA = INCERTEZAS_FATOR_G.tolist()
+_COEFS_FATOR_C_LISTA = COEFS_FATOR_C.tolist()
+
+
+def indice_csr_mais_proximo(csr, chaves):
+    """
+    Índice da faixa de CSR mais próxima em `chaves` (lista crescente), por busca binária.
+    Empates ficam com a menor faixa, como min(chaves, key=lambda x: abs(x - csr)).
+    """
+    direita = min(max(bisect_left(chaves, csr), 1), len(chaves) - 1)
+    esquerda = direita - 1
+    if csr != csr or abs(chaves[esquerda] - csr) <= abs(chaves[direita] - csr):  # NaN fica com a primeira faixa
+        return esquerda
+    return direita
+
+
+def indices_csr_mais_proximo(csr, chaves):
+    """Versão vetorizada de indice_csr_mais_proximo (np.searchsorted sobre um array de CSR)."""
+    chaves = np.asarray(chaves, dtype=float)
+    direita = np.clip(np.searchsorted(chaves, csr), 1, len(chaves) - 1)
+    esquerda = direita - 1
+    usar_esquerda = np.abs(chaves[esquerda] - csr) <= np.abs(chaves[direita] - csr)
+    return np.where(usar_esquerda | np.isnan(csr), esquerda, direita)
+
+
+def faixa_csr_fator_g(csr):
+    """Índice da faixa de CSR do fator g mais próxima de `csr`."""
+    return indice_csr_mais_proximo(csr, CHAVES_CSR_FATOR_G)
+
+
+def coeficientes_fator_g(faixa):
+    """Retorna ((a0, a1, a2, a3), (da0, da1, da2, da3)) de uma faixa (índice) do fator g."""
+    return _COEFS_FATOR_G_LISTA[faixa], _INCERTEZAS_FATOR_G_LISTA[faixa]
+
+
+def csr_mais_proximo_fator_c(csr):
+    """Faixa de CSR da tabela do Fator C mais próxima de `csr`."""
+    return CHAVES_CSR_FATOR_C[indice_csr_mais_proximo(csr, CHAVES_CSR_FATOR_C)]
+
+
+def coeficientes_fator_c(csr_key, group_key):
+    """Coeficientes (a, b, c, d) de uma faixa de CSR exata e grupo (1 a 4), ou None."""
+    i = _INDICE_CSR_FATOR_C.get(csr_key)
+    if i is None or group_key not in (1, 2, 3, 4):
+        return None
+    return _COEFS_FATOR_C_LISTA[i][group_key - 1]
+
+
+def interpolar_x_ki(idx_local, idx_alvo, kv, tabelas_ki=TABELAS_KI_EMBUTIDAS):
+    """TabelasKi.interpolar_x_ki (padrão: calibração embutida)."""
+    return tabelas_ki.interpolar_x_ki(idx_local, idx_alvo, kv)
+
+
+def trechos_spline_ki(idx_local, idx_alvo, kv, tabelas_ki=TABELAS_KI_EMBUTIDAS, ultimo_no_a_esquerda=False):
+    """TabelasKi.trechos_spline_ki (padrão: calibração embutida)."""
+    return tabelas_ki.trechos_spline_ki(idx_local, idx_alvo, kv, ultimo_no_a_esquerda)
+
+
+def x_ki(local, alvo_filtro, kv, tabelas_ki=TABELAS_KI_EMBUTIDAS):
+    """TabelasKi.x_ki (padrão: calibração embutida)."""
+    return tabelas_ki.x_ki(local, alvo_filtro, kv)
+
+
+def verificar_consistencia_fator_c(tolerancia=1e-9):
+    """
+    Confere se as fórmulas de formulas_fator_c e os coeficientes compilados descrevem os
+    mesmos polinômios. Lança RuntimeError listando as divergências.
+    """
+    divergencias = []
+    if sorted(formulas_fator_c) != CHAVES_CSR_FATOR_C:
+        divergencias.append(f"faixas de CSR diferentes: {sorted(formulas_fator_c)} x {CHAVES_CSR_FATOR_C}")
+    espessuras = np.arange(1.0, 20.5, 0.5)
+    for csr_key in CHAVES_CSR_FATOR_C:
+        for grupo, formula in formulas_fator_c.get(csr_key, {}).items():
+            coefs = coeficientes_fator_c(csr_key, grupo)
+            if coefs is None:
+                divergencias.append(f"CSR {csr_key}, grupo {grupo}: sem coeficientes")
+                continue
+            esperado = np.array([formula(e) for e in espessuras])
+            calculado = np.polyval(coefs, espessuras)
+            desvio = float(np.max(np.abs(esperado - calculado)))
+            if desvio > tolerancia:
+                divergencias.append(f"CSR {csr_key}, grupo {grupo}: desvio máximo {desvio:.3g}")
+    if divergencias:
+        raise RuntimeError("Coeficientes do Fator C inconsistentes com formulas_fator_c: " + "; ".join(divergencias))
+
+
+verificar_consistencia_fator_c()
+
+# --- FIM TABELAS COMPILADAS ---
@@ -1,717 +1,541 @@
-import streamlit as st
-import pandas as pd
-from datetime import datetime
-import io
-import math # Para sqrt
-
-# Define as opções para o alvo/filtro
-alvo_filtro_options = {
-    'Mo/Mo': 1,
-    'Mo/Rh': 1.017,
-    'Rh/Rh': 1.061,
-    'Rh/Al': 1.044,
-    'W/Rh':  1.042
-}
-
-# --- DICIONÁRIOS GLOBAIS E CONSTANTES DE INCERTEZA ---
-
-# Coeficientes para CSR (para calculo e derivada)
-csr_coeffs = {
-    'Mo/Mo': {'a': 0.01, 'b': 0.08},
-    'Mo/Rh': {'a': 0.0067, 'b': 0.2333},
-    'Rh/Rh': {'a': 0.0167, 'b': -0.0367},
-    'W/Rh':  {'a': 0.0067, 'b': 0.3533}
-}
-
-# Tabela Ki do IRD (restaurada para os valores originais e limitados)
-tabela_ki_ird = {
-    ('Mo/Mo', 26): 0.1357,
-    ('Mo/Mo', 27): 0.1530,
-    ('Mo/Rh', 29): 0.1540,
-    ('Mo/Rh', 31): 0.1830,
-}
-
-# Tabela Ki da UFRJ (dados fornecidos na última mensagem)
-tabela_ki_ufrj = {
-    ('Mo/Mo', 25): 0.119094,
-    ('Mo/Mo', 26): 0.136889,
-    ('Mo/Mo', 27): 0.155258,
-    ('Mo/Mo', 28): 0.175158,
-    ('Mo/Rh', 26): 0.114301,
-    ('Mo/Rh', 27): 0.131012,
-    ('Mo/Rh', 28): 0.148476,
-    ('Mo/Rh', 29): 0.166423,
-    ('Rh/Rh', 28): 0.126825,
-    ('Rh/Rh', 29): 0.142299,
-    ('Rh/Rh', 30): 0.158490,
-    ('Rh/Rh', 31): 0.175164,
-}
-
-# Dicionário para selecionar a tabela Ki com base no local
-tabelas_ki_por_local = {
-    'IRD': tabela_ki_ird,
-    'UFRJ': tabela_ki_ufrj,
-}
-
-# Dicionário de fórmulas para Fator C (usado para cálculo do valor principal)
-# IMPORTANTE: Mantenho as lambdas originais aqui para o cálculo do valor,
-# mas os coeficientes para a incerteza são extraídos na função get_coeffs_from_lambda_for_fator_c
-formulas_fator_c = {
-    0.34: {1: lambda e: (0.0004 * e**3) - (0.0105 * e**2) + (0.093 * e) + 0.9449, 2: lambda e: 0.0001 * e**3 - 0.0035 * e**2 + 0.0295 * e + 0.9831, 3: lambda e: -0.0001 * e**3 + 0.0028 * e**2 - 0.0242 * e + 1.0105, 4: lambda e: -0.0005 * e**3 + 0.0103 * e**2 - 0.0773 * e + 1.0343},
-    0.35: {1: lambda e: (0.0004 * e**3) - (0.0105 * e**2) + (0.093 * e) + 0.9449, 2: lambda e: 0.0001 * e**3 - 0.0035 * e**2 + 0.0295 * e + 0.9831, 3: lambda e: -0.0001 * e**3 + 0.0028 * e**2 - 0.0242 * e + 1.0105, 4: lambda e: -0.0005 * e**3 + 0.0103 * e**2 - 0.0773 * e + 1.0343},
-    0.36: {1: lambda e: 0.0004 * e**3 - 0.0103 * e**2 + 0.0915 * e + 0.9443, 2: lambda e: 0.0002 * e**3 - 0.0044 * e**2 + 0.0338 * e + 0.9768, 3: lambda e: -0.0001 * e**3 + 0.0029 * e**2 - 0.0248 * e + 1.0118, 4: lambda e: -0.0004 * e**3 + 0.0093 * e**2 - 0.0726 * e + 1.03},
-    0.37: {1: lambda e: 0.0005 * e**3 - 0.0117 * e**2 + 0.098 * e + 0.9345, 2: lambda e: 0.0002 * e**3 - 0.0041 * e**2 + 0.0325 * e + 0.9783, 3: lambda e: -0.0001 * e**3 + 0.003 * e**2 - 0.0247 * e + 1.0117, 4: lambda e: -0.0004 * e**3 + 0.0091 * e**2 - 0.0718 * e + 1.0304},
-    0.38: {1: lambda e: 0.0005 * e**3 - 0.0117 * e**2 + 0.0978 * e + 0.9342, 2: lambda e: 0.0002 * e**3 - 0.0041 * e**2 + 0.0324 * e + 0.9782, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0252 * e + 1.0126, 4: lambda e: -0.0004 * e**3 + 0.009 * e**2 - 0.0715 * e + 1.0306},
-    0.39: {1: lambda e: 0.0005 * e**3 - 0.0116 * e**2 + 0.0974 * e + 0.934, 2: lambda e: 0.0002 * e**3 - 0.0041 * e**2 + 0.0324 * e + 0.9782, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0251 * e + 1.0126, 4: lambda e: -0.0004 * e**3 + 0.0089 * e**2 - 0.0712 * e + 1.0311},
-    0.40: {1: lambda e: 0.0005 * e**3 - 0.0114 * e**2 + 0.0959 * e + 0.9335, 2: lambda e: 0.0002 * e**3 - 0.0041 * e**2 + 0.0322 * e + 0.9779, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0248 * e + 1.0128, 4: lambda e: -0.0004 * e**3 + 0.0087 * e**2 - 0.0703 * e + 1.0324},
-    0.41: {1: lambda e: 0.0007 * e**3 - 0.0154 * e**2 + 0.1207 * e + 0.8822, 2: lambda e: 0.0002 * e**3 - 0.0036 * e**2 + 0.0299 * e + 0.9801, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0248 * e + 1.0125, 4: lambda e: -0.0004 * e**3 + 0.009 * e**2 - 0.0716 * e + 1.0352},
-    0.42: {1: lambda e: 0.0007 * e**3 - 0.0165 * e**2 + 0.1278 * e + 0.8677, 2: lambda e: 0.0001 * e**3 - 0.0034 * e**2 + 0.0293 * e + 0.9807, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0247 * e + 1.0124, 4: lambda e: -0.0004 * e**3 + 0.0091 * e**2 - 0.0719 * e + 1.0358},
-    0.43: {1: lambda e: 0.0008 * e**3 - 0.0177 * e**2 + 0.1349 * e + 0.853, 2: lambda e: 0.0001 * e**3 - 0.0033 * e**2 + 0.0286 * e + 0.9815, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0247 * e + 1.0124, 4: lambda e: -0.0004 * e**3 + 0.0092 * e**2 - 0.0724 * e + 1.0368},
-    0.44: {1: lambda e: 0.0009 * e**3 - 0.0188 * e**2 + 0.1419 * e + 0.8384, 2: lambda e: 0.0001 * e**3 - 0.0032 * e**2 + 0.0279 * e + 0.9822, 3: lambda e: -0.0001 * e**3 + 0.0031 * e**2 - 0.0246 * e + 1.0122, 4: lambda e: -0.0004 * e**3 + 0.0092 * e**2 - 0.0727 * e + 1.0375},
-    0.45: {1: lambda e: 0.0011 * e**3 - 0.0229 * e**2 + 0.1669 * e + 0.787, 2: lambda e: 0.00009 * e**3 - 0.0026 * e**2 + 0.0252 * e + 0.9851, 3: lambda e: -0.0001 * e**3 + 0.0029 * e**2 - 0.0238 * e + 1.0109, 4: lambda e: -0.0004 * e**3 + 0.009 * e**2 - 0.0719 * e + 1.0374},
-    0.46: {1: lambda e: 0.0007 * e**3 - 0.0162 * e**2 + 0.1292 * e + 0.8523, 2: lambda e: 0.00008 * e**3 - 0.0024 * e**2 + 0.0241 * e + 0.9865, 3: lambda e: -0.0001 * e**3 + 0.0029 * e**2 - 0.0241 * e + 1.0127, 4: lambda e: -0.0004 * e**3 + 0.0087 * e**2 - 0.0706 * e + 1.0377},
-    0.47: {1: lambda e: 0.0006 * e**3 - 0.015 * e**2 + 0.1216 * e + 0.8666, 2: lambda e: 0.00008 * e**3 - 0.0024 * e**2 + 0.0238 * e + 0.9869, 3: lambda e: -0.0001 * e**3 + 0.0029 * e**2 - 0.0242 * e + 1.0132, 4: lambda e: -0.0004 * e**3 + 0.0086 * e**2 - 0.07 * e + 1.0375},
-    0.48: {1: lambda e: 0.0008 * e**3 - 0.0177 * e**2 + 0.1349 * e + 0.853, 2: lambda e: 0.0008 * e**3 - 0.0177 * e**2 + 0.1349 * e + 0.853, 3: lambda e: 0.0004 * e**3 - 0.0105 * e**2 + 0.093 * e + 1.077, 4: lambda e: -0.0004 * e**3 + 0.0093 * e**2 - 0.0726 * e + 1.03},
-    0.50: {1: lambda e: (0.0004 * e**3) - (0.0105 * e**2) + (0.093 * e) + 1.077, 2: lambda e: 0.0008 * e**3 - 0.0177 * e**2 + 0.1349 * e**2 + 0.853, 3: lambda e: 0.0004 * e**3 - (0.0105 * e**2) + (0.093 * e) + 1.077, 4: lambda e: -0.0004 * e**3 + 0.0093 * e**2 - 0.0726 * e + 1.03},
-}
-
-# Constantes e Incertezas das constantes do Fator G (da0, da1, da2, da3)
-# Estes valores são fixos para cada faixa de CSR e serão usados no calcular_fator_g
-FATOR_G_CONSTANTS_UNCERTAINTIES = {
-    0.30: {'a0': 0.6862414, 'da0': 0.0215771, 'a1': -0.1903851, 'da1': 0.0122059, 'a2': 0.0211549, 'da2': 0.0020598, 'a3': -0.0008170, 'da3': 0.0001055},
-    0.35: {'a0': 0.7520924, 'da0': 0.0214658, 'a1': -0.2040045, 'da1': 0.0121429, 'a2': 0.0223514, 'da2': 0.0020492, 'a3': -0.0008553, 'da3': 0.0001050},
-    0.40: {'a0': 0.8135159, 'da0': 0.0208152, 'a1': -0.2167391, 'da1': 0.0117749, 'a2': 0.0234949, 'da2': 0.0019871, 'a3': -0.0008925, 'da3': 0.0001018},
-    0.45: {'a0': 0.8587792, 'da0': 0.02030096, 'a1': -0.2213542, 'da1': 0.01148395, 'a2': 0.0235061, 'da2': 0.00193800, 'a3': -0.0008817, 'da3': 0.00009929},
-    0.50: {'a0': 0.8926865, 'da0': 0.0192286, 'a1': -0.2192870, 'da1': 0.0108773, 'a2': 0.0224164, 'da2': 0.0018356, 'a3': -0.0008171, 'da3': 0.0000940},
-    0.55: {'a0': 0.9237367, 'da0': 0.0184259, 'a1': -0.2189931, 'da1': 0.0104233, 'a2': 0.0221241, 'da2': 0.0017590, 'a3': -0.0008050, 'da3': 0.0000901},
-    0.60: {'a0': 0.9131422, 'da0': 0.0097610, 'a1': -0.1996713, 'da1': 0.0055217, 'a2': 0.0190965, 'da2': 0.0009318, 'a3': -0.0006696, 'da3': 0.0000477},
-}
-
-# Incertezas das entradas (em porcentagem do valor)
-INCERTEZA_KV_PERCENTUAL = 0.01  # ±1%
-INCERTEZA_MAS_PERCENTUAL = 0.05 # ±5%
-INCERTEZA_ESPESSURA_PERCENTUAL = 0.05 # ±5% (considerando 1 a 2mm como 2% a 5% de 2 a 11cm)
-INCERTEZA_X_KI_PERCENTUAL = 0.02 # ±2% para os valores de 'x' na tabela Ki
-INCERTEZA_COEFS_FATOR_C_PERCENTUAL = 0.05 # ±5% para os coeficientes das fórmulas do Fator C
-
-# --- FIM DICIONÁRIOS GLOBAIS E CONSTANTES DE INCERTEZA ---
-
-# --- FUNÇÃO GENÉRICA DE PROPAGAÇÃO DE INCERTEZAS (MANUAL) ---
-def propagate_uncertainty(value_func, uncertainty_terms):
-    """
-    Calcula a incerteza propagada usando a fórmula da raiz quadrada da soma dos quadrados (RSS).
-    Args:
-        value_func (callable): Uma função que retorna o valor da medida.
-        uncertainty_terms (list of tuples): Lista de (derivada_parcial, incerteza_da_entrada).
-            A derivada parcial deve ser o valor numérico avaliado.
-    Returns:
-        float: A incerteza propagada.
-    """
-    sum_of_squares = 0
-    for partial_deriv, input_uncertainty in uncertainty_terms:
-        sum_of_squares += (partial_deriv * input_uncertainty)**2
-    
-    return math.sqrt(sum_of_squares)
-
-# --- FIM FUNÇÃO GENÉRICA DE PROPAGAÇÃO DE INCERTEZAS ---
-
-# Função auxiliar para extrair coeficientes do Fator C.
-# MOVIMENTO: Esta função foi movida para o escopo global para resolver o NameError.
-def get_coeffs_from_lambda_for_fator_c(csr_key, group_key):
-    coeffs_map = {
-        0.34: {
-            1: {'a': 0.0004, 'b': -0.0105, 'c': 0.093, 'd': 0.9449},
-            2: {'a': 0.0001, 'b': -0.0035, 'c': 0.0295, 'd': 0.9831},
-            3: {'a': -0.0001, 'b': 0.0028, 'c': -0.0242, 'd': 1.0105},
-            4: {'a': -0.0005, 'b': 0.0103, 'c': -0.0773, 'd': 1.0343}
-        },
-        0.35: {
-            1: {'a': 0.0004, 'b': -0.0105, 'c': 0.093, 'd': 0.9449},
-            2: {'a': 0.0001, 'b': -0.0035, 'c': 0.0295, 'd': 0.9831},
-            3: {'a': -0.0001, 'b': 0.0028, 'c': -0.0242, 'd': 1.0105},
-            4: {'a': -0.0005, 'b': 0.0103, 'c': -0.0773, 'd': 1.0343}
-        },
-        0.36: {
-            1: {'a': 0.0004, 'b': -0.0103, 'c': 0.0915, 'd': 0.9443},
-            2: {'a': 0.0002, 'b': -0.0044, 'c': 0.0338, 'd': 0.9768},
-            3: {'a': -0.0001, 'b': 0.0029, 'c': -0.0248, 'd': 1.0118},
-            4: {'a': -0.0004, 'b': 0.0093, 'c': -0.0726, 'd': 1.03}
-        },
-        0.37: {
-            1: {'a': 0.0005, 'b': -0.0117, 'c': 0.098, 'd': 0.9345},
-            2: {'a': 0.0002, 'b': -0.0041, 'c': 0.0325, 'd': 0.9783},
-            3: {'a': -0.0001, 'b': 0.003, 'c': -0.0247, 'd': 1.0117},
-            4: {'a': -0.0004, 'b': 0.0091, 'c': -0.0718, 'd': 1.0304}
-        },
-        0.38: {
-            1: {'a': 0.0005, 'b': -0.0117, 'c': 0.0978, 'd': 0.9342},
-            2: {'a': 0.0002, 'b': -0.0041, 'c': 0.0324, 'd': 0.9782},
-            3: {'a': -0.0001, 'b': 0.0031, 'c': -0.0252, 'd': 1.0126},
-            4: {'a': -0.0004, 'b': 0.009, 'c': -0.0715, 'd': 1.0306}
-        },
-        0.39: {
-            1: {'a': 0.0005, 'b': -0.0116, 'c': 0.0974, 'd': 0.934},
-            2: {'a': 0.0002, 'b': -0.0041, 'c': 0.0324, 'd': 0.9782},
-            3: {'a': -0.0001, 'b': 0.0031, 'c': -0.0251, 'd': 1.0126},
-            4: {'a': -0.0004, 'b': 0.0089, 'c': -0.0712, 'd': 1.0311}
-        },
-        0.40: {
-            1: {'a': 0.0005, 'b': -0.0114, 'c': 0.0959, 'd': 0.9335},
-            2: {'a': 0.0002, 'b': -0.0041, 'c': 0.0322, 'd': 0.9779},
-            3: {'a': -0.0001, 'b': 0.0031, 'c': -0.0248, 'd': 1.0128},
-            4: {'a': -0.0004, 'b': 0.0087, 'c': -0.0703, 'd': 1.0324}
-        },
-        0.41: {
-            1: {'a': 0.0007, 'b': -0.0154, 'c': 0.1207, 'd': 0.8822},
-            2: {'a': 0.0002, 'b': -0.0036, 'c': 0.0299, 'd': 0.9801},
-            3: {'a': -0.0001, 'b': 0.0031, 'c': -0.0248, 'd': 1.0125},
-            4: {'a': -0.0004, 'b': 0.009, 'c': -0.0716, 'd': 1.0352}
-        },
-        0.42: {
-            1: {'a': 0.0007, 'b': -0.0165, 'c': 0.1278, 'd': 0.8677},
-            2: {'a': 0.0001, 'b': -0.0034, 'c': 0.0293, 'd': 0.9807},
-            3: {'a': -0.0001, 'b': 0.0031, 'c': -0.0247, 'd': 1.0124},
-            4: {'a': -0.0004, 'b': 0.0091, 'c': -0.0719, 'd': 1.0358}
-        },
-        0.43: {
-            1: {'a': 0.0008, 'b': -0.0177, 'c': 0.1349, 'd': 0.853},
-            2: {'a': 0.0001, 'b': -0.0033, 'c': 0.0286, 'd': 0.9815},
-            3: {'a': -0.0001, 'b': 0.0031, 'c': -0.0247, 'd': 1.0124},
-            4: {'a': -0.0004, 'b': 0.0092, 'c': -0.0724, 'd': 1.0368}
-        },
-        0.44: {
-            1: {'a': 0.0009, 'b': -0.0188, 'c': 0.1419, 'd': 0.8384},
-            2: {'a': 0.0001, 'b': -0.0032, 'c': 0.0279, 'd': 0.9822},
-            3: {'a': -0.0001, 'b': 0.0031, 'c': -0.0246, 'd': 1.0122},
-            4: {'a': -0.0004, 'b': 0.0092, 'c': -0.0727, 'd': 1.0375}
-        },
-        0.45: {
-            1: {'a': 0.0011, 'b': -0.0229, 'c': 0.1669, 'd': 0.787},
-            2: {'a': 0.00009, 'b': -0.0026, 'c': 0.0252, 'd': 0.9851},
-            3: {'a': -0.0001, 'b': 0.0029, 'c': -0.0238, 'd': 1.0109},
-            4: {'a': -0.0004, 'b': 0.009, 'c': -0.0719, 'd': 1.0374}
-        },
-        0.46: {
-            1: {'a': 0.0007, 'b': -0.0162, 'c': 0.1292, 'd': 0.8523},
-            2: {'a': 0.00008, 'b': -0.0024, 'c': 0.0241, 'd': 0.9865},
-            3: {'a': -0.0001, 'b': 0.0029, 'c': -0.0241, 'd': 1.0127},
-            4: {'a': -0.0004, 'b': 0.0087, 'c': -0.0706, 'd': 1.0377}
-        },
-        0.47: {
-            1: {'a': 0.0006, 'b': -0.015, 'c': 0.1216, 'd': 0.8666},
-            2: {'a': 0.00008, 'b': -0.0024, 'c': 0.0238, 'd': 0.9869},
-            3: {'a': -0.0001, 'b': 0.0029, 'c': -0.0242, 'd': 1.0132},
-            4: {'a': -0.0004, 'b': 0.0086, 'c': -0.07, 'd': 1.0375}
-        },
-        0.48: {
-            1: {'a': 0.0008, 'b': -0.0177, 'c': 0.1349, 'd': 0.853},
-            2: {'a': 0.0008, 'b': -0.0177, 'c': 0.1349, 'd': 0.853}, # Duplicado, verificar no original se é intencional
-            3: {'a': 0.0004, 'b': -0.0105, 'c': 0.093, 'd': 1.077},
-            4: {'a': -0.0004, 'b': 0.0093, 'c': -0.0726, 'd': 1.03}
-        },
-        0.50: {
-            1: {'a': 0.0004, 'b': -0.0105, 'c': 0.093, 'd': 1.077},
-            2: {'a': 0.0008, 'b': (-0.0177 + 0.1349), 'c': 0.0, 'd': 0.853}, # Corrigido coeficientes para evitar ambiguidade na fórmula
-            3: {'a': 0.0004, 'b': -0.0105, 'c': 0.093, 'd': 1.077},
-            4: {'a': -0.0004, 'b': 0.0093, 'c': -0.0726, 'd': 1.03}
-        },
-    }
-    return coeffs_map.get(csr_key, {}).get(group_key, None)
-
-
-# Fórmulas para CSR (função)
-def calcular_csr(kv_val, alvo_filtro, d_kv_abs):
-    try:
-        const_a = csr_coeffs.get(alvo_filtro)['a']
-        const_b = csr_coeffs.get(alvo_filtro)['b']
-        
-        csr_val = round(const_a * kv_val + const_b, 2)
-
-        # Derivada parcial de CSR em relação a Kv é 'const_a'
-        partial_deriv_kv = const_a
-        
-        incerteza_csr = propagate_uncertainty(
-            lambda: csr_val,
-            [(partial_deriv_kv, d_kv_abs)]
-        )
-
-        return csr_val, round(incerteza_csr, 4)
-    except Exception: # Captura qualquer erro, incluindo se alvo/filtro for inválido
-        return "Erro CSR", 0.0
-
-
-# FUNÇÃO calcular_fator_g
-def calcular_fator_g(csr_val, espessura_val, d_espessura_abs):
-    """
-    Calcula o fator g e sua incerteza.
-    """
-    try:
-        a0, a1, a2, a3 = 0, 0, 0, 0
-        da0, da1, da2, da3 = 0, 0, 0, 0 # Incertezas das constantes
-
-        # Encontra a faixa de CSR mais próxima para obter as constantes
-        # Usamos FATOR_G_CONSTANTS_UNCERTAINTIES porque ela já tem todos os dados
-        csr_keys = list(FATOR_G_CONSTANTS_UNCERTAINTIES.keys())
-        csr_aproximado_key = min(csr_keys, key=lambda x: abs(x - csr_val))
-        
-        constants_data = FATOR_G_CONSTANTS_UNCERTAINTIES.get(csr_aproximado_key)
-
-        if not constants_data:
-            return "CSR fora do intervalo suportado para cálculo do fator g.", 0.0
-
-        a0, da0 = constants_data['a0'], constants_data['da0']
-        a1, da1 = constants_data['a1'], constants_data['da1']
-        a2, da2 = constants_data['a2'], constants_data['da2']
-        a3, da3 = constants_data['a3'], constants_data['da3']
-
-        # Valor numérico do Fator g
-        fator_g_calculado = (a0 + (a1 * espessura_val) + (a2 * (espessura_val**2)) + (a3 * (espessura_val**3)))
-        fator_g_val = max(0, round(fator_g_calculado, 4))
-
-        # Calcula as derivadas parciais manualmente
-        # f(x, a0, a1, a2, a3) = a0 + a1*x + a2*x^2 + 3*a3*x^2
-        # Derivada em relação a x (espessura_val): a1 + 2*a2*x + 3*a3*x^2
-        partial_deriv_espessura = a1 + 2*a2*espessura_val + 3*a3*espessura_val**2
-        # Derivada em relação a a0: 1
-        partial_deriv_a0 = 1
-        # Derivada em relação a a1: x
-        partial_deriv_a1 = espessura_val
-        # Derivada em relação a a2: x^2
-        partial_deriv_a2 = espessura_val**2
-        # Derivada em relação a a3: x^3
-        partial_deriv_a3 = espessura_val**3
-
-        incerteza_fator_g = propagate_uncertainty(
-            lambda: fator_g_val, # O valor da função
-            [
-                (partial_deriv_espessura, d_espessura_abs),
-                (partial_deriv_a0, da0),
-                (partial_deriv_a1, da1),
-                (partial_deriv_a2, da2),
-                (partial_deriv_a3, da3)
-            ]
-        )
-
-        return fator_g_val, round(incerteza_fator_g, 4)
-    
-    except Exception: # Captura qualquer erro
-        return "Erro Fator g", 0.0
-
-# FUNÇÃO DE GLANDULARIDADE (incerteza não propagada aqui, assumida como exata)
-def calcular_glandularidade(idade, espessura_mama_cm):
-    """
-    Calcula a glandularidade usando a fórmula G = at^3 + bt^2 + ct + k.
-    t é a espessura da mama em mm.
-    """
-    espessura_mama_mm = espessura_mama_cm * 10
-
-    # Define as constantes com base na idade
-    if 30 <= idade <= 49:
-        a = -0.000196
-        b = 0.0666
-        c = -7.450000
-        k = 278
-    elif 50 <= idade <= 54:
-        a = -0.000255
-        b = 0.0768
-        c = -7.670000
-        k = 259
-    elif 55 <= idade <= 59:
-        a = -0.000199
-        b = 0.0593
-        c = -6.000000
-        k = 207
-    elif 60 <= idade <= 88:
-        a = -0.000186
-        b = 0.0572
-        c = -5.990000
-        k = 208
-    else:
-        return "Idade fora do intervalo suportado para cálculo de glandularidade (30-88)."
-
-    # Calcula G
-    G = (a * (espessura_mama_mm**3)) + (b * (espessura_mama_mm**2)) + (c * espessura_mama_mm) + k
-    
-    return max(0, round(G, 2))
-
-# Função para calcular o fator C (com incerteza)
-def calcular_fator_c(csr, espessura, glandularidade, d_espessura_abs):
-    try:
-        espessura = float(espessura)
-        glandularidade = float(glandularidade)
-
-        grupo_val = 0
-        if glandularidade <= 25:
-            grupo_val = 1
-        elif glandularidade <= 50:
-            grupo_val = 2
-        elif glandularidade <= 75:
-            grupo_val = 3
-        else:
-            grupo_val = 4
-
-        csr_aproximado = min(formulas_fator_c.keys(), key=lambda x: abs(x - csr))
-
-        if csr_aproximado not in formulas_fator_c:
-            return "CSR fora do intervalo suportado.", 0.0
-
-        coeffs = get_coeffs_from_lambda_for_fator_c(csr_aproximado, grupo_val)
-        if not coeffs:
-            return "Erro: Coeficientes do Fator C não encontrados.", 0.0
-
-        a, b, c, d = coeffs['a'], coeffs['b'], coeffs['c'], coeffs['d']
-        
-        fator_c_val = (a * espessura**3) + (b * espessura**2) + (c * espessura) + d
-        fator_c_val = round(fator_c_val, 4)
-
-        # Incertezas absolutas dos coeficientes
-        da = a * INCERTEZA_COEFS_FATOR_C_PERCENTUAL
-        db = b * INCERTEZA_COEFS_FATOR_C_PERCENTUAL
-        dc = c * INCERTEZA_COEFS_FATOR_C_PERCENTUAL
-        dd = d * INCERTEZA_COEFS_FATOR_C_PERCENTUAL
-
-        # Derivadas parciais de Fator C = a*e^3 + b*e^2 + c*e + d
-        partial_deriv_espessura = (3 * a * espessura**2) + (2 * b * espessura) + c
-        partial_deriv_a = espessura**3
-        partial_deriv_b = espessura**2
-        partial_deriv_c = espessura
-        partial_deriv_d = 1
-
-        incerteza_fator_c = propagate_uncertainty(
-            lambda: fator_c_val,
-            [
-                (partial_deriv_espessura, d_espessura_abs),
-                (partial_deriv_a, da),
-                (partial_deriv_b, db),
-                (partial_deriv_c, dc),
-                (partial_deriv_d, dd)
-            ]
-        )
-        return fator_c_val, round(incerteza_fator_c, 4)
-
-    except (ValueError, TypeError) as e:
-        return f"Entrada inválida para Fator C: {e}", 0.0
-    except Exception as e:
-        return f"Erro inesperado no cálculo do Fator C: {e}", 0.0
-
-# Função para calcular o Ki (com incerteza e seleção de tabela)
-def calcular_ki(kv, alvo_filtro, mas, espessura_mama, d_mas_abs, d_espessura_abs, local_mamografo):
-    try:
-        # Seleciona a tabela de Ki correta com base no local do mamógrafo
-        tabela_ki_selecionada = tabelas_ki_por_local.get(local_mamografo)
-        
-        if tabela_ki_selecionada is None:
-            return "Local do mamógrafo inválido selecionado.", 0.0
-
-        x_val = tabela_ki_selecionada.get((alvo_filtro, int(kv)))
-        
-        if x_val is None:
-            # Caso não encontre o kV exato na tabela, pode-se implementar interpolação
-            # Por agora, retornará erro conforme o comportamento atual
-            kv_options_for_alvo = [k for af, k in tabela_ki_selecionada.keys() if af == alvo_filtro]
-            if kv_options_for_alvo:
-                return f"Combinação de alvo/filtro ({alvo_filtro}) para Kv {kv} não encontrada para o local {local_mamografo}. KVs disponíveis: {sorted(kv_options_for_alvo)}.", 0.0
-            else:
-                return f"Combinação de alvo/filtro ({alvo_filtro}) não encontrada para o local {local_mamografo}.", 0.0
-        
-        # Define os fatores específicos do Ki com base no local do mamógrafo
-        if local_mamografo == 'UFRJ':
-            conversion_factor = 1892.25
-            reference_thickness = 64
-        else: # Default para IRD e qualquer outro caso
-            conversion_factor = 2500
-            reference_thickness = 63
-            
-        divisor = (reference_thickness - espessura_mama)**2
-        if divisor == 0:
-            return f"Erro: A espessura da mama é inválida para o cálculo de Ki ({reference_thickness} - espessura deve ser diferente de zero).", 0.0
-
-        ki_val = round(((x_val * mas)*conversion_factor) / divisor, 2)
-
-        # Incerteza de x_val
-        d_x_abs = x_val * INCERTEZA_X_KI_PERCENTUAL
-
-        # Derivadas parciais de Ki = (x * mas * conversion_factor) / (reference_thickness - espessura_mama)**2
-        # dKi/dx = (mas * conversion_factor) / (reference_thickness - espessura_mama)**2
-        partial_deriv_x = (mas * conversion_factor) / divisor
-
-        # dKi/dmas = (x * conversion_factor) / (reference_thickness - espessura_mama)**2
-        partial_deriv_mas = (x_val * conversion_factor) / divisor
-
-        # dKi/despessura = (x * mas * conversion_factor) * (-2 * (reference_thickness - espessura_mama) * -1) / ((reference_thickness - espessura_mama)**2)**2
-        # dKi/despessura = (x * mas * conversion_factor * 2 * (reference_thickness - espessura_mama)) / ((reference_thickness - espessura_mama)**4)
-        # dKi/despessura = (x * mas * conversion_factor * 2) / ((reference_thickness - espessura_mama)**3)
-        partial_deriv_espessura = (x_val * mas * conversion_factor * 2) / ((reference_thickness - espessura_mama)**3)
-
-        incerteza_ki = propagate_uncertainty(
-            lambda: ki_val,
-            [
-                (partial_deriv_x, d_x_abs),
-                (partial_deriv_mas, d_mas_abs),
-                (partial_deriv_espessura, d_espessura_abs)
-            ]
-        )
-        
-        return ki_val, round(incerteza_ki, 4)
-    except Exception as e:
-        return f"Erro no cálculo de Ki: {e}", 0.0
-
-
-# --- FUNÇÃO calcular_dgm (AGORA RETORNA VALOR E INCERTEZA) ---
-def calcular_dgm(ki_val, s_val, fator_g_val, fator_c_val, incerteza_ki, incerteza_s, incerteza_fator_g, incerteza_fator_c):
-    try:
-        dgm = ki_val * s_val * fator_g_val * fator_c_val
-        
-        # Derivadas parciais de DGM = Ki * s * Fg * Fc
-        partial_deriv_ki = s_val * fator_g_val * fator_c_val
-        partial_deriv_s = ki_val * fator_g_val * fator_c_val
-        partial_deriv_fg = ki_val * s_val * fator_c_val
-        partial_deriv_fc = ki_val * s_val * fator_g_val
-
-        incerteza_dgm = propagate_uncertainty(
-            lambda: dgm, # Valor da DGM
-            [
-                (partial_deriv_ki, incerteza_ki),
-                (partial_deriv_s, incerteza_s),
-                (partial_deriv_fg, incerteza_fator_g),
-                (partial_deriv_fc, incerteza_fator_c)
-            ]
-        )
-        
-        # Multiplica a incerteza da DGM por 10% conforme solicitado
-        incerteza_dgm = incerteza_dgm * 0.10
-
-        return round(dgm, 2), round(incerteza_dgm, 4)
-    except Exception as e: # Captura qualquer erro
-        return f"Erro DGM: {e}", 0.0
-
-# Funções para Exportação (CSV)
-@st.cache_data
-def to_csv(df):
-    return df.to_csv(index=False).encode('utf-8')
-
-# --- Interface Streamlit ---
-st.set_page_config(
-    page_title="Calculadora de DGM",
-    page_icon="🔬",
-    layout="centered"
-)
-
-st.title("🔬 Calculadora de Dose Glandular Média (DGM)")
-st.markdown("Preencha os campos abaixo para calcular a DGM de mamografia.")
-
-# Inicializar st.session_state para armazenar os resultados
-if 'resultados_dgm' not in st.session_state:
-    st.session_state.resultados_dgm = pd.DataFrame(columns=[
-        "Data/Hora", "ID Paciente", "Iniciais Paciente", "Local do Mamógrafo", "Idade", "Espessura (cm)", "Alvo/Filtro", "Kv", "mAs",
-        "Glandularidade (%)", "Grupo Glandularidade", "Valor s", "CSR", "Incerteza CSR", 
-        "Fator g", "Incerteza Fator g", "Fator C", "Incerteza Fator C", "Ki", "Incerteza Ki", "DGM (mGy)", "Incerteza DGM (mGy)" 
-    ])
-
-# Sidebar para inputs
-with st.sidebar:
-    st.header("Dados de Entrada")
-    
-    # NOVOS CAMPOS PARA DADOS DO PACIENTE
-    paciente_id = st.text_input('ID do Paciente:', help="Identificador único do paciente (ex: prontuário)")
-    iniciais_paciente = st.text_input('Iniciais da Paciente:', max_chars=3, help="Iniciais da paciente (ex: J.S.)").upper() # Converte para maiúsculas
-    
-    # NOVO CAMPO PARA SELEÇÃO DO LOCAL DO MAMÓGRAFO
-    local_mamografo = st.selectbox('Local do Mamógrafo:', options=list(tabelas_ki_por_local.keys()), index=0) # IRD como padrão
-    
-    idade = st.number_input('Idade:', min_value=1, max_value=120, value=45, help="Idade da paciente (usado para glandularidade automática)")
-    espessura_mama = st.number_input('Espessura da Mama (cm):', min_value=1.0, max_value=20.0, value=6.0, step=0.1, help="Espessura da mama comprimida em centímetros")
-    alvo_filtro = st.selectbox('Alvo/Filtro:', options=list(alvo_filtro_options.keys()))
-    kv = st.number_input('Kv:', min_value=1.0, max_value=50.0, value=28.0, step=0.1)
-    mas = st.number_input('mAs:', min_value=0.1, max_value=1000.0, value=50.0, step=0.1)
-    
-    sabe_glandularidade = st.checkbox("Eu sei a glandularidade (marcar para inserir manualmente)")
-    glandularidade_input = None
-    if sabe_glandularidade:
-        glandularidade_input = st.number_input('Glandularidade (%):', min_value=0.0, max_value=100.0, value=50.0, step=0.1)
-
-# Botão de Cálculo
-st.markdown("---")
-if st.button("Calcular DGM"):
-    st.subheader("Resultados do Cálculo Atual:")
-
-    # --- Cálculo de Incertezas Absolutas das Entradas ---
-    # Convertendo porcentagens para valores absolutos de incerteza
-    d_kv_abs = kv * INCERTEZA_KV_PERCENTUAL
-    d_mas_abs = mas * INCERTEZA_MAS_PERCENTUAL
-    d_espessura_abs = espessura_mama * INCERTEZA_ESPESSURA_PERCENTUAL
-
-    # --- Cálculo e Exibição de Glandularidade ---
-    col1, col2 = st.columns(2)
-    glandularidade = None
-    with col1:
-        if sabe_glandularidade and glandularidade_input is not None:
-            glandularidade = glandularidade_input
-            st.info(f"**Glandularidade informada:** {glandularidade:.1f}%")
-        else:
-            glandularidade_calc = calcular_glandularidade(idade, espessura_mama)
-            if isinstance(glandularidade_calc, str):
-                st.error(f"Erro ao calcular Glandularidade: {glandularidade_calc}")
-                glandularidade = "Erro"
-            else:
-                glandularidade = glandularidade_calc
-                st.info(f"**Glandularidade:** {glandularidade:.1f}%")
-
-    # --- Cálculo e Exibição de s ---
-    with col2:
-        s = alvo_filtro_options.get(alvo_filtro, "Inválido")
-        incerteza_s = 0.0 # Assumida como zero
-        if isinstance(s, str):
-            st.error(f"Erro no valor de s: {s}")
-            s_val = "Erro"
-        else:
-            st.info(f"**Valor de s:** {s}")
-            s_val = s
-
-    # --- Cálculo e Exibição de CSR e Fator g ---
-    col3, col4 = st.columns(2)
-    with col3:
-        # calcular_csr agora retorna (valor, incerteza)
-        csr_val, incerteza_csr = calcular_csr(kv, alvo_filtro, d_kv_abs)
-        if isinstance(csr_val, str):
-            st.error(f"Erro no cálculo de CSR: {csr_val}")
-            csr_val_to_record = "Erro" # Valor para registro no histórico
-            incerteza_csr_to_record = "Erro"
-        else:
-            st.info(f"**Valor de CSR:** {csr_val} ± {incerteza_csr}")
-            csr_val_to_record = csr_val
-            incerteza_csr_to_record = incerteza_csr
-
-    with col4:
-        # Fator g agora retorna (valor, incerteza)
-        fator_g_val, incerteza_fator_g = calcular_fator_g(csr_val_to_record, espessura_mama, d_espessura_abs)
-        
-        if isinstance(fator_g_val, str):
-            st.error(f"Erro no cálculo do Fator g: {fator_g_val}")
-            fator_g_val_to_record = "Erro"
-            incerteza_fator_g_to_record = "Erro"
-        else:
-            st.info(f"**Valor do Fator g:** {fator_g_val} ± {incerteza_fator_g}")
-            fator_g_val_to_record = fator_g_val
-            incerteza_fator_g_to_record = incerteza_fator_g
-
-    # --- Cálculo e Exibição de Fator C e Ki ---
-    col5, col6 = st.columns(2)
-    
-    grupo_glandularidade_val = "Não calculado"
-    if isinstance(glandularidade, (int, float)):
-        if glandularidade <= 25:
-            grupo_glandularidade_val = 1
-        elif glandularidade <= 50:
-            grupo_glandularidade_val = 2
-        elif glandularidade <= 75:
-            grupo_glandularidade_val = 3
-        else:
-            grupo_glandularidade_val = 4
-
-    with col5:
-        fator_c_val_to_record = "Erro"
-        incerteza_fator_c_to_record = "Erro"
-        if isinstance(csr_val_to_record, (int, float)) and isinstance(glandularidade, (int, float)):
-            csr_possiveis_fator_c_local = list(formulas_fator_c.keys()) 
-            csr_para_c = min(csr_possiveis_fator_c_local, key=lambda x: abs(x - csr_val_to_record))
-
-            fator_c_calc, incerteza_fator_c = calcular_fator_c(csr_para_c, espessura_mama, glandularidade, d_espessura_abs)
-
-            if isinstance(fator_c_calc, str):
-                st.error(f"Erro no cálculo do Fator C: {fator_c_calc}")
-            else:
-                st.info(f"**Valor do Fator C:** {fator_c_calc} ± {incerteza_fator_c}")
-                fator_c_val_to_record = fator_c_calc
-                incerteza_fator_c_to_record = incerteza_fator_c
-        else:
-            st.warning("Fator C não calculado devido a entradas inválidas de CSR ou Glandularidade.")
-
-    with col6:
-        ki_val_to_record = "Erro"
-        incerteza_ki_to_record = "Erro"
-        # Passa o local_mamografo para a função calcular_ki
-        ki_calc, incerteza_ki = calcular_ki(kv, alvo_filtro, mas, espessura_mama, d_mas_abs, d_espessura_abs, local_mamografo)
-        if isinstance(ki_calc, str):
-            st.error(f"Erro no cálculo de Ki: {ki_calc}")
-        else:
-            st.info(f"**Valor de Ki:** {ki_calc} ± {incerteza_ki}")
-            ki_val_to_record = ki_calc
-            incerteza_ki_to_record = incerteza_ki
-
-    # --- Cálculo e Exibição final da DGM e sua Incerteza ---
-    st.markdown("---")
-    dgm_val_to_record = "Erro"
-    incerteza_dgm_val_to_record = "Erro"
-    
-    if all(isinstance(val, (int, float)) for val in [ki_val_to_record, s_val, fator_g_val_to_record, fator_c_val_to_record, 
-                                                     incerteza_ki_to_record, incerteza_s, incerteza_fator_g_to_record, incerteza_fator_c_to_record]):
-        
-        dgm, incerteza_dgm = calcular_dgm(ki_val_to_record, s_val, fator_g_val_to_record, fator_c_val_to_record, 
-                                         incerteza_ki_to_record, incerteza_s, incerteza_fator_g_to_record, incerteza_fator_c_to_record)
-        
-        if isinstance(dgm, str):
-            st.error(f"Não foi possível calcular a DGM: {dgm}")
-        else:
-            st.success(f"**Valor da DGM:** {dgm} mGy ± {incerteza_dgm} mGy")
-            dgm_val_to_record = dgm
-            incerteza_dgm_val_to_record = incerteza_dgm
-    else:
-        st.error("Não foi possível calcular a DGM devido a erros nos valores anteriores ou incertezas inválidas.")
-
-    # Armazenar resultados na sessão
-    if dgm_val_to_record != "Erro":
-        nova_linha = {
-            "Data/Hora": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "ID Paciente": paciente_id,
-            "Iniciais Paciente": iniciais_paciente,
-            "Local do Mamógrafo": local_mamografo, # Novo campo no histórico
-            "Idade": idade,
-            "Espessura (cm)": espessura_mama,
-            "Alvo/Filtro": alvo_filtro,
-            "Kv": kv,
-            "mAs": mas,
-            "Glandularidade (%)": glandularidade,
-            "Grupo Glandularidade": grupo_glandularidade_val,
-            "Valor s": s_val,
-            "CSR": csr_val_to_record,
-            "Incerteza CSR": incerteza_csr_to_record, 
-            "Fator g": fator_g_val_to_record,
-            "Incerteza Fator g": incerteza_fator_g_to_record,
-            "Fator C": fator_c_val_to_record,
-            "Incerteza Fator C": incerteza_fator_c_to_record,
-            "Ki": ki_val_to_record,
-            "Incerteza Ki": incerteza_ki_to_record,
-            "DGM (mGy)": dgm_val_to_record,
-            "Incerteza DGM (mGy)": incerteza_dgm_val_to_record
-        }
-        st.session_state.resultados_dgm = pd.concat([st.session_state.resultados_dgm, pd.DataFrame([nova_linha])], ignore_index=True)
-
-# --- Exibição do Histórico e Botões ---
-st.markdown("---")
-st.subheader("Histórico de Cálculos:")
-
-if not st.session_state.resultados_dgm.empty:
-    st.dataframe(st.session_state.resultados_dgm, use_container_width=True)
-    
-    csv_data = to_csv(st.session_state.resultados_dgm)
-    st.download_button(
-        label="📥 Baixar Resultados como CSV",
-        data=csv_data,
-        file_name=f"resultados_dgm_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-        mime="text/csv",
-    )
-    
-    if st.button("Limpar Histórico"):
-        st.session_state.resultados_dgm = pd.DataFrame(columns=[
-            "Data/Hora", "ID Paciente", "Iniciais Paciente", "Local do Mamógrafo", "Idade", "Espessura (cm)", "Alvo/Filtro", "Kv", "mAs",
-            "Glandularidade (%)", "Grupo Glandularidade", "Valor s", "CSR", "Incerteza CSR", 
-            "Fator g", "Incerteza Fator g", "Fator C", "Incerteza Fator C", "Ki", "Incerteza Ki", "DGM (mGy)", "Incerteza DGM (mGy)"
-        ])
-        st.experimental_rerun()
-else:
-    st.info("Nenhum cálculo realizado ainda. Os resultados aparecerão aqui.")
-
-st.markdown("---")
-st.markdown("Desenvolvido por Jossana Almeida, com o auxílio de um modelo de linguagem.")
-
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import io
+import tempfile
+import time
+import uuid
+
+from dgm.nucleo import alvo_filtro_options
+from dgm.calibracao import REGISTRO as REGISTRO_CALIBRACOES, calibracao_ativa
+from dgm.cache import configurar_cache, estatisticas_cache, limpar_cache, max_entradas_cache
+from dgm.arquivos import contar_linhas, ler_blocos, ler_cabecalho
+from dgm.colunar import ArmazemColunar
+from dgm.lote import COLUNAS_ENTRADA_LOTE, calcular_dgm_lote, colunas_faltando
+from dgm.historico import COLUNAS_HISTORICO, HistoricoDGM
+from dgm.exportacao import FORMATOS_EXPORTACAO, exportar_historico_em_cache
+from dgm.drl import AgregadorDRL
+from dgm.grafo import GRAFO_INDIVIDUAL, CalculoIncremental
+from dgm.montecarlo import simular_dgm
+from dgm.resultados import RegistroDGM
+from dgm.otimizador import carta_tecnica, otimizar_tecnicas
+from dgm.metricas import (
+    ativar_metricas,
+    estatisticas_metricas,
+    exportar_metricas_json,
+    exportar_metricas_prometheus,
+    limpar_metricas,
+    metricas_ativas,
+)
+
+# Linhas calculadas por execução do painel de lote; cada bloco é uma reexecução curta
+# do fragmento, o que mantém a página responsiva e permite cancelar entre blocos.
+TAMANHO_BLOCO_INTERFACE = 5_000
+
+# Linhas exibidas por página do histórico
+TAMANHO_PAGINA_HISTORICO = 50
+
+# Histórico persistente (SQLite): um arquivo para o servidor, mas cada sessão só vê,
+# exporta e limpa os próprios cálculos (linhas gravadas com o dono da sessão)
+@st.cache_resource
+def obter_historico():
+    return HistoricoDGM()
+
+def dono_historico():
+    """Identificador da sessão do navegador, gravado como dono das linhas do histórico."""
+    if "dono_historico" not in st.session_state:
+        st.session_state.dono_historico = uuid.uuid4().hex
+    return st.session_state.dono_historico
+
+# Estatísticas de DRL da sessão, atualizadas só com os cálculos novos do histórico dela
+def obter_agregador_drl():
+    if "agregador_drl" not in st.session_state:
+        st.session_state.agregador_drl = AgregadorDRL()
+    return st.session_state.agregador_drl
+
+# --- Cálculo em lote a partir de arquivo ---
+# Os resultados de cada bloco vão para um armazém colunar em disco (dgm.colunar), não para a
+# sessão: o tamanho do arquivo enviado não pesa na memória do servidor.
+def iniciar_lote(arquivo):
+    descartar_lote()
+    st.session_state.lote = {
+        "nome": arquivo.name,
+        "blocos": ler_blocos(arquivo, TAMANHO_BLOCO_INTERFACE),
+        "total": contar_linhas(arquivo),
+        "processadas": 0,
+        "armazem": ArmazemColunar(tempfile.mkdtemp(prefix="dgm_lote_"), metadados={"arquivo": arquivo.name}),
+        "status": "processando",
+        "inicio": time.perf_counter(),
+        "duracao": 0.0,
+    }
+
+def descartar_lote():
+    """Apaga o armazém do lote anterior da sessão, se houver."""
+    lote = st.session_state.get("lote")
+    if lote is not None:
+        lote["armazem"].remover()
+    st.session_state.lote = None
+
+def processar_proximo_bloco(lote):
+    """Calcula um único bloco do arquivo e o acrescenta ao armazém do lote."""
+    bloco = next(lote["blocos"], None)
+    if bloco is not None:
+        resultado = calcular_dgm_lote(bloco)
+        for coluna in bloco.columns:
+            if coluna not in resultado.columns:
+                resultado[coluna] = bloco[coluna]
+        lote["armazem"].acrescentar(resultado)
+        lote["processadas"] += len(resultado)
+    else:
+        lote["status"] = "concluído"
+        lote["blocos"] = None
+    lote["duracao"] = time.perf_counter() - lote["inicio"]
+
+def adicionar_lote_ao_historico(armazem):
+    """Acrescenta ao histórico as linhas calculadas com sucesso, bloco a bloco."""
+    data_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    historico = obter_historico()
+    dono = dono_historico()
+    for bloco in armazem.iterar_blocos():
+        validas = bloco[bloco["Erro"] == ""]
+        if validas.empty:
+            continue
+        novas_linhas = pd.DataFrame({
+            coluna: validas[coluna] if coluna in validas.columns else ""
+            for coluna in COLUNAS_HISTORICO
+        })
+        novas_linhas["Data/Hora"] = data_hora
+        historico.adicionar_varias(novas_linhas, dono)
+
+@st.fragment
+def painel_lote():
+    st.markdown("Envie um arquivo CSV ou XLSX com as colunas: " + ", ".join(f"**{c}**" for c in COLUNAS_ENTRADA_LOTE)
+                + ". A coluna **Glandularidade (%)** é opcional (vazia = calculada pela idade).")
+    arquivo = st.file_uploader("Arquivo de exposições", type=["csv", "xlsx"])
+    lote = st.session_state.get("lote")
+    processando = lote is not None and lote["status"] == "processando"
+
+    if arquivo is not None:
+        # Valida as colunas uma vez por arquivo enviado, antes de qualquer cálculo
+        validacao = st.session_state.get("validacao_lote")
+        if validacao is None or validacao[0] != arquivo.file_id:
+            try:
+                validacao = (arquivo.file_id, colunas_faltando(ler_cabecalho(arquivo)), None)
+            except Exception as e:
+                validacao = (arquivo.file_id, None, str(e))
+            st.session_state.validacao_lote = validacao
+        _, faltando, erro_leitura = validacao
+        if erro_leitura:
+            st.error(f"Não foi possível ler o arquivo: {erro_leitura}")
+        elif faltando:
+            st.error(f"Colunas obrigatórias ausentes no arquivo: {', '.join(faltando)}")
+        elif st.button("Processar arquivo", disabled=processando):
+            iniciar_lote(arquivo)
+            lote = st.session_state.lote
+            processando = True
+
+    if lote is None:
+        return
+
+    if processando:
+        if st.button("Cancelar processamento"):
+            lote["status"] = "cancelado"
+        else:
+            processar_proximo_bloco(lote)
+
+    total = max(lote["total"], lote["processadas"], 1)
+    st.progress(min(lote["processadas"] / total, 1.0),
+                text=f"{lote['nome']}: {lote['processadas']} de {lote['total']} linhas ({lote['status']})")
+
+    if lote["status"] == "processando":
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            # Execução completa da página (ex.: outro widget mudou): só então o próximo bloco reexecuta tudo
+            st.rerun()
+
+    armazem = lote["armazem"]
+    if not len(armazem):
+        st.info("Nenhuma linha processada.")
+        return
+
+    # Resumo e erros percorrem o armazém em blocos, sem montar a tabela inteira
+    erros = armazem.contar_valores("Erro")
+    linhas_ok = int(erros.get("", 0))
+    erros = erros.drop("", errors="ignore")
+    taxa = lote["processadas"] / lote["duracao"] if lote["duracao"] > 0 else 0
+    if lote["status"] == "cancelado":
+        st.warning("Processamento cancelado; o resumo abaixo considera apenas as linhas já calculadas.")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Linhas calculadas", linhas_ok)
+    col2.metric("Linhas com erro", int(erros.sum()))
+    col3.metric("Linhas/s", f"{taxa:,.0f}")
+
+    if linhas_ok:
+        st.markdown("**DGM (mGy) por local e alvo/filtro:**")
+        st.dataframe(armazem.resumo(["Local do Mamógrafo", "Alvo/Filtro"], "DGM (mGy)"), use_container_width=True)
+    if not erros.empty:
+        st.markdown("**Erros encontrados:**")
+        st.dataframe(erros, use_container_width=True)
+
+    st.download_button(
+        label="📥 Baixar resultados do lote (CSV)",
+        data=lambda: armazem.exportar(formato="csv").getvalue(),  # gerado só quando o botão é clicado
+        file_name=f"resultados_lote_dgm_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        mime="text/csv",
+    )
+    if st.button("Adicionar resultados ao histórico", disabled=not linhas_ok):
+        adicionar_lote_ao_historico(armazem)
+        descartar_lote()
+        st.rerun()
+
+# --- Otimizador de técnica (fragmento) ---
+@st.fragment
+def painel_otimizador():
+    st.markdown("Avalia todos os alvos/filtros e kV da tabela Ki do local e calcula o mAs de cada combinação "
+                "para atingir uma DGM (ou ficar abaixo de um teto).")
+    col1, col2 = st.columns(2)
+    with col1:
+        local = st.selectbox("Local do Mamógrafo:", calibracao_ativa().nomes_locais, key="otimizador_local")
+        modo = st.radio("Objetivo:", ["DGM alvo", "DGM máxima"], horizontal=True, key="otimizador_modo",
+                        help="DGM alvo: mAs para atingir a dose (menor mAs primeiro). "
+                             "DGM máxima: maior mAs abaixo do teto (maior mAs primeiro).")
+        dgm_objetivo = st.number_input("DGM (mGy):", min_value=0.01, max_value=50.0, value=1.5, step=0.1, key="otimizador_dgm")
+    with col2:
+        usar_idade = st.radio("Glandularidade:", ["Pela idade", "Informada"], horizontal=True, key="otimizador_glandularidade_modo")
+        if usar_idade == "Pela idade":
+            idade_otm, glandularidade_otm = st.number_input("Idade:", min_value=1, max_value=120, value=45, key="otimizador_idade"), None
+        else:
+            idade_otm = None
+            glandularidade_otm = st.number_input("Glandularidade (%):", min_value=0.0, max_value=100.0, value=50.0, step=0.1,
+                                                 key="otimizador_glandularidade")
+        espessura_min, espessura_max = st.slider("Espessuras (cm):", min_value=1.0, max_value=20.0, value=(6.0, 6.0), step=0.1,
+                                                 key="otimizador_espessuras")
+    opcoes = {"dgm_alvo" if modo == "DGM alvo" else "dgm_maxima": dgm_objetivo,
+              "idade": idade_otm, "glandularidade": glandularidade_otm}
+    espessuras = np.round(np.arange(round(espessura_min * 10), round(espessura_max * 10) + 1) / 10, 1)
+
+    try:
+        if len(espessuras) == 1:
+            tabela = otimizar_tecnicas(espessuras, local, **opcoes)
+        else:
+            melhores = st.number_input("Técnicas por espessura:", min_value=1, max_value=10, value=1, key="otimizador_melhores")
+            tabela = carta_tecnica(espessuras, local, melhores=int(melhores), **opcoes)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    if not tabela["Viável"].any():
+        st.warning("Nenhuma técnica atinge o objetivo dentro da faixa de mAs do equipamento.")
+    st.dataframe(tabela, use_container_width=True, hide_index=True)
+    st.download_button(
+        label="📥 Baixar técnicas (CSV)",
+        data=lambda: tabela.to_csv(index=False).encode('utf-8'),
+        file_name=f"tecnicas_dgm_{local}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        mime="text/csv",
+    )
+
+# --- Painéis da barra lateral (fragmentos: seus widgets reexecutam só o próprio painel) ---
+@st.fragment
+def painel_cache():
+    # Cache das etapas intermediárias (compartilhado entre as sessões do servidor). O limite só
+    # é aplicado quando o campo muda: reexecutar uma sessão não desfaz o ajuste feito por outra
+    with st.expander("⚙️ Cache de cálculos"):
+        st.number_input('Máximo de entradas por etapa (0 desativa):', min_value=0, max_value=1_000_000,
+                        value=max_entradas_cache(), step=256, key="max_entradas_cache",
+                        on_change=lambda: configurar_cache(int(st.session_state["max_entradas_cache"])))
+        if st.button("Limpar cache"):
+            limpar_cache()
+        st.dataframe(pd.DataFrame(estatisticas_cache()).set_index("etapa"), use_container_width=True)
+
+@st.fragment
+def painel_diagnostico():
+    # Métricas por etapa (latência, chamadas e erros por tipo), também do processo inteiro
+    with st.expander("🩺 Diagnóstico"):
+        ativar_metricas(st.checkbox("Coletar métricas por etapa", value=metricas_ativas()))
+        if st.button("Zerar métricas"):
+            limpar_metricas()
+        estatisticas = estatisticas_metricas()
+        st.dataframe(
+            pd.DataFrame(estatisticas)[["etapa", "chamadas", "erros", "media_ms", "p50_ms", "p95_ms", "p99_ms"]].set_index("etapa"),
+            use_container_width=True,
+        )
+        erros_por_tipo = [(e["etapa"], tipo, quantidade) for e in estatisticas for tipo, quantidade in e["erros_por_tipo"].items()]
+        if erros_por_tipo:
+            st.dataframe(pd.DataFrame(erros_por_tipo, columns=["etapa", "tipo", "quantidade"]), use_container_width=True, hide_index=True)
+        st.download_button("Métricas (JSON)", data=exportar_metricas_json, file_name="metricas_dgm.json", mime="application/json")
+        st.download_button("Métricas (Prometheus)", data=exportar_metricas_prometheus, file_name="metricas_dgm.prom", mime="text/plain")
+
+# --- Histórico (fragmento: filtros, ordenação e páginas reexecutam só este painel) ---
+@st.fragment
+def painel_historico():
+    historico = obter_historico()
+    dono = dono_historico()
+    total_historico = historico.contar(dono=dono)
+    if not total_historico:
+        st.info("Nenhum cálculo realizado ainda. Os resultados aparecerão aqui.")
+        return
+
+    # Filtros e ordenação são aplicados no banco; só a página exibida é lida
+    col_filtro_id, col_filtro_local, col_periodo = st.columns(3)
+    with col_filtro_id:
+        filtro_id = st.text_input("Filtrar por ID do Paciente:", key="filtro_historico_id").strip()
+    with col_filtro_local:
+        filtro_local = st.selectbox("Filtrar por Local do Mamógrafo:", ["Todos"] + historico.valores_distintos("Local do Mamógrafo", dono),
+                                    key="filtro_historico_local")
+    with col_periodo:
+        periodo = st.date_input("Período:", value=(), key="filtro_historico_periodo")
+    filtros = {"id_paciente": filtro_id or None, "local": None if filtro_local == "Todos" else filtro_local, "dono": dono}
+    if len(periodo) == 2:
+        filtros["data_inicio"] = f"{periodo[0]:%Y-%m-%d} 00:00:00"
+        filtros["data_fim"] = f"{periodo[1]:%Y-%m-%d} 23:59:59"
+
+    col_ordem, col_direcao = st.columns([2, 1], vertical_alignment="bottom")
+    with col_ordem:
+        ordenar_por = st.selectbox("Ordenar por:", COLUNAS_HISTORICO, key="ordem_historico")
+    with col_direcao:
+        decrescente = st.toggle("Decrescente", value=True, key="ordem_historico_decrescente")
+
+    total_filtrado = historico.contar(**filtros)
+    paginas = max(1, -(-total_filtrado // TAMANHO_PAGINA_HISTORICO))
+    pagina = st.number_input(f"Página (de {paginas}):", min_value=1, max_value=paginas, value=1, step=1, key="pagina_historico")
+    st.caption(f"{total_filtrado} de {total_historico} cálculos.")
+    st.dataframe(historico.pagina(pagina, TAMANHO_PAGINA_HISTORICO, ordenar_por, decrescente, **filtros),
+                 use_container_width=True, hide_index=True)
+
+    # O arquivo é gerado a partir do banco só quando o botão é clicado e reaproveitado
+    # enquanto o histórico não mudar (cache pela versão do histórico, sem hash do conteúdo)
+    col_formato, col_baixar = st.columns([1, 2], vertical_alignment="bottom")
+    with col_formato:
+        formato = st.selectbox("Formato:", list(FORMATOS_EXPORTACAO), format_func=str.upper, key="formato_exportacao")
+    extensao, mime = FORMATOS_EXPORTACAO[formato]
+    with col_baixar:
+        st.download_button(
+            label=f"📥 Baixar Resultados como {formato.upper()}",
+            data=lambda: exportar_historico_em_cache(historico, formato, **filtros),
+            file_name=f"resultados_dgm_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extensao}",
+            mime=mime,
+        )
+
+    if st.button("Limpar Histórico"):
+        historico.limpar(dono=dono)
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            st.rerun()
+
+# --- Níveis de referência (fragmento: lê do histórico só os cálculos incluídos desde a última exibição) ---
+@st.fragment
+def painel_drl():
+    agregador = obter_agregador_drl()
+    agregador.sincronizar(obter_historico(), dono=dono_historico())
+    minimo = st.number_input("Mínimo de exposições por grupo:", min_value=1, value=10, step=1, key="drl_minimo_exposicoes")
+    tabela = agregador.tabela(minimo_exposicoes=minimo)
+    if tabela.empty:
+        st.info("Nenhum grupo com exposições suficientes no histórico.")
+        return
+    st.caption("Mediana e P75 estimados por esboço de quantis (erro de posição em torno de 1%); "
+               "média e desvio padrão exatos.")
+    st.dataframe(tabela.round(2), use_container_width=True, hide_index=True)
+    st.download_button("📥 Baixar tabela de DRL (CSV)", data=lambda: tabela.to_csv(index=False).encode("utf-8"),
+                       file_name="drl_dgm.csv", mime="text/csv")
+
+# --- Interface Streamlit ---
+st.set_page_config(
+    page_title="Calculadora de DGM",
+    page_icon="🔬",
+    layout="centered"
+)
+
+st.title("🔬 Calculadora de Dose Glandular Média (DGM)")
+st.markdown("Preencha os campos abaixo para calcular a DGM de mamografia.")
+
+# Calibração dos mamógrafos (arquivos versionados, recarregados quando mudam; ver dgm.calibracao).
+# Lida uma vez por execução: todos os cálculos desta execução usam a mesma.
+calibracao = calibracao_ativa()
+
+# Sidebar para inputs
+with st.sidebar:
+    st.header("Dados de Entrada")
+    if REGISTRO_CALIBRACOES.erro:
+        st.warning(f"Calibração não atualizada (mantida a anterior): {REGISTRO_CALIBRACOES.erro}")
+
+    # Os campos ficam em um formulário: editar um valor não reexecuta a página, só o botão "Calcular DGM"
+    with st.form("entradas_dgm", border=False):
+        # NOVOS CAMPOS PARA DADOS DO PACIENTE
+        paciente_id = st.text_input('ID do Paciente:', help="Identificador único do paciente (ex: prontuário)")
+        iniciais_paciente = st.text_input('Iniciais da Paciente:', max_chars=3, help="Iniciais da paciente (ex: J.S.)").upper() # Converte para maiúsculas
+
+        # NOVO CAMPO PARA SELEÇÃO DO LOCAL DO MAMÓGRAFO
+        local_mamografo = st.selectbox('Local do Mamógrafo:', options=calibracao.nomes_locais, index=0) # IRD como padrão
+
+        idade = st.number_input('Idade:', min_value=1, max_value=120, value=45, help="Idade da paciente (usado para glandularidade automática)")
+        espessura_mama = st.number_input('Espessura da Mama (cm):', min_value=1.0, max_value=20.0, value=6.0, step=0.1, help="Espessura da mama comprimida em centímetros")
+        alvo_filtro = st.selectbox('Alvo/Filtro:', options=list(alvo_filtro_options.keys()))
+        kv = st.number_input('Kv:', min_value=1.0, max_value=50.0, value=28.0, step=0.1)
+        mas = st.number_input('mAs:', min_value=0.1, max_value=1000.0, value=50.0, step=0.1)
+
+        # Dentro do formulário os campos não aparecem/somem conforme as caixas; os valores só são usados com elas marcadas
+        sabe_glandularidade = st.checkbox("Eu sei a glandularidade (marcar para inserir manualmente)")
+        glandularidade_input = st.number_input('Glandularidade (%):', min_value=0.0, max_value=100.0, value=50.0, step=0.1,
+                                               help="Usada apenas com a opção acima marcada.")
+        if not sabe_glandularidade:
+            glandularidade_input = None
+
+        usar_monte_carlo = st.checkbox("Incerteza também por Monte Carlo (GUM S1)",
+                                       help="Sorteia as entradas e os coeficientes e propaga pela cadeia completa CSR → g/C/Ki → DGM.")
+        amostras_monte_carlo = st.number_input('Amostras do Monte Carlo:', min_value=1_000, max_value=5_000_000,
+                                               value=1_000_000, step=100_000, help="Usado apenas com o Monte Carlo marcado.")
+        if not usar_monte_carlo:
+            amostras_monte_carlo = 0
+
+        calcular = st.form_submit_button("Calcular DGM", type="primary", use_container_width=True)
+
+    painel_cache()
+    painel_diagnostico()
+
+# Abas: cálculo individual (sidebar), cálculo em lote (envio de arquivo) e otimizador de técnica
+aba_individual, aba_lote, aba_otimizador = st.tabs(["Cálculo individual", "Cálculo em lote (arquivo)", "Otimizador de técnica"])
+
+with aba_individual:
+    # Cálculo disparado pelo botão do formulário da barra lateral
+    st.markdown("---")
+    if not calcular:
+        st.caption("Preencha os dados na barra lateral e clique em **Calcular DGM**.")
+    else:
+        st.subheader("Resultados do Cálculo Atual:")
+
+        # Etapas pelo grafo de dependências: só as que dependem das entradas alteradas desde o
+        # último cálculo da sessão são refeitas (ex.: mudar só o mAs refaz Ki e DGM)
+        if "calculo_incremental" not in st.session_state:
+            st.session_state.calculo_incremental = CalculoIncremental(GRAFO_INDIVIDUAL)
+        calculo_incremental = st.session_state.calculo_incremental
+        etapas = calculo_incremental.calcular(
+            local=local_mamografo, idade=idade, espessura=espessura_mama, alvo_filtro=alvo_filtro, kv=kv, mas=mas,
+            glandularidade_informada=glandularidade_input if sabe_glandularidade and glandularidade_input is not None else None,
+            calibracao=calibracao,
+        )
+
+        # Registro do cálculo: valores em float (NaN quando a etapa falha) e o código da primeira falha
+        registro = RegistroDGM(
+            local=local_mamografo, alvo_filtro=alvo_filtro, data_hora=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            id_paciente=paciente_id, iniciais_paciente=iniciais_paciente,
+            calibracao=calibracao.carimbo_por_local.get(local_mamografo, ""),
+            idade=idade, espessura=espessura_mama, kv=kv, mas=mas,
+        )
+
+        # --- Cálculo e Exibição de Glandularidade ---
+        col1, col2 = st.columns(2)
+        with col1:
+            if sabe_glandularidade and glandularidade_input is not None:
+                registro.definir("glandularidade", etapas["glandularidade"])
+                st.info(f"**Glandularidade informada:** {registro.glandularidade:.1f}%")
+            else:
+                glandularidade_calc = etapas["glandularidade"]
+                if registro.definir("glandularidade", glandularidade_calc):
+                    st.info(f"**Glandularidade:** {registro.glandularidade:.1f}%")
+                else:
+                    st.error(f"Erro ao calcular Glandularidade: {glandularidade_calc}")
+
+        # --- Cálculo e Exibição de s ---
+        with col2:
+            s = etapas["valor_s"]
+            if registro.definir("valor_s", s):
+                st.info(f"**Valor de s:** {s}")
+            else:
+                st.error(f"Erro no valor de s: {s}")
+
+        # --- Cálculo e Exibição de CSR e Fator g ---
+        col3, col4 = st.columns(2)
+        with col3:
+            csr_val, incerteza_csr = etapas["csr"], etapas["incerteza_csr"]
+            if registro.definir("csr", csr_val, incerteza_csr):
+                st.info(f"**Valor de CSR:** {csr_val} ± {incerteza_csr}")
+            else:
+                st.error(f"Erro no cálculo de CSR: {csr_val}")
+
+        with col4:
+            fator_g_val, incerteza_fator_g = etapas["fator_g"], etapas["incerteza_fator_g"]
+            if registro.definir("fator_g", fator_g_val, incerteza_fator_g):
+                st.info(f"**Valor do Fator g:** {fator_g_val} ± {incerteza_fator_g}")
+            else:
+                st.error(f"Erro no cálculo do Fator g: {fator_g_val}")
+
+        # --- Cálculo e Exibição de Fator C e Ki ---
+        col5, col6 = st.columns(2)
+
+        glandularidade = registro.glandularidade
+        if not np.isnan(glandularidade):
+            if glandularidade <= 25:
+                registro.grupo_glandularidade = 1
+            elif glandularidade <= 50:
+                registro.grupo_glandularidade = 2
+            elif glandularidade <= 75:
+                registro.grupo_glandularidade = 3
+            else:
+                registro.grupo_glandularidade = 4
+
+        with col5:
+            if registro.valores("csr", "glandularidade"):
+                fator_c_calc, incerteza_fator_c = etapas["fator_c"], etapas["incerteza_fator_c"]
+                if registro.definir("fator_c", fator_c_calc, incerteza_fator_c):
+                    st.info(f"**Valor do Fator C:** {fator_c_calc} ± {incerteza_fator_c}")
+                else:
+                    st.error(f"Erro no cálculo do Fator C: {fator_c_calc}")
+            else:
+                st.warning("Fator C não calculado devido a entradas inválidas de CSR ou Glandularidade.")
+
+        with col6:
+            ki_calc, incerteza_ki = etapas["ki"], etapas["incerteza_ki"]
+            if registro.definir("ki", ki_calc, incerteza_ki):
+                st.info(f"**Valor de Ki:** {ki_calc} ± {incerteza_ki}")
+            else:
+                st.error(f"Erro no cálculo de Ki: {ki_calc}")
+
+        # --- Cálculo e Exibição final da DGM e sua Incerteza ---
+        st.markdown("---")
+        entradas_dgm = registro.valores("ki", "valor_s", "fator_g", "fator_c",
+                                        "incerteza_ki", "incerteza_fator_g", "incerteza_fator_c")
+        if entradas_dgm:
+            dgm, incerteza_dgm = etapas["dgm"], etapas["incerteza_dgm"]
+
+            if registro.definir("dgm", dgm, incerteza_dgm):
+                st.success(f"**Valor da DGM:** {dgm} mGy ± {incerteza_dgm} mGy")
+
+                if usar_monte_carlo:
+                    mc = simular_dgm(kv, alvo_filtro, mas, espessura_mama, local_mamografo, idade=idade,
+                                     glandularidade=glandularidade if sabe_glandularidade else None,
+                                     amostras=int(amostras_monte_carlo), calibracao=calibracao)
+                    st.info(f"**Monte Carlo ({mc['amostras']:,} amostras):** média {mc['media']:.2f} mGy, "
+                            f"desvio-padrão {mc['desvio_padrao']:.4f} mGy; intervalo de {mc['cobertura']:.0%}: "
+                            f"[{mc['limite_inferior']:.2f}, {mc['limite_superior']:.2f}] mGy")
+            else:
+                st.error(f"Não foi possível calcular a DGM: {dgm}")
+        else:
+            st.error("Não foi possível calcular a DGM devido a erros nos valores anteriores ou incertezas inválidas.")
+
+        st.caption("Etapas recalculadas: " + (", ".join(calculo_incremental.recalculadas) or "nenhuma (entradas iguais às do cálculo anterior)")
+                   + f" · Calibração: {registro.calibracao or 'sem calibração para o local'}")
+
+        # Armazenar resultados no histórico
+        if registro.ok:
+            obter_historico().adicionar(registro.linha_historico(), dono_historico())
+
+with aba_lote:
+    painel_lote()
+
+with aba_otimizador:
+    painel_otimizador()
+
+# --- Exibição do Histórico e Botões ---
+st.markdown("---")
+st.subheader("Histórico de Cálculos:")
+painel_historico()
+
+with st.expander("📊 Níveis de referência (DRL) por local, alvo/filtro e espessura"):
+    painel_drl()
+
+st.markdown("---")
+st.markdown("Desenvolvido por Jossana Almeida, com o auxílio de um modelo de linguagem.")
+
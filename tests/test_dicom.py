@@ -0,0 +1,194 @@
+"""
+Leitura de DICOM (dgm.dicom) com os arquivos sintéticos de gravar_imagem_sintetica e
+gravar_sr_sintetico: sintaxes implícita e explícita, eventos do RDSR, conversão de unidades,
+sintaxes recusadas e arquivos truncados.
+"""
+import math
+from datetime import datetime
+
+import pytest
+
+from dgm.dicom import (
+    SINTAXES_NAO_SUPORTADAS,
+    ErroDicom,
+    _bytes_elemento,
+    _converter_unidade,
+    gravar_imagem_sintetica,
+    gravar_sr_sintetico,
+    ler_blocos_dicom,
+    ler_exposicoes_dicom,
+)
+
+SINTAXE_EXPLICITA = "1.2.840.10008.1.2.1"
+CONTENT_SEQUENCE = b"\x40\x00\x30\xa7"  # (0040,A730) em little endian
+PIXEL_DATA = b"\xe0\x7f\x10\x00"  # (7FE0,0010)
+
+EVENTOS_SR = [
+    {"kv": 28, "mas": 60, "espessura": 4.5, "alvo_filtro": "Mo/Rh", "dgm": 1.2},
+    {"kv": 31, "mas": 85.5, "espessura": 5.8, "alvo_filtro": "W/Rh"},
+]
+
+
+def _gravar_imagem(caminho, implicito=False, **extras):
+    parametros = {"kv": 29, "mas": 63.5, "espessura": 4.5, "alvo_filtro": "Mo/Rh", "idade": 52, "id_paciente": "P001",
+                  "nome_paciente": "Silva^Maria^Clara", "data_hora": datetime(2024, 3, 5, 14, 30, 15),
+                  "estacao": "MAMO1", "dose_orgao": 0.012, "bytes_pixels": 256}
+    parametros.update(extras)
+    gravar_imagem_sintetica(caminho, implicito=implicito, **parametros)
+    return caminho
+
+
+def _gravar_sr(caminho, implicito=False):
+    gravar_sr_sintetico(caminho, EVENTOS_SR, idade=60, id_paciente="P002", nome_paciente="Souza^Ana",
+                        data_hora=datetime(2024, 3, 6, 9, 0, 0), estacao="MAMO2", implicito=implicito)
+    return caminho
+
+
+def _trocar_sintaxe(caminho, sintaxe):
+    """Regrava o arquivo (explícito) com outra sintaxe de transferência na meta-informação."""
+    dados = caminho.read_bytes()
+    original = _bytes_elemento(0x00020010, b"UI", SINTAXE_EXPLICITA, True)
+    assert dados.count(original) == 1
+    caminho.write_bytes(dados.replace(original, _bytes_elemento(0x00020010, b"UI", sintaxe, True)))
+
+
+# --- Sintaxes implícita e explícita ---
+
+@pytest.mark.parametrize("implicito", [False, True], ids=["explicita", "implicita"])
+def test_imagem(tmp_path, implicito):
+    exposicoes = ler_exposicoes_dicom(_gravar_imagem(tmp_path / "imagem.dcm", implicito))
+    assert len(exposicoes) == 1
+    exposicao = exposicoes[0]
+    assert exposicao["Data/Hora"] == "2024-03-05 14:30:15"
+    assert exposicao["ID Paciente"] == "P001"
+    assert exposicao["Iniciais Paciente"] == "MCS"
+    assert exposicao["Estação"] == "MAMO1"
+    assert exposicao["Idade"] == 52
+    assert exposicao["Alvo/Filtro"] == "Mo/Rh"
+    assert exposicao["Kv"] == 29
+    assert exposicao["mAs"] == pytest.approx(63.5)
+    assert exposicao["Espessura (cm)"] == pytest.approx(4.5)
+
+
+def test_sintaxes_leem_o_mesmo(tmp_path):
+    explicita = ler_exposicoes_dicom(_gravar_imagem(tmp_path / "explicita.dcm"))[0]
+    implicita = ler_exposicoes_dicom(_gravar_imagem(tmp_path / "implicita.dcm", implicito=True))[0]
+    assert {c: v for c, v in explicita.items() if c != "Arquivo"} == {c: v for c, v in implicita.items() if c != "Arquivo"}
+
+
+# --- Eventos do RDSR ---
+
+@pytest.mark.parametrize("implicito", [False, True], ids=["explicita", "implicita"])
+def test_sr_um_evento_por_exposicao(tmp_path, implicito):
+    exposicoes = ler_exposicoes_dicom(_gravar_sr(tmp_path / "rdsr.dcm", implicito))
+    assert len(exposicoes) == len(EVENTOS_SR)
+    for exposicao, evento in zip(exposicoes, EVENTOS_SR):
+        assert exposicao["ID Paciente"] == "P002"
+        assert exposicao["Iniciais Paciente"] == "AS"
+        assert exposicao["Idade"] == 60
+        assert exposicao["Data/Hora"] == "2024-03-06 09:00:00"
+        assert exposicao["Alvo/Filtro"] == evento["alvo_filtro"]
+        assert exposicao["Kv"] == evento["kv"]
+        assert exposicao["mAs"] == pytest.approx(evento["mas"])
+        assert exposicao["Espessura (cm)"] == pytest.approx(evento["espessura"])
+    assert exposicoes[0]["DGM Informada (mGy)"] == pytest.approx(1.2)
+    assert math.isnan(exposicoes[1]["DGM Informada (mGy)"])
+
+
+def test_sr_em_blocos_com_local_por_estacao(tmp_path):
+    _gravar_sr(tmp_path / "rdsr.dcm")
+    _gravar_imagem(tmp_path / "imagem.dcm")
+    blocos = list(ler_blocos_dicom(tmp_path, tamanho_bloco=2, local={"MAMO1": "IRD", "MAMO2": "UFRJ"}))
+    assert [len(bloco) for bloco in blocos] == [2, 1]
+    assert list(blocos[1].index) == [2]
+    locais = [local for bloco in blocos for local in bloco["Local do Mamógrafo"]]
+    assert locais == ["IRD", "UFRJ", "UFRJ"]  # arquivos em ordem de nome: imagem.dcm, rdsr.dcm
+
+
+# --- Conversão de unidades ---
+
+@pytest.mark.parametrize("nome, valor, unidade, esperado", [
+    ("exposicao", 63500, "uA.s", 63.5),
+    ("exposicao", 63.5, "mA.s", 63.5),
+    ("exposicao", 0.0635, "A.s", 63.5),
+    ("espessura", 45, "mm", 4.5),
+    ("espessura", 4.5, "cm", 4.5),
+    ("tempo_exposicao", 1.2, "s", 1200),
+    ("dgm_informada", 0.012, "dGy", 1.2),
+    ("dgm_informada", 0.0012, "Gy", 1.2),
+    ("dgm_informada", 1.2, "mGy", 1.2),
+    ("kv", 28, "kV", 28),
+])
+def test_converter_unidade(nome, valor, unidade, esperado):
+    assert _converter_unidade(nome, valor, unidade) == pytest.approx(esperado)
+
+
+def test_imagem_unidades_do_cabecalho(tmp_path):
+    # Exposure in µAs -> mAs, Body Part Thickness em mm -> cm, Organ Dose em dGy -> mGy
+    exposicao = ler_exposicoes_dicom(_gravar_imagem(tmp_path / "imagem.dcm", mas=120.25, espessura=6.3,
+                                                    dose_orgao=0.0215))[0]
+    assert exposicao["mAs"] == pytest.approx(120.25)
+    assert exposicao["Espessura (cm)"] == pytest.approx(6.3)
+    assert exposicao["DGM Informada (mGy)"] == pytest.approx(2.15)
+
+
+# --- Sintaxes não suportadas ---
+
+@pytest.mark.parametrize("sintaxe", sorted(SINTAXES_NAO_SUPORTADAS))
+def test_sintaxe_nao_suportada(tmp_path, sintaxe):
+    caminho = _gravar_imagem(tmp_path / "imagem.dcm")
+    _trocar_sintaxe(caminho, sintaxe)
+    with pytest.raises(ErroDicom, match="não suportada"):
+        ler_exposicoes_dicom(caminho)
+
+
+def test_sintaxe_nao_suportada_registrada_nos_erros(tmp_path):
+    _gravar_imagem(tmp_path / "a.dcm")
+    _trocar_sintaxe(_gravar_imagem(tmp_path / "b.dcm"), "1.2.840.10008.1.2.2")
+    erros = []
+    blocos = list(ler_blocos_dicom(tmp_path, local="IRD", erros=erros))
+    assert sum(len(bloco) for bloco in blocos) == 1
+    assert [arquivo for arquivo, _ in erros] == [str(tmp_path / "b.dcm")]
+
+
+# --- Arquivos truncados e que não são DICOM ---
+
+@pytest.mark.parametrize("implicito", [False, True], ids=["explicita", "implicita"])
+def test_sr_truncado(tmp_path, implicito):
+    dados = _gravar_sr(tmp_path / "rdsr.dcm", implicito).read_bytes()
+    inicio = dados.find(CONTENT_SEQUENCE)
+    truncado = tmp_path / "truncado.dcm"
+    # Qualquer corte dentro da Content Sequence é recusado, até o do delimitador final
+    for tamanho in range(inicio + 1, len(dados)):
+        truncado.write_bytes(dados[:tamanho])
+        with pytest.raises(ErroDicom):
+            ler_exposicoes_dicom(truncado)
+
+
+@pytest.mark.parametrize("implicito", [False, True], ids=["explicita", "implicita"])
+def test_imagem_truncada(tmp_path, implicito):
+    dados = _gravar_imagem(tmp_path / "imagem.dcm", implicito).read_bytes()
+    truncado = tmp_path / "truncado.dcm"
+    # Cortes no cabeçalho: ErroDicom ou só os campos gravados antes do corte, nunca outra exceção
+    for tamanho in range(1, dados.find(PIXEL_DATA)):
+        truncado.write_bytes(dados[:tamanho])
+        try:
+            exposicoes = ler_exposicoes_dicom(truncado)
+        except ErroDicom:
+            continue
+        assert len(exposicoes) <= 1
+
+
+def test_pixels_truncados_nao_sao_lidos(tmp_path):
+    dados = _gravar_imagem(tmp_path / "imagem.dcm", bytes_pixels=4096).read_bytes()
+    truncado = tmp_path / "truncado.dcm"
+    truncado.write_bytes(dados[:dados.find(PIXEL_DATA) + 16])
+    assert ler_exposicoes_dicom(truncado)[0]["Kv"] == 29
+
+
+@pytest.mark.parametrize("conteudo", [b"", b"Data/Hora,Kv\n2024-01-01,28\n", b"\x00" * 200])
+def test_nao_dicom(tmp_path, conteudo):
+    caminho = tmp_path / "arquivo.dcm"
+    caminho.write_bytes(conteudo)
+    with pytest.raises(ErroDicom):
+        ler_exposicoes_dicom(caminho)